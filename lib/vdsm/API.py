@@ -1013,6 +1013,9 @@ class StorageDomain(APIBase):
             return self._irs.detachStorageDomain(self._UUID, storagepoolID,
                                                  masterSdUUID, masterVersion)
 
+    def dump(self):
+        return self._irs.dumpStorageDomain(self._UUID)
+
     def extend(self, storagepoolID, devlist, force=False):
         return self._irs.extendStorageDomain(self._UUID, storagepoolID,
                                              devlist, force)
@@ -1360,6 +1363,19 @@ class Global(APIBase):
         return {'status': doneCode,
                 'statsList': logutils.Suppressed(statsList)}
 
+    @api.logged(on="api.host")
+    def getAllVmStatsChanges(self, token=None):
+        """
+        Get statistics of all running VMs changed since the call returning
+        token.
+        """
+        hooks.before_get_all_vm_stats()
+        statsList = self._cif.getAllVmStats()
+        statsList = hooks.after_get_all_vm_stats(statsList)
+        changes = self._cif.vm_stats_tracker.changes(statsList, token)
+        return {'status': doneCode,
+                'changes': logutils.Suppressed(changes)}
+
     @api.logged(on="api.host")
     def getAllVmIoTunePolicies(self):
         """
@@ -1395,6 +1411,15 @@ class Global(APIBase):
                                           sampling.host_samples.stats(),
                                           multipath=True)}
 
+    @api.logged(on="api.host")
+    def getRpcStats(self):
+        """
+        Report per method statistics of JSON-RPC requests.
+        """
+        json_binding = self._cif.servers['jsonrpc']
+        return {'status': doneCode,
+                'stats': logutils.Suppressed(json_binding.stats.info())}
+
     @api.logged(on="api.host")
     def setLogLevel(self, level, name=''):
         """
@@ -45,6 +45,15 @@ PRIMITIVE_TYPES = {'boolean': lambda value: isinstance(value, bool),
                    'uint': lambda value: isinstance(value, int) and value >= 0}
 TYPE_KEYS = list(PRIMITIVE_TYPES.keys())
 
+# Primitive types checked only by the class of the value.
+_PRIMITIVE_CLASSES = {'boolean': bool,
+                      'float': float,
+                      'int': int,
+                      'string': six.string_types}
+
+# Default value of a required property.
+_REQUIRED = object()
+
 
 DEFAULT_VALUES = {'{}': {},
                   '()': (),
@@ -137,6 +146,8 @@ class Schema(object):
         self._strict_mode = strict_mode
         self._methods = {}
         self._types = {}
+        self._validators = {}
+        self._types_validators = {}
         try:
             for schema_type in schema_types:
                 with io.open(schema_type.path(), 'rb') as f:
@@ -204,12 +215,6 @@ class Schema(object):
     def get_types(self):
         return utils.picklecopy(self._types)
 
-    def _check_primitive_type(self, t, value, name):
-        condition = PRIMITIVE_TYPES.get(t)
-        if not condition(value):
-            self._report_inconsistency('Parameter %s is not %s type'
-                                       % (name, t))
-
     def _report_inconsistency(self, message):
         if self._strict_mode:
             raise JsonRpcInvalidParamsError(message)
@@ -218,191 +223,319 @@ class Schema(object):
 
     def verify_args(self, rep, args):
         try:
+            self._validator(self._compile_args, rep)(args, rep.id)
+        except JsonRpcInvalidParamsError:
+            raise
+        except Exception:
+            self._report_inconsistency('Unexpected issue with request type'
+                                       ' verification for %s' % rep.id)
+
+    def verify_retval(self, rep, ret):
+        try:
+            validate = self._validator(self._compile_retval, rep)
+            if validate is not None:
+                if isinstance(ret, Suppressed):
+                    ret = ret.value
+                validate(ret, rep.id)
+        except JsonRpcInvalidParamsError:
+            raise
+        except Exception:
+            self._report_inconsistency('Unexpected issue with response type'
+                                       ' verification for %s' % rep.id)
+
+    def verify_event_params(self, sub_id, args):
+        rep = EventRep(sub_id)
+        try:
+            self._validator(self._compile_event, rep)(args, rep.id)
+        except JsonRpcInvalidParamsError:
+            raise
+        except Exception:
+            self._report_inconsistency('Unexpected issue with event type'
+                                       ' verification for %s' % rep.id)
+
+    # Validators
+    #
+    # Walking the schema for every call is too slow for verifying large
+    # values like the statistics of all VMs. Instead, the schema of a method
+    # is compiled on first use into a tree of validator closures, cached per
+    # method. Types shared by many methods are compiled only once.
+    #
+    # A validator is called as validator(value, identifier), where
+    # identifier is the method or event id used in the reports.
+    #
+    # Validators are named like the methods used before to walk the schema,
+    # and keep the type in their arguments, so SchemaInconsistencyFormatter
+    # can find them in the stack.
+
+    def _validator(self, compile, rep):
+        key = (compile.__name__, rep.id)
+        try:
+            return self._validators[key]
+        except KeyError:
+            validator = self._validators[key] = compile(rep)
+            return validator
+
+    def _compile_args(self, rep):
+        params = self.get_args(rep)
+        arg_names = frozenset(param.get('name') for param in params)
+        checks = self._compile_params(params)
+        report = self._report_inconsistency
+
+        def verify_args(args, identifier):
             # check whether there are extra parameters
-            unknown_args = [key for key in args if key not in
-                            self.get_arg_names(rep)]
-            if unknown_args:
-                self._report_inconsistency('Following parameters %s were not'
-                                           ' recognized' % (unknown_args))
+            if not arg_names.issuperset(args):
+                unknown_args = [key for key in args if key not in arg_names]
+                report('Following parameters %s were not recognized'
+                       % (unknown_args))
 
             # verify types of provided parameters
-            for param in self.get_args(rep):
-                name = param.get('name')
+            for name, optional, check in checks:
                 arg = args.get(name)
                 if arg is None:
                     # check if missing paramter was defined as optional
-                    if 'defaultvalue' not in param:
-                        self._report_inconsistency(
-                            'Required parameter %s is not '
-                            'provided when calling %s' % (name, rep.id))
+                    if not optional:
+                        report('Required parameter %s is not provided when'
+                               ' calling %s' % (name, identifier))
                     continue
-                self._verify_type(param, arg, rep.id)
-        except JsonRpcInvalidParamsError:
-            raise
-        except Exception:
-            self._report_inconsistency('Unexpected issue with request type'
-                                       ' verification for %s' % rep.id)
+                check(arg, identifier)
+
+        return verify_args
+
+    def _compile_retval(self, rep):
+        ret_args = self.get_ret_param(rep)
+        if not ret_args:
+            return None
+        return self._compile_type(ret_args.get('type'))
+
+    def _compile_event(self, rep):
+        checks = self._compile_params(self.get_args(rep))
+        report = self._report_inconsistency
+
+        def verify_event_params(args, identifier):
+            # due to issue with vm status changes key names (vm_ids)
+            # we are not able to find unknown params
+            for name, optional, check in checks:
+                if name == 'no_name':
+                    for key, value in six.iteritems(args):
+                        if key == "notify_time":
+                            continue
+                        check({key: value}, identifier)
+                    continue
+                arg = args.get(name)
+                if arg is None:
+                    if not optional:
+                        report('Required parameter %s is not provided when'
+                               ' sending %s' % (name, identifier))
+                    continue
+                check(arg, identifier)
+
+        return verify_event_params
 
-    def _verify_type(self, param, value, identifier):
+    def _compile_params(self, params):
+        return [(param.get('name'), 'defaultvalue' in param,
+                 self._compile_type(param))
+                for param in params]
+
+    def _compile_type(self, param):
+        """
+        Return a validator for param, a type, a list of types, or a
+        parameter or property using a type.
+
+        If the schema of param is invalid, the returned validator raises
+        the error, so it is reported only when verifying a value of this
+        type.
+        """
+        try:
+            return self._compile_type_unsafe(param)
+        except Exception as e:
+            return _invalid_type(e)
+
+    def _compile_type_unsafe(self, param):
         # check whether a parameter is in a list
         if isinstance(param, list):
-            if not isinstance(value, list):
-                self._report_inconsistency('Parameter %s is not a list'
-                                           % (value))
-            for a in value:
-                self._verify_type(param[0], a, identifier)
-            return
+            return self._compile_list(param[0], list, 'list')
         # check whether a parameter is defined as primitive type
         elif param in TYPE_KEYS:
-            self._check_primitive_type(param, value, param)
-            return
+            return self._compile_primitive(param, param)
 
         # get type and name
         name = param.get('name')
         t = param.get('type')
         if t == 'dict':
             # it seems that there is no other way to have it fixed
-            self._report_inconsistency(
-                'Unsupported type %s in %s please fix' % (t, identifier))
+            return self._compile_unsupported(t)
 
         # check whether it is a primitive type
         elif t in TYPE_KEYS:
-            self._check_primitive_type(t, value, name)
+            return self._compile_primitive(t, name)
+
+        # if type is a string param is the type
+        elif isinstance(t, six.string_types):
+            return self._compile_complex(t, param, name)
+
+        # if type is in a list we need to get the type
+        elif isinstance(t, list):
+            return self._compile_list(t[0], (list, tuple), 'sequence')
 
         else:
-            # if type is a string call type verification method
-            if isinstance(t, six.string_types):
-                self._verify_complex_type(t, param, value, name, identifier)
-
-            # if type is in a list we need to get the type and call
-            # type verification method
-            elif isinstance(t, list):
-                if not isinstance(value, (list, tuple)):
-                    self._report_inconsistency('Parameter %s is not a sequence'
-                                               % (value))
-                for a in value:
-                    self._verify_type(t[0], a, identifier)
-            else:
-                # call complex type verification
-                self._verify_complex_type(t.get('type'), t, value, name,
-                                          identifier)
+            return self._compile_complex(t.get('type'), t, name)
+
+    def _compile_unsupported(self, t):
+        report = self._report_inconsistency
+
+        def _verify_unsupported_type(value, identifier):
+            report('Unsupported type %s in %s please fix' % (t, identifier))
+
+        return _verify_unsupported_type
+
+    def _compile_list(self, item_type, classes, kind):
+        check_item = self._compile_type(item_type)
+        report = self._report_inconsistency
+
+        def _verify_list_type(value, identifier):
+            if not isinstance(value, classes):
+                report('Parameter %s is not a %s' % (value, kind))
+            for item in value:
+                check_item(item, identifier)
+
+        return _verify_list_type
 
-    def _verify_complex_type(self, t_type, t, arg, name, identifier):
+    def _compile_primitive(self, t, name):
+        report = self._report_inconsistency
+        classes = _PRIMITIVE_CLASSES.get(t)
+
+        if classes is not None:
+            def _check_primitive_type(value, identifier, t=t):
+                if not isinstance(value, classes):
+                    report('Parameter %s is not %s type' % (name, t))
+        else:
+            condition = PRIMITIVE_TYPES[t]
+
+            def _check_primitive_type(value, identifier, t=t):
+                if not condition(value):
+                    report('Parameter %s is not %s type' % (name, t))
+
+        return _check_primitive_type
+
+    def _compile_complex(self, t_type, t, name):
         """
-        This method verify whether argument value align with different
-        types we support such as: alias, map, union, enum and object.
+        Return a validator for the types we support such as: alias, map,
+        union, enum and object.
         """
         if t_type == 'alias':
             # if alias we need to check sourcetype
-            self._check_primitive_type(t.get('sourcetype'), arg, name)
-        elif t_type == 'map':
-            # if map we need to check key and value types
-            for key, value in six.iteritems(arg):
-                self._verify_type(t.get('key-type'), key, identifier)
-                self._verify_type(t.get('value-type'), value, identifier)
+            return self._compile_primitive(t.get('sourcetype'), name)
         elif t_type == 'union':
-            # if union we need to check whether parameter matches on of the
-            # values defined
-            for value in t.get('values'):
-                props = value.get('properties')
-                prop_names = [prop.get('name') for prop in props]
-                if not [key for key in arg if key not in prop_names]:
-                    self._verify_complex_type(value.get('type'), value, arg,
-                                              name, identifier)
+            return self._compile_union(t, name)
+
+        # Validators of other types do not depend on the parameter name.
+        validator = self._types_validators.get(id(t))
+        if validator is None:
+            if t_type == 'map':
+                validator = self._compile_map(t)
+            elif t_type == 'enum':
+                validator = self._compile_enum(t)
+            else:
+                validator = self._compile_object(t)
+            self._types_validators[id(t)] = validator
+        return validator
+
+    def _compile_map(self, t):
+        # if map we need to check key and value types
+        check_key = self._compile_type(t.get('key-type'))
+        check_value = self._compile_type(t.get('value-type'))
+
+        def _verify_complex_type(arg, identifier, t_type='map'):
+            for key, value in six.iteritems(arg):
+                check_key(key, identifier)
+                check_value(value, identifier)
+
+        return _verify_complex_type
+
+    def _compile_union(self, t, name):
+        # if union we need to check whether parameter matches on of the
+        # values defined
+        values = []
+        for value in t.get('values'):
+            try:
+                prop_names = frozenset(prop.get('name')
+                                       for prop in value.get('properties'))
+                check = self._compile_complex(value.get('type'), value, name)
+            except Exception as e:
+                prop_names, check = None, _invalid_type(e)
+            values.append((prop_names, check))
+        report = self._report_inconsistency
+
+        def _verify_complex_type(arg, identifier, t_type='union'):
+            for prop_names, check in values:
+                if prop_names is None or prop_names.issuperset(arg):
+                    check(arg, identifier)
                     return
-            self._report_inconsistency('Provided parameters %s do not match'
-                                       ' any of union %s values'
-                                       % (arg, t.get('name')))
-        elif t_type == 'enum':
-            # if enum we need to check whether provided parameter is in values
-            if arg not in t.get('values'):
-                self._report_inconsistency('Provided value "%s" not'
-                                           ' defined in %s enum for'
-                                           ' %s' % (arg,
-                                                    t.get('name'),
-                                                    identifier))
-        else:
-            # if custom time (object) we need to check whether all the
-            # properties match values provided
-            self._verify_object_type(t, arg, identifier)
+            report('Provided parameters %s do not match any of union %s'
+                   ' values' % (arg, t.get('name')))
+
+        return _verify_complex_type
+
+    def _compile_enum(self, t):
+        # if enum we need to check whether provided parameter is in values
+        values = t.get('values')
+        report = self._report_inconsistency
+
+        def _verify_complex_type(arg, identifier, t_type='enum'):
+            if arg not in values:
+                report('Provided value "%s" not defined in %s enum for %s'
+                       % (arg, t.get('name'), identifier))
+
+        return _verify_complex_type
 
-    def _verify_object_type(self, t, arg, identifier):
+    def _compile_object(self, t):
+        # if custom time (object) we need to check whether all the
+        # properties match values provided
         props = t.get('properties')
-        prop_names = [prop.get('name') for prop in props]
-        # check if there are any extra prarameters
-        unknown_props = [key for key in arg
-                         if key not in prop_names]
-        if unknown_props:
-            if 'any_string' in prop_names:
-                return
-            self._report_inconsistency('Following parameters %s were not'
-                                       ' recognized' % (unknown_props))
-        # iterate over properties
+        prop_names = frozenset(prop.get('name') for prop in props)
+        any_string = 'any_string' in prop_names
+        checks = []
         for prop in props:
-            p_name = prop.get('name')
-            a = arg.get(p_name)
-
-            # check whether parameter is defined as optional and
-            # check default type
             if 'defaultvalue' in prop:
-                value = prop.get('defaultvalue')
-                if value == 'needs updating':
-                    self._report_inconsistency(
-                        'No default value specified for %s parameter in'
-                        ' %s' % (p_name, identifier))
-                if value == 'no-default':
-                    continue
-                if a is None or a == value:
+                default = prop.get('defaultvalue')
+                if default == 'no-default':
                     continue
             else:
-                if a is None:
-                    self._report_inconsistency(
-                        'Required property %s is not provided when calling'
-                        ' %s' % (p_name, identifier))
-                    continue
-            # call type verification
-            self._verify_type(prop, a, identifier)
-
-    def verify_retval(self, rep, ret):
-        try:
-            ret_args = self.get_ret_param(rep)
-
-            if ret_args:
-                if isinstance(ret, Suppressed):
-                    ret = ret.value
-                self._verify_type(ret_args.get('type'), ret, rep.id)
-        except JsonRpcInvalidParamsError:
-            raise
-        except Exception:
-            self._report_inconsistency('Unexpected issue with response type'
-                                       ' verification for %s' % rep.id)
+                default = _REQUIRED
+            checks.append((prop.get('name'), default,
+                           self._compile_type(prop)))
+        report = self._report_inconsistency
+
+        def _verify_object_type(arg, identifier, t=t):
+            # check if there are any extra prarameters
+            if not prop_names.issuperset(arg):
+                if any_string:
+                    return
+                unknown_props = [key for key in arg
+                                 if key not in prop_names]
+                report('Following parameters %s were not recognized'
+                       % (unknown_props))
+            # iterate over properties
+            for p_name, default, check in checks:
+                a = arg.get(p_name)
+
+                # check whether parameter is defined as optional and
+                # check default type
+                if default is _REQUIRED:
+                    if a is None:
+                        report('Required property %s is not provided when'
+                               ' calling %s' % (p_name, identifier))
+                        continue
+                else:
+                    if default == 'needs updating':
+                        report('No default value specified for %s parameter'
+                               ' in %s' % (p_name, identifier))
+                    if a is None or a == default:
+                        continue
+                # call type verification
+                check(a, identifier)
 
-    def verify_event_params(self, sub_id, args):
-        rep = EventRep(sub_id)
-        try:
-            # due to issue with vm status changes key names (vm_ids)
-            # we are not able to find unknown params
-            for param in self.get_args(rep):
-                name = param.get('name')
-                if name == 'no_name':
-                    for key, value in six.iteritems(args):
-                        if key == "notify_time":
-                            continue
-                        self._verify_type(param, {key: value}, rep.id)
-                    continue
-                arg = args.get(name)
-                if arg is None:
-                    if 'defaultvalue' not in param:
-                        self._report_inconsistency(
-                            'Required parameter %s is not '
-                            'provided when sending %s' % (name, rep.id))
-                    continue
-                self._verify_type(param, arg, rep.id)
-        except JsonRpcInvalidParamsError:
-            raise
-        except Exception:
-            self._report_inconsistency('Unexpected issue with event type'
-                                       ' verification for %s' % rep.id)
+        return _verify_object_type
 
     def _get_arg_dict(self, arg_type, name, params_dict):
         '''
@@ -497,3 +630,9 @@ class Schema(object):
             else:
                 params_dict[arg.get('name')] = arg.get('type')
         return json.dumps(params_dict, indent=4)
+
+
+def _invalid_type(error):
+    def _verify_invalid_type(value, identifier):
+        raise error
+    return _verify_invalid_type
@@ -32,7 +32,7 @@ from collections import defaultdict
 
 import six
 
-from yajsonrpc.betterAsyncore import Reactor
+from yajsonrpc import betterAsyncore
 from yajsonrpc.exception import JsonRpcBindingsError
 from yajsonrpc.stompclient import StompClient
 from yajsonrpc.stompserver import StompRpcServer
@@ -49,6 +49,8 @@ from vdsm.virt import events
 from vdsm.virt import migration
 from vdsm.virt import recovery
 from vdsm.virt import secret
+from vdsm.virt import statstracker
+from vdsm.virt import vmstatspool
 from vdsm.virt import vmstatus
 from vdsm.virt.vmchannels import Listener
 from vdsm.virt.vmdevices.storage import DISK_TYPE
@@ -107,6 +109,13 @@ class clientIF(object):
         # visible to the rest of the code.
         self.channelListener = Listener(self.log)
         self.qga_poller = QemuGuestAgentPoller(self, log, scheduler)
+        self.vm_stats_pool = None
+        stats_workers = config.getint('vars', 'vm_stats_workers')
+        if stats_workers > 0:
+            self.vm_stats_pool = vmstatspool.VmStatsPool(
+                scheduler,
+                stats_workers,
+                config.getint('vars', 'vm_stats_timeout'))
         self.mom = None
         self.servers = {}
         self._broker_client = None
@@ -119,6 +128,7 @@ class clientIF(object):
             self.gluster = None
         try:
             self.vmContainer = {}
+            self.vm_stats_tracker = statstracker.VmStatsTracker()
             self.lastRemoteAccess = 0
             self._enabled = True
             self._netConfigDirty = False
@@ -130,6 +140,8 @@ class clientIF(object):
                 config.getint('vars', 'guest_agent_timeout'))
             self.channelListener.start()
             self.qga_poller.start()
+            if self.vm_stats_pool is not None:
+                self.vm_stats_pool.start()
             self.threadLocal = threading.local()
             self.threadLocal.client = ''
 
@@ -268,7 +280,8 @@ class clientIF(object):
 
     def _createAcceptor(self, host, port):
         sslctx = sslutils.create_ssl_context()
-        self._reactor = Reactor()
+        self._reactor = betterAsyncore.create_reactor(
+            config.get('rpc', 'reactor'))
 
         self._acceptor = MultiProtocolAcceptor(self._reactor, host,
                                                port, sslctx)
@@ -389,6 +402,8 @@ class clientIF(object):
             secret.clear()
             self.channelListener.stop()
             self.qga_poller.stop()
+            if self.vm_stats_pool is not None:
+                self.vm_stats_pool.stop()
             if self.irs:
                 return self.irs.prepareForShutdown()
             else:
@@ -566,7 +581,10 @@ class clientIF(object):
             return ret
 
     def getAllVmStats(self):
-        return [v.getStats() for v in self.vmContainer.values()]
+        vms = list(self.vmContainer.values())
+        if self.vm_stats_pool is None:
+            return [v.getStats() for v in vms]
+        return self.vm_stats_pool.produce(vms)
 
     def getAllVmIoTunePolicies(self):
         vm_io_tune_policies = {}
@@ -140,21 +140,71 @@ class Barrier(object):
 Result = namedtuple("Result", ["succeeded", "value"])
 
 
-def tmap(func, iterable):
+def tmap(func, iterable, max_workers=None, slot_timeout=None):
+    """
+    Run func with every argument from iterable in a new thread, and return
+    a list of Result objects, in the order of the arguments.
+
+    If max_workers is set, run at most max_workers calls at the same time.
+
+    If slot_timeout is set, a call running more than slot_timeout seconds
+    stops counting against max_workers, so a blocked call does not delay
+    the next calls. tmap returns only when all calls have completed.
+    """
+    if max_workers is not None and max_workers < 1:
+        raise ValueError("Invalid max_workers: %r" % max_workers)
+
     args = list(iterable)
     results = [None] * len(args)
+    if max_workers is None:
+        max_workers = len(args)
+
+    cond = threading.Condition(threading.Lock())
+    completed = [0]
 
     def worker(i, f, arg):
         try:
-            results[i] = Result(True, f(arg))
+            result = Result(True, f(arg))
         except Exception as e:
-            results[i] = Result(False, e)
+            result = Result(False, e)
+        with cond:
+            results[i] = result
+            completed[0] += 1
+            cond.notify()
 
     threads = []
-    for i, arg in enumerate(args):
-        t = thread(worker, args=(i, func, arg), name="tmap/%d" % i)
-        t.start()
-        threads.append(t)
+    # Maps the index of a call using a worker slot to its slot deadline.
+    slots = {}
+    with cond:
+        while True:
+            while len(threads) < len(args) and len(slots) < max_workers:
+                i = len(threads)
+                t = thread(worker, args=(i, func, args[i]),
+                           name="tmap/%d" % i)
+                if slot_timeout is not None:
+                    slots[i] = time.monotonic_time() + slot_timeout
+                else:
+                    slots[i] = None
+                t.start()
+                threads.append(t)
+
+            if completed[0] == len(args):
+                break
+
+            now = time.monotonic_time()
+            for i, deadline in list(slots.items()):
+                if results[i] is not None or (
+                        deadline is not None and now >= deadline):
+                    del slots[i]
+
+            if len(threads) < len(args) and len(slots) < max_workers:
+                continue
+
+            deadlines = [d for d in slots.values() if d is not None]
+            if deadlines:
+                cond.wait(max(0, min(deadlines) - now))
+            else:
+                cond.wait()
 
     for t in threads:
         t.join()
@@ -0,0 +1,111 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Thread safe histograms with fixed buckets, for collecting latency
+distributions without keeping the samples.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import bisect
+import threading
+
+# Default bucket upper bounds in seconds, suitable for operations taking
+# milliseconds to minutes.
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    60.0)
+
+
+class Histogram(object):
+    """
+    Count values in buckets defined by sorted upper bounds. Values larger
+    than the last bound are counted in an overflow bucket.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        if list(buckets) != sorted(buckets):
+            raise ValueError("Buckets must be sorted: %s" % (buckets,))
+        self._bounds = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._count = 0
+        self._sum = 0
+        self._min = None
+        self._max = None
+
+    def add(self, value):
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            if self._min is None or value < self._min:
+                self._min = value
+            if self._max is None or value > self._max:
+                self._max = value
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self._bounds) + 1)
+            self._count = 0
+            self._sum = 0
+            self._min = None
+            self._max = None
+
+    def snapshot(self):
+        """
+        Return a dict describing the histogram:
+
+            count       number of values added
+            sum         sum of all values
+            min, max    smallest and largest values, None if empty
+            buckets     list of (upper_bound, count) tuples, including the
+                        overflow bucket with upper bound of None
+        """
+        with self._lock:
+            counts = list(self._counts)
+            result = {
+                "count": self._count,
+                "sum": self._sum,
+                "min": self._min,
+                "max": self._max,
+            }
+        result["buckets"] = list(zip(self._bounds + (None,), counts))
+        return result
+
+    def percentile(self, p):
+        """
+        Return the upper bound of the bucket containing the p percentile
+        (0 < p <= 100), the largest value if the percentile falls in the
+        overflow bucket, or None if the histogram is empty.
+        """
+        with self._lock:
+            if self._count == 0:
+                return None
+            rank = self._count * p / 100
+            total = 0
+            for bound, n in zip(self._bounds, self._counts):
+                total += n
+                if total >= rank:
+                    return min(bound, self._max)
+            return self._max
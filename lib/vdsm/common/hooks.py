@@ -31,13 +31,22 @@ import logging
 import os
 import os.path
 import pkgutil
+import re
 import sys
 import tempfile
+import threading
 
 import six
 
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
 from vdsm.common import commands
 from vdsm.common import exception
+from vdsm.common import hookworker
+from vdsm.common.config import config
 from vdsm.common.constants import P_VDSM_HOOKS, P_VDSM_RUN
 
 _LAUNCH_FLAGS_FILE = 'launchflags'
@@ -48,6 +57,104 @@ _LAUNCH_FLAGS_PATH = os.path.join(
 )
 
 
+# Python hooks using the hooking module, run in the hook worker.
+_HOOKING_IMPORT = re.compile(
+    br'^\s*(import hooking|from vdsm\.hook import hooking)\b', re.MULTILINE)
+
+
+class _Inventory(object):
+    """
+    Hook scripts found in the hooks directory, and information about them.
+
+    The information is cached while an inotify watch on the hooks directory
+    tree reports no change. If the directory cannot be watched, nothing is
+    cached.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._notifier = None
+        self._cache = {}
+        self._generation = 0
+
+    def generation(self):
+        """
+        Return a number changing whenever the hooks directory tree changes,
+        or None if the directory cannot be watched.
+        """
+        with self._lock:
+            if not self._watching():
+                return None
+            return self._generation
+
+    def scripts(self, path):
+        return list(self._get('scripts', path, _findScripts))
+
+    def script_info(self, path):
+        return dict(self._get('info', path, _getScriptInfo))
+
+    def is_python_hook(self, path):
+        return self._get('python', path, _isPythonHook)
+
+    def _get(self, kind, path, func):
+        with self._lock:
+            if not path.startswith(self._path) or not self._watching():
+                return func(path)
+            key = (kind, path)
+            try:
+                return self._cache[key]
+            except KeyError:
+                value = self._cache[key] = func(path)
+                return value
+
+    def _watching(self):
+        if self._notifier is None:
+            if pyinotify is None or not os.path.isdir(self._path):
+                return False
+            try:
+                self._watch()
+            except Exception:
+                logging.debug("Cannot watch %s", self._path, exc_info=True)
+                return False
+        if self._notifier.check_events(timeout=0):
+            self._notifier.read_events()
+            self._notifier.process_events()
+        return self._notifier is not None
+
+    def _watch(self):
+        mask = (pyinotify.IN_CREATE | pyinotify.IN_DELETE |
+                pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO |
+                pyinotify.IN_ATTRIB | pyinotify.IN_CLOSE_WRITE |
+                pyinotify.IN_DELETE_SELF | pyinotify.IN_MOVE_SELF)
+        wm = pyinotify.WatchManager()
+        notifier = pyinotify.Notifier(wm, default_proc_fun=self._changed)
+        try:
+            wm.add_watch(self._path.rstrip('/'), mask, rec=True,
+                         auto_add=True, quiet=False)
+        except:
+            notifier.stop()
+            raise
+        self._notifier = notifier
+        self._cache.clear()
+        self._generation += 1
+
+    def _changed(self, event):
+        self._cache.clear()
+        self._generation += 1
+        if (event.mask & (pyinotify.IN_DELETE_SELF | pyinotify.IN_MOVE_SELF)
+                and event.path == self._path.rstrip('/')):
+            # Watch again when the directory is created.
+            if self._notifier is not None:
+                self._notifier.stop()
+                self._notifier = None
+
+
+_inventory = _Inventory(P_VDSM_HOOKS)
+
+_worker = hookworker.Worker()
+
+
 # dir path is relative to '/' for test purposes
 # otherwise path is relative to P_VDSM_HOOKS
 def _scriptsPerDir(dir):
@@ -55,9 +162,44 @@ def _scriptsPerDir(dir):
         path = dir
     else:
         path = P_VDSM_HOOKS + dir
+    return _inventory.scripts(path)
+
+
+def _findScripts(path):
     return [s for s in glob.glob(path + '/*')
             if os.access(s, os.X_OK)]
 
+
+def _isPythonHook(path):
+    """
+    Return True if path is a python script using the hooking module, run by
+    the same interpreter running this process.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except EnvironmentError:
+        return False
+    if not data.startswith(b'#!'):
+        return False
+    interpreter = data[2:].split(b'\n', 1)[0].split()
+    if len(interpreter) != 1:
+        return False
+    interpreter = interpreter[0].decode('utf-8', 'replace')
+    if os.path.realpath(interpreter) != os.path.realpath(sys.executable):
+        return False
+    return _HOOKING_IMPORT.search(data) is not None
+
+
+def _runScript(script, env):
+    if (config.getboolean('vars', 'hooks_worker') and
+            _inventory.is_python_hook(script)):
+        try:
+            return _worker.run(script, env)
+        except hookworker.Error as e:
+            logging.warning('Cannot run %s in hook worker: %s', script, e)
+    return commands.execCmd([script], raw=True, env=env)
+
 _DOMXML_HOOK = 1
 _JSON_HOOK = 2
 
@@ -109,8 +251,7 @@ def _runHooksDir(data, dir, vmconf={}, raiseError=True, errors=None, params={},
             scriptenv['_hook_json'] = data_filename
 
         for s in scripts:
-            rc, out, err = commands.execCmd([s], raw=True,
-                                            env=scriptenv)
+            rc, out, err = _runScript(s, scriptenv)
             logging.info('%s: rc=%s err=%s', s, rc, err)
             if rc != 0:
                 errors.append(err)
@@ -471,10 +612,18 @@ def remove_vm_launch_flags_file(vm_id):
 
 
 def _getHookInfo(dir):
-    return dict((os.path.basename(script), _getScriptInfo(script))
+    return dict((os.path.basename(script), _inventory.script_info(script))
                 for script in _scriptsPerDir(dir))
 
 
+def generation():
+    """
+    Return a number changing whenever hooks are added, removed or modified,
+    or None if changes cannot be detected.
+    """
+    return _inventory.generation()
+
+
 def installed():
     res = {}
     for dir in os.listdir(P_VDSM_HOOKS):
@@ -0,0 +1,374 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Persistent worker running python hooks.
+
+Running a python hook starts a new python interpreter, importing the
+hooking module and the vdsm modules it uses. This takes more time than
+most hooks spend doing their work.
+
+The worker is a python process started once, importing the hooking module
+in advance. For every hook, the worker forks a child running the hook
+script with runpy, so the hook does not pay for starting the interpreter
+and importing the modules. The hook runs in a new process, with its own
+environment, standard input, output and error, like a hook started by
+exec.
+
+The worker is single threaded, so forking it is safe. Requests and
+responses are sent as json lines over the worker standard input and
+output. Multiple requests may be running at the same time.
+
+Only hooks using the same interpreter as the worker can run in the worker.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import base64
+import errno
+import fcntl
+import json
+import logging
+import os
+import runpy
+import select
+import signal
+import sys
+import tempfile
+import threading
+import traceback
+
+import six
+
+from vdsm.common import commands
+from vdsm.common import concurrent
+from vdsm.common.compat import subprocess
+
+
+class Error(Exception):
+    """ Running a hook in the worker failed """
+
+
+class Worker(object):
+    """
+    Client side of the worker, running in the process running the hooks.
+    The worker process is started on the first run() call, and started
+    again if it was terminated.
+    """
+
+    _log = logging.getLogger("common.hookworker")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._proc = None
+        self._calls = {}
+        self._last_id = 0
+
+    def run(self, script, env):
+        """
+        Run script with environment env in the worker, and return rc, out,
+        err as commands.execCmd(raw=True) does. If the worker terminated
+        while running the script, the script is considered failed.
+
+        Raises Error if the script could not be started in the worker.
+        """
+        call = _Call()
+        with self._lock:
+            if self._proc is None:
+                self._start()
+            self._last_id += 1
+            req_id = self._last_id
+            request = {
+                "id": req_id,
+                "script": script,
+                "env": {_text(k): _text(v) for k, v in six.iteritems(env)},
+            }
+            self._calls[req_id] = call
+            try:
+                self._proc.stdin.write(
+                    json.dumps(request).encode("utf-8") + b"\n")
+                self._proc.stdin.flush()
+            except EnvironmentError as e:
+                del self._calls[req_id]
+                raise Error("Cannot send request to worker: %s" % e)
+
+        response = call.wait()
+        if response is None:
+            return 1, b"", b"Hook worker terminated while running the hook"
+        return (response["rc"],
+                base64.b64decode(response["out"]),
+                base64.b64decode(response["err"]))
+
+    def _start(self):
+        cmd = [sys.executable, "-m", "vdsm.common.hookworker"]
+        try:
+            self._proc = commands.start(cmd,
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+        except OSError as e:
+            raise Error("Cannot start worker: %s" % e)
+        self._log.info("Started hook worker (pid=%d)", self._proc.pid)
+        t = concurrent.thread(self._read_responses, args=(self._proc,),
+                              name="hookworker")
+        t.start()
+
+    def _read_responses(self, proc):
+        try:
+            for line in iter(proc.stdout.readline, b""):
+                response = json.loads(line.decode("utf-8"))
+                with self._lock:
+                    call = self._calls.pop(response["id"], None)
+                if call is None:
+                    self._log.warning("Unexpected response: %s", response)
+                    continue
+                call.set(response)
+        except Exception:
+            self._log.exception("Error reading worker responses")
+        finally:
+            rc = proc.wait()
+            self._log.warning("Hook worker terminated (pid=%d, rc=%s)",
+                              proc.pid, rc)
+            with self._lock:
+                if self._proc is proc:
+                    self._proc = None
+                calls = list(self._calls.values())
+                self._calls.clear()
+            for call in calls:
+                call.set(None)
+
+
+class _Call(object):
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._response = None
+
+    def set(self, response):
+        self._response = response
+        self._done.set()
+
+    def wait(self):
+        """
+        Return the response, or None if the worker terminated.
+        """
+        self._done.wait()
+        return self._response
+
+
+def _text(s):
+    if isinstance(s, six.binary_type):
+        return s.decode("utf-8", "replace")
+    return s
+
+
+# Server side, running in the worker process.
+
+
+def main():
+    # Requests and responses use the original standard input and output.
+    # Anything written to standard output by mistake, for example while
+    # importing modules, must not corrupt the responses.
+    infd = os.dup(0)
+    outfd = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    _preload()
+
+    server = _Server(infd, outfd)
+    server.serve()
+
+
+def _preload():
+    """
+    Import the modules used by the hooks, so the hooks do not have to.
+    Hooks import the hooking module from the vdsm/hook directory.
+    """
+    try:
+        from vdsm.hook import hooking as vdsm_hooking
+        sys.path.append(os.path.dirname(vdsm_hooking.__file__))
+        import hooking  # NOQA: F401 (imported for the hooks)
+    except Exception:
+        traceback.print_exc()
+
+
+class _Server(object):
+
+    def __init__(self, infd, outfd):
+        self._infd = infd
+        self._outfd = outfd
+        self._buf = b""
+        # Maps child pid to request id and output files.
+        self._children = {}
+        self._eof = False
+
+    def serve(self):
+        wakeup_r, wakeup_w = os.pipe()
+        for fd in (wakeup_r, wakeup_w):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        # The SIGCHLD handler does nothing, the signal wakes up select by
+        # writing to wakeup_w.
+        signal.signal(signal.SIGCHLD, lambda signo, frame: None)
+        signal.set_wakeup_fd(wakeup_w)
+        self._wakeup = (wakeup_r, wakeup_w)
+
+        while not self._eof or self._children:
+            readers = [wakeup_r] if self._eof else [self._infd, wakeup_r]
+            try:
+                readable, _, _ = select.select(readers, [], [])
+            except select.error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                readable = []
+
+            if wakeup_r in readable:
+                _drain(wakeup_r)
+            if self._infd in readable:
+                self._read_requests()
+            self._reap_children()
+
+    def _read_requests(self):
+        data = os.read(self._infd, 65536)
+        if not data:
+            self._eof = True
+            return
+        self._buf += data
+        while b"\n" in self._buf:
+            line, self._buf = self._buf.split(b"\n", 1)
+            self._start_child(json.loads(line.decode("utf-8")))
+
+    def _start_child(self, request):
+        out = tempfile.TemporaryFile()
+        err = tempfile.TemporaryFile()
+        pid = os.fork()
+        if pid == 0:
+            self._run_hook(request["script"], request["env"], out, err)
+        self._children[pid] = (request["id"], out, err)
+
+    def _run_hook(self, script, env, out, err):
+        """
+        Run in the child process, never returns.
+        """
+        rc = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            for fd in (self._infd, self._outfd) + self._wakeup:
+                os.close(fd)
+
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.close(devnull)
+            os.dup2(out.fileno(), 1)
+            os.dup2(err.fileno(), 2)
+
+            os.environ.clear()
+            for key, value in six.iteritems(env):
+                os.environ[_native(key)] = _native(value)
+            pythonpath = env.get("PYTHONPATH", "")
+            sys.path[:0] = [p for p in pythonpath.split(":") if p]
+            sys.argv = [script]
+
+            try:
+                runpy.run_path(script, run_name="__main__")
+                rc = 0
+            except SystemExit as e:
+                rc = _exit_code(e.code)
+            except BaseException:
+                traceback.print_exc()
+                rc = 1
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(rc)
+
+    def _reap_children(self):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            if pid == 0:
+                return
+            child = self._children.pop(pid, None)
+            if child is not None:
+                self._send_response(child, status)
+
+    def _send_response(self, child, status):
+        req_id, out, err = child
+        if os.WIFSIGNALED(status):
+            rc = -os.WTERMSIG(status)
+        else:
+            rc = os.WEXITSTATUS(status)
+        response = {
+            "id": req_id,
+            "rc": rc,
+            "out": _read_output(out),
+            "err": _read_output(err),
+        }
+        data = json.dumps(response).encode("utf-8") + b"\n"
+        while data:
+            n = os.write(self._outfd, data)
+            data = data[n:]
+
+
+def _exit_code(code):
+    """
+    Return the exit code of a python process exiting with SystemExit(code).
+    """
+    if code is None:
+        return 0
+    if isinstance(code, six.integer_types):
+        return code & 0xff
+    sys.stderr.write("%s\n" % (code,))
+    return 1
+
+
+def _native(s):
+    if six.PY2:
+        return s.encode("utf-8")
+    return s
+
+
+def _read_output(f):
+    with f:
+        f.seek(0)
+        return base64.b64encode(f.read()).decode("ascii")
+
+
+def _drain(fd):
+    try:
+        while os.read(fd, 4096):
+            pass
+    except OSError as e:
+        if e.errno != errno.EAGAIN:
+            raise
+
+
+if __name__ == "__main__":
+    main()
@@ -101,6 +101,35 @@ def send_metrics(hoststats):
         logging.exception('Host metrics collection failed')
 
 
+def send_mailbox_metrics(cif):
+    if not cif.irs:
+        return
+
+    from vdsm.storage.hsm import HSM
+    stats = HSM.mailbox_stats()
+    latency = stats.get('extend_latency')
+    if latency is None:
+        return
+
+    prefix = "hosts.storage.mailbox.extend_latency"
+    data = {prefix + '.count': latency['count']}
+    for name in ('p50', 'p90', 'p99', 'max'):
+        if latency[name] is not None:
+            data[prefix + '.' + name] = latency[name]
+    metrics.send(data)
+
+
+def send_rpc_metrics(cif):
+    if not config.getboolean('metrics', 'rpc_stats'):
+        return
+
+    json_binding = cif.servers.get('jsonrpc')
+    if json_binding is None:
+        return
+
+    metrics.send(json_binding.stats.metrics("hosts.vdsm.rpc"))
+
+
 def _readSwapTotalFree():
     meminfo = utils.readMemInfo()
     return meminfo['SwapTotal'] // 1024, meminfo['SwapFree'] // 1024
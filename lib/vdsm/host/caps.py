@@ -17,12 +17,32 @@
 #
 # Refer to the README and COPYING files for full details of the license
 #
-"""Collect host capabilities"""
+"""
+Collect host capabilities
+
+Some sections of the capabilities are expensive to collect, but change
+rarely. These sections are cached, and collected again only when the key
+of the section changes:
+
+    network     generation of the network capabilities in supervdsm
+    packages    modification time of the package database
+    hooks       generation of the hooks inventory, changed by inotify
+                events in the hooks directory tree
+    storage     HBA rescans and modification time of the iSCSI initiator
+                name
+    connector   network and storage keys, since os-brick reports the host
+                addresses and initiators
+
+A section failing to collect is not cached. A section is not cached also
+when its key is None, meaning that changes cannot be detected.
+"""
 from __future__ import absolute_import
 from __future__ import division
 
+import copy
 import os
 import logging
+import threading
 
 import libvirt
 
@@ -67,13 +87,124 @@ def _parseKeyVal(lines, delim='='):
 
 def _getIscsiIniName():
     try:
-        with open('/etc/iscsi/initiatorname.iscsi') as f:
+        with open(hba.ISCSI_INITIATOR_NAME) as f:
             return _parseKeyVal(f)['InitiatorName']
     except:
         logging.error('reporting empty InitiatorName', exc_info=True)
     return ''
 
 
+class _Section(object):
+    """
+    A section of the capabilities, built by build() and cached until key()
+    returns a different value. If key() returns None the section is built
+    on every call.
+    """
+
+    def __init__(self, name, build, key):
+        self._name = name
+        self._build = build
+        self._key = key
+        self._lock = threading.Lock()
+        self._cached = False
+        self._cached_key = None
+        self._value = None
+
+    def get(self):
+        """
+        Return a copy of the section, so callers may modify it.
+        """
+        try:
+            key = self._key()
+        except Exception:
+            logging.warning("Cannot get key of capabilities section %s, "
+                            "collecting it again", self._name, exc_info=True)
+            return self._build()
+
+        if key is None:
+            return self._build()
+
+        with self._lock:
+            if not self._cached or key != self._cached_key:
+                logging.debug("Collecting capabilities section %s",
+                              self._name)
+                self._value = self._build()
+                self._cached_key = key
+                self._cached = True
+            return copy.deepcopy(self._value)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+# Databases modified when packages are installed, removed or upgraded.
+_PACKAGES_DB = (
+    '/var/lib/rpm/Packages',
+    '/var/lib/rpm/rpmdb.sqlite',
+    '/var/lib/dpkg/status',
+)
+
+
+def _packages_key():
+    key = tuple(_mtime(path) for path in _PACKAGES_DB)
+    if all(mtime is None for mtime in key):
+        # No known package database, cannot detect changes.
+        return None
+    return key
+
+
+def _packages():
+    return {'packages2': osinfo.package_versions()}
+
+
+def _hooks_key():
+    return hooks.generation()
+
+
+def _hooks():
+    return {'hooks': hooks.installed()}
+
+
+def _network_key():
+    return supervdsm.getProxy().network_caps_generation()
+
+
+def _network():
+    return supervdsm.getProxy().network_caps()
+
+
+def _storage_key():
+    return hba.rescan_generation(), _mtime(hba.ISCSI_INITIATOR_NAME)
+
+
+def _storage():
+    return {
+        'ISCSIInitiatorName': _getIscsiIniName(),
+        'HBAInventory': hba.HBAInventory(),
+    }
+
+
+def _connector_key():
+    return _network_key(), _storage_key()
+
+
+def _connector():
+    return {'connector_info': managedvolume.connector_info()}
+
+
+_sections = {
+    'network': _Section('network', _network, _network_key),
+    'packages': _Section('packages', _packages, _packages_key),
+    'hooks': _Section('hooks', _hooks, _hooks_key),
+    'storage': _Section('storage', _storage, _storage_key),
+    'connector': _Section('connector', _connector, _connector_key),
+}
+
+
 def get():
     caps = {}
     cpu_topology = numa.cpu_topology()
@@ -95,24 +226,22 @@ def get():
 
     caps.update(_getVersionInfo())
 
-    net_caps = supervdsm.getProxy().network_caps()
-    caps.update(net_caps)
+    caps.update(_sections['network'].get())
 
     try:
-        caps['hooks'] = hooks.installed()
+        caps.update(_sections['hooks'].get())
     except:
         logging.debug('not reporting hooks', exc_info=True)
 
     caps['operatingSystem'] = osinfo.version()
     caps['uuid'] = host.uuid()
-    caps['packages2'] = osinfo.package_versions()
+    caps.update(_sections['packages'].get())
     caps['realtimeKernel'] = osinfo.runtime_kernel_flags().realtime
     caps['kernelArgs'] = osinfo.kernel_args()
     caps['nestedVirtualization'] = osinfo.nested_virtualization().enabled
     caps['emulatedMachines'] = machinetype.emulated_machines(
         cpuarch.effective())
-    caps['ISCSIInitiatorName'] = _getIscsiIniName()
-    caps['HBAInventory'] = hba.HBAInventory()
+    caps.update(_sections['storage'].get())
     caps['vmTypes'] = ['kvm']
 
     caps['memSize'] = str(utils.readMemInfo()['MemTotal'] // 1024)
@@ -147,7 +276,7 @@ def get():
     caps['backupEnabled'] = False
 
     try:
-        caps["connector_info"] = managedvolume.connector_info()
+        caps.update(_sections['connector'].get())
     except se.ManagedVolumeNotSupported as e:
         logging.info("managedvolume not supported: %s", e)
     except se.ManagedVolumeHelperFailed as e:
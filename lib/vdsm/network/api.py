@@ -26,8 +26,10 @@ import sys
 import logging
 import six
 import copy
+import functools
 
 from vdsm.common import hooks
+from vdsm.common.config import config
 
 from vdsm.network import connectivity
 from vdsm.network import netstats
@@ -38,6 +40,7 @@ from vdsm.network.ipwrapper import DUMMY_BRIDGE
 from vdsm.network.link import iface as link_iface
 from vdsm.network.link import sriov
 from vdsm.network.lldp import info as lldp_info
+from vdsm.network.netinfo import monitored
 
 from . import canonicalize
 from . ip import address as ipaddress
@@ -47,6 +50,14 @@ from . import netconfpersistence
 
 DUMMY_BRIDGE
 
+_cache = monitored.MonitoredCache(
+    max_age=config.getint('vars', 'net_cache_max_age'))
+
+
+def start_cache():
+    """Keep the network reports cached, see monitored.MonitoredCache."""
+    _cache.start()
+
 
 def network_caps():
     """Obtain root-requiring network capabilties
@@ -54,15 +65,38 @@ def network_caps():
     TODO: When we split netinfo, we will merge root and non-root netinfo in
           caps to reduce the amount of work in root context.
     """
+    return _cache.get('caps', _network_caps)
+
+
+def network_caps_generation():
+    """
+    Return the generation of the network_caps() report. The generation
+    changes only when the report changes.
+    """
+    return _cache.generation('caps', _network_caps)
+
+
+def _network_caps():
     # TODO: Version requests by engine to ease handling of compatibility.
     return netswitch.configurator.netcaps(compatibility=30600)
 
 
+def _invalidates_cache(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _cache.invalidate()
+    return wrapper
+
+
 def network_stats():
     """Report network statistics"""
     return netstats.report()
 
 
+@_invalidates_cache
 def change_numvfs(pci_path, numvfs, devname):
     """Change number of virtual functions of a device.
 
@@ -156,6 +190,7 @@ def _rollback():
             six.reraise(roi.exc_type, roi.value, tb)
 
 
+@_invalidates_cache
 def setupNetworks(networks, bondings, options):
     """Add/Edit/Remove configuration for networks and bondings.
 
@@ -214,7 +249,7 @@ def setupNetworks(networks, bondings, options):
                                                               bondings)
         canonicalize.canonicalize_bondings(bondings)
 
-        net_info = netswitch.configurator.netinfo()
+        net_info = _cache.get('netinfo', netswitch.configurator.netinfo)
 
         validator.validate(networks, bondings, net_info)
 
@@ -310,10 +345,12 @@ def remove_sourceroute(iface):
     sourceroute.remove(iface)
 
 
+@_invalidates_cache
 def add_ovs_vhostuser_port(bridge, port, socket_path):
     netswitch.configurator.ovs_add_vhostuser_port(bridge, port, socket_path)
 
 
+@_invalidates_cache
 def remove_ovs_port(bridge, port):
     netswitch.configurator.ovs_remove_port(bridge, port)
 
@@ -25,6 +25,7 @@ import logging
 import time
 
 from vdsm.common.config import config
+from vdsm.network import api as network_api
 from vdsm.network import dhclient_monitor
 from vdsm.network import lldp
 from vdsm.network.dhclient_monitor import dhclient_monitor_ctx
@@ -37,6 +38,7 @@ Lldp = lldp.driver()
 def init_privileged_network_components():
     networkmanager.init()
     _lldp_init()
+    _cache_init()
 
 
 def init_unprivileged_network_components(cif, net_api):
@@ -74,6 +76,13 @@ def _lldp_init():
         logging.warning('LLDP is inactive, skipping LLDP initialization')
 
 
+def _cache_init():
+    if config.getint('vars', 'net_cache_max_age') > 0:
+        network_api.start_cache()
+    else:
+        logging.info('Network cache is disabled')
+
+
 def _init_sourceroute(net_api):
     """
     Setup sourceroute with the dhclient monitor.
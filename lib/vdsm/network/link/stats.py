@@ -17,33 +17,112 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+"""
+Statistics of the host links.
+
+The counters and the state of all the links are read using a single netlink
+dump. The type, speed and duplex of a link are read from sysfs and ethtool,
+and are cached until the link changes. A link changes when its index, flags,
+operational state or master change. Since a bond speed depends on its slaves
+and a vlan speed on its base device, these are refreshed when the slaves or
+the base device change.
+"""
+
 from __future__ import absolute_import
 from __future__ import division
 
+from collections import namedtuple
+import threading
+
+import six
+
 from vdsm.network.link import bond
 from vdsm.network.link import dpdk
 from vdsm.network.link import iface
 from vdsm.network.link import nic
 from vdsm.network.link import vlan
+from vdsm.network.netlink import link
+
+
+_LinkProperties = namedtuple('_LinkProperties', 'signature, speed, duplex')
+
+_lock = threading.Lock()
+# Link name -> _LinkProperties
+_links = {}
 
 
 def report():
+    links = {info['name']: info for info in link.iter_links_with_stats()}
+
     stats = {}
-    for iface_properties in iface.list():
-        i = iface.iface(iface_properties['name'])
-        stats[i.device] = i.statistics()
-
-        speed = 0
-        if i.type() == iface.Type.NIC:
-            speed = nic.speed(i.device)
-        elif i.type() == iface.Type.BOND:
-            speed = bond.speed(i.device)
-        elif i.type() == iface.Type.VLAN:
-            speed = vlan.speed(i.device)
-        elif i.type() == iface.Type.DPDK:
-            speed = dpdk.speed(i.device)
-
-        stats[i.device]['speed'] = speed
-        stats[i.device]['duplex'] = nic.duplex(i.device)
+    with _lock:
+        _update_properties(links)
+        for name, info in six.viewitems(links):
+            stats[name] = _link_stats(info, _links[name])
+
+    for dev_name in dpdk.get_dpdk_devices():
+        stats[dev_name] = _dpdk_stats(dev_name)
+
+    return stats
+
+
+def _update_properties(links):
+    for name in set(_links) - set(links):
+        del _links[name]
+
+    changed = set(
+        name for name, info in six.viewitems(links)
+        if name not in _links or _links[name].signature != _signature(info))
+    changed.update([info['master'] for name, info in six.viewitems(links)
+                    if name in changed and info.get('master') in links])
+    changed.update([name for name, info in six.viewitems(links)
+                    if info.get('device') in changed])
+
+    for name in changed:
+        _links[name] = _properties(links[name])
+
+
+def _signature(info):
+    return (info['index'], info['flags'], info['state'],
+            info.get('master_index'))
+
+
+def _properties(info):
+    name = info['name']
+    link_type = info.get('type')
+    if link_type is None:
+        link_type = iface.get_alternative_type(name)
+
+    speed = 0
+    if link_type == iface.Type.NIC:
+        speed = nic.speed(name)
+    elif link_type == iface.Type.BOND:
+        speed = bond.speed(name)
+    elif link_type == iface.Type.VLAN:
+        speed = vlan.speed(name)
+
+    return _LinkProperties(_signature(info), speed, nic.duplex(name))
+
+
+def _link_stats(info, properties):
+    counters = info['stats']
+    is_up = link.is_link_up(info['flags'], check_oper_status=True)
+    return {
+        'name': info['name'],
+        'rx': counters['rx_bytes'],
+        'tx': counters['tx_bytes'],
+        'state': 'up' if is_up else 'down',
+        'rxDropped': counters['rx_dropped'],
+        'txDropped': counters['tx_dropped'],
+        'rxErrors': counters['rx_errors'],
+        'txErrors': counters['tx_errors'],
+        'speed': properties.speed,
+        'duplex': properties.duplex,
+    }
+
 
+def _dpdk_stats(dev_name):
+    stats = iface.iface(dev_name).statistics()
+    stats['speed'] = dpdk.speed(dev_name)
+    stats['duplex'] = nic.duplex(dev_name)
     return stats
@@ -0,0 +1,175 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Network reports cached in memory and kept current by netlink events.
+
+Building a network report reads the links, addresses and routes of the
+host, and the sysfs attributes and DHCP leases of every device. On hosts
+with many devices this takes a lot of time, and it is done for every
+getCapabilities and setupNetworks call.
+
+MonitoredCache keeps the reports built by its callers. A netlink monitor
+thread drops all the reports when a link, an address or a route changes,
+and the next call builds the report again. Information not reported by
+netlink, like the nameservers, is refreshed by dropping reports older
+than max_age seconds. Code changing the network configuration calls
+invalidate() when done.
+
+Every report has a generation, changed only when a report built again is
+different from the previous one, so clients can tell if a report changed
+since they got it. The generation includes an instance id, so generations
+from a previous instance never match.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import copy
+import logging
+import threading
+import time
+import uuid
+
+from vdsm.common import concurrent
+from vdsm.common.time import monotonic_time
+from vdsm.network.netlink import monitor
+
+_GROUPS = ('link', 'ipv4-ifaddr', 'ipv6-ifaddr', 'ipv4-route', 'ipv6-route')
+
+# Seconds to wait before starting a new monitor when the monitor failed.
+_RESTART_DELAY = 1
+
+
+class MonitoredCache(object):
+
+    _log = logging.getLogger('network.cache')
+
+    def __init__(self, max_age):
+        self._max_age = max_age
+        self._instance = str(uuid.uuid4())
+        # Serializes building reports, so concurrent calls do not build the
+        # same report.
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Incremented on every change. A report built when the counter had
+        # a different value is stale.
+        self._changes_lock = threading.Lock()
+        self._changes = 0
+        self._running = False
+        self._monitor = None
+        self._thread = None
+
+    def start(self):
+        """
+        Start monitoring netlink events. Until the cache is started, every
+        call builds the report again.
+        """
+        self._log.info("Starting network cache (max_age=%s)", self._max_age)
+        self._running = True
+        self._thread = concurrent.thread(self._run, name="netcache/monitor")
+        self._thread.start()
+
+    def stop(self):
+        self._log.info("Stopping network cache")
+        self._running = False
+        self.invalidate()
+        mon = self._monitor
+        if mon is not None and not mon.is_stopped():
+            mon.stop()
+
+    def wait(self):
+        self._thread.join()
+
+    def get(self, name, build):
+        """
+        Return a copy of report name, calling build() to build the report if
+        it is not cached or stale.
+        """
+        return copy.deepcopy(self._entry(name, build).value)
+
+    def generation(self, name, build):
+        """
+        Return the generation of report name, building the report if needed.
+        """
+        entry = self._entry(name, build)
+        return '%s:%d' % (self._instance, entry.generation)
+
+    def invalidate(self):
+        """
+        Drop all reports. Called when the network configuration changed.
+        """
+        with self._changes_lock:
+            self._changes += 1
+
+    def _entry(self, name, build):
+        with self._lock:
+            changes = self._changes
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = _Entry(build(), 1, changes)
+                self._entries[name] = entry
+            elif self._is_stale(entry, changes):
+                value = build()
+                generation = entry.generation
+                if value != entry.value:
+                    generation += 1
+                entry = _Entry(value, generation, changes)
+                self._entries[name] = entry
+            return entry
+
+    def _is_stale(self, entry, changes):
+        if not self._running or entry.changes != changes:
+            return True
+        return monotonic_time() - entry.created >= self._max_age
+
+    def _run(self):
+        while self._running:
+            try:
+                self._monitor_changes()
+            except Exception:
+                self._log.exception("Network monitor failed")
+                self.invalidate()
+                time.sleep(_RESTART_DELAY)
+
+    def _monitor_changes(self):
+        mon = monitor.Monitor(groups=_GROUPS)
+        with mon:
+            self._monitor = mon
+            try:
+                # Changes before the monitor was started were missed.
+                self.invalidate()
+                if not self._running:
+                    return
+                for _ in mon:
+                    self.invalidate()
+            finally:
+                self._monitor = None
+
+
+class _Entry(object):
+
+    __slots__ = ('value', 'generation', 'changes', 'created')
+
+    def __init__(self, value, generation, changes):
+        self.value = value
+        self.generation = generation
+        self.changes = changes
+        self.created = monotonic_time()
@@ -28,6 +28,17 @@ from . import _cache_manager
 from . import _pool
 from . import libnl
 
+# Statistics reported by iter_links_with_stats(), named as in
+# /sys/class/net/<link>/statistics/.
+_LINK_STATS = (
+    ('rx_bytes', libnl.RtnlLinkStat.RX_BYTES),
+    ('tx_bytes', libnl.RtnlLinkStat.TX_BYTES),
+    ('rx_dropped', libnl.RtnlLinkStat.RX_DROPPED),
+    ('tx_dropped', libnl.RtnlLinkStat.TX_DROPPED),
+    ('rx_errors', libnl.RtnlLinkStat.RX_ERRORS),
+    ('tx_errors', libnl.RtnlLinkStat.TX_ERRORS),
+)
+
 
 def get_link(name):
     """Returns the information dictionary of the name specified link."""
@@ -51,6 +62,20 @@ def iter_links():
                 link = libnl.nl_cache_get_next(link)
 
 
+def iter_links_with_stats():
+    """Generator that yields an information dictionary for each link of the
+    system, including the link statistics under the 'stats' key. All the
+    links and their statistics are read using a single netlink dump."""
+    with _pool.socket() as sock:
+        with _nl_link_cache(sock) as cache:
+            link = libnl.nl_cache_get_first(cache)
+            while link:
+                info = _link_info(link, cache=cache)
+                info['stats'] = _link_stats(link)
+                yield info
+                link = libnl.nl_cache_get_next(link)
+
+
 def is_link_up(link_flags, check_oper_status):
     """
     Check link status based on device status flags.
@@ -106,6 +131,14 @@ def _link_info(link, cache=None):
     return info
 
 
+def _link_stats(link):
+    """Returns a dictionary with the statistics of the link object."""
+    return {
+        name: libnl.rtnl_link_get_stat(link, stat_id)
+        for name, stat_id in _LINK_STATS
+    }
+
+
 def _link_index_to_name(link_index, cache=None):
     """Returns the textual name of the link with index equal to link_index."""
     if cache is None:
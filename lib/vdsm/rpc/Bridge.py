@@ -342,6 +342,7 @@ command_info = {
     'Host_getLldp': {'ret': 'info'},
     'Host_getHardwareInfo': {'ret': 'info'},
     'Host_getLVMVolumeGroups': {'ret': 'vglist'},
+    'Host_getRpcStats': {'ret': 'stats'},
     'Host_getStats': {'ret': 'info'},
     'Host_getStorageDomains': {'ret': 'domlist'},
     'Host_getStorageRepoStats': {'ret': Host_getStorageRepoStats_Ret},
@@ -350,6 +351,7 @@ command_info = {
     'Host_getVMList': {'call': Host_getVMList_Call, 'ret': 'vmList'},
     'Host_getVMFullList': {'call': Host_getVMFullList_Call, 'ret': 'vmList'},
     'Host_getAllVmStats': {'ret': 'statsList'},
+    'Host_getAllVmStatsChanges': {'ret': 'changes'},
     'Host_getAllVmIoTunePolicies': {'ret': 'io_tune_policies_dict'},
     'Host_setupNetworks': {'ret': 'status'},
     'Host_setKsmTune': {'ret': 'status'},
@@ -368,6 +370,7 @@ command_info = {
     'ISCSIConnection_discoverSendTargets': {'ret': 'fullTargets'},
     'LVMVolumeGroup_create': {'ret': 'uuid'},
     'LVMVolumeGroup_getInfo': {'ret': 'info'},
+    'StorageDomain_dump': {'ret': 'dump'},
     'StorageDomain_getFileStats': {'ret': 'fileStats'},
     'StorageDomain_getImages': {'ret': 'imageslist'},
     'StorageDomain_getInfo': {'ret': 'info'},
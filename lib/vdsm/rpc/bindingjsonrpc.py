@@ -20,6 +20,7 @@ import functools
 import logging
 
 from yajsonrpc import JsonRpcServer
+from yajsonrpc import codec
 from yajsonrpc.stompserver import StompReactor
 
 from vdsm import executor
@@ -38,6 +39,11 @@ class BindingJsonRpc(object):
     log = logging.getLogger('BindingJsonRpc')
 
     def __init__(self, bridge, subs, timeout, scheduler, cif):
+        try:
+            codec.select(config.get('rpc', 'json_codec'))
+        except ValueError as e:
+            self.log.error("Cannot select JSON codec, using %s: %s",
+                           codec.current().name, e)
         self._executor = executor.Executor(name="jsonrpc",
                                            workers_count=_THREADS,
                                            max_tasks=_TASKS,
@@ -64,6 +70,10 @@ class BindingJsonRpc(object):
     def bridge(self):
         return self._bridge
 
+    @property
+    def stats(self):
+        return self._server.stats
+
     def start(self):
         self._executor.start()
 
@@ -633,6 +633,65 @@ class BufferedReader(asyncore.file_dispatcher):
         return False
 
 
+class LineReader(asyncore.file_dispatcher):
+    """
+    Read lines from file, notifying when a line was read and when the file
+    was closed.
+    """
+
+    def __init__(self, fd, line_received, closed, bufsize=4096, map=None):
+        asyncore.file_dispatcher.__init__(self, fd, map=map)
+        filecontrol.set_close_on_exec(self._fileno)
+        self._line_received = line_received
+        self._closed = closed
+        self._bufsize = bufsize
+        self._data = b""
+
+    def handle_read(self):
+        chunk = self.socket.read(self._bufsize)
+        if not chunk:
+            self.handle_close()
+            return
+        self._process(chunk)
+
+    def handle_close(self):
+        # Call closed exactly once.
+        if self._closed:
+            # asyncore may report that the file was closed before reading
+            # all the data; lines written before closing must not be lost.
+            try:
+                for chunk in iter(
+                        lambda: self.socket.read(self._bufsize), b""):
+                    self._process(chunk)
+            except EnvironmentError as e:
+                log.debug("Error reading remaining data: %s", e)
+            closed = self._closed
+            self._closed = None
+            closed()
+        self.close()
+
+    def _process(self, chunk):
+        self._data += chunk
+        while b"\n" in self._data:
+            line, self._data = self._data.split(b"\n", 1)
+            self._line_received(line)
+
+    def handle_error(self):
+        log.exception("Unhandled error in %s", self)
+        self.handle_close()
+
+    def close(self):
+        if self.closing:
+            return
+        self.closing = True
+        # Never call closed if closed by the caller.
+        self._closed = None
+        asyncore.file_dispatcher.close(self)
+
+    def writable(self):
+        return False
+
+
 class Reaper(object):
     """
     Wait for process and notify when it has terminated.
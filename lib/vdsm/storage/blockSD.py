@@ -41,6 +41,7 @@ from vdsm.common import concurrent
 from vdsm.common import exception
 from vdsm.common import proc
 from vdsm.common.threadlocal import vars
+from vdsm.common.time import monotonic_time
 from vdsm.config import config
 from vdsm import constants
 from vdsm import utils
@@ -60,6 +61,7 @@ from vdsm.storage import multipath
 from vdsm.storage import resourceFactories
 from vdsm.storage import resourceManager as rm
 from vdsm.storage import sd
+from vdsm.storage import volume
 from vdsm.storage.compat import sanlock
 from vdsm.storage.mailbox import MAILBOX_SIZE
 from vdsm.storage.persistent import PersistentDict, DictValidator
@@ -106,6 +108,8 @@ MASTER_LV_SIZE_MB = 1024
 
 BlockSDVol = namedtuple("BlockSDVol", "name, image, parent")
 
+_CachedIndex = namedtuple("_CachedIndex", "index, seqno, writes, created")
+
 log = logging.getLogger("storage.BlockSD")
 
 # Metadata LV reserved size:
@@ -259,6 +263,130 @@ def getAllVolumes(sdUUID):
                 for k, v in six.iteritems(res))
 
 
+# Volume of a block storage domain, as reported by VolumeIndex. Image,
+# parent and slot are taken from the LV tags, and are None if the LV has
+# no such tag. Metadata is the parsed volume metadata, or None if the
+# metadata could not be parsed, and then error describes the failure.
+VolumeEntry = namedtuple(
+    "VolumeEntry", "uuid, image, parent, slot, metadata, error")
+
+
+class VolumeIndex(object):
+    """
+    Snapshot of the volumes of a block storage domain, built from the LV
+    tags and a single read of the metadata volume.
+    """
+
+    log = logging.getLogger("storage.VolumeIndex")
+
+    def __init__(self, sd_id, entries):
+        self._sd_id = sd_id
+        self._volumes = {}
+        self._images = {}
+        self._children = {}
+        for entry in entries:
+            self._volumes[entry.uuid] = entry
+            self._images.setdefault(entry.image, []).append(entry.uuid)
+            self._children.setdefault(entry.parent, []).append(entry.uuid)
+
+    def volumes(self):
+        """
+        Return dict {vol_id: VolumeEntry} of all volumes.
+        """
+        return dict(self._volumes)
+
+    def get(self, vol_id):
+        try:
+            return self._volumes[vol_id]
+        except KeyError:
+            raise se.VolumeDoesNotExist(vol_id)
+
+    def image_volumes(self, img_id):
+        """
+        Return the ids of the volumes of image img_id, not including the
+        shared base (template).
+        """
+        return list(self._images.get(img_id, ()))
+
+    def children(self, vol_id):
+        return tuple(self._children.get(vol_id, ()))
+
+    def slots(self):
+        """
+        Return a sorted list of the metadata slots used by the volumes.
+        """
+        return sorted(entry.slot for entry in six.itervalues(self._volumes)
+                      if entry.slot is not None)
+
+    def chain(self, img_id, vol_id=None):
+        """
+        Return the ids of the volumes in the chain of image img_id, ordered
+        from base to leaf, like image.Image.getChain().
+        """
+        if vol_id:
+            vol = self.get(vol_id)
+            # For template images include only one volume (the template
+            # itself).
+            if self._voltype(vol) == sc.SHARED_VOL:
+                return [vol.uuid]
+        else:
+            vol_ids = self.image_volumes(img_id)
+            if not vol_ids:
+                raise se.ImageDoesNotExistInSD(img_id, self._sd_id)
+
+            vol = self.get(vol_ids[0])
+            if len(vol_ids) == 1 and self._voltype(vol) == sc.SHARED_VOL:
+                return [vol.uuid]
+
+            for vol_id in vol_ids:
+                vol = self.get(vol_id)
+                if self._voltype(vol) == sc.LEAF_VOL:
+                    break
+            else:
+                self.log.error("There is no leaf in the image %s", img_id)
+                raise se.ImageIsNotLegalChain(img_id)
+
+        chain = []
+        seen = set()
+
+        while self._voltype(vol) != sc.SHARED_VOL:
+            chain.insert(0, vol.uuid)
+            seen.add(vol.uuid)
+
+            if vol.parent == sc.BLANK_UUID:
+                break
+
+            if vol.parent in seen:
+                self.log.error("Image %s volume %s has invalid parent UUID %s",
+                               img_id, vol.uuid, vol.parent)
+                raise se.ImageIsNotLegalChain(img_id)
+
+            vol = self.get(vol.parent)
+
+        return chain
+
+    def _voltype(self, vol):
+        if vol.metadata is None:
+            raise se.VolumeMetadataReadError(
+                "%s/%s: %s" % (self._sd_id, vol.uuid, vol.error))
+        return sc.name2type(vol.metadata.voltype)
+
+
+def _parse_volume_tags(lv):
+    """
+    Return image, parent and metadata slot of a volume from its LV tags.
+    """
+    image = parent = slot = None
+    for tag in lv.tags:
+        if tag.startswith(sc.TAG_PREFIX_IMAGE):
+            image = tag[len(sc.TAG_PREFIX_IMAGE):]
+        elif tag.startswith(sc.TAG_PREFIX_PARENT):
+            parent = tag[len(sc.TAG_PREFIX_PARENT):]
+        elif tag.startswith(sc.TAG_PREFIX_MD):
+            slot = int(tag[len(sc.TAG_PREFIX_MD):])
+    return image, parent, slot
+
+
 def deleteVolumes(sdUUID, vols):
     lvm.removeLVs(sdUUID, vols)
 
@@ -454,6 +582,14 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
         # BlockStorageDomain. The lock should not be used elsewhere.
         self.metadata_lock = threading.Lock()
 
+        # Serializes building the volume index.
+        self._volume_index_lock = threading.Lock()
+        self._volume_index = None
+        # Incremented after writing volume metadata. An index built when
+        # the counter had a different value is stale.
+        self._metadata_writes_lock = threading.Lock()
+        self._metadata_writes = 0
+
     @classmethod
     def special_volumes(cls, version):
         if cls.supports_external_leases(version):
@@ -865,7 +1001,6 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
         return free_slot
 
     def occupied_metadata_slots(self):
-        stripPrefix = lambda s, pfx: s[len(pfx):]
         occupiedSlots = []
         special_lvs = self.special_volumes(self.getVersion())
         for lv in lvm.getLV(self.sdUUID):
@@ -873,12 +1008,7 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
                 # Special LVs have no mapping
                 continue
 
-            offset = None
-            for tag in lv.tags:
-                if tag.startswith(sc.TAG_PREFIX_MD):
-                    offset = int(stripPrefix(tag, sc.TAG_PREFIX_MD))
-                    break
-
+            _, _, offset = _parse_volume_tags(lv)
             if offset is None:
                 self.log.warn("Could not find mapping for lv %s/%s",
                               self.sdUUID, lv.name)
@@ -982,7 +1112,7 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
         """
         Reads metadata block from storage.
         """
-        # Function readblock is used here intentionally as it supports
+        # Function readblock is used here intentionally as it retries
         # short reads while DirectFile read doesn't.
         return misc.readblock(self.metadata_volume_path(),
                               self.metadata_offset(slot),
@@ -997,9 +1127,13 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
         storage block size.
         """
         metavol = self.metadata_volume_path()
-        with directio.open(metavol, "r+") as f:
-            f.seek(self.metadata_offset(slot))
-            f.write(data)
+        try:
+            with directio.open(metavol, "r+") as f:
+                f.seek(self.metadata_offset(slot))
+                f.write(data)
+        finally:
+            with self._metadata_writes_lock:
+                self._metadata_writes += 1
 
     def clear_metadata_block(self, slot):
         """
@@ -1008,6 +1142,214 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
         data = b"\0" * sc.METADATA_SIZE
         self.write_metadata_block(slot, data)
 
+    # Volume index
+
+    def volume_index(self):
+        """
+        Return a VolumeIndex of the domain volumes.
+
+        The index is built using a single read of the metadata volume, or a
+        read per volume if the single read fails, and is reused until this
+        host writes volume metadata, the lvm cache sequence number of the
+        domain changes, or the index is older than [irs]
+        volume_index_max_age seconds.
+        """
+        # Must be read before getting the LVs, so changes in the LVs while
+        # building the index invalidate the index.
+        seqno = lvm.vg_seqno(self.sdUUID)
+
+        with self._volume_index_lock:
+            writes = self._metadata_writes
+            cached = self._volume_index
+            if cached is None or self._is_stale(cached, seqno, writes):
+                special_lvs = self.special_volumes(self.getVersion())
+                lvs = [lv for lv in lvm.getLV(self.sdUUID)
+                       if lv.name not in special_lvs]
+                index = VolumeIndex(self.sdUUID, self._read_volumes(lvs))
+                cached = _CachedIndex(index, seqno, writes, monotonic_time())
+                self._volume_index = cached
+            return cached.index
+
+    def _is_stale(self, cached, seqno, writes):
+        if cached.seqno != seqno or cached.writes != writes:
+            return True
+        max_age = config.getint("irs", "volume_index_max_age")
+        return monotonic_time() - cached.created >= max_age
+
+    def image_volume_index(self, img_id):
+        """
+        Return a VolumeIndex including the volumes of image img_id and their
+        parents.
+
+        If the volume index of the domain is up to date, it is returned.
+        Otherwise only the metadata of the image volumes is read, so looking
+        up a single image does not read the metadata of all volumes.
+        """
+        seqno = lvm.vg_seqno(self.sdUUID)
+        with self._volume_index_lock:
+            cached = self._volume_index
+            if (cached is not None and
+                    not self._is_stale(cached, seqno, self._metadata_writes)):
+                return cached.index
+
+        special_lvs = self.special_volumes(self.getVersion())
+        tags = {lv.name: (lv, _parse_volume_tags(lv))
+                for lv in lvm.getLV(self.sdUUID)
+                if lv.name not in special_lvs}
+
+        selected = {name: lv for name, (lv, (image, _, _)) in
+                    six.iteritems(tags) if image == img_id}
+
+        # Add the parents from other images (template).
+        pending = list(selected)
+        while pending:
+            _, (_, parent, _) = tags[pending.pop()]
+            if parent in tags and parent not in selected:
+                selected[parent] = tags[parent][0]
+                pending.append(parent)
+
+        entries = self._read_volumes(list(selected.values()), bulk=False)
+        return VolumeIndex(self.sdUUID, entries)
+
+    def _read_volumes(self, lvs, bulk=True):
+        tags = [(lv.name,) + _parse_volume_tags(lv) for lv in lvs]
+        slots = [slot for _, _, _, slot in tags if slot is not None]
+        version = self.getVersion()
+        blocks = self._read_metadata_blocks(slots, version, bulk=bulk)
+
+        entries = []
+        for vol_id, image, parent, slot in tags:
+            md = None
+            error = None
+            if slot is None:
+                error = "missing metadata slot"
+            else:
+                block, error = blocks[slot]
+                if error is None:
+                    try:
+                        md = VolumeMetadata.from_lines(block.splitlines())
+                    except (se.MetaDataKeyNotFoundError, ValueError) as e:
+                        error = str(e)
+            entries.append(
+                VolumeEntry(vol_id, image, parent, slot, md, error))
+        return entries
+
+    def _read_metadata_blocks(self, slots, version, bulk=True):
+        """
+        Read the metadata blocks of slots, and return a dict mapping a slot
+        to a tuple (data, error).
+
+        If bulk is True, read all the metadata slots at once, from the first
+        slot to the end of the last slot. If the read fails, or bulk is
+        False, read every slot separately, so an error reading one slot
+        fails only the volume using it.
+        """
+        blocks = {}
+        if not slots:
+            return blocks
+
+        path = self.metadata_volume_path()
+
+        if bulk:
+            start = self.metadata_offset(min(slots), version)
+            end = self.metadata_offset(max(slots), version) + sc.METADATA_SIZE
+            try:
+                data = misc.readblock(path, start, end - start)
+            except Exception as e:
+                self.log.warning("Error reading metadata of domain %s, "
+                                 "reading every volume metadata: %s",
+                                 self.sdUUID, e)
+            else:
+                for slot in slots:
+                    offset = self.metadata_offset(slot, version) - start
+                    blocks[slot] = (
+                        data[offset:offset + sc.METADATA_SIZE], None)
+                return blocks
+
+        for slot in slots:
+            try:
+                data = misc.readblock(
+                    path, self.metadata_offset(slot, version),
+                    sc.METADATA_SIZE)
+            except Exception as e:
+                self.log.error("Error reading metadata slot %s of domain "
+                               "%s: %s", slot, self.sdUUID, e)
+                blocks[slot] = (None, str(e))
+            else:
+                blocks[slot] = (data, None)
+
+        return blocks
+
+    def dump(self):
+        """
+        Return the info of all the volumes of the domain, using the volume
+        index instead of reading the metadata of every volume.
+        """
+        vol_ids = self.getAllVolumes()
+        index = self.volume_index()
+        lvs = {lv.name: lv for lv in lvm.getLV(self.sdUUID)}
+        leases_path = None
+        if self.hasVolumeLeases():
+            leases_path = self.getLeasesFilePath()
+
+        volumes = {}
+        for vol_id in vol_ids:
+            try:
+                entry = index.get(vol_id)
+                lv = lvs[vol_id]
+            except (se.VolumeDoesNotExist, KeyError):
+                self.log.warning("Volume %s/%s was removed",
+                                 self.sdUUID, vol_id)
+                continue
+            volumes[vol_id] = self._volume_info(entry, lv, leases_path)
+        return {"volumes": volumes}
+
+    def _volume_info(self, entry, lv, leases_path):
+        """
+        Return the volume info reported by Volume.getInfo().
+        """
+        if entry.metadata is None:
+            self.log.debug("Invalid volume %s/%s: %s",
+                           self.sdUUID, entry.uuid, entry.error)
+            info = {
+                "uuid": entry.uuid,
+                "image": entry.image,
+                "parent": entry.parent,
+                "apparentsize": "0",
+                "truesize": "0",
+                "status": "INVALID",
+            }
+        else:
+            info = volume.metadata2info(
+                entry.uuid, entry.image, entry.parent, entry.metadata)
+            info["capacity"] = str(info.pop("size") * sc.BLOCK_SIZE)
+            info["apparentsize"] = str(lv.size)
+            info["truesize"] = str(lv.size)
+            info["status"] = "OK"
+            if leases_path is not None:
+                info["lease"] = self._volume_lease_info(entry, leases_path)
+
+        info["children"] = []
+        if info.get("legality") == sc.ILLEGAL_VOL:
+            info["status"] = sc.ILLEGAL_VOL
+        return info
+
+    def _volume_lease_info(self, entry, leases_path):
+        lease = clusterlock.Lease(
+            entry.uuid, leases_path, self.volume_lease_offset(entry.slot))
+        info = {"path": lease.path, "offset": lease.offset}
+        try:
+            version, host_id = self._domainLock.inquire(lease)
+        except clusterlock.InvalidLeaseName as e:
+            # The lease needs repair, report it without the status.
+            self.log.warning("Cannot get lease status: %s", e)
+        except clusterlock.TemporaryFailure as e:
+            raise exception.expected(e)
+        else:
+            info["owners"] = [host_id] if host_id is not None else []
+            info["version"] = version
+        return info
+
 
 class BlockStorageDomain(sd.StorageDomain):
     manifestClass = BlockStorageDomainManifest
@@ -1721,7 +2063,7 @@ class BlockStorageDomain(sd.StorageDomain):
                     try:
                         md = VolumeMetadata.from_lines(
                             v4_data.rstrip(b"\0").splitlines())
-                    except se.MetaDataKeyNotFoundError as e:
+                    except (se.MetaDataKeyNotFoundError, ValueError) as e:
                         self.log.warning(
                             "Cannot convert metadata slot %s offset=%s: %s",
                             slot, v4_off, e)
@@ -34,6 +34,7 @@ from vdsm.storage import constants as sc
 from vdsm.storage import exception as se
 from vdsm.storage import lvm
 from vdsm.storage import qemuimg
+from vdsm.storage import resourceFactories
 from vdsm.storage import resourceManager as rm
 from vdsm.storage import task
 from vdsm.storage import volume
@@ -374,13 +375,39 @@ class BlockVolumeManifest(volume.VolumeManifest):
                                         self.volUUID, access)
         activation.autoRelease = False
 
+    def llPrepareChain(self, justme=False):
+        """
+        Activate inactive LVs and refresh active LVs of the volume, or of the
+        entire COW chain if justme is false, using one lvm command for all
+        the LVs. Acquiring the lvm activation resource of every volume finds
+        the LV active and does not run any lvm command.
+        """
+        lvs = [self.volUUID]
+        if not justme:
+            pvolUUID = self.getParentTag()
+            while pvolUUID != sc.BLANK_UUID:
+                lvs.append(pvolUUID)
+                pvolUUID = getVolumeTag(
+                    self.sdUUID, pvolUUID, sc.TAG_PREFIX_PARENT)
+
+        return resourceFactories.activate_lvs(self.sdUUID, lvs)
+
+    def llAbortChain(self, chain):
+        resourceFactories.deactivate_unused(self.sdUUID, chain)
+
     @classmethod
     def teardown(cls, sdUUID, volUUID, justme=False):
         """
         Deactivate volume and release resources.
         Volume deactivation occurs as part of resource releasing.
-        If justme is false, the entire COW chain should be torn down.
+        If justme is false, the entire COW chain should be torn down, and the
+        LVs of the chain are deactivated using one lvm command.
         """
+        with resourceFactories.deferred_deactivation(sdUUID):
+            cls._teardown(sdUUID, volUUID, justme)
+
+    @classmethod
+    def _teardown(cls, sdUUID, volUUID, justme):
         cls.log.info("Tearing down volume %s/%s justme %s"
                      % (sdUUID, volUUID, justme))
         lvmActivationNamespace = rm.getNamespace(sc.LVM_ACTIVATION_NAMESPACE,
@@ -398,7 +425,7 @@ class BlockVolumeManifest(volume.VolumeManifest):
                              % (sdUUID, volUUID, e))
 
             if pvolUUID != sc.BLANK_UUID:
-                cls.teardown(sdUUID=sdUUID, volUUID=pvolUUID, justme=False)
+                cls._teardown(sdUUID, pvolUUID, justme=False)
 
     def optimal_size(self):
         """
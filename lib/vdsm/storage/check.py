@@ -27,13 +27,19 @@ CheckService     entry point for starting and stopping path checkers.
 DirectioChecker  checker using dd process for file or block based
                  volumes.
 
+HelperChecker    checker using a pool of long-lived helper processes for
+                 file or block based volumes.
+
 CheckResult      result object provided to user callback on each check.
 """
 
 from __future__ import absolute_import
 
+import functools
+import json
 import logging
 import re
+import sys
 import threading
 
 from vdsm.common import constants
@@ -46,6 +52,10 @@ from vdsm.storage import exception
 
 EXEC_ERROR = 127
 
+# Checker backends
+DD = "dd"
+HELPER = "helper"
+
 _log = logging.getLogger("storage.check")
 
 
@@ -77,12 +87,18 @@ class CheckService(object):
 
     """
 
-    def __init__(self):
+    def __init__(self, backend=DD):
+        if backend not in (DD, HELPER):
+            raise ValueError("Invalid checker backend: %r" % backend)
         self._lock = threading.Lock()
         self._loop = asyncevent.EventLoop()
         self._thread = concurrent.thread(self._loop.run_forever,
                                          name="check/loop")
         self._checkers = {}
+        if backend == HELPER:
+            self._pool = HelperPool(self._loop)
+        else:
+            self._pool = None
 
     def start(self):
         """
@@ -106,6 +122,8 @@ class CheckService(object):
             for checker in self._checkers.values():
                 self._loop.call_soon_threadsafe(checker.stop)
             self._checkers.clear()
+            if self._pool:
+                self._loop.call_soon_threadsafe(self._pool.close)
             self._loop.call_soon_threadsafe(self._loop.stop)
             self._thread.join()
             self._loop.close()
@@ -122,8 +140,12 @@ class CheckService(object):
         with self._lock:
             if path in self._checkers:
                 raise RuntimeError("Already checking path %r" % path)
-            checker = DirectioChecker(self._loop, path, complete,
-                                      interval=interval)
+            if self._pool:
+                checker = HelperChecker(self._loop, path, complete,
+                                        self._pool, interval=interval)
+            else:
+                checker = DirectioChecker(self._loop, path, complete,
+                                          interval=interval)
             self._checkers[path] = checker
         self._loop.call_soon_threadsafe(checker.start)
 
@@ -357,13 +379,16 @@ class DirectioChecker(object):
         elapsed = self._loop.time() - self._check_time
         _log.debug("FINISH check %r (rc=%s, elapsed=%.02f)",
                    self._path, rc, elapsed)
-        result = CheckResult(self._path, rc, self._err, self._check_time,
-                             elapsed)
+        result = self._check_result(rc, elapsed)
         try:
             self._complete(result)
         except Exception:
             _log.exception("Unhandled error in complete callback")
 
+    def _check_result(self, rc, elapsed):
+        return CheckResult(self._path, rc, self._err, self._check_time,
+                           elapsed)
+
     def __repr__(self):
         info = [self.__class__.__name__,
                 self._path,
@@ -373,6 +398,177 @@ class DirectioChecker(object):
         return "<%s at 0x%x>" % (" ".join(info), id(self))
 
 
+class HelperChecker(DirectioChecker):
+    """
+    Check path availability using direct I/O in a helper process.
+
+    HelperChecker works like DirectioChecker, but instead of starting a dd
+    process for every check, the read is performed by a long-lived helper
+    process from a HelperPool shared by all checkers.
+
+    Usage::
+
+        pool = HelperPool(loop)
+        checker = HelperChecker(loop, path, complete, pool)
+        loop.call_soon_threadsafe(checker.start)
+
+    """
+
+    def __init__(self, loop, path, complete, pool, interval=10.0):
+        DirectioChecker.__init__(self, loop, path, complete,
+                                 interval=interval)
+        self._pool = pool
+        self._delay = None
+
+    def _start_process(self):
+        """
+        Sends the read to a helper process. When the read has completed,
+        _helper_completed will be called.
+        """
+        self._proc = self._pool.read(self._path, self._helper_completed)
+
+    def _helper_completed(self, rc, err, delay):
+        self._err = err
+        self._delay = delay
+        self._check_completed(rc)
+
+    def _check_result(self, rc, elapsed):
+        return HelperCheckResult(self._path, rc, self._err, self._check_time,
+                                 elapsed, self._delay)
+
+
+class HelperPool(object):
+    """
+    Pool of long-lived helper processes reading paths using direct I/O.
+
+    A helper performs one read at a time, so a read blocked on unresponsive
+    storage blocks only the helper performing it. Other reads are sent to
+    idle helpers, starting new helpers when there are no idle helpers. Up
+    to max_idle idle helpers are kept for the next reads.
+
+    The pool is not thread safe and must be used only in the event loop
+    thread.
+    """
+
+    def __init__(self, loop, max_idle=4):
+        self._loop = loop
+        self._max_idle = max_idle
+        self._idle = []
+        self._busy = set()
+
+    def read(self, path, complete):
+        """
+        Read path in a helper process, and return the helper. When the read
+        has completed, the complete callback is invoked with rc, err and
+        the read delay.
+        """
+        helper = self._get_helper()
+        self._busy.add(helper)
+        try:
+            helper.read(path, functools.partial(
+                self._read_completed, helper, complete))
+        except Exception:
+            self._busy.discard(helper)
+            helper.close()
+            raise
+        return helper
+
+    def close(self):
+        """
+        Terminate all helpers, including helpers running a read. The reads
+        will complete with an error.
+        """
+        for helper in self._idle + list(self._busy):
+            helper.close()
+        self._idle = []
+
+    def _get_helper(self):
+        while self._idle:
+            helper = self._idle.pop()
+            # An idle helper may have been terminated.
+            if helper.is_alive():
+                return helper
+        return _Helper(self._loop)
+
+    def _read_completed(self, helper, complete, rc, err, delay):
+        self._busy.discard(helper)
+        if helper.is_alive() and len(self._idle) < self._max_idle:
+            self._idle.append(helper)
+        else:
+            helper.close()
+        complete(rc, err, delay)
+
+    def __repr__(self):
+        return "<%s idle=%d busy=%d at 0x%x>" % (
+            self.__class__.__name__, len(self._idle), len(self._busy),
+            id(self))
+
+
+class _Helper(object):
+    """
+    Client side of a helper process running vdsm.storage.checkhelper.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._complete = None
+        cmd = [sys.executable, "-m", "vdsm.storage.checkhelper"]
+        cmd = cmdutils.wrap_command(cmd)
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        _log.debug("Started check helper (pid=%d)", self._proc.pid)
+        self._reader = self._loop.create_dispatcher(
+            asyncevent.LineReader, self._proc.stdout, self._line_received,
+            self._closed)
+
+    def read(self, path, complete):
+        assert self._complete is None, "Helper is busy"
+        request = json.dumps({"path": path}).encode("utf-8") + b"\n"
+        self._proc.stdin.write(request)
+        self._proc.stdin.flush()
+        self._complete = complete
+
+    def is_alive(self):
+        return self._reader is not None
+
+    def close(self):
+        """
+        Terminate the helper. If the helper was running a read, the read
+        completes with an error.
+        """
+        if self._reader is None:
+            return
+        self._reader.close()
+        self._closed()
+
+    def _line_received(self, line):
+        response = json.loads(line.decode("utf-8"))
+        self._done(response["rc"], response.get("err"),
+                   response.get("delay"))
+
+    def _closed(self):
+        self._reader = None
+        self._proc.stdin.close()
+        self._proc.stdout.close()
+        if self._proc.poll() is None:
+            self._proc.kill()
+            asyncevent.Reaper(self._loop, self._proc, self._reaped)
+        else:
+            self._reaped(self._proc.returncode)
+        self._done(EXEC_ERROR, "Check helper terminated", None)
+
+    def _reaped(self, rc):
+        _log.debug("Check helper terminated (pid=%d, rc=%s)",
+                   self._proc.pid, rc)
+
+    def _done(self, rc, err, delay):
+        if self._complete is None:
+            return
+        complete = self._complete
+        self._complete = None
+        complete(rc, err, delay)
+
+
 class CheckResult(object):
 
     _PATTERN = re.compile(br".*, ([\de\-.]+) s,[^,]+")
@@ -406,3 +602,19 @@ class CheckResult(object):
         return "<%s path=%s rc=%d err=%r time=%.2f elapsed=%.2f at 0x%x>" % (
             self.__class__.__name__, self.path, self.rc, self.err, self.time,
             self.elapsed, id(self))
+
+
+class HelperCheckResult(CheckResult):
+    """
+    Result of a check performed by a helper process, reporting the read
+    delay measured by the helper instead of dd statistics.
+    """
+
+    def __init__(self, path, rc, err, time, elapsed, read_delay):
+        CheckResult.__init__(self, path, rc, err, time, elapsed)
+        self.read_delay = read_delay
+
+    def delay(self):
+        if self.rc != 0:
+            raise exception.MiscFileReadException(self.path, self.rc, self.err)
+        return self.read_delay
@@ -0,0 +1,75 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Helper process used by check.HelperPool to check paths.
+
+The helper reads a json request from standard input for every check,
+reads the first block of the path using direct I/O, and writes a json
+response to standard output. Only one path is read at a time, so a read
+blocked on unresponsive storage blocks only this helper.
+
+The helper exits when standard input is closed.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import json
+import os
+import sys
+import time
+
+from vdsm.storage import directio
+
+BLOCK_SIZE = 4096
+
+
+def main():
+    infile = os.fdopen(sys.stdin.fileno(), "rb", 0)
+    outfd = sys.stdout.fileno()
+    for line in iter(infile.readline, b""):
+        request = json.loads(line.decode("utf-8"))
+        response = check(request["path"])
+        data = json.dumps(response).encode("utf-8") + b"\n"
+        while data:
+            n = os.write(outfd, data)
+            data = data[n:]
+
+
+def check(path):
+    """
+    Read the first block of path using direct I/O, and return a response
+    with the read delay in seconds, or the error.
+    """
+    try:
+        with directio.DirectFile(path, "r") as f:
+            # monotonic_time() resolution is too low for measuring a read,
+            # usually taking less than a millisecond.
+            start = time.time()
+            f.read(BLOCK_SIZE)
+            delay = time.time() - start
+    except EnvironmentError as e:
+        return {"rc": e.errno or 1, "err": str(e)}
+    return {"rc": 0, "delay": delay}
+
+
+if __name__ == "__main__":
+    main()
@@ -47,15 +47,25 @@ PORT_NAME = "port_name"
 NODE_NAME = "node_name"
 
 
+# Incremented after every rescan, so users keeping the HBA inventory can
+# tell when it may have changed.
+_rescan_generation = 0
+
+
 class Error(Exception):
     """ hba operation failed """
 
 
+def rescan_generation():
+    return _rescan_generation
+
+
 @misc.samplingmethod
 def rescan():
     """
     Rescan HBAs discovering new devices.
     """
+    global _rescan_generation
     log.debug("Starting scan")
     try:
         supervdsm.getProxy().hbaRescan()
@@ -63,6 +73,8 @@ def rescan():
         log.error("Scan failed: %s", e)
     else:
         log.debug("Scan finished")
+    finally:
+        _rescan_generation += 1
 
 
 def _rescan():
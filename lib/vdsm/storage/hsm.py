@@ -43,6 +43,7 @@ from vdsm import constants
 from vdsm import jobs
 from vdsm.common import concurrent
 from vdsm.common import function
+from vdsm.common import logutils
 from vdsm.common.threadlocal import vars
 from vdsm.common import api
 from vdsm.common import exception
@@ -400,6 +401,8 @@ class HSM(object):
         self.multipathListener = udev.MultipathListener()
         self.mpathhealth_monitor = mpathhealth.Monitor()
         self.multipathListener.register(self.mpathhealth_monitor)
+        if config.getboolean('irs', 'lvm_incremental_cache'):
+            self.multipathListener.register(lvm.cache_monitor())
         self.multipathListener.start()
 
         def storageRefresh():
@@ -916,6 +919,20 @@ class HSM(object):
             if pool.hsmMailer:
                 pool.hsmMailer.sendExtendMsg(volDict, newSize, callbackFunc)
 
+    @classmethod
+    def mailbox_stats(cls):
+        """
+        Return the HSM mailbox statistics of the connected pool, or an empty
+        dict if the pool is not connected or does not use a mailbox.
+
+        Called directly for every metrics sample, not via the dispatcher,
+        since collecting the statistics needs no task.
+        """
+        pool = cls._pool
+        if pool.is_connected() and pool.hsmMailer:
+            return pool.hsmMailer.stats()
+        return {}
+
     def _spmSchedule(self, spUUID, name, func, *args):
         pool = self.getPool(spUUID)
         pool.validateSPM()
@@ -2403,21 +2420,43 @@ class HSM(object):
                 "domType=%s, spUUID=%s, conList=%s" %
                 (domType, spUUID, conList)))
 
-        res = []
-        connections = []
+        workers = config.getint("irs", "connection_workers")
+        timeout = config.getint("irs", "connection_timeout")
+
+        conObjs = []
         for conDef in conList:
             conInfo = _connectionDict2ConnectionInfo(domType, conDef)
-            conObj = storageServer.ConnectionFactory.createConnection(conInfo)
+            conObjs.append(
+                storageServer.ConnectionFactory.createConnection(conInfo))
+
+        def connect(args):
+            conDef, conObj = args
             try:
                 self._connectStorageOverIser(conDef, conObj, domType)
                 conObj.connect()
-            except Exception as err:
+            except Exception:
                 self.log.error(
                     "Could not connect to storageServer", exc_info=True)
-                status, _ = self._translateConnectionError(err)
-            else:
+                raise
+            return conObj
+
+        # A slow server must not delay the other connections, so connect
+        # concurrently. A connection running more than timeout seconds
+        # releases its worker, but we always wait for the connection result.
+        # Note that iSCSI logins are still serialized by iscsiadm locks,
+        # since iscsiadm is not thread safe.
+        results = concurrent.tmap(
+            connect, zip(conList, conObjs), max_workers=workers,
+            slot_timeout=timeout)
+
+        res = []
+        connections = []
+        for conDef, result in zip(conList, results):
+            if result.succeeded:
                 status = 0
-                connections.append(conObj)
+                connections.append(result.value)
+            else:
+                status, _ = self._translateConnectionError(result.value)
 
             res.append({'id': conDef["id"], 'status': status})
 
@@ -2426,17 +2465,27 @@ class HSM(object):
         # call refreshStorage.
         if domType in (sd.FCP_DOMAIN, sd.ISCSI_DOMAIN):
             sdCache.refreshStorage()
+            # Block domains are found by scanning all the devices, not the
+            # connection, so there is no need to prefetch more than once.
+            connections = connections[:1]
 
-        for conObj in connections:
+        def prefetch(conObj):
             try:
-                doms = self._prefetchDomains(domType, conObj)
-            except:
+                return self._prefetchDomains(domType, conObj)
+            except Exception:
                 self.log.debug("prefetch failed: %s",
                                sdCache.knownSDs, exc_info=True)
-            else:
+                raise
+
+        results = concurrent.tmap(
+            prefetch, connections, max_workers=workers, slot_timeout=timeout)
+
+        for result in results:
+            if result.succeeded:
                 # Any pre-existing domains in sdCache stand the chance of
                 # being invalid, since there is no way to know what happens
                 # to them while the storage is disconnected.
+                doms = result.value
                 for sdUUID in doms:
                     sdCache.manuallyRemoveDomain(sdUUID)
                 sdCache.knownSDs.update(doms)
@@ -3305,6 +3354,24 @@ class HSM(object):
         images = dom.getAllImages()
         return dict(imageslist=list(images))
 
+    @public
+    def dumpStorageDomain(self, sdUUID, options=None):
+        """
+        Gets the info of all the volumes of a domain in one call.
+
+        :param sdUUID: The UUID of the storage domain you want to query.
+        :type sdUUID: UUID.
+        :param options: ?
+
+        :returns: a dict with the info of all the volumes, as returned by
+                  getVolumeInfo, indexed by volume UUID.
+        :rtype: dict
+        """
+        vars.task.getSharedLock(STORAGE, sdUUID)
+        dom = sdCache.produce_manifest(sdUUID)
+        # The dump is too big for the log.
+        return dict(dump=logutils.Suppressed(dom.dump()))
+
     @deprecated
     @public
     def getImageDomainsList(self, spUUID, imgUUID, options=None):
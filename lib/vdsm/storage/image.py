@@ -169,7 +169,15 @@ class Image:
         (not including a shared base (template) if any)
         """
         chain = []
-        volclass = sdCache.produce(sdUUID).getVolumeClass()
+        dom = sdCache.produce(sdUUID)
+        volclass = dom.getVolumeClass()
+
+        # Block domains find the chain using the volume index, reading the
+        # metadata only if the index is not up to date.
+        if dom.getStorageType() in sd.BLOCK_DOMAIN_TYPES:
+            index = dom.manifest.image_volume_index(imgUUID)
+            return [volclass(self.repoPath, sdUUID, imgUUID, vol_id)
+                    for vol_id in index.chain(imgUUID, volUUID)]
 
         # Use volUUID when provided
         if volUUID:
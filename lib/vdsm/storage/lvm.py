@@ -35,6 +35,7 @@ import glob
 import grp
 import logging
 from collections import namedtuple
+from collections import OrderedDict
 import pprint as pp
 import threading
 import time
@@ -49,9 +50,11 @@ from vdsm.common import errors
 from vdsm.storage import devicemapper
 from vdsm.storage import constants as sc
 from vdsm.storage import exception as se
+from vdsm.storage import lvmshell
 from vdsm.storage import misc
 from vdsm.storage import multipath
 from vdsm.storage import rwlock
+from vdsm.storage import udev
 from vdsm.storage.constants import VG_EXTENT_SIZE_MB, SUPPORTED_BLOCKSIZE
 
 from vdsm.config import config
@@ -118,6 +121,9 @@ PVS_CMD = ("pvs",) + LVM_FLAGS + ("-o", PV_FIELDS)
 VGS_CMD = ("vgs",) + LVM_FLAGS + ("-o", VG_FIELDS)
 LVS_CMD = ("lvs",) + LVM_FLAGS + ("-o", LV_FIELDS)
 
+# Commands that do not modify anything, safe to run again.
+READ_ONLY_COMMANDS = frozenset(("pvs", "vgs", "lvs"))
+
 # FIXME we must use different METADATA_USER ownership for qemu-unreadable
 # metadata volumes
 USER_GROUP = constants.DISKIMAGE_USER + ":" + constants.DISKIMAGE_GROUP
@@ -178,7 +184,7 @@ def _buildConfig(dev_filter, locking_type):
 def _normalizeargs(args=None):
     if args is None:
         args = []
-    elif not hasattr(args, "__iter__"):
+    elif isinstance(args, six.string_types) or not hasattr(args, "__iter__"):
         args = [args]
 
     return args
@@ -258,7 +264,9 @@ class LVMCache(object):
         br"WARNING: This metadata update is NOT backed up",
         re.IGNORECASE)
 
-    def __init__(self):
+    def __init__(self, incremental=False, shell_pool=None):
+        self._incremental = incremental
+        self._shell_pool = shell_pool
         self._read_only_lock = rwlock.RWLock()
         self._read_only = False
         self._filter = None
@@ -272,6 +280,12 @@ class LVMCache(object):
         self._pvs = {}
         self._vgs = {}
         self._lvs = {}
+        # VGs with all LVs loaded, used only in incremental mode.
+        self._fresh_lv_vgs = set()
+        # Sequence number incremented when cached VG or LVs are invalidated.
+        self._seqno = 0
+        self._flush_seqno = 0
+        self._vg_seqno = {}
 
     def set_read_only(self, value):
         """
@@ -317,6 +331,43 @@ class LVMCache(object):
         self.invalidateFilter()
         self.flush()
 
+    def vg_seqno(self, vgName):
+        """
+        Return the sequence number of the cached information about vgName.
+
+        The sequence number changes when the VG or any of its LVs is
+        invalidated, either by lvm commands run by this module, or by udev
+        events on the LVs devices, and when reloading the LVs finds LVs
+        modified, added or removed by another host. Callers can keep the
+        sequence number read before getting data from the cache, and skip
+        getting the data again when the sequence number did not change.
+        """
+        with self._lock:
+            return max(self._vg_seqno.get(vgName, 0), self._flush_seqno)
+
+    def _lv_changed(self, key, lv):
+        """
+        Return True if replacing the cached LV at key with lv changes the
+        cached information. Replacing a stub does not change the
+        information, since the sequence number was changed when the LV was
+        invalidated.
+        """
+        old = self._lvs.get(key)
+        if isinstance(old, Stub):
+            return False
+        return old != lv
+
+    def _bump_seqno(self, vgNames):
+        # Must be called while holding self._lock.
+        self._seqno += 1
+        for vgName in vgNames:
+            self._vg_seqno[vgName] = self._seqno
+
+    def _bump_all_seqno(self):
+        # Must be called while holding self._lock.
+        self._seqno += 1
+        self._flush_seqno = self._seqno
+
     def cmd(self, cmd, devices=tuple()):
         # Take a shared lock, so set_read_only() can wait for commands using
         # the previous mode.
@@ -377,8 +428,27 @@ class LVMCache(object):
 
         We log warnings only for successful commands since callers are already
         handling failures.
+
+        If a lvm shell pool is configured, the command runs in one of the
+        pool sessions. If the command could not be sent to the shell, or the
+        command is read only, a failed command runs again in a new lvm
+        process. Otherwise the command may have modified the metadata before
+        the session failed, so the lvmshell.Error is raised.
         """
-        rc, out, err = misc.execCmd(cmd, sudo=True)
+        if self._shell_pool is not None and self._shell_pool.enabled:
+            try:
+                rc, out, err = self._shell_pool.run(cmd)
+            except lvmshell.Error as e:
+                if not (isinstance(e, lvmshell.NotSent) or
+                        cmd[1] in READ_ONLY_COMMANDS):
+                    log.error("Running command in lvm shell failed, "
+                              "cmd=%r: %s", cmd, e)
+                    raise
+                log.warning("Running command in lvm shell failed, retrying "
+                            "in a new lvm process: %s", e)
+                rc, out, err = misc.execCmd(cmd, sudo=True)
+        else:
+            rc, out, err = misc.execCmd(cmd, sudo=True)
 
         err = [s for s in err if not self.SUPPRESS_WARNINGS.search(s)]
 
@@ -540,6 +610,7 @@ class LVMCache(object):
                 return dict(self._lvs)
 
             updatedLVs = {}
+            changedVGs = set()
             for line in out:
                 fields = [field.strip() for field in line.split(SEPARATOR)]
                 if len(fields) != LV_FIELDS_LEN:
@@ -548,8 +619,11 @@ class LVMCache(object):
                 lv = makeLV(*fields)
                 # For LV we are only interested in its first extent
                 if lv.seg_start_pe == "0":
-                    self._lvs[(lv.vg_name, lv.name)] = lv
-                    updatedLVs[(lv.vg_name, lv.name)] = lv
+                    key = (lv.vg_name, lv.name)
+                    if self._lv_changed(key, lv):
+                        changedVGs.add(lv.vg_name)
+                    self._lvs[key] = lv
+                    updatedLVs[key] = lv
 
             # Determine if there are stale LVs
             if lvNames:
@@ -557,14 +631,22 @@ class LVMCache(object):
                             if (vgName, lvName) not in updatedLVs)
             else:
                 # All the LVs in the VG
-                staleLVs = (lvName for v, lvName in self._lvs.keys()
+                staleLVs = [lvName for v, lvName in self._lvs.keys()
                             if (v == vgName) and
-                            ((vgName, lvName) not in updatedLVs))
+                            ((vgName, lvName) not in updatedLVs)]
 
             for lvName in staleLVs:
                 log.warning("Removing stale lv: %s/%s", vgName, lvName)
+                if self._lv_changed((vgName, lvName), None):
+                    changedVGs.add(vgName)
                 self._lvs.pop((vgName, lvName), None)
 
+            if not lvNames:
+                self._fresh_lv_vgs.add(vgName)
+
+            if changedVGs:
+                self._bump_seqno(changedVGs)
+
             log.debug("lvs reloaded")
 
         return updatedLVs
@@ -577,6 +659,7 @@ class LVMCache(object):
         rc, out, err = self.cmd(cmd)
         if rc == 0:
             updatedLVs = set()
+            changedVGs = set()
             for line in out:
                 fields = [field.strip() for field in line.split(SEPARATOR)]
                 if len(fields) != LV_FIELDS_LEN:
@@ -585,17 +668,55 @@ class LVMCache(object):
                 lv = makeLV(*fields)
                 # For LV we are only interested in its first extent
                 if lv.seg_start_pe == "0":
-                    self._lvs[(lv.vg_name, lv.name)] = lv
-                    updatedLVs.add((lv.vg_name, lv.name))
+                    key = (lv.vg_name, lv.name)
+                    if self._lv_changed(key, lv):
+                        changedVGs.add(lv.vg_name)
+                    self._lvs[key] = lv
+                    updatedLVs.add(key)
 
             # Remove stales
-            for vgName, lvName in self._lvs.keys():
+            for vgName, lvName in list(self._lvs.keys()):
                 if (vgName, lvName) not in updatedLVs:
+                    if self._lv_changed((vgName, lvName), None):
+                        changedVGs.add(vgName)
                     self._lvs.pop((vgName, lvName), None)
                     log.error("Removing stale lv: %s/%s", vgName, lvName)
             self._stalelv = False
+            self._fresh_lv_vgs.update(vgName for vgName, _ in updatedLVs)
+            if changedVGs:
+                with self._lock:
+                    self._bump_seqno(changedVGs)
         return dict(self._lvs)
 
+    def _reloadstalelvs(self, vgName):
+        """
+        Used only in incremental mode.
+
+        Reload only the stale LVs in vgName if all the LVs in vgName were
+        loaded before, or all the LVs in vgName otherwise.
+        """
+        with self._lock:
+            fresh = vgName in self._fresh_lv_vgs
+            staleLVs = [lv.name for (v, _), lv in six.iteritems(self._lvs)
+                        if v == vgName and isinstance(lv, Stub)]
+
+        if not fresh:
+            self._reloadlvs(vgName)
+            return
+
+        if not staleLVs:
+            return
+
+        self._reloadlvs(vgName, staleLVs)
+
+        # If some LVs could not be reloaded, they may have been removed on
+        # another host. Reloading the entire VG removes them from the cache.
+        with self._lock:
+            failed = any(isinstance(self._lvs.get((vgName, lvName)), Stub)
+                         for lvName in staleLVs)
+        if failed:
+            self._reloadlvs(vgName)
+
     def _invalidatepvs(self, pvNames):
         pvNames = _normalizeargs(pvNames)
         with self._lock:
@@ -612,11 +733,20 @@ class LVMCache(object):
         with self._lock:
             for vgName in vgNames:
                 self._vgs[vgName] = Stub(vgName, True)
+            self._bump_seqno(vgNames)
 
     def _invalidateAllVgs(self):
         with self._lock:
             self._stalevg = True
             self._vgs.clear()
+            self._bump_all_seqno()
+
+    def _removevgs(self, vgNames):
+        vgNames = _normalizeargs(vgNames)
+        with self._lock:
+            for vgName in vgNames:
+                self._vgs.pop(vgName, None)
+            self._bump_seqno(vgNames)
 
     def _invalidatelvs(self, vgName, lvNames=None):
         lvNames = _normalizeargs(lvNames)
@@ -632,11 +762,22 @@ class LVMCache(object):
                     if not isinstance(lv, Stub):
                         if lv.vg_name == vgName:
                             self._lvs[(vgName, lv.name)] = Stub(lv.name, True)
+                self._fresh_lv_vgs.discard(vgName)
+            self._bump_seqno((vgName,))
 
     def _invalidateAllLvs(self):
         with self._lock:
             self._stalelv = True
             self._lvs.clear()
+            self._fresh_lv_vgs.clear()
+            self._bump_all_seqno()
+
+    def _removelvs(self, vgName, lvNames):
+        lvNames = _normalizeargs(lvNames)
+        with self._lock:
+            for lvName in lvNames:
+                self._lvs.pop((vgName, lvName), None)
+            self._bump_seqno((vgName,))
 
     def flush(self):
         self._invalidateAllPvs()
@@ -725,6 +866,9 @@ class LVMCache(object):
         # If only 'lvName' is None then return all the LVs in the given VG
         # If only 'vgName' is None it is weird, so return nothing
         # (we can consider returning all the LVs with a given name)
+        if self._incremental:
+            return self._getLvIncremental(vgName, lvName)
+
         if lvName:
             # vgName, lvName
             lv = self._lvs.get((vgName, lvName))
@@ -754,6 +898,27 @@ class LVMCache(object):
             res = lvs
         return res
 
+    def _getLvIncremental(self, vgName, lvName=None):
+        if lvName:
+            lv = self._lvs.get((vgName, lvName))
+            if not lv or isinstance(lv, Stub):
+                if vgName in self._fresh_lv_vgs:
+                    # Other LVs in the VG are up to date, reload only this
+                    # LV.
+                    lvs = self._reloadlvs(vgName, lvName)
+                else:
+                    lvs = self._reloadlvs(vgName)
+                lv = lvs.get((vgName, lvName))
+                if not lv:
+                    log.warning("lv: %s not found in lvs vg: %s response",
+                                lvName, vgName)
+            return lv
+
+        self._reloadstalelvs(vgName)
+        with self._lock:
+            return [lv for lv in self._lvs.values()
+                    if not isinstance(lv, Stub) and lv.vg_name == vgName]
+
     def getAllLvs(self):
         # None, None
         if self._stalelv or any(isinstance(lv, Stub)
@@ -763,7 +928,44 @@ class LVMCache(object):
             lvs = dict(self._lvs)
         return lvs.values()
 
-_lvminfo = LVMCache()
+
+class CacheMonitor(udev.MultipathMonitor):
+    """
+    Invalidate cached LVs when their device mapper devices change.
+
+    Activating, refreshing, resizing or deactivating a LV on this host emits
+    a udev event for the LV device. Invalidating only the affected LV allows
+    the cache in incremental mode to reload only this LV, instead of all the
+    LVs in the VG.
+    """
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def handle(self, event):
+        """
+        Implementation of the interface udev.MultipathMonitor.handle()
+        This method is called by the udev.MultipathListener and should not
+        be called by others.
+        """
+        if event.type in (udev.LV_CHANGED, udev.LV_REMOVED):
+            log.debug("Invalidating lv: %s/%s (event=%s)",
+                      event.vg_name, event.lv_name, event.type)
+            self._cache._invalidatelvs(event.vg_name, event.lv_name)
+
+
+def _create_shell_pool():
+    size = config.getint("irs", "lvm_shell_sessions")
+    if size == 0:
+        return None
+    size = min(size, LVMCache.MAX_COMMANDS)
+    timeout = config.getint("irs", "lvm_shell_timeout")
+    return lvmshell.Pool(size, timeout=timeout)
+
+
+_lvminfo = LVMCache(
+    incremental=config.getboolean("irs", "lvm_incremental_cache"),
+    shell_pool=_create_shell_pool())
 
 
 def bootstrap(skiplvs=()):
@@ -813,6 +1015,21 @@ def invalidateCache():
     _lvminfo.invalidateCache()
 
 
+def cache_monitor():
+    """
+    Return a udev monitor invalidating the lvm cache on LV device events.
+    """
+    return CacheMonitor(_lvminfo)
+
+
+def vg_seqno(vgName):
+    """
+    Return the sequence number of the cached information about vgName. See
+    LVMCache.vg_seqno() for more info.
+    """
+    return _lvminfo.vg_seqno(vgName)
+
+
 def _fqpvname(pv):
     if pv[0] == "/":
         # Absolute path, use as is.
@@ -1155,7 +1372,7 @@ def removeVG(vgName):
         raise se.VolumeGroupRemoveError("VG %s remove failed." % vgName)
     else:
         # Remove the vg from the cache
-        _lvminfo._vgs.pop(vgName, None)
+        _lvminfo._removevgs(vgName)
 
 
 def removeVGbyUUID(vgUUID):
@@ -1339,11 +1556,10 @@ def removeLVs(vgName, lvNames):
         cmd.append("%s/%s" % (vgName, lvName))
     rc, out, err = _lvminfo.cmd(cmd, _lvminfo._getVGDevs((vgName, )))
     if rc == 0:
-        for lvName in lvNames:
-            # Remove the LV from the cache
-            _lvminfo._lvs.pop((vgName, lvName), None)
-            # If lvremove succeeded it affected VG as well
-            _lvminfo._invalidatevgs(vgName)
+        # Remove the LVs from the cache
+        _lvminfo._removelvs(vgName, lvNames)
+        # If lvremove succeeded it affected VG as well
+        _lvminfo._invalidatevgs(vgName)
     else:
         # Otherwise LV info needs to be refreshed
         _lvminfo._invalidatelvs(vgName, lvNames)
@@ -1426,30 +1642,20 @@ def activateLVs(vgName, lvNames, refresh=True):
     Active lvs may not reflect the current mapping on storage if the lv was
     extended or removed on another host. By default, active lvs are refreshed.
     To skip refresh, call with refresh=False.
-    """
-    active = []
-    inactive = []
-    for lvName in lvNames:
-        if _isLVActive(vgName, lvName):
-            active.append(lvName)
-        else:
-            inactive.append(lvName)
 
-    if refresh and active:
-        log.info("Refreshing active lvs: vg=%s lvs=%s", vgName, active)
-        _refreshLVs(vgName, active)
-
-    if inactive:
-        log.info("Activating lvs: vg=%s lvs=%s", vgName, inactive)
-        _setLVAvailability(vgName, inactive, "y")
+    Returns the names of the lvs that were inactive and were activated.
+    """
+    batch = LVBatch(vgName)
+    batch.activate(lvNames, refresh=refresh)
+    activated = list(batch.activating)
+    batch.commit(raise_error=True)
+    return activated
 
 
 def deactivateLVs(vgName, lvNames):
-    toDeactivate = [lvName for lvName in lvNames
-                    if _isLVActive(vgName, lvName)]
-    if toDeactivate:
-        log.info("Deactivating lvs: vg=%s lvs=%s", vgName, toDeactivate)
-        _setLVAvailability(vgName, toDeactivate, "n")
+    batch = LVBatch(vgName)
+    batch.deactivate(lvNames)
+    batch.commit(raise_error=True)
 
 
 def renameLV(vg, oldlv, newlv):
@@ -1459,7 +1665,7 @@ def renameLV(vg, oldlv, newlv):
     if rc != 0:
         raise se.LogicalVolumeRenameError("%s %s %s" % (vg, oldlv, newlv))
 
-    _lvminfo._lvs.pop((vg, oldlv), None)
+    _lvminfo._removelvs(vg, oldlv)
     _lvminfo._reloadlvs(vg, newlv)
 
 
@@ -1525,6 +1731,184 @@ def addLVTags(vg, lv, addTags):
     changeLVTags(vg, lv, addTags=addTags)
 
 
+class LVBatch(object):
+    """
+    Collect changes to many LVs in one VG, and apply them using one lvm
+    command for each kind of change, instead of one command per LV.
+
+    Changes are applied in this order: tag changes, refresh, activation and
+    deactivation. If a command changing multiple LVs fails, the change is
+    retried for every LV, so the failure can be attributed to specific LVs.
+    Once a change failed for a LV, the next changes are skipped for this LV.
+
+    Usage:
+
+        batch = lvm.LVBatch(vg)
+        batch.change_tags(lvs, delTags=[old_tag], addTags=[new_tag])
+        batch.activate(lvs)
+        errors = batch.commit()
+
+    A batch is not thread safe and should be used by a single thread.
+    """
+
+    def __init__(self, vgName):
+        self._vg = vgName
+        # (delTags, addTags) -> [lvName, ...]
+        self._tags = OrderedDict()
+        self._refresh = []
+        self._activate = []
+        self._deactivate = []
+
+    @property
+    def vg(self):
+        return self._vg
+
+    @property
+    def activating(self):
+        """
+        Return the names of the inactive LVs that will be activated.
+        """
+        return tuple(self._activate)
+
+    def change_tags(self, lvNames, delTags=(), addTags=()):
+        """
+        Delete delTags and add addTags to all lvNames.
+        """
+        delTags = frozenset(delTags)
+        addTags = frozenset(addTags)
+        if delTags.intersection(addTags):
+            raise se.LogicalVolumeReplaceTagError(
+                "Cannot add and delete the same tag vg: `%s` tags: `%s`" %
+                (self._vg, ", ".join(delTags.intersection(addTags))))
+        lvs = self._tags.setdefault((delTags, addTags), [])
+        _extend_unique(lvs, _normalizeargs(lvNames))
+
+    def refresh(self, lvNames):
+        """
+        Reload the mapping of active lvNames.
+        """
+        _extend_unique(self._refresh, _normalizeargs(lvNames))
+
+    def activate(self, lvNames, refresh=True):
+        """
+        Activate inactive lvNames. If refresh is True, active lvNames are
+        refreshed, see activateLVs().
+        """
+        for lvName in _normalizeargs(lvNames):
+            if _isLVActive(self._vg, lvName):
+                if refresh:
+                    _extend_unique(self._refresh, [lvName])
+            else:
+                _extend_unique(self._activate, [lvName])
+
+    def deactivate(self, lvNames):
+        """
+        Deactivate active lvNames.
+        """
+        lvs = [lv for lv in _normalizeargs(lvNames)
+               if _isLVActive(self._vg, lv)]
+        _extend_unique(self._deactivate, lvs)
+
+    def commit(self, raise_error=False):
+        """
+        Apply the collected changes, and clear the batch.
+
+        Arguments:
+            raise_error (bool): if True, raise the error of the first failed
+                LV after trying to apply all changes.
+
+        Returns:
+            OrderedDict mapping LV name to the exception raised when changing
+            the LV, in the order of the failures. Empty if all changes
+            succeeded.
+        """
+        errors = OrderedDict()
+
+        for (delTags, addTags), lvs in self._tags.items():
+            self._apply(
+                "Changing tags (delTags=%s, addTags=%s)"
+                % (sorted(delTags), sorted(addTags)),
+                lvs,
+                lambda lvs: changeLVsTags(self._vg, lvs, delTags, addTags),
+                errors)
+
+        self._apply("Refreshing", self._refresh,
+                    lambda lvs: _refreshLVs(self._vg, lvs),
+                    errors)
+
+        self._apply("Activating", self._activate,
+                    lambda lvs: _setLVAvailability(self._vg, lvs, "y"),
+                    errors)
+
+        self._apply("Deactivating", self._deactivate,
+                    lambda lvs: _setLVAvailability(self._vg, lvs, "n"),
+                    errors)
+
+        self._tags.clear()
+        del self._refresh[:]
+        del self._activate[:]
+        del self._deactivate[:]
+
+        if errors and raise_error:
+            raise next(iter(errors.values()))
+
+        return errors
+
+    def _apply(self, action, lvs, func, errors):
+        lvs = [lv for lv in lvs if lv not in errors]
+        if not lvs:
+            return
+
+        log.info("%s lvs: vg=%s lvs=%s", action, self._vg, lvs)
+        try:
+            func(lvs)
+            return
+        except se.StorageException as e:
+            if len(lvs) == 1:
+                errors[lvs[0]] = e
+                return
+            log.warning("%s lvs failed, retrying every lv: vg=%s lvs=%s: %s",
+                        action, self._vg, lvs, e)
+
+        for lv in lvs:
+            try:
+                func([lv])
+            except se.StorageException as e:
+                log.error("%s lv failed: vg=%s lv=%s: %s",
+                          action, self._vg, lv, e)
+                errors[lv] = e
+
+
+def changeLVsTags(vg, lvs, delTags=(), addTags=()):
+    """
+    Change the tags of multiple LVs using one lvchange command.
+
+    Unlike changeLVTags(), the tags must be validated by the caller.
+    """
+    lvs = _normalizeargs(lvs)
+    cmd = ["lvchange"]
+    cmd.extend(LVM_NOBACKUP)
+    for tag in delTags:
+        cmd.extend(("--deltag", tag))
+    for tag in addTags:
+        cmd.extend(("--addtag", tag))
+    cmd.extend("%s/%s" % (vg, lv) for lv in lvs)
+
+    rc, out, err = _lvminfo.cmd(cmd, _lvminfo._getVGDevs((vg, )))
+    _lvminfo._invalidatelvs(vg, lvs)
+    if rc != 0:
+        raise se.LogicalVolumeReplaceTagError(
+            'lvs: `%s/%s` add: `%s` del: `%s` (%s)' %
+            (vg, ", ".join(lvs), ", ".join(addTags), ", ".join(delTags),
+             err[-1] if err else ""))
+
+
+def _extend_unique(items, new_items):
+    for item in new_items:
+        if item not in items:
+            items.append(item)
+
+
 #
 # Helper functions
 #
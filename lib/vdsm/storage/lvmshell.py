@@ -0,0 +1,425 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Persistent lvm shell sessions.
+
+Running a lvm command starts sudo and lvm, parses lvm.conf and scans the
+devices in the filter. When running many commands, this is most of the time
+spent in every command. A lvm shell session keeps a single lvm process
+running multiple commands.
+
+Session     a single "lvm shell" process, running one command at a time.
+
+Pool        a bounded pool of sessions, used by multiple threads.
+
+Commands run in a session use the same arguments used for running a new lvm
+process, and return the same (rc, out, err) tuple. Reports are requested in
+json format and converted back to the format requested by the caller, so
+callers can use either way to run commands.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import errno
+import json
+import logging
+import os
+import select
+import threading
+
+from six.moves import queue
+
+from vdsm.common import cmdutils
+from vdsm.common import commands
+from vdsm.common import constants
+from vdsm.common import errors
+from vdsm.common.compat import subprocess
+from vdsm.common.time import monotonic_time
+
+log = logging.getLogger("storage.lvmshell")
+
+PROMPT = b"lvm> "
+
+# lvm command log return code for successful command (ECMD_PROCESSED).
+ECMD_PROCESSED = 1
+
+# Report the command log with the report, so we can get the command status.
+LOG_CONFIG = ' log { report_command_log=1 command_log_selection="all" }'
+
+# Default time to wait for command completion.
+DEFAULT_TIMEOUT = 300
+
+
+class Error(errors.Base):
+    msg = "lvm shell error: {self.reason}"
+
+    def __init__(self, reason):
+        self.reason = reason
+
+
+class Timeout(Error):
+    msg = "lvm shell timed out: {self.reason}"
+
+
+class NotSent(Error):
+    """
+    Raised when a command could not be sent to lvm shell. The command was
+    not run, so it is safe to run it again.
+    """
+    msg = "lvm shell command not sent: {self.reason}"
+
+
+class Session(object):
+    """
+    A lvm shell process, running one command at a time.
+
+    A session is not thread safe; concurrent users should use a Pool.
+    """
+
+    def __init__(self, cmd=(constants.EXT_LVM, "shell"), sudo=True,
+                 timeout=DEFAULT_TIMEOUT):
+        self._cmd = cmd
+        self._sudo = sudo
+        self._timeout = timeout
+        self._proc = None
+
+    @property
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        """
+        Start the lvm shell process, and wait until it is ready to run
+        commands.
+
+        Raises:
+            Error if the process could not start or did not respond.
+        """
+        try:
+            self._proc = commands.start(
+                self._cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                sudo=self._sudo,
+                reset_cpu_affinity=False)
+        except OSError as e:
+            raise Error("Cannot start lvm shell: %s" % e)
+
+        try:
+            self._read_response()
+        except Error:
+            self.close()
+            raise
+
+        log.debug("Started lvm shell pid=%d", self._proc.pid)
+
+    def run(self, cmd):
+        """
+        Run lvm command in the shell.
+
+        Arguments:
+            cmd (sequence): lvm command arguments, starting with the lvm
+                executable, as used for running a new lvm process.
+
+        Returns:
+            (rc, out, err) tuple, where out and err are lists of lines, like
+            misc.execCmd().
+
+        Raises:
+            NotSent if the command could not be sent to the shell.
+            Error if the shell process failed or did not respond in time,
+                after the command was sent. The command may have run. The
+                session cannot be used after an error.
+        """
+        log.debug(cmdutils.command_log_line(cmd))
+        line = _format_command(cmd)
+        try:
+            self._proc.stdin.write(line + b"\n")
+            self._proc.stdin.flush()
+        except EnvironmentError as e:
+            # lvm shell runs only complete lines, so a partial line was not
+            # run.
+            self.close()
+            raise NotSent("Error writing to lvm shell: %s" % e)
+
+        try:
+            out, err = self._read_response()
+        except Error:
+            self.close()
+            raise
+
+        rc, out = _parse_output(out, _separator(cmd))
+        err = err.splitlines()
+        log.debug(cmdutils.retcode_log_line(rc, err=b"\n".join(err)))
+        return rc, out, err
+
+    def close(self):
+        """
+        Terminate the lvm shell process.
+        """
+        if self._proc is None:
+            return
+        proc = self._proc
+        self._proc = None
+        log.debug("Stopping lvm shell pid=%d", proc.pid)
+        try:
+            proc.stdin.close()
+        except EnvironmentError:
+            pass
+        try:
+            commands.terminate(proc)
+        except commands.TerminatingFailure as e:
+            log.warning("Error terminating lvm shell: %s", e)
+        finally:
+            proc.stdout.close()
+            proc.stderr.close()
+
+    def _read_response(self):
+        """
+        Read stdout and stderr until lvm shell prints the prompt.
+        """
+        out = bytearray()
+        err = bytearray()
+        buffers = {
+            self._proc.stdout.fileno(): out,
+            self._proc.stderr.fileno(): err,
+        }
+        deadline = monotonic_time() + self._timeout
+
+        while not out.endswith(PROMPT):
+            timeout = deadline - monotonic_time()
+            if timeout <= 0:
+                raise Timeout("No response in %s seconds" % self._timeout)
+            try:
+                readable, _, _ = select.select(list(buffers), [], [], timeout)
+            except select.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            for fd in readable:
+                data = os.read(fd, 65536)
+                if not data:
+                    raise Error("lvm shell terminated (rc=%s)"
+                                % self._proc.poll())
+                buffers[fd] += data
+
+        # stderr is written before the prompt, but may not have been read
+        # yet.
+        fd = self._proc.stderr.fileno()
+        while select.select([fd], [], [], 0)[0]:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            err += data
+
+        return bytes(out[:-len(PROMPT)]), bytes(err)
+
+
+class Pool(object):
+    """
+    A bounded pool of lvm shell sessions.
+
+    Sessions are started when needed, up to size sessions. Sessions failing
+    to run a command are closed and replaced with new sessions on the next
+    command.
+
+    If a session cannot be started, the pool is disabled, since lvm does not
+    support the shell on this host, and callers should run lvm commands
+    directly.
+    """
+
+    def __init__(self, size, timeout=DEFAULT_TIMEOUT, session=Session):
+        self._size = size
+        self._timeout = timeout
+        self._session = session
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._sessions = 0
+        self._enabled = True
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def run(self, cmd):
+        """
+        Run lvm command in one of the pool sessions.
+
+        Raises:
+            NotSent if the command could not be sent to a session. The
+                command was not run.
+            Error if the session failed after the command was sent. The
+                command may have run, so the caller may retry only commands
+                that do not modify anything.
+        """
+        session = self._acquire()
+        try:
+            return session.run(cmd)
+        finally:
+            self._release(session)
+
+    def close(self):
+        """
+        Close all idle sessions. Sessions currently running commands are
+        closed when the command completes.
+        """
+        with self._lock:
+            self._enabled = False
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(session)
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                if not self._enabled:
+                    raise NotSent("Pool is disabled")
+                if self._sessions < self._size:
+                    self._sessions += 1
+                    break
+
+            # All sessions are busy. Wait for an idle session, or for a
+            # failed session to be discarded.
+            try:
+                return self._idle.get(timeout=1.0)
+            except queue.Empty:
+                pass
+
+        session = self._session(timeout=self._timeout)
+        try:
+            session.start()
+        except Error as e:
+            log.error("Cannot start lvm shell, disabling lvm shell pool: %s",
+                      e)
+            with self._lock:
+                self._sessions -= 1
+                self._enabled = False
+            raise NotSent(str(e))
+
+        return session
+
+    def _release(self, session):
+        if session.alive and self._enabled:
+            self._idle.put(session)
+        else:
+            self._discard(session)
+
+    def _discard(self, session):
+        session.close()
+        with self._lock:
+            self._sessions -= 1
+
+
+def _format_command(cmd):
+    """
+    Format lvm command for the shell, requesting a json report including the
+    command log.
+
+    The shell splits arguments on white space, and supports quoting
+    arguments with single or double quotes, without escaping.
+    """
+    args = list(cmd[1:2]) + ["--reportformat", "json"]
+    rest = list(cmd[2:])
+    if "--config" in rest:
+        i = rest.index("--config") + 1
+        rest[i] += LOG_CONFIG
+    else:
+        rest += ["--config", LOG_CONFIG.strip()]
+    args.extend(rest)
+    return " ".join(_quote(arg) for arg in args).encode("utf-8")
+
+
+def _quote(arg):
+    if arg and not any(c.isspace() or c in "'\"#" for c in arg):
+        return arg
+    if "'" not in arg:
+        return "'%s'" % arg
+    if '"' not in arg:
+        return '"%s"' % arg
+    raise NotSent("Cannot quote argument %r" % arg)
+
+
+def _separator(cmd):
+    try:
+        return cmd[list(cmd).index("--separator") + 1]
+    except (ValueError, IndexError):
+        return None
+
+
+def _parse_output(out, separator):
+    """
+    Split lvm shell output to the json report and other output lines.
+
+    The json report starts with a line containing "{" and ends with a line
+    containing "}". Report rows are converted to lines using separator, like
+    the lines reported by lvm when running with --separator.
+
+    Returns:
+        (rc, lines) tuple.
+    """
+    lines = out.splitlines()
+    stripped = [l.strip() for l in lines]
+    try:
+        start = stripped.index(b"{")
+        end = len(stripped) - stripped[::-1].index(b"}")
+    except ValueError:
+        raise Error("No report in lvm shell output: %r" % out)
+
+    try:
+        report = json.loads(
+            b"\n".join(lines[start:end]).decode("utf-8"),
+            object_pairs_hook=collections.OrderedDict)
+    except ValueError as e:
+        raise Error("Invalid report in lvm shell output: %s" % e)
+
+    rc = _command_rc(report)
+
+    result = lines[:start] + lines[end:]
+    if separator is not None:
+        for section in report.get("report", ()):
+            for rows in section.values():
+                for row in rows:
+                    line = separator.join(row.values())
+                    result.append(b"  " + line.encode("utf-8"))
+
+    return rc, result
+
+
+def _command_rc(report):
+    """
+    Return the command exit code from the command log status, using the same
+    codes used by lvm for exiting.
+    """
+    for entry in reversed(report.get("log", ())):
+        if entry.get("log_type") == "status":
+            ret_code = int(entry["log_ret_code"])
+            return 0 if ret_code == ECMD_PROCESSED else ret_code
+    raise Error("No command status in lvm shell report: %r" % report)
@@ -19,9 +19,10 @@
 #
 
 from __future__ import absolute_import
-import array
+import mmap
 import os
 import errno
+import stat
 import time
 import threading
 import struct
@@ -34,11 +35,14 @@ from six.moves import queue
 from vdsm.config import config
 from vdsm.storage import misc
 from vdsm.storage import task
+from vdsm.storage import xlease
 from vdsm.storage.exception import InvalidParameterException
 from vdsm.storage.threadPool import ThreadPool
 
 from vdsm import constants
 from vdsm.common import concurrent
+from vdsm.common import histogram
+from vdsm.common.time import monotonic_time
 
 __author__ = "ayalb"
 __date__ = "$Mar 9, 2009 5:25:07 PM$"
@@ -52,6 +56,7 @@ SIZE_CHARS = 16
 MESSAGE_VERSION = b"1"
 MESSAGE_SIZE = 64
 CLEAN_MESSAGE = b"\1" * MESSAGE_SIZE
+EMPTY_MESSAGE = b"\0" * MESSAGE_SIZE
 EXTEND_CODE = b"xtnd"
 BLOCK_SIZE = 512
 REPLY_OK = 1
@@ -64,9 +69,7 @@ MESSAGES_PER_MAILBOX = SLOTS_PER_MAILBOX - 1
 
 def checksum(string, numBytes):
     bits = 8 * numBytes
-    tmpArray = array.array('B')
-    tmpArray.fromstring(string)
-    csum = sum(tmpArray)
+    csum = sum(bytearray(string))
     return csum - (csum >> bits << bits)
 
 
@@ -90,6 +93,185 @@ def _mboxExecCmd(*args, **kwargs):
     return misc.execCmd(*args, **kwargs)
 
 
+class DirectMailbox(object):
+    """
+    Mailbox I/O using direct I/O in the current process, with a persistent
+    file descriptor and reusable aligned buffers.
+
+    Checking for mail costs a couple of syscalls instead of starting a dd
+    process. Used for mailboxes on block storage, like the other direct I/O
+    in vdsm process (see xlease.DirectFile).
+    """
+
+    def __init__(self, path):
+        self._file = xlease.DirectFile(path)
+        # mmap buffers are page aligned, as required for direct I/O. Mailbox
+        # I/O uses few fixed sizes, so we keep one buffer per size.
+        self._buffers = {}
+
+    @property
+    def name(self):
+        return self._file.name
+
+    def read(self, offset, size):
+        """
+        Read size bytes at offset, returning the data read. The data may be
+        shorter than size if the mailbox is too small.
+        """
+        buf = self._buffer(size)
+        buf.seek(0)
+        nread = self._file.pread(offset, buf)
+        return buf[:nread]
+
+    def write(self, offset, data):
+        """
+        Write data at offset, and wait until the data reached storage.
+        """
+        buf = self._buffer(len(data))
+        buf.seek(0)
+        buf.write(data)
+        self._file.pwrite(offset, buf)
+
+    def close(self):
+        self._file.close()
+        for buf in self._buffers.values():
+            buf.close()
+        self._buffers.clear()
+
+    def _buffer(self, size):
+        buf = self._buffers.get(size)
+        if buf is None:
+            buf = mmap.mmap(-1, size, mmap.MAP_SHARED)
+            self._buffers[size] = buf
+        return buf
+
+
+class DDMailbox(object):
+    """
+    Mailbox I/O using a dd child process. Used for mailboxes on file
+    storage, where I/O to a non-responsive server would block the calling
+    process in D state.
+    """
+
+    def __init__(self, path):
+        self._path = path
+
+    @property
+    def name(self):
+        return self._path
+
+    def read(self, offset, size):
+        cmd = [constants.EXT_DD,
+               'if=' + str(self._path),
+               'iflag=direct,fullblock,skip_bytes',
+               'bs=' + str(size),
+               'count=1',
+               'skip=' + str(offset)]
+        rc, out, err = _mboxExecCmd(cmd, raw=True)
+        if rc:
+            raise IOError(errno.EIO, "Could not read mailbox %s: rc=%s "
+                          "err=%s" % (self._path, rc, err))
+        return out
+
+    def write(self, offset, data):
+        cmd = [constants.EXT_DD,
+               'of=' + str(self._path),
+               'iflag=fullblock',
+               'oflag=direct,seek_bytes',
+               'conv=notrunc',
+               'bs=' + str(len(data)),
+               'count=1',
+               'seek=' + str(offset)]
+        rc, out, err = _mboxExecCmd(cmd, data=data)
+        if rc:
+            raise IOError(errno.EIO, "Could not write mailbox %s: rc=%s "
+                          "err=%s" % (self._path, rc, err))
+
+    def close(self):
+        pass
+
+
+class Poller(object):
+    """
+    Wait between mailbox checks.
+
+    With a fixed interval, the monitor waits interval seconds between checks.
+    With adaptive polling (min_interval is not None), the monitor waits
+    min_interval seconds after activity, doubling the wait after every check
+    up to interval seconds.
+
+    The wait can be cut short by calling wakeup(), used when the other side
+    of the mailbox runs in the same process.
+    """
+
+    def __init__(self, interval, min_interval=None):
+        if min_interval is not None:
+            min_interval = min(min_interval, interval)
+        self._max_interval = interval
+        self._min_interval = min_interval
+        self._interval = interval
+        self._event = threading.Event()
+
+    @property
+    def adaptive(self):
+        return self._min_interval is not None
+
+    @property
+    def interval(self):
+        return self._interval
+
+    def activity(self):
+        """
+        Poll fast since new mail is expected soon.
+        """
+        if self.adaptive:
+            self._interval = self._min_interval
+
+    def wakeup(self):
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the next check, or until woken up. Returns True if woken
+        up.
+        """
+        if timeout is None:
+            timeout = self._interval
+            if self.adaptive:
+                self._interval = min(self._interval * 2, self._max_interval)
+        # Clear only a wakeup consumed by this wait. A wakeup arriving
+        # after a timeout, or while the caller checks the mailbox, must cut
+        # the next wait short.
+        woken = self._event.wait(timeout)
+        if woken:
+            self._event.clear()
+        return woken
+
+
+def _min_poll_interval():
+    """
+    Return the minimal polling interval for adaptive polling, or None if
+    adaptive polling is disabled.
+    """
+    if not config.getboolean('irs', 'mailbox_adaptive_polling'):
+        return None
+    return config.getfloat('irs', 'mailbox_min_interval')
+
+
+def _is_block_device(path):
+    return stat.S_ISBLK(os.stat(path).st_mode)
+
+
+def open_mailbox(path):
+    """
+    Return a mailbox I/O backend for path, using direct I/O in the current
+    process for block devices, and dd for files.
+    """
+    if _is_block_device(path):
+        return DirectMailbox(path)
+    return DDMailbox(path)
+
+
 class SPM_Extend_Message:
 
     log = logging.getLogger('storage.SPM.Messages.Extend')
@@ -112,6 +294,7 @@ class SPM_Extend_Message:
         self.pool = volumeData['poolID']
         self.volumeData = volumeData
         self.callback = callbackFunction
+        self.created = monotonic_time()
 
         # Message structure is rigid (order must be kept and is relied upon):
         # Version (1 byte), OpCode (4 bytes), Domain UUID (16 bytes), Volume
@@ -211,6 +394,29 @@ class HSM_Mailbox:
         if str(msg.pool) != self._poolID:
             raise ValueError('PoolID does not correspond to Mailbox pool')
         self._queue.put(msg)
+        self._mailman.wakeup()
+
+    @property
+    def extend_latency(self):
+        """
+        Histogram of the time in seconds from sending an extend request until
+        getting the SPM reply.
+        """
+        return self._mailman.extend_latency
+
+    def stats(self):
+        latency = self.extend_latency.snapshot()
+        for p in (50, 90, 99):
+            latency["p%d" % p] = self.extend_latency.percentile(p)
+        return {"extend_latency": latency}
+
+    def set_local_spm(self, spm_mailer):
+        """
+        When this host is the SPM, deliver requests to the SPM mail monitor
+        running in this process without waiting for the next check. Use None
+        to disable when the host stops being the SPM.
+        """
+        self._mailman.set_local_spm(spm_mailer)
 
     def stop(self):
         if self._mailman:
@@ -237,27 +443,17 @@ class HSM_MailMonitor(object):
         self._queue = queue
         self._activeMessages = {}
         self._monitorInterval = monitorInterval
+        self._poller = Poller(monitorInterval, _min_poll_interval())
+        self._local_spm = None
+        self.extend_latency = histogram.Histogram()
         self._hostID = int(hostID)
         self._used_slots_array = [0] * MESSAGES_PER_MAILBOX
-        self._outgoingMail = EMPTYMAILBOX
+        self._outgoingMail = bytearray(EMPTYMAILBOX)
         self._incomingMail = EMPTYMAILBOX
         # TODO: add support for multiple paths (multiple mailboxes)
-        self._inCmd = [constants.EXT_DD,
-                       'if=' + str(inbox),
-                       'iflag=direct,fullblock',
-                       'bs=' + str(MAILBOX_SIZE),
-                       'count=1',
-                       'skip=' + str(self._hostID)
-                       ]
-        self._outCmd = [constants.EXT_DD,
-                        'of=' + str(outbox),
-                        'iflag=fullblock',
-                        'oflag=direct',
-                        'conv=notrunc',
-                        'bs=' + str(MAILBOX_SIZE),
-                        'count=1',
-                        'seek=' + str(self._hostID)
-                        ]
+        self._inbox = open_mailbox(inbox)
+        self._outbox = open_mailbox(outbox)
+        self._mailboxOffset = self._hostID * MAILBOX_SIZE
         self._init = False
         self._initMailbox()  # Read initial mailbox state
         self._msgCounter = 0
@@ -268,24 +464,41 @@ class HSM_MailMonitor(object):
 
     def _initMailbox(self):
         # Sync initial incoming mail state with storage view
-        (rc, out, err) = _mboxExecCmd(self._inCmd, raw=True)
-        if rc == 0:
-            self._incomingMail = out
+        try:
+            self._incomingMail = self._inbox.read(self._mailboxOffset,
+                                                  MAILBOX_SIZE)
             self._init = True
-        else:
+        except EnvironmentError as e:
             self.log.warning("HSM_MailboxMonitor - Could not initialize "
                              "mailbox, will not accept requests until init "
-                             "succeeds")
+                             "succeeds: %s", e)
 
     def immStop(self):
         self._stop = True
+        self._poller.wakeup()
 
     def wait(self, timeout=None):
         self._thread.join(timeout=timeout)
         return not self._thread.is_alive()
 
+    def wakeup(self):
+        """
+        Check for replies and send new messages now, if adaptive polling is
+        enabled. When there are no active messages, the monitor is already
+        waiting for new messages.
+        """
+        if self._poller.adaptive and self._activeMessages:
+            self._poller.wakeup()
+
+    def set_local_spm(self, spm_mailer):
+        if spm_mailer is not None and not self._poller.adaptive:
+            return
+        self._local_spm = spm_mailer
+
     def _handleResponses(self, newMsgs):
         rc = False
+        newView = memoryview(newMsgs)
+        oldView = memoryview(self._incomingMail)
 
         for i in range(0, MESSAGES_PER_MAILBOX):
             # Skip checking non used slots
@@ -294,19 +507,15 @@ class HSM_MailMonitor(object):
 
             # Skip empty return messages (messages with version 0)
             start = i * MESSAGE_SIZE
+            end = start + MESSAGE_SIZE
 
             # First byte of message is message version.
             # Check return message version, if 0 then message is empty
-            if newMsgs[start] in ['\0', '0']:
+            if newMsgs[start:start + 1] in (b"\0", b"0"):
                 continue
 
-            for j in range(start, start + MESSAGE_SIZE):
-                if newMsgs[j] != self._incomingMail[j]:
-                    break
-
-            # If search exhausted then message hasn't changed since last read
-            # and can be skipped
-            if j == (start + MESSAGE_SIZE - 1):
+            # If message hasn't changed since last read it can be skipped
+            if newView[start:end] == oldView[start:end]:
                 continue
 
             #
@@ -316,27 +525,25 @@ class HSM_MailMonitor(object):
             #
             rc = True
 
-            newMsg = newMsgs[start:start + MESSAGE_SIZE]
+            newMsg = newView[start:end].tobytes()
 
             if newMsg == CLEAN_MESSAGE:
                 del self._activeMessages[i]
                 self._used_slots_array[i] = 0
                 self._msgCounter -= 1
-                self._outgoingMail = self._outgoingMail[0:start] + \
-                    MESSAGE_SIZE * "\0" + self._outgoingMail[start +
-                                                             MESSAGE_SIZE:]
+                self._outgoingMail[start:end] = EMPTY_MESSAGE
                 continue
 
             msg = self._activeMessages[i]
             self._activeMessages[i] = CLEAN_MESSAGE
-            self._outgoingMail = self._outgoingMail[0:start] + \
-                CLEAN_MESSAGE + self._outgoingMail[start + MESSAGE_SIZE:]
+            self._outgoingMail[start:end] = CLEAN_MESSAGE
 
             try:
                 self.log.debug("HSM_MailboxMonitor(%s/%s) - Checking reply: "
                                "%s", self._msgCounter, MESSAGES_PER_MAILBOX,
                                repr(newMsg))
                 msg.checkReply(newMsg)
+                self.extend_latency.add(monotonic_time() - msg.created)
                 if msg.callback:
                     try:
                         id = str(uuid.uuid4())
@@ -365,11 +572,11 @@ class HSM_MailMonitor(object):
 
     def _checkForMail(self):
         # self.log.debug("HSM_MailMonitor - checking for mail")
-        # self.log.debug("Running command: " + str(self._inCmd))
-        (rc, in_mail, err) = misc.execCmd(self._inCmd, raw=True)
-        if rc:
-            raise RuntimeError("_handleResponses.Could not read mailbox - rc "
-                               "%s" % rc)
+        try:
+            in_mail = self._inbox.read(self._mailboxOffset, MAILBOX_SIZE)
+        except EnvironmentError as e:
+            raise RuntimeError("_handleResponses.Could not read mailbox - %s"
+                               % e)
         if (len(in_mail) != MAILBOX_SIZE):
             raise RuntimeError("_handleResponses.Could not read mailbox - len "
                                "%s != %s" % (len(in_mail), MAILBOX_SIZE))
@@ -377,15 +584,17 @@ class HSM_MailMonitor(object):
         return self._handleResponses(in_mail)
 
     def _sendMail(self):
-        self.log.info("HSM_MailMonitor sending mail to SPM - " +
-                      str(self._outCmd))
+        self.log.info("HSM_MailMonitor sending mail to SPM - %s offset %s",
+                      self._outbox.name, self._mailboxOffset)
         chk = checksum(
             self._outgoingMail[0:MAILBOX_SIZE - CHECKSUM_BYTES],
             CHECKSUM_BYTES)
         pChk = struct.pack('<l', chk)  # Assumes CHECKSUM_BYTES equals 4!!!
-        self._outgoingMail = \
-            self._outgoingMail[0:MAILBOX_SIZE - CHECKSUM_BYTES] + pChk
-        _mboxExecCmd(self._outCmd, data=self._outgoingMail)
+        self._outgoingMail[MAILBOX_SIZE - CHECKSUM_BYTES:] = pChk
+        try:
+            self._outbox.write(self._mailboxOffset, bytes(self._outgoingMail))
+        except EnvironmentError as e:
+            self.log.error("HSM_MailMonitor couldn't send mail: %s", e)
 
     def _handleMessage(self, message):
         # TODO: add support for multiple mailboxes
@@ -395,12 +604,8 @@ class HSM_MailMonitor(object):
                 if not freeSlot:
                     freeSlot = i
                 continue
-            duplicate = True
-            for j in range(0, MESSAGE_SIZE):
-                if message[j] != self._activeMessages[i][j]:
-                    duplicate = False
-                    break
-            if duplicate:
+            active = self._activeMessages[i]
+            if active != CLEAN_MESSAGE and active.payload == message.payload:
                 self.log.debug("HSM_MailMonitor - ignoring duplicate message "
                                "%s" % (repr(message)))
                 return
@@ -413,8 +618,7 @@ class HSM_MailMonitor(object):
         self._activeMessages[freeSlot] = message
         start = freeSlot * MESSAGE_SIZE
         end = start + MESSAGE_SIZE
-        self._outgoingMail = self._outgoingMail[0:start] + message.payload + \
-            self._outgoingMail[end:]
+        self._outgoingMail[start:end] = message.payload
         self.log.debug("HSM_MailMonitor - start: %s, end: %s, len: %s, "
                        "message(%s/%s): %s" %
                        (start, end, len(self._outgoingMail), self._msgCounter,
@@ -482,6 +686,11 @@ class HSM_MailMonitor(object):
 
                     if sendMail:
                         self._sendMail()
+                        # More replies are expected soon.
+                        self._poller.activity()
+                        spm = self._local_spm
+                        if spm is not None:
+                            spm.wakeup()
 
                     # If there are active messages waiting for SPM reply, wait
                     # a few seconds before performing another IO op
@@ -489,9 +698,9 @@ class HSM_MailMonitor(object):
                         # If recurring failures then sleep for one minute
                         # before retrying
                         if (failures > 9):
-                            time.sleep(60)
+                            self._poller.wait(60)
                         else:
-                            time.sleep(self._monitorInterval)
+                            self._poller.wait()
 
                 except:
                     self.log.error("HSM_MailboxMonitor - Incoming mail"
@@ -500,8 +709,10 @@ class HSM_MailMonitor(object):
         finally:
             self.log.info("HSM_MailboxMonitor - Incoming mail monitoring "
                           "thread stopped, clearing outgoing mail")
-            self._outgoingMail = EMPTYMAILBOX
+            self._outgoingMail = bytearray(EMPTYMAILBOX)
             self._sendMail()  # Clear outgoing mailbox
+            self._inbox.close()
+            self._outbox.close()
 
 
 class SPM_MailMonitor:
@@ -543,31 +754,27 @@ class SPM_MailMonitor:
         self._numHosts = int(maxHostID)
         self._outMailLen = MAILBOX_SIZE * self._numHosts
         self._monitorInterval = monitorInterval
+        self._poller = Poller(monitorInterval, _min_poll_interval())
+        self._local_hsm = None
         # TODO: add support for multiple paths (multiple mailboxes)
-        self._outgoingMail = self._outMailLen * b"\0"
-        self._incomingMail = self._outgoingMail
-        self._inCmd = ['dd',
-                       'if=' + str(self._inbox),
-                       'iflag=direct,fullblock',
-                       'count=1'
-                       ]
-        self._outCmd = ['dd',
-                        'of=' + str(self._outbox),
-                        'oflag=direct',
-                        'iflag=fullblock',
-                        'conv=notrunc',
-                        'count=1'
-                        ]
+        self._outgoingMail = bytearray(self._outMailLen)
+        self._incomingMail = bytearray(self._outMailLen)
+        self._inFile = open_mailbox(self._inbox)
+        self._outFile = open_mailbox(self._outbox)
         self._outLock = threading.Lock()
         self._inLock = threading.Lock()
+        # True if the outgoing mail could not be written, and must be sent
+        # on the next check.
+        self._send_pending = False
         # Clear outgoing mail
-        self.log.debug("SPM_MailMonitor - clearing outgoing mail, command is: "
-                       "%s", self._outCmd)
-        cmd = self._outCmd + ['bs=' + str(self._outMailLen)]
-        (rc, out, err) = _mboxExecCmd(cmd, data=self._outgoingMail)
-        if rc:
-            self.log.warning("SPM_MailMonitor couldn't clear outgoing mail, "
-                             "dd failed")
+        self.log.debug("SPM_MailMonitor - clearing outgoing mail %s",
+                       self._outbox)
+        try:
+            self._outFile.write(0, bytes(self._outgoingMail))
+        except EnvironmentError as e:
+            self.log.warning("SPM_MailMonitor couldn't clear outgoing mail: "
+                             "%s", e)
+            self._send_pending = True
 
         self._thread = concurrent.thread(
             self._run, name="mailbox-spm", log=self.log)
@@ -582,10 +789,33 @@ class SPM_MailMonitor:
 
     def stop(self):
         self._stop = True
+        self._poller.wakeup()
 
     def isStopped(self):
         return self._stopped
 
+    def wakeup(self):
+        """
+        Check for mail now, if adaptive polling is enabled.
+        """
+        if self._poller.adaptive:
+            self._poller.wakeup()
+
+    def set_local_hsm(self, hostID, hsm_mailbox):
+        """
+        Deliver replies to the HSM mailbox of this host without waiting for
+        the next check. Use None to disable.
+        """
+        if hsm_mailbox is None or not self._poller.adaptive:
+            self._local_hsm = None
+        else:
+            self._local_hsm = (int(hostID), hsm_mailbox)
+
+    def _notify_local_hsm(self, host=None):
+        local = self._local_hsm
+        if local is not None and host in (None, local[0]):
+            local[1].wakeup()
+
     @classmethod
     def validateMailbox(self, mailbox, mailboxIndex):
         """
@@ -608,14 +838,30 @@ class SPM_MailMonitor:
         return True
 
     def _handleRequests(self, newMail):
+        """
+        Handle new requests in newMail, the contents of all host mailboxes.
+
+        Mailboxes are compared with the mail read in the previous check, and
+        only changed mailboxes are validated and checked for new messages.
+        Most mailboxes do not change between checks, so the comparisons are
+        done on memoryviews of the mail buffers, without copying.
 
+        Returns True if the outgoing mail was modified and should be sent.
+        """
         send = False
+        newMail = bytearray(newMail)
+        newView = memoryview(newMail)
+        oldView = memoryview(self._incomingMail)
 
-        # run through all messages and check if new messages have arrived
+        # run through all mailboxes and check if new messages have arrived
         # (since last read)
         for host in range(0, self._numHosts):
-            # Check mailbox checksum
             mailboxStart = host * MAILBOX_SIZE
+            mailboxEnd = mailboxStart + MAILBOX_SIZE
+
+            if newView[mailboxStart:mailboxEnd] == \
+                    oldView[mailboxStart:mailboxEnd]:
+                continue
 
             isMailboxValidated = False
 
@@ -623,10 +869,11 @@ class SPM_MailMonitor:
 
                 msgId = host * SLOTS_PER_MAILBOX + i
                 msgStart = msgId * MESSAGE_SIZE
+                msgEnd = msgStart + MESSAGE_SIZE
 
                 # First byte of message is message version.  Check message
                 # version, if 0 then message is empty and can be skipped
-                if newMail[msgStart] in ['\0', '0']:
+                if newMail[msgStart:msgStart + 1] in (b"\0", b"0"):
                     continue
 
                 # Most mailboxes are probably empty so it costs less to check
@@ -635,55 +882,39 @@ class SPM_MailMonitor:
                 # mailbox
                 if not isMailboxValidated:
                     if not self.validateMailbox(
-                            newMail[mailboxStart:mailboxStart + MAILBOX_SIZE],
-                            host):
+                            newView[mailboxStart:mailboxEnd].tobytes(), host):
                         # Cleaning invalid mbx in newMail
-                        newMail = newMail[:mailboxStart] + EMPTYMAILBOX + \
-                            newMail[mailboxStart + MAILBOX_SIZE:]
+                        newMail[mailboxStart:mailboxEnd] = EMPTYMAILBOX
                         break
                     self.log.debug("SPM_MailMonitor: Mailbox %s validated, "
                                    "checking mail", host)
                     isMailboxValidated = True
 
-                newMsg = newMail[msgStart:msgStart + MESSAGE_SIZE]
-                msgOffset = msgId * MESSAGE_SIZE
-                if newMsg == CLEAN_MESSAGE:
+                if newView[msgStart:msgEnd] == CLEAN_MESSAGE:
                     # Should probably put a setter on outgoingMail which would
                     # take the lock
                     with self._outLock:
-                        self._outgoingMail = \
-                            self._outgoingMail[0:msgOffset] + CLEAN_MESSAGE + \
-                            self._outgoingMail[msgOffset + MESSAGE_SIZE:
-                                               self._outMailLen]
+                        self._outgoingMail[msgStart:msgEnd] = CLEAN_MESSAGE
                     send = True
                     continue
 
-                # Message isn't empty, check if its new
-                isMessageNew = False
-                for j in range(msgStart, msgStart + MESSAGE_SIZE):
-                    if newMail[j] != self._incomingMail[j]:
-                        isMessageNew = True
-                        break
-
-                # If search exhausted, i.e. message hasn't changed since last
-                # read, it can be skipped
-                if not isMessageNew:
+                # If message hasn't changed since last read, it can be skipped
+                if newView[msgStart:msgEnd] == oldView[msgStart:msgEnd]:
                     continue
 
                 # We only get here if there is a novel request
+                newMsg = newView[msgStart:msgEnd].tobytes()
                 try:
-                    msgType = newMail[msgStart + 1:msgStart + 5]
+                    msgType = newMsg[1:5]
                     if msgType in self._messageTypes:
                         # Use message class to process request according to
                         # message specific logic
                         id = str(uuid.uuid4())
                         self.log.debug("SPM_MailMonitor: processing request: "
-                                       "%s" % repr(newMail[
-                                           msgStart:msgStart + MESSAGE_SIZE]))
+                                       "%s" % repr(newMsg))
                         res = self.tp.queueTask(
                             id, runTask, (self._messageTypes[msgType], msgId,
-                                          newMail[msgStart:
-                                                  msgStart + MESSAGE_SIZE])
+                                          newMsg)
                         )
                         if not res:
                             raise Exception()
@@ -693,77 +924,95 @@ class SPM_MailMonitor:
                 except RuntimeError as e:
                     self.log.error("SPM_MailMonitor: exception: %s caught "
                                    "while handling message: %s", str(e),
-                                   newMail[msgStart:msgStart + MESSAGE_SIZE])
+                                   newMsg)
                 except:
                     self.log.error("SPM_MailMonitor: exception caught while "
-                                   "handling message: %s",
-                                   newMail[msgStart:msgStart + MESSAGE_SIZE],
+                                   "handling message: %s", newMsg,
                                    exc_info=True)
 
         self._incomingMail = newMail
         return send
 
     def _checkForMail(self):
+        """
+        Returns True if the incoming mail has changed since the last check.
+        """
         # Lock is acquired in order to make sure that
         # incomingMail is not changed during checkForMail
         with self._inLock:
             # self.log.debug("SPM_MailMonitor -_checking for mail")
-            cmd = self._inCmd + ['bs=' + str(self._outMailLen)]
-            # self.log.debug("SPM_MailMonitor - reading incoming mail, "
-            #               "command: " + str(cmd))
-            (rc, in_mail, err) = misc.execCmd(cmd, raw=True)
-            if rc:
+            try:
+                in_mail = self._inFile.read(0, self._outMailLen)
+            except EnvironmentError as e:
                 raise IOError(errno.EIO, "_handleRequests._checkForMail - "
-                              "Could not read mailbox: %s" % self._inbox)
+                              "Could not read mailbox: %s: %s"
+                              % (self._inbox, e))
 
             if (len(in_mail) != (self._outMailLen)):
-                self.log.error('SPM_MailMonitor: _checkForMail - dd succeeded '
-                               'but read %d bytes instead of %d, cannot check '
+                self.log.error('SPM_MailMonitor: _checkForMail - read '
+                               'succeeded but read %d bytes instead of %d, '
+                               'cannot check '
                                'mail.  Read mail contains: %s', len(in_mail),
                                self._outMailLen, repr(in_mail[:80]))
                 raise RuntimeError("_handleRequests._checkForMail - Could not "
                                    "read mailbox")
             # self.log.debug("Parsing inbox content: %s", in_mail)
-            if self._handleRequests(in_mail):
-                with self._outLock:
-                    cmd = self._outCmd + ['bs=' + str(self._outMailLen)]
-                    (rc, out, err) = _mboxExecCmd(cmd,
-                                                  data=self._outgoingMail)
-                    if rc:
+            changed = in_mail != self._incomingMail
+            send = self._handleRequests(in_mail)
+            with self._outLock:
+                # Unchanged mailboxes are not handled again, so outgoing
+                # mail that could not be written must be sent now.
+                send = send or self._send_pending
+                if send:
+                    try:
+                        self._outFile.write(0, bytes(self._outgoingMail))
+                        self._send_pending = False
+                    except EnvironmentError as e:
                         self.log.warning("SPM_MailMonitor couldn't write "
-                                         "outgoing mail, dd failed")
+                                         "outgoing mail, retrying on next "
+                                         "check: %s", e)
+                        self._send_pending = True
+            if send:
+                self._notify_local_hsm()
+            return changed
 
     def sendReply(self, msgID, msg):
         # Lock is acquired in order to make sure that
         # outgoingMail is not changed while used
         with self._outLock:
             msgOffset = msgID * MESSAGE_SIZE
-            self._outgoingMail = \
-                self._outgoingMail[0:msgOffset] + msg.payload + \
-                self._outgoingMail[msgOffset + MESSAGE_SIZE:self._outMailLen]
+            self._outgoingMail[msgOffset:msgOffset + MESSAGE_SIZE] = \
+                msg.payload
             mailboxOffset = (msgID // SLOTS_PER_MAILBOX) * MAILBOX_SIZE
-            mailbox = self._outgoingMail[mailboxOffset:
-                                         mailboxOffset + MAILBOX_SIZE]
-            cmd = self._outCmd + ['bs=' + str(MAILBOX_SIZE),
-                                  'seek=' + str(mailboxOffset // MAILBOX_SIZE)]
-            # self.log.debug("Running command: %s, for message id: %s",
-            #               str(cmd), str(msgID))
-            (rc, out, err) = _mboxExecCmd(cmd, data=mailbox)
-            if rc:
+            mailbox = bytes(self._outgoingMail[mailboxOffset:
+                                               mailboxOffset + MAILBOX_SIZE])
+            try:
+                self._outFile.write(mailboxOffset, mailbox)
+            except (EnvironmentError, ValueError) as e:
+                # ValueError: the mailbox was closed by a stopped monitor.
                 self.log.error("SPM_MailMonitor: sendReply - couldn't send "
-                               "reply, dd failed")
+                               "reply: %s", e)
+                self._send_pending = True
+        # The host will acknowledge the reply soon.
+        self._poller.activity()
+        self._notify_local_hsm(msgID // SLOTS_PER_MAILBOX)
 
     def _run(self):
         try:
             while not self._stop:
                 try:
-                    self._checkForMail()
+                    if self._checkForMail():
+                        self._poller.activity()
                 except:
                     self.log.error("Error checking for mail", exc_info=True)
-                time.sleep(self._monitorInterval)
+                self._poller.wait()
         finally:
             self._stopped = True
             self.tp.joinAll(waitForTasks=False)
+            with self._inLock:
+                self._inFile.close()
+            with self._outLock:
+                self._outFile.close()
             self.log.info("SPM_MailMonitor - Incoming mail monitoring thread "
                           "stopped")
 
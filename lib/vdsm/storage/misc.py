@@ -51,7 +51,9 @@ from vdsm.common import commands
 from vdsm.common import concurrent
 from vdsm.common import logutils
 from vdsm.common import proc
+from vdsm.config import config
 
+from vdsm.storage import directio
 from vdsm.storage import exception as se
 from vdsm.storage.constants import BLOCK_SIZE
 
@@ -97,8 +99,46 @@ def readblock(name, offset, size):
     if (size % 512) or (offset % 512):
         raise se.MiscBlockReadException(name, offset, size)
 
+    if config.getboolean('irs', 'readblock_in_process'):
+        return _readblock_direct(name, offset, size)
+    else:
+        return _readblock_dd(name, offset, size)
+
+
+def _readblock_direct(name, offset, size):
+    '''
+    Read using direct I/O in this process, up to MEGA bytes per read.
+    '''
+    chunks = []
+    left = size
+    try:
+        with directio.open(name, "r") as f:
+            f.seek(offset)
+            while left > 0:
+                data = f.read(min(left, MEGA))
+                chunks.append(data)
+                left -= len(data)
+                # At end of file, or a short read leaving the next read
+                # unaligned.
+                if not data or len(data) % 512:
+                    break
+    except EnvironmentError as e:
+        log.error("Error reading %s offset=%s size=%s: %s",
+                  name, offset, size, e)
+        raise se.MiscBlockReadException(name, offset, size)
+
+    if left > 0:
+        raise se.MiscBlockReadIncomplete(name, offset, size)
+
+    return b"".join(chunks)
+
+
+def _readblock_dd(name, offset, size):
+    '''
+    Read using a dd process for every aligned part of the block.
+    '''
     left = size
-    ret = ""
+    ret = b""
     baseoffset = offset
 
     while left > 0:
@@ -149,14 +189,14 @@ def _alignData(length, offset):
         # IO can be direct + single shot
         count = 1
         iounit = length
-        iooffset = offset / iounit
+        iooffset = offset // iounit
         return (iounit, count, iooffset)
 
     # Compute largest chunk possible up to 1M for IO
     while iounit > 1:
         if (length >= iounit) and (offset % iounit == 0):
-            count = length / iounit
-            iooffset = offset / iounit
+            count = length // iounit
+            iooffset = offset // iounit
             break
         iounit = iounit >> 1
 
@@ -146,7 +146,8 @@ class DomainMonitor(object):
         # the checker event loop thread.
         self.onDomainStateChange = misc.Event(
             "storage.DomainMonitor.onDomainStateChange", sync=False)
-        self._checker = check.CheckService()
+        self._checker = check.CheckService(
+            backend=config.get("irs", "path_checker"))
         self._checker.start()
 
     @property
@@ -21,6 +21,8 @@
 from __future__ import absolute_import
 
 import os
+import threading
+from contextlib import contextmanager
 
 from vdsm.config import config
 from vdsm.storage import constants as sc
@@ -33,6 +35,103 @@ import logging
 
 log = logging.getLogger('storage.ResourcesFactories')
 
+# Deactivations deferred by the current thread, see deferred_deactivation().
+_deferred = threading.local()
+
+# (vg, lv) activated by activate_lvs() or released in a
+# deferred_deactivation() context, and not acquired since then. Creating the
+# activation resource cancels the pending deactivation.
+_pending = set()
+
+# Maps (vg, lv) being deactivated by deactivate_unused() to an event set
+# when the deactivation has completed. Activating the lv must wait for the
+# deactivation, otherwise the lv may be deactivated after it was activated.
+_deactivating = {}
+
+# Protects _pending and _deactivating. Must not be held while running lvm
+# commands, since a command blocked on one domain would block activation
+# and deactivation on all domains.
+_pending_lock = threading.Lock()
+
+
+def activate_lvs(vg, lvs):
+    """
+    Activate inactive lvs and refresh active lvs before acquiring their
+    activation resources, using one lvm command for all the lvs.
+
+    Returns the lvs activated by this call. If acquiring the resources
+    fails, call deactivate_unused() with the returned lvs.
+    """
+    _wait_for_deactivation(vg, lvs)
+    activated = lvm.activateLVs(vg, lvs)
+    with _pending_lock:
+        _pending.update((vg, lv) for lv in activated)
+    return activated
+
+
+def deactivate_unused(vg, lvs):
+    """
+    Deactivate lvs activated by activate_lvs(), if no activation resource
+    was created for them.
+    """
+    done = threading.Event()
+    with _pending_lock:
+        lvs = [lv for lv in lvs
+               if (vg, lv) in _pending and (vg, lv) not in _deactivating]
+        _pending.difference_update((vg, lv) for lv in lvs)
+        for lv in lvs:
+            _deactivating[(vg, lv)] = done
+    try:
+        _deactivate(vg, lvs)
+    finally:
+        with _pending_lock:
+            for lv in lvs:
+                del _deactivating[(vg, lv)]
+        done.set()
+
+
+def _wait_for_deactivation(vg, lvs):
+    with _pending_lock:
+        events = set(_deactivating[(vg, lv)] for lv in lvs
+                     if (vg, lv) in _deactivating)
+    for event in events:
+        event.wait()
+
+
+@contextmanager
+def deferred_deactivation(vg):
+    """
+    Defer deactivation of LVs in vg when releasing lvm activation resources
+    in the current thread, and deactivate all the released LVs using one lvm
+    command when exiting the context.
+
+    Nested contexts for the same vg join the outer context.
+    """
+    outer = getattr(_deferred, "pending", None)
+    if outer is not None and outer[0] == vg:
+        yield
+        return
+
+    released = []
+    _deferred.pending = (vg, released)
+    try:
+        yield
+    finally:
+        _deferred.pending = outer
+        deactivate_unused(vg, released)
+
+
+def _deactivate(vg, lvs):
+    if not lvs:
+        return
+    try:
+        lvm.deactivateLVs(vg, lvs)
+    except Exception as e:
+        # If storage not accessible or lvm error occurred
+        # the LV deactivation will failure.
+        # We can live with it and still release the resource.
+        log.warn("Failure deactivate LVs %s/%s (%s)", vg, lvs, e)
+
 
 class LvmActivation(object):
     """
@@ -40,22 +139,28 @@ class LvmActivation(object):
     When the resource is created (i.e. the LV is being activated)
     it calls lvm.activateLVs(). When the resource is being finally released
     the close() calls lvm.deactivateLVs() to release the DM mappings
-    for this volume.
+    for this volume, or defers the deactivation if the resource is released
+    in a deferred_deactivation() context.
     """
     def __init__(self, vg, lv, lockType):
         self._vg = vg
         self._lv = lv
 
-        lvm.activateLVs(self._vg, [self._lv])
+        with _pending_lock:
+            _pending.discard((self._vg, self._lv))
+        _wait_for_deactivation(self._vg, [self._lv])
+        # The LV was refreshed by activate_lvs() when preparing the
+        # volume chain.
+        lvm.activateLVs(self._vg, [self._lv], refresh=False)
 
     def close(self):
-        try:
-            lvm.deactivateLVs(self._vg, [self._lv])
-        except Exception as e:
-            # If storage not accessible or lvm error occurred
-            # the LV deactivation will failure.
-            # We can live with it and still release the resource.
-            log.warn("Failure deactivate LV %s/%s (%s)", self._vg, self._lv, e)
+        pending = getattr(_deferred, "pending", None)
+        if pending is not None and pending[0] == self._vg:
+            with _pending_lock:
+                _pending.add((self._vg, self._lv))
+            pending[1].append(self._lv)
+        else:
+            _deactivate(self._vg, [self._lv])
 
 
 class LvmActivationFactory(rm.SimpleResourceFactory):
@@ -648,6 +648,31 @@ class StorageDomainManifest(object):
         """
         raise NotImplementedError
 
+    def dump(self):
+        """
+        Return the info of all the volumes of the domain:
+
+            {"volumes": {vol_id: info, ...}}
+
+        info is the dict returned by Volume.getInfo(). Subclasses may get
+        the info of all volumes without getting the info of every volume.
+        """
+        volumes = {}
+        for vol_id, ip in six.iteritems(self.getAllVolumes()):
+            try:
+                vol = self.produceVolume(ip.imgs[0], vol_id)
+            except se.VolumeDoesNotExist:
+                self.log.warning("Volume %s/%s was removed",
+                                 self.sdUUID, vol_id)
+                continue
+            info = vol.getInfo()
+            # Invalid volumes are reported without metadata.
+            info.setdefault("uuid", vol_id)
+            info.setdefault("image", ip.imgs[0])
+            info.setdefault("parent", ip.parent)
+            volumes[vol_id] = info
+        return {"volumes": volumes}
+
     # External leases support
 
     @classmethod
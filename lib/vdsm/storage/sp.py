@@ -368,6 +368,7 @@ class StoragePool(object):
                     self.spmMailer.registerMessageType('xtnd', partial(
                         mailbox.SPM_Extend_Message.processRequest,
                         self))
+                    self._link_mailboxes()
                     self.log.debug("SPM mailbox ready for pool %s on master "
                                    "domain %s", self.spUUID,
                                    self.masterDomain.sdUUID)
@@ -436,6 +437,8 @@ class StoragePool(object):
                 stopFailed = True
 
             try:
+                if self.hsmMailer:
+                    self.hsmMailer.set_local_spm(None)
                 if self.spmMailer:
                     self.spmMailer.stop()
             except:
@@ -516,6 +519,18 @@ class StoragePool(object):
                 self.id, self.spUUID, inbox, outbox)
             self.log.debug("HSM mailbox ready for pool %s on master "
                            "domain %s", self.spUUID, self.masterDomain.sdUUID)
+            self._link_mailboxes()
+
+    @unsecured
+    def _link_mailboxes(self):
+        """
+        When this host is the SPM, deliver extend requests and replies
+        between the HSM and SPM mailboxes directly, without waiting for the
+        next mailbox check.
+        """
+        if self.hsmMailer and self.spmMailer:
+            self.hsmMailer.set_local_spm(self.spmMailer)
+            self.spmMailer.set_local_hsm(self.id, self.hsmMailer)
 
     @unsecured
     def __cleanupDomains(self, domlist, msdUUID, masterVersion):
@@ -739,6 +754,8 @@ class StoragePool(object):
         self.id = SPM_ID_FREE
 
         if self.hsmMailer:
+            if self.spmMailer:
+                self.spmMailer.set_local_hsm(self.id, None)
             self.hsmMailer.stop()
             self.hsmMailer = None
 
@@ -37,6 +37,11 @@ MPATH_REMOVED = "removed"
 PATH_FAILED = "failed"
 PATH_REINSTATED = "reinstated"
 
+LVMEvent = namedtuple("LVMEvent", "type, vg_name, lv_name, seqnum")
+
+LV_CHANGED = "lv_changed"
+LV_REMOVED = "lv_removed"
+
 
 def create_observer(monitor, callback, name):
     """
@@ -78,8 +83,10 @@ class MultipathMonitor(object):
         """
         Must be implemented by objects registered with MultipathListener.
 
+        Monitors must ignore event types they do not handle.
+
         Arguments:
-            A MultipathEvent namedtuple.
+            A MultipathEvent or LVMEvent namedtuple.
         """
         raise NotImplementedError
 
@@ -157,8 +164,8 @@ class MultipathListener(object):
     def register(self, monitor):
         """
         Register a monitor with the listener. The monitor.handle() method will
-        be invoked with a MultipathEvent instance when receiving an event from
-        udev.
+        be invoked with a MultipathEvent or LVMEvent instance when receiving an
+        event from udev.
 
         The monitor.handle() method must never block, blocking will delay
         receiving multipath events for the entire system.  If the monitor need
@@ -228,6 +235,8 @@ class MultipathListener(object):
 
     def _detect_event(self, device):
         mpath_uuid = device.get("DM_UUID", "")
+        if mpath_uuid.startswith("LVM-"):
+            return self._detect_lvm_event(device)
         if not mpath_uuid.startswith("mpath-"):
             return None
         mpath_uuid = mpath_uuid[6:]
@@ -255,6 +264,31 @@ class MultipathListener(object):
         return MultipathEvent(event_type, mpath_uuid, path, valid_paths,
                               dm_seqnum)
 
+    def _detect_lvm_event(self, device):
+        """
+        Detect events for logical volumes device mapper devices. These events
+        are emitted when a logical volume is activated, refreshed, resized or
+        deactivated on this host.
+
+        LVM udev rules add the DM_VG_NAME and DM_LV_NAME properties to the
+        device, so we don't need to parse the device mapper name.
+        """
+        vg_name = device.get("DM_VG_NAME")
+        lv_name = device.get("DM_LV_NAME")
+        if not vg_name or not lv_name:
+            return None
+
+        action = device["ACTION"]
+        if action in ("add", "change"):
+            event_type = LV_CHANGED
+        elif action == "remove":
+            event_type = LV_REMOVED
+        else:
+            return None
+
+        seqnum = int(device.get("SEQNUM", 0))
+        return LVMEvent(event_type, vg_name, lv_name, seqnum)
+
     def _forward_event(self, event):
         with self._lock:
             monitors = list(self._monitors)
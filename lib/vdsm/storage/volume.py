@@ -55,6 +55,29 @@ def getBackingVolumePath(imgUUID, volUUID):
     return volUUID
 
 
+def metadata2info(vol_id, img_id, parent, meta):
+    """
+    Return the volume info reported by getInfo() for volume metadata meta.
+    """
+    return {
+        "uuid": vol_id,
+        "type": meta.get(sc.TYPE, ""),
+        "format": meta.get(sc.FORMAT, ""),
+        "disktype": meta.get(sc.DISKTYPE, ""),
+        "voltype": meta.get(sc.VOLTYPE, ""),
+        "size": int(meta.get(sc.SIZE, "0")),
+        "parent": parent,
+        "description": meta.get(sc.DESCRIPTION, ""),
+        "pool": "",  # deprecated value
+        "domain": meta.get(sc.DOMAIN, ""),
+        "image": img_id,
+        "ctime": meta.get(sc.CTIME, ""),
+        "mtime": "0",
+        "legality": meta.get(sc.LEGALITY, ""),
+        "generation": meta.get(sc.GENERATION, sc.DEFAULT_GENERATION)
+    }
+
+
 def _next_generation(current_generation):
     # Increment a generation value and wrap to 0 after MAX_GENERATION
     return (current_generation + 1) % (sc.MAX_GENERATION + 1)
@@ -221,23 +244,8 @@ class VolumeManifest(object):
         return dict(owners=owners, version=version)
 
     def metadata2info(self, meta):
-        return {
-            "uuid": self.volUUID,
-            "type": meta.get(sc.TYPE, ""),
-            "format": meta.get(sc.FORMAT, ""),
-            "disktype": meta.get(sc.DISKTYPE, ""),
-            "voltype": meta.get(sc.VOLTYPE, ""),
-            "size": int(meta.get(sc.SIZE, "0")),
-            "parent": self.getParent(),
-            "description": meta.get(sc.DESCRIPTION, ""),
-            "pool": "",  # deprecated value
-            "domain": meta.get(sc.DOMAIN, ""),
-            "image": self.getImage(),
-            "ctime": meta.get(sc.CTIME, ""),
-            "mtime": "0",
-            "legality": meta.get(sc.LEGALITY, ""),
-            "generation": meta.get(sc.GENERATION, sc.DEFAULT_GENERATION)
-        }
+        return metadata2info(self.volUUID, self.getImage(), self.getParent(),
+                             meta)
 
     def getInfo(self):
         """
@@ -603,6 +611,15 @@ class VolumeManifest(object):
         If justme is false, the entire COW chain is prepared.
         Note: setrw arg may be used only by SPM flows.
         """
+        chain = self.llPrepareChain(justme=justme)
+        try:
+            return self._prepare(rw=rw, justme=justme, chainrw=chainrw,
+                                 setrw=setrw, force=force)
+        except Exception:
+            self.llAbortChain(chain)
+            raise
+
+    def _prepare(self, rw, justme, chainrw, setrw, force):
         self.log.info("Volume: preparing volume %s/%s",
                       self.sdUUID, self.volUUID)
 
@@ -629,8 +646,8 @@ class VolumeManifest(object):
                 return True
             pvol = self.getParentVolume()
             if pvol:
-                pvol.prepare(rw=chainrw, justme=False,
-                             chainrw=chainrw, setrw=setrw)
+                pvol._prepare(rw=chainrw, justme=False,
+                              chainrw=chainrw, setrw=setrw, force=False)
         except Exception:
             self.log.error("Unexpected error", exc_info=True)
             self.teardown(self.sdUUID, self.volUUID)
@@ -788,6 +805,21 @@ class VolumeManifest(object):
     def llPrepare(self, rw=False, setrw=False):
         raise NotImplementedError
 
+    def llPrepareChain(self, justme=False):
+        """
+        Perform low level preparation of the volume, or the entire COW chain
+        if justme is false, before preparing every volume.
+
+        Returns an opaque value passed to llAbortChain() if preparing the
+        volumes failed.
+        """
+        return None
+
+    def llAbortChain(self, chain):
+        """
+        Undo llPrepareChain() after preparing the volumes failed.
+        """
+
     def optimal_size(self):
         raise NotImplementedError
 
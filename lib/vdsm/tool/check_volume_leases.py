@@ -24,6 +24,8 @@ from __future__ import print_function
 from collections import defaultdict
 import argparse
 
+import six
+
 from vdsm import client
 from vdsm import utils
 from vdsm.config import config
@@ -114,40 +116,33 @@ def _get_leases_to_repair(cli):
     sp_uuid, = pools
     broken_leases = {}
     for sd_uuid in cli.Host.getStorageDomains(storagepoolID=sp_uuid):
-        sd_broken_leases = _get_domain_broken_leases(cli, sp_uuid, sd_uuid)
+        sd_broken_leases = _get_domain_broken_leases(cli, sd_uuid)
         if sd_broken_leases:
             broken_leases[sd_uuid] = sd_broken_leases
 
     return broken_leases
 
 
-def _get_domain_broken_leases(cli, sp_uuid, sd_uuid):
+def _get_domain_broken_leases(cli, sd_uuid):
     broken_leases = defaultdict(dict)
-    for img_uuid in cli.StorageDomain.getImages(storagedomainID=sd_uuid):
-        vols_uuids = cli.StorageDomain.getVolumes(storagepoolID=sp_uuid,
-                                                  storagedomainID=sd_uuid,
-                                                  imageID=img_uuid)
-        for vol_uuid in vols_uuids:
-            try:
-                info = cli.Volume.getInfo(storagepoolID=sp_uuid,
-                                          storagedomainID=sd_uuid,
-                                          imageID=img_uuid,
-                                          volumeID=vol_uuid)
-            except client.Error as e:
-                print()
-                print("Error: failed to get volume info: {} (domain: {}, "
-                      "image: {}, volume: {}"
-                      .format(e, sd_uuid, img_uuid, vol_uuid))
-                continue
-
-            if 'lease' not in info:
-                # This domain does not support leases.
-                return {}
-
-            leaseinfo = info['lease']
-            if 'owners' not in leaseinfo:
-                # The lease is broken
-                broken_leases[img_uuid][vol_uuid] = leaseinfo
+    dump = cli.StorageDomain.dump(storagedomainID=sd_uuid)
+    for vol_uuid, info in six.iteritems(dump['volumes']):
+        img_uuid = info['image']
+        if info['status'] == 'INVALID':
+            print()
+            print("Error: failed to get volume info (domain: {}, "
+                  "image: {}, volume: {})"
+                  .format(sd_uuid, img_uuid, vol_uuid))
+            continue
+
+        if 'lease' not in info:
+            # This domain does not support leases.
+            return {}
+
+        leaseinfo = info['lease']
+        if 'owners' not in leaseinfo:
+            # The lease is broken
+            broken_leases[img_uuid][vol_uuid] = leaseinfo
 
     # Convert the defaultdict to the standard dict in order to get an error
     # when getting a key that doesn't exist, rather than creating an empty
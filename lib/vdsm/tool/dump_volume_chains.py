@@ -176,28 +176,26 @@ def _get_volumes_info(cli, sd_uuid):
     if not pools:
         raise NoConnectedStoragePoolError('There is no connected storage '
                                           'pool to this server')
-    sp_uuid, = pools
-    images_uuids = cli.StorageDomain.getImages(storagedomainID=sd_uuid)
+    dump = cli.StorageDomain.dump(storagedomainID=sd_uuid)
+    return _volumes_by_image(dump['volumes'])
 
-    volumes_info = {}
 
-    for img_uuid in images_uuids:
-        img_volumes_info = {}
-
-        volumes_uuids = cli.StorageDomain.getVolumes(
-            storagedomainID=sd_uuid, storagepoolID=sp_uuid,
-            imageID=img_uuid)
-
-        for vol_uuid in volumes_uuids:
-            vol_info = cli.Volume.getInfo(
-                volumeID=vol_uuid, storagepoolID=sp_uuid,
-                storagedomainID=sd_uuid, imageID=img_uuid)
+def _volumes_by_image(volumes):
+    """
+    Group volumes info by image. A template volume is reported also in the
+    images based on it, as StorageDomain.getVolumes does.
+    """
+    volumes_info = defaultdict(dict)
 
-            img_volumes_info[vol_uuid] = vol_info
+    for vol_uuid, vol_info in six.iteritems(volumes):
+        volumes_info[vol_info['image']][vol_uuid] = vol_info
 
-        volumes_info[img_uuid] = img_volumes_info
+    for vol_uuid, vol_info in six.iteritems(volumes):
+        parent_info = volumes.get(vol_info['parent'])
+        if parent_info and parent_info['image'] != vol_info['image']:
+            volumes_info[vol_info['image']][vol_info['parent']] = parent_info
 
-    return volumes_info
+    return dict(volumes_info)
 
 
 def _get_volumes_chains(volumes_info):
@@ -0,0 +1,219 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Compact representation of libvirt bulk stats.
+
+libvirt reports the stats of a domain as a flat dict with keys like
+"block.1.rd.bytes". Keeping this dict for every VM, and finding the values
+of every disk and nic by formatting keys, is costly on hosts running
+hundreds of VMs.
+
+A Sample keeps only the values used by vdsm, in columns with a fixed
+order: one row of VM wide values, and one row per disk and per nic. Missing
+values are kept as None.
+
+The Layout of a sample maps device names to rows, and holds the keys used
+to read the rows from the bulk stats dict. Consecutive samples of a VM
+share the same layout, which is built again only when the VM devices
+change, for example after hotplug.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import six
+
+# VM wide values. CPU values must be first, see Sample.cpu.
+CPU = ('cpu.time', 'cpu.user', 'cpu.system')
+SCALARS = CPU + (
+    'balloon.current',
+    'balloon.available',
+    'balloon.unused',
+    'balloon.disk_caches',
+    'balloon.swap_in',
+    'balloon.swap_out',
+    'balloon.major_fault',
+    'balloon.minor_fault',
+    'vcpu.current',
+)
+
+# Per device values, without the "group.index." prefix.
+BLOCK = (
+    'rd.reqs', 'rd.bytes', 'rd.times',
+    'wr.reqs', 'wr.bytes', 'wr.times',
+    'fl.reqs', 'fl.times',
+)
+NET = (
+    'rx.bytes', 'rx.errs', 'rx.drop',
+    'tx.bytes', 'tx.errs', 'tx.drop',
+)
+
+FIELDS = {'block': BLOCK, 'net': NET}
+
+_SCALAR_INDEX = {key: i for i, key in enumerate(SCALARS)}
+
+_FIELD_INDEX = {
+    group: {field: i for i, field in enumerate(fields)}
+    for group, fields in six.iteritems(FIELDS)
+}
+
+
+class Layout(object):
+    """
+    Map device names to rows in a sample.
+
+    The row of a device is the device index in the bulk stats, so rows are
+    stable as long as libvirt reports the devices in the same order.
+    """
+
+    __slots__ = ('names', 'slots', '_name_keys', '_keys')
+
+    def __init__(self, names):
+        """
+        names is a dict mapping a group ("block", "net") to a tuple of
+        device names ordered by bulk stats index. The name of a device
+        without a name in the bulk stats is None.
+        """
+        self.names = names
+        self.slots = {}
+        self._name_keys = {}
+        self._keys = {}
+        for group, group_names in six.iteritems(names):
+            self.slots[group] = {
+                name: i for i, name in enumerate(group_names)
+                if name is not None
+            }
+            self._name_keys[group] = tuple(
+                ('%s.%d.name' % (group, i), name)
+                for i, name in enumerate(group_names))
+            self._keys[group] = tuple(
+                tuple('%s.%d.%s' % (group, i, field)
+                      for field in FIELDS[group])
+                for i in range(len(group_names)))
+
+    @classmethod
+    def from_stats(cls, stats):
+        names = {}
+        for group in FIELDS:
+            count = stats.get('%s.count' % group, 0)
+            # Bulk stats accumulate what they can get, raising errors only
+            # in the critical cases. This includes fundamental attributes
+            # like names, so count has to be considered an upper bound
+            # more like a precise indicator.
+            names[group] = tuple(
+                stats.get('%s.%d.name' % (group, i))
+                for i in six.moves.xrange(count))
+        return cls(names)
+
+    def matches(self, stats):
+        """
+        Return True if bulk stats dict stats reports the same devices in
+        the same order.
+        """
+        for group, name_keys in six.iteritems(self._name_keys):
+            if stats.get('%s.count' % group, 0) != len(name_keys):
+                return False
+            for key, name in name_keys:
+                if stats.get(key) != name:
+                    return False
+        return True
+
+    def rows(self, stats, group):
+        return tuple(
+            tuple(stats.get(key) for key in keys)
+            for keys in self._keys[group])
+
+
+class Sample(object):
+    """
+    Values of a single VM from one bulk stats call.
+
+    VM wide values can be accessed like a dict, using the bulk stats keys.
+    Device values are accessed by device row, see Layout, and column, see
+    field_index().
+    """
+
+    __slots__ = ('layout', 'scalars', 'block', 'net')
+
+    def __init__(self, layout, scalars, block, net):
+        self.layout = layout
+        self.scalars = scalars
+        self.block = block
+        self.net = net
+
+    def __getitem__(self, key):
+        value = self.scalars[_SCALAR_INDEX[key]]
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        index = _SCALAR_INDEX.get(key)
+        if index is None or self.scalars[index] is None:
+            return default
+        return self.scalars[index]
+
+    @property
+    def cpu(self):
+        return self.scalars[:len(CPU)]
+
+
+def compact(stats, layout=None):
+    """
+    Return a Sample with the values of libvirt bulk stats dict stats.
+
+    layout is the layout of the previous sample of the same VM. It is used
+    if the VM devices did not change, avoiding formatting the keys of all
+    devices again.
+    """
+    if layout is None or not layout.matches(stats):
+        layout = Layout.from_stats(stats)
+    return Sample(
+        layout,
+        tuple(stats.get(key) for key in SCALARS),
+        layout.rows(stats, 'block'),
+        layout.rows(stats, 'net'))
+
+
+def as_sample(stats):
+    """
+    Return stats as a Sample, converting bulk stats dicts. None is returned
+    as is.
+    """
+    if stats is None or isinstance(stats, Sample):
+        return stats
+    return compact(stats)
+
+
+def field_index(group, field):
+    return _FIELD_INDEX[group][field]
+
+
+def delta(first, last):
+    """
+    Return the difference between two rows, element by element. The
+    difference is None if a value is missing in either row.
+    """
+    return [None if a is None or b is None else b - a
+            for a, b in zip(first, last)]
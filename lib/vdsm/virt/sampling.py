@@ -43,6 +43,7 @@ import vdsm.common.time
 from vdsm.config import config
 from vdsm.constants import P_VDSM_RUN
 from vdsm.host import api as hostapi
+from vdsm.virt import bulkstats
 from vdsm.virt.utils import ExpiringCache
 
 
@@ -252,6 +253,10 @@ class StatsCache(object):
     Provide facilities to retrieve per-vm samples, and the glue code to deal
     with disappearing per-vm samples.
 
+    Per-vm samples are kept as bulkstats.Sample, holding only the values
+    reported by vdsm. Consecutive samples of a VM share the same layout,
+    mapping devices to rows, as long as the VM devices do not change.
+
     Rationale for the 'clock()' method and for the odd API of the 'put()'
     method with explicit 'monotonic_ts' argument:
 
@@ -353,10 +358,12 @@ class StatsCache(object):
         returned by unblocked stuck calls, to avoid overwrite fresh data
         with stale one.
         """
+        # Compacting hundreds of samples is too slow to do under the lock.
+        samples = self._compact(bulk_stats)
         with self._lock:
             last_sample_time = self._last_sample_time
             if monotonic_ts >= last_sample_time:
-                self._samples.append(bulk_stats)
+                self._samples.append(samples)
                 self._last_sample_time = monotonic_ts
 
                 self._update_ts(bulk_stats, monotonic_ts)
@@ -365,6 +372,18 @@ class StatsCache(object):
                     'dropped stale old sample: sampled %f stored %f',
                     monotonic_ts, last_sample_time)
 
+    def _compact(self, bulk_stats):
+        with self._lock:
+            _, last_batch = self._samples.last()
+        if last_batch is None:
+            last_batch = {}
+        samples = {}
+        for vm_id, stats in six.iteritems(bulk_stats):
+            last_sample = last_batch.get(vm_id)
+            layout = last_sample.layout if last_sample is not None else None
+            samples[vm_id] = bulkstats.compact(stats, layout)
+        return samples
+
     def _update_ts(self, bulk_stats, monotonic_ts):
         # FIXME: this is expected to be costly performance-wise.
         for vmid in bulk_stats:
@@ -480,6 +499,8 @@ class HostMonitor(object):
         if self._cif and _METRICS_ENABLED:
             stats = hostapi.get_stats(self._cif, self._samples.stats())
             hostapi.send_metrics(stats)
+            hostapi.send_mailbox_metrics(self._cif)
+            hostapi.send_rpc_metrics(self._cif)
 
 
 def _translate(bulk_stats):
@@ -0,0 +1,359 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Track changes in VMs statistics, so clients polling the statistics of all
+VMs can get only the statistics changed since their previous call.
+
+Every update changing the statistics starts a new generation. Every VM and
+every statistic of a VM remember the generation of their last change.
+
+Clients get a token with every response, and send it back in the next call.
+The response contains only the VMs and the statistics changed after the
+generation in the token. If the changes since the token are not known, for
+example when vdsm was restarted, the response contains all the statistics
+and the client must discard its previous state.
+
+The tracker keeps no state per client; any number of clients can use the
+same tracker.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import collections
+import copy
+import logging
+import threading
+import uuid
+
+import six
+
+# Number of removed VMs remembered. A client using a token older than the
+# oldest removal remembered gets the full statistics.
+MAX_REMOVED = 1000
+
+# Value of a statistic that is no longer reported.
+_REMOVED = object()
+
+# Value tracking the presence of a device statistic.
+_PRESENT = True
+
+# Statistics changing on every sample. They are reported only with other
+# changes in the same VM or device.
+_VOLATILE = frozenset(('statusTime', 'elapsedTime'))
+_VOLATILE_DEVICE = frozenset(('sampleTime',))
+
+# Statistics mapping device names to device statistics. Changes are
+# tracked per device statistic, so only the changed statistics of the
+# changed devices are reported. A removed device is reported in the VM
+# removed statistics as "<statistic>/<device name>", for example
+# "network/vnet0".
+_DEVICES = frozenset(('network', 'disks'))
+
+
+class VmStatsTracker(object):
+
+    _log = logging.getLogger("virt.statstracker")
+
+    def __init__(self, max_removed=MAX_REMOVED):
+        self._lock = threading.Lock()
+        # Tokens of previous vdsm instances must not be accepted.
+        self._instance = str(uuid.uuid4())
+        self._generation = 0
+        # Changes before this generation are not known.
+        self._oldest = 0
+        self._vms = {}
+        self._removed = collections.deque()
+        self._max_removed = max_removed
+
+    def changes(self, stats_list, token=None):
+        """
+        Update the tracker with stats_list, the current statistics of all
+        VMs, and return the changes since the call returning token.
+
+        Returns a dict:
+
+            token       token for the next call
+            full        True if the changes include all the statistics, and
+                        the client should discard its previous state
+            changed     list of dicts with the VM id ("vmId"), the changed
+                        statistics ("stats"), and the names of statistics
+                        no longer reported ("removed")
+            removed     ids of VMs removed since token. A VM removed and
+                        added again is reported both as removed and as
+                        changed, so the removals must be applied first.
+        """
+        with self._lock:
+            self._update(stats_list)
+            since = self._parse(token)
+            if since is None:
+                changed = [vm.current(vm_id)
+                           for vm_id, vm in six.iteritems(self._vms)]
+                removed = []
+            else:
+                changed = [vm.changes(vm_id, since)
+                           for vm_id, vm in six.iteritems(self._vms)
+                           if vm.generation > since]
+                removed = [vm_id for generation, vm_id in self._removed
+                           if generation > since]
+            return {
+                'token': '%s:%d' % (self._instance, self._generation),
+                'full': since is None,
+                'changed': changed,
+                'removed': removed,
+            }
+
+    def _update(self, stats_list):
+        generation = self._generation + 1
+        changed = False
+
+        current = set()
+        for stats in stats_list:
+            vm_id = stats['vmId']
+            current.add(vm_id)
+            vm = self._vms.get(vm_id)
+            if vm is None:
+                vm = self._vms[vm_id] = _VmStats()
+            if vm.update(stats, generation):
+                changed = True
+
+        for vm_id in list(self._vms):
+            if vm_id not in current:
+                del self._vms[vm_id]
+                self._removed.append((generation, vm_id))
+                changed = True
+
+        while len(self._removed) > self._max_removed:
+            self._oldest, _ = self._removed.popleft()
+
+        if changed:
+            self._generation = generation
+
+    def _parse(self, token):
+        """
+        Return the generation in token, or None if the changes since this
+        generation are not known.
+        """
+        if token is None:
+            return None
+        try:
+            instance, generation = token.rsplit(':', 1)
+            generation = int(generation)
+        except ValueError:
+            self._log.warning("Invalid token %r", token)
+            return None
+        if instance != self._instance:
+            self._log.debug("Token %r from another instance", token)
+            return None
+        if not self._oldest <= generation <= self._generation:
+            self._log.debug("Changes since token %r are not known", token)
+            return None
+        return generation
+
+
+class _VmStats(object):
+
+    __slots__ = ('generation', '_fields', '_devices')
+
+    def __init__(self):
+        # Generation of the last change in any statistic.
+        self.generation = 0
+        self._fields = _Fields(_VOLATILE)
+        # Device statistic name -> _Devices. The presence of the device
+        # statistic is tracked in self._fields.
+        self._devices = {name: _Devices() for name in _DEVICES}
+
+    def update(self, stats, generation):
+        """
+        Update the statistics, and return True if any statistic changed.
+        """
+        fields = dict(stats)
+        devices_changed = False
+        for name, devices in six.iteritems(self._devices):
+            if name in fields:
+                if devices.update(fields[name], generation):
+                    devices_changed = True
+                fields[name] = _PRESENT
+            else:
+                # Removed devices are reported by removing the device
+                # statistic.
+                devices.update({}, generation)
+
+        changed = self._fields.update(fields, generation, devices_changed)
+        if changed:
+            self.generation = generation
+        return changed
+
+    def current(self, vm_id):
+        stats = self._fields.current()
+        for name, devices in six.iteritems(self._devices):
+            if name in stats:
+                stats[name] = devices.current()
+        return {'vmId': vm_id, 'stats': stats, 'removed': []}
+
+    def changes(self, vm_id, since):
+        stats, removed = self._fields.changes(since)
+        for name, devices in six.iteritems(self._devices):
+            if not self._fields.reported(name):
+                continue
+            dev_stats, dev_removed = devices.changes(since)
+            # The device statistic was reported again since the client call,
+            # so it must be reported even if there are no devices.
+            if dev_stats or name in stats:
+                stats[name] = dev_stats
+            removed.extend('%s/%s' % (name, dev) for dev in dev_removed)
+        return {'vmId': vm_id, 'stats': stats, 'removed': removed}
+
+
+class _Devices(object):
+    """
+    Statistics of devices, tracked per device statistic.
+
+    A device added again after it was removed is reported both as removed
+    and with all its statistics, so the client discards its previous
+    statistics.
+    """
+
+    __slots__ = ('_devices',)
+
+    def __init__(self):
+        # Device name -> (_Fields or None if removed, generation of last
+        # addition or removal, True if the device replaced a previous one)
+        self._devices = {}
+
+    def update(self, stats, generation):
+        changed = False
+
+        for name, dev_stats in six.iteritems(stats):
+            entry = self._devices.get(name)
+            fields = None if entry is None else entry[0]
+            if fields is not None and set(dev_stats) == fields.names():
+                if fields.update(dev_stats, generation):
+                    changed = True
+            else:
+                # A new device, or a device reporting different statistics.
+                fields = _Fields(_VOLATILE_DEVICE)
+                fields.update(dev_stats, generation)
+                self._devices[name] = (fields, generation, entry is not None)
+                changed = True
+
+        for name, (fields, _, _) in six.iteritems(self._devices):
+            if fields is not None and name not in stats:
+                self._devices[name] = (None, generation, True)
+                changed = True
+
+        return changed
+
+    def current(self):
+        return {name: fields.current()
+                for name, (fields, _, _) in six.iteritems(self._devices)
+                if fields is not None}
+
+    def changes(self, since):
+        stats = {}
+        removed = []
+        for name, (fields, generation, replaced) in \
+                six.iteritems(self._devices):
+            if generation > since:
+                if replaced:
+                    removed.append(name)
+                if fields is not None:
+                    stats[name] = fields.current()
+            elif fields is not None:
+                dev_stats, _ = fields.changes(since)
+                if dev_stats:
+                    stats[name] = dev_stats
+        return stats, removed
+
+
+class _Fields(object):
+    """
+    Statistics tracked per statistic name.
+
+    Volatile statistics change on every sample, so changes in volatile
+    statistics are not considered as changes, but they are reported with
+    the other changes.
+    """
+
+    __slots__ = ('_volatile', '_values')
+
+    def __init__(self, volatile):
+        self._volatile = volatile
+        # Statistic name -> (value, generation of last change)
+        self._values = {}
+
+    def update(self, stats, generation, changed=False):
+        """
+        Update the statistics, and return True if any statistic changed.
+        If changed is True, related statistics changed, and volatile
+        statistics are reported with them.
+        """
+        volatile = []
+
+        for name, value in six.iteritems(stats):
+            old = self._values.get(name)
+            if old is None or old[0] is _REMOVED:
+                self._values[name] = (copy.deepcopy(value), generation)
+                changed = True
+            elif name in self._volatile:
+                volatile.append((name, value))
+            elif old[0] != value:
+                # Values may be modified later by their owner; keep a copy
+                # to detect the change in the next update.
+                self._values[name] = (copy.deepcopy(value), generation)
+                changed = True
+
+        for name, (value, _) in six.iteritems(self._values):
+            if value is not _REMOVED and name not in stats:
+                self._values[name] = (_REMOVED, generation)
+                changed = True
+
+        for name, value in volatile:
+            if changed:
+                self._values[name] = (value, generation)
+            else:
+                self._values[name] = (value, self._values[name][1])
+
+        return changed
+
+    def names(self):
+        return set(name for name, (value, _) in six.iteritems(self._values)
+                   if value is not _REMOVED)
+
+    def reported(self, name):
+        value = self._values.get(name)
+        return value is not None and value[0] is not _REMOVED
+
+    def current(self):
+        return {name: value
+                for name, (value, _) in six.iteritems(self._values)
+                if value is not _REMOVED}
+
+    def changes(self, since):
+        stats = {}
+        removed = []
+        for name, (value, generation) in six.iteritems(self._values):
+            if generation > since:
+                if value is _REMOVED:
+                    removed.append(name)
+                else:
+                    stats[name] = value
+        return stats, removed
@@ -29,12 +29,43 @@ import six
 from vdsm.common.time import monotonic_time
 from vdsm.utils import convertToStr
 
+from vdsm.virt import bulkstats
 from vdsm.virt.utils import isVdsmImage
 
 
 _log = logging.getLogger('virt.vmstats')
 
 
+def _columns(group, fields):
+    return tuple((name, field, bulkstats.field_index(group, field))
+                 for name, field in fields)
+
+
+_NIC_ERRORS = _columns('net', (('rxErrors', 'rx.errs'),
+                               ('rxDropped', 'rx.drop'),
+                               ('txErrors', 'tx.errs'),
+                               ('txDropped', 'tx.drop')))
+
+_NIC_BYTES = _columns('net', (('rx', 'rx.bytes'),
+                              ('tx', 'tx.bytes')))
+
+_DISK_RATES = _columns('block', (('readRate', 'rd.bytes'),
+                                 ('writeRate', 'wr.bytes')))
+
+_DISK_OPERATIONS = _columns('block', (('readLatency', 'rd.reqs'),
+                                      ('writeLatency', 'wr.reqs'),
+                                      ('flushLatency', 'fl.reqs')))
+
+_DISK_TIMES = _columns('block', (('readLatency', 'rd.times'),
+                                 ('writeLatency', 'wr.times'),
+                                 ('flushLatency', 'fl.times')))
+
+_DISK_TOTALS = _columns('block', (('readOps', 'rd.reqs'),
+                                  ('writeOps', 'wr.reqs'),
+                                  ('readBytes', 'rd.bytes'),
+                                  ('writtenBytes', 'wr.bytes')))
+
+
 def produce(vm, first_sample, last_sample, interval):
     """
     Translates vm samples into stats.
@@ -42,6 +73,9 @@ def produce(vm, first_sample, last_sample, interval):
 
     stats = {}
 
+    first_sample = bulkstats.as_sample(first_sample)
+    last_sample = bulkstats.as_sample(last_sample)
+
     cpu(stats, first_sample, last_sample, interval)
     networks(vm, stats, first_sample, last_sample, interval)
     disks(vm, stats, first_sample, last_sample, interval)
@@ -127,24 +161,23 @@ def cpu(stats, first_sample, last_sample, interval):
             interval)
         return None
 
-    keys = ('cpu.system', 'cpu.user')
-    samples = (last_sample, first_sample)
+    first_sample = bulkstats.as_sample(first_sample)
+    last_sample = bulkstats.as_sample(last_sample)
+    cpu_time, cpu_user, cpu_system = bulkstats.delta(
+        first_sample.cpu, last_sample.cpu)
 
-    if all(k in s for k in keys for s in samples):
+    if cpu_user is not None and cpu_system is not None:
         # TODO: cpuUsage should have the same type as cpuUser and cpuSys.
         # we may block the str() when xmlrpc is deserted.
         stats['cpuUsage'] = str(last_sample['cpu.system'] +
                                 last_sample['cpu.user'])
 
-        cpu_sys = ((last_sample['cpu.user'] - first_sample['cpu.user']) +
-                   (last_sample['cpu.system'] - first_sample['cpu.system']))
+        cpu_sys = cpu_user + cpu_system
         stats['cpuSys'] = _usage_percentage(cpu_sys, interval)
 
-        if all('cpu.time' in s for s in samples):
-            stats['cpuUser'] = _usage_percentage(
-                ((last_sample['cpu.time'] - first_sample['cpu.time']) -
-                 cpu_sys),
-                interval)
+        if cpu_time is not None:
+            stats['cpuUser'] = _usage_percentage(cpu_time - cpu_sys,
+                                                 interval)
 
             return stats
 
@@ -204,7 +237,8 @@ def _nic_traffic(vm_obj, nic,
     - sampleTime
     Produce as many statistics as possible, skipping errors.
     Expect two samplings `start_sample' and `end_sample'
-    which must be data in the format of the libvirt bulk stats.
+    which must be bulkstats.Sample or data in the format of the libvirt
+    bulk stats.
     Expects the indexes of the nic whose statistics needs to be produced,
     for each sampling:
     `start_index' for `start_sample', `end_index' for `end_sample'.
@@ -215,17 +249,17 @@ def _nic_traffic(vm_obj, nic,
     Return the `stats' dictionary on success.
     """
 
+    end_sample = bulkstats.as_sample(end_sample)
+    row = end_sample.net[end_index]
     if_stats = nic_info(nic)
 
-    with _skip_if_missing_stats(vm_obj):
-        if_stats['rxErrors'] = str(end_sample['net.%d.rx.errs' % end_index])
-        if_stats['rxDropped'] = str(end_sample['net.%d.rx.drop' % end_index])
-        if_stats['txErrors'] = str(end_sample['net.%d.tx.errs' % end_index])
-        if_stats['txDropped'] = str(end_sample['net.%d.tx.drop' % end_index])
-
-    with _skip_if_missing_stats(vm_obj):
-        if_stats['rx'] = str(end_sample['net.%d.rx.bytes' % end_index])
-        if_stats['tx'] = str(end_sample['net.%d.tx.bytes' % end_index])
+    for columns in (_NIC_ERRORS, _NIC_BYTES):
+        with _skip_if_missing_stats(vm_obj):
+            for name, field, index in columns:
+                value = row[index]
+                if value is None:
+                    raise KeyError('net.%d.%s' % (end_index, field))
+                if_stats[name] = str(value)
 
     if_stats['sampleTime'] = monotonic_time()
 
@@ -243,8 +277,10 @@ def networks(vm, stats, first_sample, last_sample, interval):
             interval, vm.id)
         return None
 
-    first_indexes = _find_bulk_stats_reverse_map(first_sample, 'net')
-    last_indexes = _find_bulk_stats_reverse_map(last_sample, 'net')
+    first_sample = bulkstats.as_sample(first_sample)
+    last_sample = bulkstats.as_sample(last_sample)
+    first_indexes = first_sample.layout.slots['net']
+    last_indexes = last_sample.layout.slots['net']
 
     for nic in vm.getNicDevices():
         if nic.is_hostdevice:
@@ -255,14 +291,17 @@ def networks(vm, stats, first_sample, last_sample, interval):
         if not hasattr(nic, 'name'):
             continue
 
+        first_index = first_indexes.get(nic.name)
+        last_index = last_indexes.get(nic.name)
+
         # may happen if nic is a new hot-plugged one
-        if nic.name not in first_indexes or nic.name not in last_indexes:
+        if first_index is None or last_index is None:
             continue
 
         stats['network'][nic.name] = _nic_traffic(
             vm, nic,
-            first_sample, first_indexes[nic.name],
-            last_sample, last_indexes[nic.name])
+            first_sample, first_index,
+            last_sample, last_index)
 
     return stats
 
@@ -286,9 +325,11 @@ def disks(vm, stats, first_sample, last_sample, interval):
     # libvirt does not guarantee that disk will returned in the same
     # order across calls. It is usually like this, but not always,
     # for example if hotplug/hotunplug comes into play.
-    # To be safe, we need to find the mapping after each call.
-    first_indexes = _find_bulk_stats_reverse_map(first_sample, 'block')
-    last_indexes = _find_bulk_stats_reverse_map(last_sample, 'block')
+    # To be safe, we look up the row of each disk in both samples.
+    first_sample = bulkstats.as_sample(first_sample)
+    last_sample = bulkstats.as_sample(last_sample)
+    first_indexes = first_sample.layout.slots['block']
+    last_indexes = last_sample.layout.slots['block']
     disk_stats = {}
 
     for vm_drive in vm.getDiskDevices():
@@ -296,8 +337,13 @@ def disks(vm, stats, first_sample, last_sample, interval):
         try:
             drive_stats = disk_info(vm_drive)
 
-            if (vm_drive.name in first_indexes and
-               vm_drive.name in last_indexes):
+            first_index = first_indexes.get(vm_drive.name)
+            last_index = last_indexes.get(vm_drive.name)
+
+            if first_index is not None and last_index is not None:
+                last_row = last_sample.block[last_index]
+                delta = bulkstats.delta(
+                    first_sample.block[first_index], last_row)
                 # will be None if sampled during recovery
                 if interval <= 0:
                     _log.warning(
@@ -305,19 +351,9 @@ def disks(vm, stats, first_sample, last_sample, interval):
                         'stats for vm %s disk %s',
                         interval, vm.id, vm_drive.name)
                 else:
-                    drive_stats.update(
-                        _disk_rate(
-                            first_sample, first_indexes[vm_drive.name],
-                            last_sample, last_indexes[vm_drive.name],
-                            interval))
-                drive_stats.update(
-                    _disk_latency(
-                        first_sample, first_indexes[vm_drive.name],
-                        last_sample, last_indexes[vm_drive.name]))
-                drive_stats.update(
-                    _disk_iops_bytes(
-                        first_sample, first_indexes[vm_drive.name],
-                        last_sample, last_indexes[vm_drive.name]))
+                    drive_stats.update(_disk_rate(delta, interval))
+                drive_stats.update(_disk_latency(delta))
+                drive_stats.update(_disk_iops_bytes(last_row))
 
         except AttributeError:
             _log.exception("Disk %s stats not available",
@@ -352,36 +388,20 @@ def disk_info(vm_drive):
     return drive_stats
 
 
-def _disk_rate(first_sample, first_index, last_sample, last_index, interval):
-    stats = {}
-
-    for name, mode in (("readRate", "rd"), ("writeRate", "wr")):
-        first_key = 'block.%d.%s.bytes' % (first_index, mode)
-        last_key = 'block.%d.%s.bytes' % (last_index, mode)
-        try:
-            first_value = first_sample[first_key]
-            last_value = last_sample[last_key]
-        except KeyError:
-            continue
-        stats[name] = str((last_value - first_value) / interval)
-
-    return stats
+def _disk_rate(delta, interval):
+    return {name: str(delta[index] / interval)
+            for name, _, index in _DISK_RATES
+            if delta[index] is not None}
 
 
-def _disk_latency(first_sample, first_index, last_sample, last_index):
+def _disk_latency(delta):
     stats = {}
 
-    for name, mode in (('readLatency', 'rd'),
-                       ('writeLatency', 'wr'),
-                       ('flushLatency', 'fl')):
-        try:
-            last_key = "block.%d.%s" % (last_index, mode)
-            first_key = "block.%d.%s" % (first_index, mode)
-            operations = (last_sample[last_key + ".reqs"] -
-                          first_sample[first_key + ".reqs"])
-            elapsed_time = (last_sample[last_key + ".times"] -
-                            first_sample[first_key + ".times"])
-        except KeyError:
+    columns = zip(_DISK_OPERATIONS, _DISK_TIMES)
+    for (name, _, ops_index), (_, _, time_index) in columns:
+        operations = delta[ops_index]
+        elapsed_time = delta[time_index]
+        if operations is None or elapsed_time is None:
             continue
         if operations:
             stats[name] = str(elapsed_time / operations)
@@ -391,43 +411,16 @@ def _disk_latency(first_sample, first_index, last_sample, last_index):
     return stats
 
 
-def _disk_iops_bytes(first_sample, first_index, last_sample, last_index):
-    stats = {}
-
-    for name, mode, field in (('readOps', 'rd', 'reqs'),
-                              ('writeOps', 'wr', 'reqs'),
-                              ('readBytes', 'rd', 'bytes'),
-                              ('writtenBytes', 'wr', 'bytes')):
-        key = 'block.%d.%s.%s' % (last_index, mode, field)
-        try:
-            value = last_sample[key]
-        except KeyError:
-            continue
-        stats[name] = str(value)
-
-    return stats
+def _disk_iops_bytes(row):
+    return {name: str(row[index])
+            for name, _, index in _DISK_TOTALS
+            if row[index] is not None}
 
 
 def _usage_percentage(val, interval):
     return 100 * val / interval / 1000 ** 3
 
 
-def _find_bulk_stats_reverse_map(stats, group):
-    name_to_idx = {}
-    for idx in six.moves.xrange(stats.get('%s.count' % group, 0)):
-        try:
-            name = stats['%s.%d.name' % (group, idx)]
-        except KeyError:
-            # Bulk stats accumulate what they can get, raising errors
-            # only in the critical cases. This includes fundamental
-            # attributes like names, so count has to be considered
-            # an upper bound more like a precise indicator.
-            pass
-        else:
-            name_to_idx[name] = idx
-    return name_to_idx
-
-
 def memory(stats, first_sample, last_sample, interval):
     mem_stats = {}
 
@@ -0,0 +1,193 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Produce the statistics of all VMs in parallel.
+
+Producing the statistics of a VM should only copy data, but it may block,
+for example on a lock held by a VM stuck in libvirt. When the statistics
+of all VMs are produced sequentially, a single blocked VM delays the
+response for all VMs.
+
+VmStatsPool produces the statistics of every VM in a separate executor
+task, so a blocked VM delays only its own statistics, and waits for the
+results until a deadline. VMs without statistics at the
+deadline are reported with a minimal entry marked with "statsTimeout".
+A VM still blocked from a previous call is not dispatched again, and is
+reported immediately as timed out.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import logging
+import sys
+import threading
+
+import six
+
+from vdsm import executor
+from vdsm.common import exception
+from vdsm.common.time import monotonic_time
+
+# Maximum number of tasks waiting for a worker. If the queue is full, the
+# statistics of the remaining VMs are produced in the calling thread.
+_TASKS = 1000
+
+
+class VmStatsPool(object):
+
+    _log = logging.getLogger("virt.vmstatspool")
+
+    def __init__(self, scheduler, workers, timeout):
+        """
+        workers is the number of executor workers, and timeout the time to
+        wait for the statistics of all VMs, in seconds.
+        """
+        self._timeout = timeout
+        self._executor = executor.Executor(name="vmstats",
+                                           workers_count=workers,
+                                           max_tasks=_TASKS,
+                                           scheduler=scheduler,
+                                           max_workers=workers * 2)
+        self._lock = threading.Lock()
+        # Ids of VMs with statistics being produced.
+        self._busy = set()
+
+    def start(self):
+        self._executor.start()
+
+    def stop(self):
+        self._executor.stop(wait=False)
+
+    def produce(self, vms):
+        """
+        Return a list with the statistics of vms, in the same order.
+
+        VMs without statistics after the timeout are reported as:
+
+            {'vmId': vm.id, 'status': vm.lastStatus, 'statsTimeout': True}
+
+        Errors raised by Vm.getStats() are raised as when producing the
+        statistics sequentially.
+        """
+        deadline = monotonic_time() + self._timeout
+        request = _Request()
+
+        with self._lock:
+            blocked = set(vm.id for vm in vms if vm.id in self._busy)
+            pending = [vm for vm in vms if vm.id not in blocked]
+            self._busy.update(vm.id for vm in pending)
+
+        if blocked:
+            self._log.warning("Statistics of VMs %s are still being "
+                              "produced, not waiting for them",
+                              sorted(blocked))
+
+        for vm in pending:
+            task = _Task(vm, request, self._done)
+            try:
+                self._executor.dispatch(task, timeout=self._timeout)
+            except (executor.NotRunning, exception.ResourceExhausted) as e:
+                self._log.warning("Cannot dispatch statistics of VM %s (%s), "
+                                  "producing in the calling thread", vm.id, e)
+                task()
+
+        results = request.wait(len(pending), deadline)
+
+        stats_list = []
+        timed_out = []
+        for vm in vms:
+            stats = results.get(vm.id)
+            if stats is None:
+                timed_out.append(vm.id)
+                stats = {
+                    'vmId': vm.id,
+                    'status': vm.lastStatus,
+                    'statsTimeout': True,
+                }
+            stats_list.append(stats)
+
+        if len(timed_out) > len(blocked):
+            self._log.warning("Timeout producing statistics of VMs %s",
+                              sorted(set(timed_out) - blocked))
+
+        return stats_list
+
+    def _done(self, vm_id):
+        with self._lock:
+            self._busy.discard(vm_id)
+
+
+class _Task(object):
+
+    def __init__(self, vm, request, done):
+        self._vm = vm
+        self._request = request
+        self._done = done
+
+    def __call__(self):
+        try:
+            self._request.add(self._vm.id, self._vm.getStats())
+        except Exception:
+            self._request.fail(sys.exc_info())
+        finally:
+            self._done(self._vm.id)
+
+    def __repr__(self):
+        return "<VmStatsTask vm=%s at 0x%x>" % (self._vm.id, id(self))
+
+
+class _Request(object):
+    """
+    Results of a single produce() call, added by the tasks.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._results = {}
+        self._error = None
+
+    def add(self, vm_id, stats):
+        with self._cond:
+            self._results[vm_id] = stats
+            self._cond.notify()
+
+    def fail(self, exc_info):
+        with self._cond:
+            if self._error is None:
+                self._error = exc_info
+            self._cond.notify()
+
+    def wait(self, count, deadline):
+        """
+        Wait until count results were added, an error was raised, or the
+        deadline expired, and return the results added so far.
+        """
+        with self._cond:
+            while len(self._results) < count and self._error is None:
+                timeout = deadline - monotonic_time()
+                if timeout <= 0:
+                    break
+                self._cond.wait(timeout)
+            if self._error is not None:
+                six.reraise(*self._error)
+            # Tasks may add results after the deadline.
+            return dict(self._results)
@@ -20,13 +20,14 @@ from six.moves import queue
 
 from vdsm.common import exception as vdsmexception
 
-from vdsm.common.compat import json
 from vdsm.common.logutils import Suppressed, traceback
 from vdsm.common.threadlocal import vars
 from vdsm.common.time import monotonic_time
 from vdsm.common.password import protect_passwords, unprotect_passwords
 
+from yajsonrpc import codec
 from yajsonrpc import exception
+from yajsonrpc import rpcstats
 
 __all__ = ["betterAsyncore", "stompserver", "stomp"]
 
@@ -46,7 +47,7 @@ class JsonRpcRequest(object):
     @classmethod
     def decode(cls, msg):
         try:
-            obj = json.loads(msg)
+            obj = codec.current().loads(msg)
         except:
             raise exception.JsonRpcParseError()
 
@@ -92,7 +93,7 @@ class JsonRpcRequest(object):
 
     def encode(self):
         res = self.toDict()
-        return json.dumps(res)
+        return codec.current().dumps(res)
 
     def isNotification(self):
         return (self.id is None)
@@ -118,11 +119,17 @@ class JsonRpcResponse(object):
 
     def encode(self):
         res = self.toDict()
-        return json.dumps(res)
+        return codec.current().dumps(res)
+
+    def encode_chunks(self):
+        """
+        Return the encoded response as a list of utf-8 encoded chunks.
+        """
+        return codec.current().encode_chunks(self.toDict())
 
     @staticmethod
     def decode(msg):
-        obj = json.loads(msg)
+        obj = codec.current().loads(msg)
         return JsonRpcResponse.fromRawObject(obj)
 
     @staticmethod
@@ -174,9 +181,9 @@ class Notification(object):
         """
         self._add_notify_time(params)
         self._event_schema.verify_event_params(self._event_id, params)
-        notification = json.dumps({'jsonrpc': '2.0',
-                                   'method': self._event_id,
-                                   'params': params})
+        notification = codec.current().dumps({'jsonrpc': '2.0',
+                                              'method': self._event_id,
+                                              'params': params})
 
         self.log.debug("Sending event %s", notification)
         self._cb(notification)
@@ -186,13 +193,15 @@ class Notification(object):
 
 
 class _JsonRpcServeRequestContext(object):
-    def __init__(self, client, server_address, context):
+    def __init__(self, client, server_address, context, stats=None):
         self._requests = []
         self._client = client
         self._server_address = server_address
         self._context = context
+        self._stats = stats
         self._counter = 0
         self._requests = {}
+        self._methods = {}
         self._responses = []
 
     def setRequests(self, requests):
@@ -200,6 +209,7 @@ class _JsonRpcServeRequestContext(object):
             if not request.isNotification():
                 self._counter += 1
                 self._requests[request.id] = request
+                self._methods[request.id] = request.method
 
         self.sendReply()
 
@@ -219,22 +229,36 @@ class _JsonRpcServeRequestContext(object):
         if len(self._requests) > 0:
             return
 
+        # Responses may be very large; encode them to chunks sent as is, and
+        # join them only when building the frame.
         encodedObjects = []
+        requestIds = []
         for response in self._responses:
+            if response.id is not None:
+                requestIds.append(response.id)
             try:
-                encodedObjects.append(response.encode())
+                encodedObjects.append(response.encode_chunks())
             except:  # Error encoding data
                 response = JsonRpcResponse(None,
                                            exception.JsonRpcInternalError(),
                                            response.id)
-                encodedObjects.append(response.encode())
+                encodedObjects.append(response.encode_chunks())
+            if self._stats is not None and response.id in self._methods:
+                self._stats.response_sent(
+                    self._methods[response.id],
+                    sum(len(chunk) for chunk in encodedObjects[-1]))
 
         if len(encodedObjects) == 1:
             data = encodedObjects[0]
         else:
-            data = '[' + ','.join(encodedObjects) + ']'
+            data = [b'[']
+            for i, chunks in enumerate(encodedObjects):
+                if i > 0:
+                    data.append(b',')
+                data.extend(chunks)
+            data.append(b']')
 
-        self._client.send(data.encode('utf-8'))
+        self._client.send(data, request_ids=requestIds)
 
     def addResponse(self, response):
         self._responses.append(response)
@@ -253,13 +277,14 @@ class _JsonRpcServeRequestContext(object):
 
 class JsonRpcTask(object):
 
-    def __init__(self, handler, ctx, req):
+    def __init__(self, handler, ctx, req, received=None):
         self._handler = handler
         self._ctx = ctx
         self._req = req
+        self._received = received
 
     def __call__(self):
-        self._handler(self._ctx, self._req)
+        self._handler(self._ctx, self._req, self._received)
 
     def __repr__(self):
         return '<JsonRpcTask %s at 0x%x>' % (
@@ -283,9 +308,14 @@ class JsonRpcServer(object):
         self._timeout = timeout
         self._next_report = monotonic_time() + self._timeout
         self._counter = 0
+        self._stats = rpcstats.RpcStats()
+
+    @property
+    def stats(self):
+        return self._stats
 
     def queueRequest(self, req):
-        self._workQueue.put_nowait(req)
+        self._workQueue.put_nowait((req, monotonic_time()))
 
     """
     Aggregates number of requests received by vdsm. Each request from
@@ -300,16 +330,20 @@ class JsonRpcServer(object):
             self._next_report += self._timeout
             self._counter = 0
 
-    def _serveRequest(self, ctx, req):
+    def _serveRequest(self, ctx, req, received=None):
         start_time = monotonic_time()
         response = self._handle_request(req, ctx)
+        run_time = monotonic_time() - start_time
         error = getattr(response, "error", None)
         if error is None:
             response_log = "succeeded"
         else:
             response_log = "failed (error %s)" % (error.code,)
         self.log.info("RPC call %s %s in %.2f seconds",
-                      req.method, response_log, monotonic_time() - start_time)
+                      req.method, response_log, run_time)
+        queue_time = None if received is None else start_time - received
+        self._stats.request_served(
+            req.method, queue_time, run_time, error is not None)
         if response is not None:
             ctx.requestDone(response)
 
@@ -363,18 +397,20 @@ class JsonRpcServer(object):
     @traceback(log=log)
     def serve_requests(self):
         while True:
-            obj = self._workQueue.get()
-            if obj is None:
+            item = self._workQueue.get()
+            if item is None:
                 break
 
-            self._parseMessage(obj)
+            obj, received = item
+            self._parseMessage(obj, received)
 
-    def _parseMessage(self, obj):
+    def _parseMessage(self, obj, received=None):
         client, server_address, context, msg = obj
-        ctx = _JsonRpcServeRequestContext(client, server_address, context)
+        ctx = _JsonRpcServeRequestContext(client, server_address, context,
+                                          self._stats)
 
         try:
-            rawRequests = json.loads(msg)
+            rawRequests = codec.current().loads(msg)
         except:
             ctx.addResponse(JsonRpcResponse(
                 None, exception.JsonRpcParseError(), None))
@@ -414,19 +450,21 @@ class JsonRpcServer(object):
             ctx.sendReply()
 
         for request in requests:
-            self._runRequest(ctx, request)
+            self._runRequest(ctx, request, received)
 
-    def _runRequest(self, ctx, request):
+    def _runRequest(self, ctx, request, received=None):
         if self._threadFactory is None:
-            self._serveRequest(ctx, request)
+            self._serveRequest(ctx, request, received)
         else:
             try:
                 self._threadFactory(
-                    JsonRpcTask(self._serveRequest, ctx, request)
+                    JsonRpcTask(self._serveRequest, ctx, request, received)
                 )
             except vdsmexception.ContextException as e:
+                self._stats.request_rejected(request.method)
                 ctx.requestDone(JsonRpcResponse(None, e, request.id))
             except Exception as e:
+                self._stats.request_rejected(request.method)
                 self.log.exception("could not serve request %s", request)
                 ctx.requestDone(
                     JsonRpcResponse(
@@ -21,18 +21,29 @@ from __future__ import division
 
 import asyncore
 import errno
+import heapq
+import itertools
 import logging
+import select
 import socket
 
 import six
 
 from vdsm import sslutils
 from vdsm.common.eventfd import EventFD
+from vdsm.common.time import monotonic_time
 
 
 _BLOCKING_IO_ERRORS = (errno.EAGAIN, errno.EALREADY, errno.EINPROGRESS,
                        errno.EWOULDBLOCK)
 
+# Python 2 sockets do not support sendmsg().
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+
+# Maximum time to wait for events, in seconds. Dispatchers are checked at
+# least once in this interval even if they do not need to.
+_MAX_TIMEOUT = 30.0
+
 
 class Dispatcher(asyncore.dispatcher):
 
@@ -140,8 +151,25 @@ class Dispatcher(asyncore.dispatcher):
             return ''
 
     def send(self, data):
+        return self._send(self.socket.send, data)
+
+    def send_buffers(self, buffers):
+        """
+        Send a list of buffers and return the number of bytes sent.
+
+        Plain sockets send the buffers using a single sendmsg() call,
+        without joining them. SSL sockets do not support sendmsg(), so the
+        buffers are joined and sent using send().
+        """
+        if len(buffers) == 1:
+            return self.send(buffers[0])
+        if _HAS_SENDMSG and type(self.socket) is socket.socket:
+            return self._send(self.socket.sendmsg, buffers)
+        return self.send(b"".join(buffers))
+
+    def _send(self, send, data):
         try:
-            result = self.socket.send(data)
+            result = send(data)
             if result == -1:
                 return 0
             return result
@@ -247,7 +275,7 @@ class Reactor(object):
         self._map.clear()
 
     def _get_timeout(self, map):
-        timeout = 30.0
+        timeout = _MAX_TIMEOUT
         for disp in list(six.viewvalues(self._map)):
             if hasattr(disp, "next_check_interval"):
                 interval = disp.next_check_interval()
@@ -272,3 +300,201 @@ class Reactor(object):
         dispatcher.connect(address)
 
         return dispatcher
+
+
+class _EpollMap(dict):
+    """
+    Dispatchers map notifying the reactor when asyncore adds or removes a
+    channel.
+    """
+
+    def __init__(self, reactor):
+        dict.__init__(self)
+        self._reactor = reactor
+
+    def __setitem__(self, fd, obj):
+        dict.__setitem__(self, fd, obj)
+        self._reactor._channel_added(fd)
+
+    def __delitem__(self, fd):
+        dict.__delitem__(self, fd)
+        self._reactor._channel_removed(fd)
+
+
+class EpollReactor(Reactor):
+    """
+    Reactor using epoll instead of asyncore.loop().
+
+    asyncore.loop() builds a new poll set from all the dispatchers on every
+    iteration, and Reactor asks all the dispatchers for their next check
+    interval before every iteration. With many connections, most of this
+    work is wasted, since on every iteration only few dispatchers have
+    events.
+
+    EpollReactor keeps the dispatchers registered with epoll, and checks a
+    dispatcher only when it may need a different event mask:
+
+    - after handling its events
+    - when its check interval expires. The intervals are kept in a heap, so
+      finding the next timeout does not depend on the number of
+      dispatchers.
+    - when a dispatcher is added
+    - when the reactor is woken up. Other threads wake up the reactor after
+      queuing messages without telling which dispatcher should send them,
+      so all dispatchers are checked.
+
+    Dispatchers are registered in level-triggered mode, since asyncore
+    dispatchers do not read or write until the socket would block.
+    """
+
+    def __init__(self):
+        self._epoll = select.epoll()
+        # Dispatchers to check in the next iteration.
+        self._dirty = set()
+        # Event mask registered with epoll for every fd.
+        self._masks = {}
+        # Timers heap: (deadline, seq, fd). A timer is valid if seq is the
+        # current timer of fd.
+        self._timers = []
+        self._timer_seq = {}
+        self._seq = itertools.count()
+        try:
+            self._map = _EpollMap(self)
+            self._is_running = False
+            self._wakeupEvent = AsyncoreEvent(self._map)
+        except:
+            self._epoll.close()
+            raise
+
+    def process_requests(self):
+        self._is_running = True
+        try:
+            while self._is_running:
+                self._check_dirty()
+                self._poll(self._next_timeout())
+                self._expire_timers()
+
+            for dispatcher in list(six.viewvalues(self._map)):
+                dispatcher.close()
+
+            self._map.clear()
+        finally:
+            self._epoll.close()
+
+    def _poll(self, timeout):
+        try:
+            events = self._epoll.poll(timeout)
+        except (IOError, OSError) as e:
+            if e.errno != errno.EINTR:
+                raise
+            return
+
+        wakeup_fd = self._wakeupEvent._fileno
+        for fd, flags in events:
+            obj = self._map.get(fd)
+            if obj is None:
+                continue
+            asyncore.readwrite(obj, flags)
+            if fd == wakeup_fd:
+                self._dirty.update(self._map)
+            else:
+                self._dirty.add(fd)
+
+    def _check_dirty(self):
+        while self._dirty:
+            self._check(self._dirty.pop())
+
+    def _check(self, fd):
+        obj = self._map.get(fd)
+        if obj is None:
+            return
+
+        # May handle a timeout, closing the dispatcher.
+        interval = None
+        if hasattr(obj, "next_check_interval"):
+            interval = obj.next_check_interval()
+        if interval is None or interval < 0:
+            interval = _MAX_TIMEOUT
+        if self._map.get(fd) is not obj:
+            return
+        self._add_timer(fd, min(interval, _MAX_TIMEOUT))
+
+        # Same events asyncore.poll2() waits for. readable() and writable()
+        # may close the dispatcher.
+        mask = 0
+        if obj.readable():
+            mask |= select.EPOLLIN | select.EPOLLPRI
+        if obj.writable() and not obj.accepting:
+            mask |= select.EPOLLOUT
+        if self._map.get(fd) is not obj:
+            return
+        self._register(fd, mask)
+
+    def _register(self, fd, mask):
+        old = self._masks.get(fd, 0)
+        if mask == old:
+            return
+        # epoll always reports errors and hangups, so a dispatcher waiting
+        # for no events must be unregistered, as asyncore.poll2() does.
+        if mask == 0:
+            del self._masks[fd]
+            self._epoll.unregister(fd)
+        elif old == 0:
+            self._epoll.register(fd, mask)
+            self._masks[fd] = mask
+        else:
+            self._epoll.modify(fd, mask)
+            self._masks[fd] = mask
+
+    def _add_timer(self, fd, interval):
+        seq = next(self._seq)
+        self._timer_seq[fd] = seq
+        heapq.heappush(self._timers, (monotonic_time() + interval, seq, fd))
+
+    def _next_timeout(self):
+        timers = self._timers
+        while timers and self._timer_seq.get(timers[0][2]) != timers[0][1]:
+            heapq.heappop(timers)
+        if not timers:
+            return _MAX_TIMEOUT
+        return max(timers[0][0] - monotonic_time(), 0)
+
+    def _expire_timers(self):
+        timers = self._timers
+        now = monotonic_time()
+        while timers and timers[0][0] <= now:
+            _, seq, fd = heapq.heappop(timers)
+            if self._timer_seq.get(fd) == seq:
+                del self._timer_seq[fd]
+                self._dirty.add(fd)
+
+    def _channel_added(self, fd):
+        self._dirty.add(fd)
+
+    def _channel_removed(self, fd):
+        # Called before the socket is closed, possibly from another thread.
+        self._timer_seq.pop(fd, None)
+        if self._masks.pop(fd, 0):
+            try:
+                self._epoll.unregister(fd)
+            except (IOError, OSError, ValueError):
+                # Closed reactor or socket.
+                pass
+
+
+def create_reactor(name="auto"):
+    """
+    Create a reactor. name is "asyncore" for Reactor, "epoll" for
+    EpollReactor, or "auto" for EpollReactor if epoll is available.
+
+    Raises ValueError if name is unknown or the reactor is not available.
+    """
+    if name == "auto":
+        name = "epoll" if hasattr(select, "epoll") else "asyncore"
+    if name == "asyncore":
+        return Reactor()
+    if name == "epoll":
+        if not hasattr(select, "epoll"):
+            raise ValueError("epoll reactor is not available")
+        return EpollReactor()
+    raise ValueError("Unknown reactor: %r" % name)
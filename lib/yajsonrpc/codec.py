@@ -0,0 +1,141 @@
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA
+"""
+JSON codecs used for encoding and decoding JSON-RPC messages.
+
+A codec provides:
+
+    dumps(obj)          encode obj to JSON text
+    loads(data)         decode JSON text or utf-8 encoded bytes
+    encode_chunks(obj)  encode obj to a list of utf-8 encoded chunks
+
+encode_chunks() is used for responses, which may be several megabytes.
+The chunks are copied once into the frame, so batch responses are never
+joined before building the frame.
+
+Available codecs:
+
+    json    the standard library json module, or simplejson if available.
+            Always available, and used by default.
+    ujson   the ujson C module, if installed. Must be selected explicitly.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import logging
+
+from vdsm.common.compat import json
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+log = logging.getLogger("jsonrpc.codec")
+
+
+class JsonCodec(object):
+    """
+    Codec using the json module.
+    """
+
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+    def encode_chunks(self, obj):
+        # Encoding incrementally with JSONEncoder.iterencode() uses the pure
+        # python encoder, about 10 times slower than dumps() using the C
+        # encoder.
+        return [self.dumps(obj).encode("utf-8")]
+
+
+class UJsonCodec(JsonCodec):
+    """
+    Codec using the ujson C module, much faster than the json module.
+
+    ujson cannot encode or decode some values handled by the json module,
+    like integers larger than 64 bits; such objects are encoded and decoded
+    using the json module.
+    """
+
+    name = "ujson"
+
+    def dumps(self, obj):
+        try:
+            return ujson.dumps(obj, escape_forward_slashes=False)
+        except (OverflowError, TypeError, ValueError):
+            return super(UJsonCodec, self).dumps(obj)
+
+    def loads(self, data):
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            # Also raises the json module error for invalid JSON.
+            return super(UJsonCodec, self).loads(data)
+
+
+def available():
+    """
+    Return the names of the available codecs.
+    """
+    names = [JsonCodec.name]
+    if ujson is not None:
+        names.append(UJsonCodec.name)
+    return names
+
+
+def get(name=JsonCodec.name):
+    """
+    Return a codec by name.
+
+    Raises:
+        ValueError if the codec is unknown or not available.
+    """
+    if name not in available():
+        raise ValueError("JSON codec %r is not available (available: %s)"
+                         % (name, ", ".join(available())))
+    if name == UJsonCodec.name:
+        return UJsonCodec()
+    return JsonCodec()
+
+
+_current = get()
+
+
+def current():
+    """
+    Return the codec used by the JSON-RPC client and server.
+    """
+    return _current
+
+
+def select(name):
+    """
+    Select the codec used by the JSON-RPC client and server.
+
+    Raises:
+        ValueError if the codec is unknown or not available.
+    """
+    global _current
+    _current = get(name)
+    log.info("Using %s JSON codec", _current.name)
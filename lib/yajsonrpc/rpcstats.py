@@ -0,0 +1,157 @@
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA
+"""
+Per method statistics of the requests served by JsonRpcServer.
+
+For every method we keep:
+
+    queue_time      time from receiving the request until a worker started
+                    to serve it, including waiting for a free executor
+                    worker
+    run_time        time serving the request in the worker, including the
+                    bridge and the verb
+    response_size   size of the encoded response in bytes
+    calls           number of requests served
+    errors          number of requests failed
+    rejected        number of requests rejected because the executor could
+                    not accept them
+
+Times and sizes are kept in fixed size histograms, so the memory used does
+not depend on the number of requests.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import threading
+
+from vdsm.common import histogram
+
+# Upper bounds of response size buckets, from 1 KiB to 16 MiB.
+SIZE_BUCKETS = tuple(1024 * 4**i for i in range(8))
+
+PERCENTILES = (50, 90, 99)
+
+# Requests for methods beyond this number are accounted under OTHER, so
+# clients sending random method names cannot grow the statistics.
+MAX_METHODS = 500
+OTHER = "other"
+
+
+class MethodStats(object):
+
+    def __init__(self):
+        self.queue_time = histogram.Histogram()
+        self.run_time = histogram.Histogram()
+        self.response_size = histogram.Histogram(SIZE_BUCKETS)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+
+    def served(self, queue_time, run_time, failed):
+        if queue_time is not None:
+            self.queue_time.add(queue_time)
+        self.run_time.add(run_time)
+        with self._lock:
+            self.calls += 1
+            if failed:
+                self.errors += 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def info(self):
+        with self._lock:
+            info = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "rejected": self.rejected,
+            }
+        info["queue_time"] = _summary(self.queue_time)
+        info["run_time"] = _summary(self.run_time)
+        info["response_size"] = _summary(self.response_size)
+        return info
+
+
+class RpcStats(object):
+
+    def __init__(self, max_methods=MAX_METHODS):
+        self._max_methods = max_methods
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def request_served(self, method, queue_time, run_time, failed):
+        """
+        Called when request for method was served. queue_time is None if
+        the time the request was received is not known.
+        """
+        self._get(method).served(queue_time, run_time, failed)
+
+    def request_rejected(self, method):
+        self._get(method).reject()
+
+    def response_sent(self, method, size):
+        self._get(method).response_size.add(size)
+
+    def info(self):
+        """
+        Return a dict mapping method name to method statistics.
+        """
+        with self._lock:
+            methods = list(self._methods.items())
+        return {name: stats.info() for name, stats in methods}
+
+    def metrics(self, prefix):
+        """
+        Return the statistics as a flat dict for vdsm.metrics.send().
+        """
+        data = {}
+        for name, info in self.info().items():
+            method_prefix = prefix + "." + name
+            for key in ("calls", "errors", "rejected"):
+                data[method_prefix + "." + key] = info[key]
+            for hist in ("queue_time", "run_time", "response_size"):
+                for key, value in info[hist].items():
+                    data[method_prefix + "." + hist + "." + key] = value
+        return data
+
+    def _get(self, method):
+        stats = self._methods.get(method)
+        if stats is None:
+            with self._lock:
+                stats = self._methods.get(method)
+                if stats is None:
+                    if len(self._methods) >= self._max_methods:
+                        method = OTHER
+                    stats = self._methods.setdefault(method, MethodStats())
+        return stats
+
+
+def _summary(hist):
+    """
+    Return count, sum, min, max and percentiles of histogram hist. For an
+    empty histogram, only count is returned.
+    """
+    snapshot = hist.snapshot()
+    summary = {"count": snapshot["count"]}
+    if snapshot["count"]:
+        summary["sum"] = snapshot["sum"]
+        summary["min"] = snapshot["min"]
+        summary["max"] = snapshot["max"]
+        for p in PERCENTILES:
+            summary["p%d" % p] = hist.percentile(p)
+    return summary
@@ -40,6 +40,11 @@ NR_RETRIES = 1
 # This is the value used by engine
 GRACE_PERIOD_FACTOR = 0.2
 
+# Maximum number of bytes and buffers sent in a single write. Many small
+# frames are sent using one system call, while large frames are sent alone.
+WRITE_SIZE = 256 * 1024
+WRITE_BUFFERS = 512
+
 _RE_ESCAPE_SEQUENCE = re.compile(br"\\(.)")
 
 _RE_ENCODE_CHARS = re.compile(br"[\r\n\\:]")
@@ -109,6 +114,9 @@ class _HeartBeatFrame(object):
     def encode(self):
         return "\n"
 
+    def encode_buffers(self):
+        return ["\n"]
+
 # There is no reason to have multiple instances
 _heartBeatFrame = _HeartBeatFrame()
 
@@ -128,6 +136,14 @@ class Frame(object):
         self.body = body
 
     def encode(self):
+        return ''.join(self.encode_buffers())
+
+    def encode_buffers(self):
+        """
+        Return the encoded frame as a list of buffers: the command and
+        headers, the body, and the terminating null byte. The body is not
+        copied.
+        """
         body = self.body
         # We do it here so we are sure header is up to date
         if body is not None:
@@ -141,11 +157,11 @@ class Frame(object):
             data.append("\n")
 
         data.append('\n')
-        if body is not None:
-            data.append(body)
+        if not body:
+            data.append("\0")
+            return [''.join(data)]
 
-        data.append("\0")
-        return ''.join(data)
+        return [''.join(data), body, "\0"]
 
     def __repr__(self):
         return "<StompFrame command=%s>" % (repr(self.command))
@@ -154,6 +170,65 @@ class Frame(object):
         return Frame(self.command, self.headers.copy(), self.body)
 
 
+class EncodedFrame(object):
+    """
+    A frame encoded in advance as a list of buffers, sent as is.
+    """
+    __slots__ = ("command", "_buffers")
+
+    def __init__(self, command, buffers):
+        self.command = command
+        self._buffers = buffers
+
+    def encode(self):
+        return b"".join(self._buffers)
+
+    def encode_buffers(self):
+        return self._buffers
+
+    def __repr__(self):
+        return "<StompEncodedFrame command=%s>" % (repr(self.command))
+
+
+def encode_messages(destination, body, subscription_ids,
+                    content_type="application/json"):
+    """
+    Encode a MESSAGE frame with body for every subscription id. body may be
+    bytes, text, or a list of bytes chunks, copied directly into the frames.
+
+    The command, the common headers and the body are encoded once; only the
+    subscription header is encoded for every subscription. The frames share
+    the body chunks.
+
+    Returns a list of EncodedFrame, one per subscription id.
+    """
+    if isinstance(body, six.text_type):
+        body = body.encode('utf-8')
+    if not isinstance(body, list):
+        body = [body]
+
+    head = b"".join([
+        b"MESSAGE\n",
+        _encode_header(Headers.DESTINATION, destination),
+        _encode_header(Headers.CONTENT_TYPE, content_type),
+        _encode_header(Headers.CONTENT_LENGTH,
+                       str(sum(len(chunk) for chunk in body))),
+    ])
+
+    return [
+        EncodedFrame(
+            Command.MESSAGE,
+            [head + _encode_header(Headers.SUBSCRIPTION, sub_id) + b"\n"] +
+            body +
+            [b"\0"])
+        for sub_id in subscription_ids
+    ]
+
+
+def _encode_header(key, value):
+    return encodeValue(key) + b":" + encodeValue(value) + b"\n"
+
+
 def decodeValue(s):
     # Make sure to leave this check before decoding as ':' can appear in the
     # value after decoding using \c
@@ -185,6 +260,17 @@ def encodeValue(s):
 
 
 class Parser(object):
+    """
+    Parse STOMP frames from a stream of data.
+
+    Data is appended to a bytearray buffer, and parsed from a read offset,
+    so partial reads do not copy the unparsed data. Bodies with a
+    content-length header are copied once from the buffer when complete.
+    Parsed data is removed from the buffer when it is most of the buffer,
+    keeping the cost of parsing a frame linear in its size, regardless of
+    the number of reads.
+    """
+
     _STATE_CMD = "Parsing command"
     _STATE_HEADER = "Parsing headers"
     _STATE_BODY = "Receiving body"
@@ -197,39 +283,64 @@ class Parser(object):
         self._frames = deque()
         self._change_state(self._STATE_CMD)
         self._contentLength = -1
-        self._flush()
+        self._buffer = bytearray()
+        # Start of unparsed data in the buffer.
+        self._offset = 0
+        # Where to continue searching for a terminator, avoiding searching
+        # again data received in previous reads.
+        self._scan = 0
 
     def _change_state(self, new_state):
         self._state = new_state
         self._state_cb = self._states[new_state]
 
-    def _flush(self):
-        self._buffer = ""
-
-    def _write_buffer(self, buff):
-        self._buffer += buff
-
-    def _get_buffer(self):
-        return self._buffer
+    def _compact(self):
+        """
+        Remove parsed data from the buffer if it is at least half of the
+        buffer, so every byte is moved at most once on average.
+        """
+        if self._offset == 0:
+            return
+        if self._offset == len(self._buffer):
+            del self._buffer[:]
+        elif self._offset >= len(self._buffer) // 2:
+            del self._buffer[:self._offset]
+        else:
+            return
+        self._scan = max(self._scan - self._offset, 0)
+        self._offset = 0
+
+    def _take(self, length):
+        """
+        Return length bytes from the read offset, and advance the read offset
+        by length bytes.
+        """
+        start = self._offset
+        data = memoryview(self._buffer)[start:start + length].tobytes()
+        self._offset = start + length
+        return data
 
     def _handle_terminator(self, term):
-        res, sep, rest = self._buffer.partition(term)
-        if not sep:
+        start = max(self._offset, self._scan)
+        end = self._buffer.find(term, start)
+        if end == -1:
+            self._scan = len(self._buffer)
             return None
 
-        self._buffer = rest
-
+        res = self._take(end - self._offset)
+        self._offset += 1
+        self._scan = self._offset
         return res
 
     def _parse_command(self):
-        cmd = self._handle_terminator('\n')
+        cmd = self._handle_terminator(b'\n')
         if cmd is None:
             return False
 
-        if len(cmd) > 0 and cmd[-1] == '\r':
+        if cmd.endswith(b'\r'):
             cmd = cmd[:-1]
 
-        if cmd == "":
+        if cmd == b"":
             return True
 
         cmd = decodeValue(cmd)
@@ -239,20 +350,20 @@ class Parser(object):
         return True
 
     def _parse_header(self):
-        header = self._handle_terminator('\n')
+        header = self._handle_terminator(b'\n')
         if header is None:
             return False
 
-        if len(header) > 0 and header[-1] == '\r':
+        if header.endswith(b'\r'):
             header = header[:-1]
 
         headers = self._tmpFrame.headers
-        if header == "":
+        if header == b"":
             self._contentLength = int(headers.get('content-length', -1))
             self._change_state(self._STATE_BODY)
             return True
 
-        key, value = header.split(":", 1)
+        key, value = header.split(b":", 1)
         key = decodeValue(key)
         value = decodeValue(value)
 
@@ -277,7 +388,7 @@ class Parser(object):
             return self._parse_body_terminator()
 
     def _parse_body_terminator(self):
-        body = self._handle_terminator('\0')
+        body = self._handle_terminator(b'\0')
         if body is None:
             return False
 
@@ -286,20 +397,16 @@ class Parser(object):
         return True
 
     def _parse_body_length(self):
-        buf = self._get_buffer()
         cl = self._contentLength
-        ndata = len(buf)
-        if ndata < (cl + 1):
+        if len(self._buffer) - self._offset < cl + 1:
             return False
 
-        if buf[cl] != "\0":
+        if self._buffer[self._offset + cl] != 0:
             raise RuntimeError("Frame end is missing \\0")
 
-        self._flush()
-        self._write_buffer(buf[cl + 1:])
-        body = buf[:cl]
-
-        self._tmpFrame.body = body
+        self._tmpFrame.body = self._take(cl)
+        self._offset += 1
+        self._scan = self._offset
         self._pushFrame()
 
         return True
@@ -309,9 +416,12 @@ class Parser(object):
         return len(self._frames)
 
     def parse(self, data):
-        self._write_buffer(data)
-        while self._state_cb():
-            pass
+        self._buffer += data
+        try:
+            while self._state_cb():
+                pass
+        finally:
+            self._compact()
 
     def popFrame(self):
         try:
@@ -355,7 +465,10 @@ class AsyncDispatcher(object):
         self.connection = connection
         self._bufferSize = bufferSize
         self._parser = Parser()
-        self._outbuf = None
+        # Buffers of frames taken from the frame handler, not sent yet.
+        self._outbufs = deque()
+        # [frame, bytes not sent yet] for frames in self._outbufs.
+        self._outframes = deque()
         self._incoming_heartbeat_in_milis = 0
         self._outgoing_heartbeat_in_milis = 0
         self._reconnect_interval = 0
@@ -386,7 +499,8 @@ class AsyncDispatcher(object):
 
     def handle_connect(self, dispatcher):
         self.log.debug("managed to connect successfully.")
-        self._outbuf = None
+        self._outbufs.clear()
+        self._outframes.clear()
         self._count = 0
         self._on_timeout = False
         self._update_reconnect_time()
@@ -484,36 +598,87 @@ class AsyncDispatcher(object):
 
     def handle_write(self, dispatcher):
         while True:
-            if self._outbuf is None:
-                try:
-                    frame = self._frame_handler.peek_message()
-                except IndexError:
-                    return
-
-                self._outbuf = frame.encode()
+            if not self._outbufs and not self._take_frames():
+                return
 
-            data = self._outbuf
-            numSent = dispatcher.send(data)
+            buffers = self._write_buffers()
+            numSent = dispatcher.send_buffers(buffers)
             if numSent == 0:
                 # want to resend
-                resend = self._frame_handler.peek_message()
-                if resend.command == Command.SEND:
+                resend = self._outframes[0][0]
+                if getattr(resend, "command", None) == Command.SEND:
                     self._frame_handler.queue_resend(resend)
                 return
 
             self._update_outgoing_heartbeat()
-            if numSent < len(data):
-                self._outbuf = data[numSent:]
+            self._consume(numSent)
+            if numSent < sum(len(buf) for buf in buffers):
                 return
 
-            self._outbuf = None
+    def _take_frames(self):
+        """
+        Move frames from the frame handler to the output buffers, until
+        WRITE_SIZE bytes or WRITE_BUFFERS buffers are queued. Returns True
+        if frames were taken.
+        """
+        size = 0
+        while size < WRITE_SIZE and len(self._outbufs) < WRITE_BUFFERS:
+            try:
+                frame = self._frame_handler.peek_message()
+            except IndexError:
+                break
+
+            buffers = frame.encode_buffers()
+            frame_size = sum(len(buf) for buf in buffers)
+            self._outbufs.extend(buffers)
+            self._outframes.append([frame, frame_size])
             self._frame_handler.pop_message()
+            size += frame_size
+
+        return size > 0
+
+    def _write_buffers(self):
+        """
+        Return the output buffers to send in the next write. A large buffer
+        is sent alone, so it is never copied when the socket does not
+        support sending multiple buffers.
+        """
+        buffers = []
+        size = 0
+        for buf in self._outbufs:
+            if buffers and (size + len(buf) > WRITE_SIZE or
+                            len(buffers) == WRITE_BUFFERS):
+                break
+            buffers.append(buf)
+            size += len(buf)
+        return buffers
+
+    def _consume(self, size):
+        outbufs = self._outbufs
+        remaining = size
+        while remaining:
+            buf = outbufs[0]
+            if remaining < len(buf):
+                outbufs[0] = buf[remaining:]
+                break
+            remaining -= len(buf)
+            outbufs.popleft()
+
+        outframes = self._outframes
+        remaining = size
+        while remaining:
+            entry = outframes[0]
+            if remaining < entry[1]:
+                entry[1] -= remaining
+                break
+            remaining -= entry[1]
+            outframes.popleft()
 
     def writable(self, dispatcher):
         if self._frame_handler.has_outgoing_messages:
             return True
 
-        if self._outbuf is not None:
+        if self._outbufs:
             return True
 
         if (self.next_check_interval() == 0):
@@ -41,7 +41,7 @@ from yajsonrpc.stomp import \
     SUBSCRIPTION_ID_RESPONSE
 from yajsonrpc.jsonrpcclient import JsonRpcClient
 from yajsonrpc import CALL_TIMEOUT
-from .betterAsyncore import Reactor
+from .betterAsyncore import create_reactor
 
 
 class AsyncClient(object):
@@ -439,7 +439,7 @@ def StandAloneRpcClient(host, port, request_queue, response_queue,
     request and response queues that we want to use during communication.
     We can provide ssl context if we want to secure connection.
     """
-    reactor = Reactor()
+    reactor = create_reactor()
 
     def start():
         thread = concurrent.thread(reactor.process_requests,
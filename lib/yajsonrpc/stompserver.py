@@ -20,10 +20,10 @@ from collections import deque
 import functools
 
 from vdsm.config import config
-from vdsm.common.compat import json
 from . import JsonRpcServer
+from . import codec
 from . import stomp, stompclient
-from .betterAsyncore import Dispatcher, Reactor
+from .betterAsyncore import Dispatcher, create_reactor
 
 
 def parseHeartBeatHeader(v):
@@ -235,7 +235,8 @@ class StompAdapterImpl(object):
         or for standard mode we use 'reply-to' header.
         """
         try:
-            self._handle_destination(dispatcher, req_dest, json.loads(request))
+            self._handle_destination(
+                dispatcher, req_dest, codec.current().loads(request))
         except Exception:
             # let json server process issue
             pass
@@ -300,44 +301,42 @@ class StompServer(object):
         return stomp.StompConnection(self, adapter, sock,
                                      self._reactor)
 
-    """
-    Sends message to all subscribes that subscribed to destination.
-    """
-    def send(self, message, destination=stomp.SUBSCRIPTION_ID_RESPONSE):
-        resp = json.loads(message)
-        if not isinstance(resp, dict):
-            raise ValueError(
-                'Provided message %s failed parsing to dictionary' % message)
-        # pylint: disable=no-member
-        response_id = resp.get("id")
+    def send(self, message, destination=stomp.SUBSCRIPTION_ID_RESPONSE,
+             request_ids=()):
+        """
+        Sends message to all subscribes that subscribed to destination.
 
-        try:
-            destination = self._req_dest[response_id]
-            del self._req_dest[response_id]
-        except KeyError:
-            # we could have no reply-to or we could send events (no message id)
-            pass
+        message may be bytes, text, or a list of bytes chunks.
+
+        If message is a response, request_ids are the ids of the requests
+        answered by the message. If the requests specified a destination for
+        the response, the message is sent to this destination.
+        """
+        for request_id in request_ids:
+            try:
+                reply_to = self._req_dest.pop(request_id)
+            except KeyError:
+                # we could have no reply-to
+                continue
+            # All requests in a batch were sent in the same frame.
+            destination = reply_to
 
         try:
-            connections = self._sub_map[destination]
+            subscriptions = self._sub_map[destination]
         except KeyError:
             self.log.warn("Attempt to reply to unknown destination %s",
                           destination)
             return
 
-        for connection in connections:
-            res = stomp.Frame(
-                stomp.Command.MESSAGE,
-                {
-                    stomp.Headers.DESTINATION: destination,
-                    stomp.Headers.CONTENT_TYPE: "application/json",
-                    stomp.Headers.SUBSCRIPTION: connection.id
-                },
-                message
-            )
-            # we need to check whether the channel is not closed
-            if not connection.client.is_closed():
-                connection.client.send_raw(res)
+        # we need to check whether the channel is not closed
+        subscriptions = [sub for sub in subscriptions
+                         if not sub.client.is_closed()]
+
+        frames = stomp.encode_messages(
+            destination, message, [sub.id for sub in subscriptions])
+
+        for subscription, frame in zip(subscriptions, frames):
+            subscription.client.send_raw(frame)
 
 
 def StompListener(reactor, server, acceptHandler, connected_socket):
@@ -368,7 +367,7 @@ class StompListenerImpl(object):
 
 class StompReactor(object):
     def __init__(self, subs):
-        self._reactor = Reactor()
+        self._reactor = create_reactor(config.get('rpc', 'reactor'))
         self._server = StompServer(self._reactor, subs)
 
     def createListener(self, connected_socket, acceptHandler):
@@ -439,7 +438,9 @@ class ServerRpcContextAdapter(object):
     def get_local_address(self, *args, **kwargs):
         return self._address
 
-    def send(self, data):
+    def send(self, data, request_ids=()):
+        if isinstance(data, list):
+            data = b"".join(data)
         if self._reply_to:
             self._client.send(
                 self._reply_to,
@@ -21,13 +21,20 @@
 
 from __future__ import absolute_import
 from __future__ import division
+import select
 import socket
+import threading
 from contextlib import closing
 
 from vdsm.common import concurrent
-from yajsonrpc.betterAsyncore import AsyncoreEvent, Reactor
+from vdsm.common.time import monotonic_time
+from yajsonrpc import betterAsyncore
+from yajsonrpc.betterAsyncore import AsyncoreEvent, EpollReactor, Reactor
 
 from testlib import VdsmTestCase as TestCaseBase
+from testlib import expandPermutations, permutations
+
+REACTORS = [[Reactor], [EpollReactor]]
 
 
 class TestEvent(TestCaseBase):
@@ -43,6 +50,18 @@ class TestEvent(TestCaseBase):
         self.assertFalse(event.closing)
 
 
+class TestDispatcher(TestCaseBase):
+
+    def test_send_buffers(self):
+        s1, s2 = socket.socketpair()
+        with closing(s2):
+            disp = betterAsyncore.Dispatcher(sock=s1, map={})
+            with closing(disp):
+                buffers = [b"first", b"second", b"third"]
+                self.assertEqual(disp.send_buffers(buffers), 16)
+                self.assertEqual(s2.recv(4096), b"firstsecondthird")
+
+
 class TestingImpl(object):
 
     def readable(self, dispatcher):
@@ -55,6 +74,48 @@ class TestingImpl(object):
         return 0.1
 
 
+class EchoImpl(object):
+
+    def __init__(self):
+        self._buf = b""
+
+    def readable(self, dispatcher):
+        return True
+
+    def writable(self, dispatcher):
+        return len(self._buf) > 0
+
+    def handle_read(self, dispatcher):
+        data = dispatcher.recv(4096)
+        if data:
+            self._buf += data
+
+    def handle_write(self, dispatcher):
+        sent = dispatcher.send(self._buf)
+        self._buf = self._buf[sent:]
+
+
+class ExpiringImpl(object):
+
+    def __init__(self, timeout):
+        self._give_up_at = monotonic_time() + timeout
+        self.closed = threading.Event()
+
+    def readable(self, dispatcher):
+        if monotonic_time() >= self._give_up_at:
+            dispatcher.close()
+            self.closed.set()
+            return False
+        return True
+
+    def writable(self, dispatcher):
+        return False
+
+    def next_check_interval(self):
+        return max(self._give_up_at - monotonic_time(), 0)
+
+
+@expandPermutations
 class TestReactor(TestCaseBase):
 
     def test_close(self):
@@ -71,3 +132,116 @@ class TestReactor(TestCaseBase):
 
         self.assertTrue(disp.closing)
         self.assertFalse(reactor._wakeupEvent.closing)
+
+    @permutations(REACTORS)
+    def test_echo(self, reactor_class):
+        reactor = reactor_class()
+        thread = concurrent.thread(reactor.process_requests,
+                                   name='test reactor')
+        thread.start()
+        try:
+            s1, s2 = socket.socketpair()
+            with closing(s2):
+                s2.settimeout(1)
+                reactor.create_dispatcher(s1, impl=EchoImpl())
+                reactor.wakeup()
+                for i in range(10):
+                    data = b"message %d" % i
+                    s2.sendall(data)
+                    self.assertEqual(s2.recv(4096), data)
+        finally:
+            reactor.stop()
+            thread.join(timeout=1)
+
+    @permutations(REACTORS)
+    def test_check_interval(self, reactor_class):
+        reactor = reactor_class()
+        thread = concurrent.thread(reactor.process_requests,
+                                   name='test reactor')
+        thread.start()
+        try:
+            s1, s2 = socket.socketpair()
+            with closing(s2):
+                impl = ExpiringImpl(0.2)
+                disp = reactor.create_dispatcher(s1, impl=impl)
+                reactor.wakeup()
+                # The dispatcher has no events, and is checked only when
+                # its check interval expires.
+                self.assertTrue(impl.closed.wait(1))
+                self.assertTrue(disp.closing)
+        finally:
+            reactor.stop()
+            thread.join(timeout=1)
+
+
+class TestEpollReactor(TestCaseBase):
+
+    def test_stop(self):
+        reactor = EpollReactor()
+        thread = concurrent.thread(reactor.process_requests,
+                                   name='test reactor')
+        thread.start()
+        s1, s2 = socket.socketpair()
+        with closing(s2):
+            s2.settimeout(1)
+            # Wait until the reactor is running, so stop() is not lost.
+            reactor.create_dispatcher(s1, impl=EchoImpl())
+            reactor.wakeup()
+            s2.sendall(b"ping")
+            self.assertEqual(s2.recv(4096), b"ping")
+
+            reactor.stop()
+            thread.join(timeout=1)
+            self.assertFalse(thread.is_alive())
+
+            # All dispatchers were closed.
+            self.assertEqual(s2.recv(4096), b"")
+            self.assertTrue(reactor._wakeupEvent.closing)
+
+    def test_del_channel(self):
+        reactor = EpollReactor()
+        s1, s2 = socket.socketpair()
+        with closing(s1), closing(s2):
+            disp = reactor.create_dispatcher(s1, impl=TestingImpl())
+            fd = s1.fileno()
+            reactor._check_dirty()
+            self.assertIn(fd, reactor._masks)
+
+            disp.del_channel()
+            self.assertNotIn(fd, reactor._masks)
+            self.assertNotIn(fd, reactor._timer_seq)
+
+    def test_mask(self):
+        reactor = EpollReactor()
+        s1, s2 = socket.socketpair()
+        with closing(s2):
+            impl = EchoImpl()
+            disp = reactor.create_dispatcher(s1, impl=impl)
+            fd = s1.fileno()
+            reactor._check_dirty()
+            self.assertEqual(reactor._masks[fd],
+                             select.EPOLLIN | select.EPOLLPRI)
+
+            impl._buf = b"data"
+            reactor._dirty.add(fd)
+            reactor._check_dirty()
+            self.assertTrue(reactor._masks[fd] & select.EPOLLOUT)
+            disp.close()
+
+
+class TestCreateReactor(TestCaseBase):
+
+    def test_asyncore(self):
+        self.assertIsInstance(betterAsyncore.create_reactor("asyncore"),
+                              Reactor)
+
+    def test_epoll(self):
+        self.assertIsInstance(betterAsyncore.create_reactor("epoll"),
+                              EpollReactor)
+
+    def test_auto(self):
+        self.assertIsInstance(betterAsyncore.create_reactor(), EpollReactor)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            betterAsyncore.create_reactor("no-such-reactor")
@@ -28,6 +28,7 @@ import platform
 import tempfile
 from testlib import VdsmTestCase as TestCaseBase
 from monkeypatch import MonkeyPatch
+from monkeypatch import MonkeyPatchScope
 
 from vdsm.host import caps
 from vdsm import numa
@@ -252,3 +253,87 @@ class TestCaps(TestCaseBase):
         self.assertEqual(t.sockets, 1)
         self.assertEqual(t.online_cpus,
                          ['0', '1', '2', '3', '4', '5', '6', '7'])
+
+
+class TestSection(TestCaseBase):
+
+    def setUp(self):
+        self.key = 1
+        self.calls = 0
+
+    def _build(self):
+        self.calls += 1
+        return {'value': [self.key]}
+
+    def _key(self):
+        return self.key
+
+    def test_cached(self):
+        section = caps._Section('test', self._build, self._key)
+        self.assertEqual(section.get(), {'value': [1]})
+        self.assertEqual(section.get(), {'value': [1]})
+        self.assertEqual(self.calls, 1)
+
+    def test_key_changed(self):
+        section = caps._Section('test', self._build, self._key)
+        section.get()
+        self.key = 2
+        self.assertEqual(section.get(), {'value': [2]})
+        self.assertEqual(self.calls, 2)
+
+    def test_returns_copy(self):
+        section = caps._Section('test', self._build, self._key)
+        section.get()['value'].append(2)
+        self.assertEqual(section.get(), {'value': [1]})
+
+    def test_build_failure_not_cached(self):
+        def build():
+            self.calls += 1
+            raise RuntimeError("no value")
+
+        section = caps._Section('test', build, self._key)
+        for i in range(2):
+            with self.assertRaises(RuntimeError):
+                section.get()
+        self.assertEqual(self.calls, 2)
+
+    def test_key_failure(self):
+        def key():
+            raise RuntimeError("no key")
+
+        section = caps._Section('test', self._build, key)
+        section.get()
+        section.get()
+        self.assertEqual(self.calls, 2)
+
+    def test_key_none_not_cached(self):
+        self.key = None
+        section = caps._Section('test', self._build, self._key)
+        self.assertEqual(section.get(), {'value': [None]})
+        section.get()
+        self.assertEqual(self.calls, 2)
+
+
+class TestSectionKeys(TestCaseBase):
+
+    @MonkeyPatch(caps, '_PACKAGES_DB', ('/no/such/packages/db',))
+    def test_packages_key_without_database(self):
+        self.assertIsNone(caps._packages_key())
+
+    def test_packages_key(self):
+        with tempfile.NamedTemporaryFile() as db:
+            with MonkeyPatchScope([
+                (caps, '_PACKAGES_DB', ('/no/such/packages/db', db.name)),
+            ]):
+                self.assertEqual(caps._packages_key(),
+                                 (None, os.stat(db.name).st_mtime))
+
+    @MonkeyPatch(caps, '_storage_key', lambda: (1, None))
+    def test_connector_key_network_changed(self):
+        generation = [1]
+        with MonkeyPatchScope([
+            (caps, '_network_key', lambda: generation[0]),
+        ]):
+            key = caps._connector_key()
+            generation[0] = 2
+            self.assertNotEqual(caps._connector_key(), key)
@@ -227,6 +227,60 @@ class TMapTests(VdsmTestCase):
         expected = [concurrent.Result(False, error)] * 10
         self.assertEqual(results, expected)
 
+    def test_max_workers(self):
+        lock = threading.Lock()
+        running = [0]
+        max_running = [0]
+
+        def func(x):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return x
+
+        values = tuple(range(10))
+        results = concurrent.tmap(func, values, max_workers=3)
+        expected = [concurrent.Result(True, x) for x in values]
+        self.assertEqual(results, expected)
+        self.assertEqual(max_running[0], 3)
+
+    def test_invalid_max_workers(self):
+        with self.assertRaises(ValueError):
+            concurrent.tmap(lambda x: x, [1], max_workers=0)
+
+    def test_empty(self):
+        self.assertEqual(concurrent.tmap(lambda x: x, [], max_workers=2), [])
+
+    def test_slot_timeout_releases_worker(self):
+        # The first call blocks until the last call is run, which is
+        # possible only if the first call releases its worker slot.
+        event = threading.Event()
+
+        def func(x):
+            if x == 0:
+                return event.wait(5)
+            if x == 2:
+                event.set()
+            return x
+
+        results = concurrent.tmap(
+            func, [0, 1, 2], max_workers=1, slot_timeout=0.2)
+        self.assertEqual(results, [concurrent.Result(True, True),
+                                   concurrent.Result(True, 1),
+                                   concurrent.Result(True, 2)])
+
+    def test_slot_timeout_waits_for_all_calls(self):
+        start = monotonic_time()
+        results = concurrent.tmap(
+            lambda x: time.sleep(x) or x, [0.3, 0.0], slot_timeout=0.1)
+        elapsed = monotonic_time() - start
+        self.assertEqual(results, [concurrent.Result(True, 0.3),
+                                   concurrent.Result(True, 0.0)])
+        self.assertGreaterEqual(elapsed, 0.3)
+
 
 @expandPermutations
 class ThreadTests(VdsmTestCase):
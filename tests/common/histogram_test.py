@@ -0,0 +1,84 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import pytest
+
+from vdsm.common import histogram
+
+
+def test_empty():
+    h = histogram.Histogram(buckets=(1, 2))
+    assert h.snapshot() == {
+        "count": 0,
+        "sum": 0,
+        "min": None,
+        "max": None,
+        "buckets": [(1, 0), (2, 0), (None, 0)],
+    }
+    assert h.percentile(50) is None
+
+
+def test_add():
+    h = histogram.Histogram(buckets=(1, 2))
+    for value in (0.5, 1, 1.5, 3):
+        h.add(value)
+    assert h.snapshot() == {
+        "count": 4,
+        "sum": 6,
+        "min": 0.5,
+        "max": 3,
+        "buckets": [(1, 2), (2, 1), (None, 1)],
+    }
+
+
+def test_reset():
+    h = histogram.Histogram(buckets=(1, 2))
+    h.add(1)
+    h.reset()
+    assert h.snapshot()["count"] == 0
+    assert h.snapshot()["buckets"] == [(1, 0), (2, 0), (None, 0)]
+
+
+@pytest.mark.parametrize("p,expected", [
+    (10, 1),
+    (50, 1),
+    (80, 2),
+    (90, 2.5),
+    (100, 2.5),
+])
+def test_percentile(p, expected):
+    h = histogram.Histogram(buckets=(1, 2, 5))
+    for value in (0.1, 0.2, 0.3, 0.4, 0.5, 1.5, 1.6, 1.7, 2.5, 2.5):
+        h.add(value)
+    assert h.percentile(p) == expected
+
+
+def test_percentile_overflow():
+    h = histogram.Histogram(buckets=(1,))
+    h.add(7)
+    assert h.percentile(99) == 7
+
+
+def test_unsorted_buckets():
+    with pytest.raises(ValueError):
+        histogram.Histogram(buckets=(2, 1))
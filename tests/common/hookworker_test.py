@@ -0,0 +1,144 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import os
+import signal
+import sys
+
+import pytest
+
+from vdsm.common import concurrent
+from vdsm.common import hookworker
+
+
+@pytest.fixture(scope="module")
+def worker():
+    return hookworker.Worker()
+
+
+@pytest.fixture
+def script(tmpdir):
+    def create(code):
+        path = tmpdir.join("hook")
+        path.write("#!%s\n%s" % (sys.executable, code))
+        path.chmod(0o755)
+        return str(path)
+    return create
+
+
+def env(**kw):
+    e = dict(os.environ)
+    e.update(kw)
+    return e
+
+
+def test_output(worker, script):
+    path = script(
+        "import sys\n"
+        "sys.stdout.write('out')\n"
+        "sys.stderr.write('err')\n")
+    assert worker.run(path, env()) == (0, b"out", b"err")
+
+
+def test_environment(worker, script):
+    path = script(
+        "import os, sys\n"
+        "sys.stdout.write(os.environ['customProperty'])\n")
+    rc, out, _ = worker.run(path, env(customProperty="rocks!"))
+    assert out == b"rocks!"
+
+
+def test_argv(worker, script):
+    path = script(
+        "import sys\n"
+        "sys.stdout.write(sys.argv[0])\n")
+    assert worker.run(path, env())[1] == path.encode("utf-8")
+
+
+def test_modify_file(worker, script, tmpdir):
+    data = tmpdir.join("data")
+    data.write("oVirt")
+    path = script(
+        "import os\n"
+        "with open(os.environ['_hook_json'], 'a') as f:\n"
+        "    f.write(' rocks!')\n")
+    assert worker.run(path, env(_hook_json=str(data)))[0] == 0
+    assert data.read() == "oVirt rocks!"
+
+
+@pytest.mark.parametrize("code,rc", [
+    ("import sys\nsys.exit(2)\n", 2),
+    ("import sys\nsys.exit()\n", 0),
+    ("raise RuntimeError('failed')\n", 1),
+    ("import os, signal\nos.kill(os.getpid(), signal.SIGKILL)\n",
+     -signal.SIGKILL),
+])
+def test_exit_code(worker, script, code, rc):
+    path = script(code)
+    assert worker.run(path, env())[0] == rc
+
+
+def test_exception(worker, script):
+    path = script("raise RuntimeError('hook failed')\n")
+    _, _, err = worker.run(path, env())
+    assert b"RuntimeError: hook failed" in err
+
+
+def test_concurrent(worker, script, tmpdir):
+    # The first hook blocks until the second hook was run.
+    fifo = str(tmpdir.join("fifo"))
+    os.mkfifo(fifo)
+    reader = script(
+        "import sys\n"
+        "with open(sys.argv[0] + '.fifo') as f:\n"
+        "    sys.stdout.write(f.read())\n")
+    os.rename(fifo, reader + ".fifo")
+    results = []
+
+    t = concurrent.thread(
+        lambda: results.append(worker.run(reader, env())))
+    t.start()
+    writer = str(tmpdir.join("writer"))
+    with open(writer, "w") as f:
+        f.write("#!%s\n" % sys.executable)
+        f.write("with open(%r, 'w') as f:\n" % (reader + ".fifo"))
+        f.write("    f.write('done')\n")
+    assert worker.run(writer, env())[0] == 0
+    t.join()
+    assert results == [(0, b"done", b"")]
+
+
+def test_worker_terminated(script):
+    worker = hookworker.Worker()
+    path = script(
+        "import os, signal\n"
+        "os.kill(os.getppid(), signal.SIGKILL)\n"
+        "import time\n"
+        "time.sleep(1)\n")
+    rc, _, err = worker.run(path, env())
+    assert rc == 1
+    assert b"terminated" in err
+
+    # A new worker is started.
+    path = script("print('ok')\n")
+    assert worker.run(path, env()) == (0, b"ok\n", b"")
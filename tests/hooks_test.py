@@ -29,9 +29,11 @@ import libvirt
 import tempfile
 import os
 import os.path
+import sys
 from contextlib import contextmanager
 from monkeypatch import MonkeyPatchScope
 from testlib import VdsmTestCase as TestCaseBase
+from testlib import make_config
 from testlib import namedTemporaryDir
 
 from vdsm.common import hooks
@@ -146,6 +148,46 @@ domXMLFile.close()
                                         vmconf=vmconf)
             self.assertEqual(result, "oVirt rocks more!")
 
+    def _writeScript(self, dir, code):
+        with tempfile.NamedTemporaryFile(dir=dir, delete=False) as f:
+            f.write(code.encode('utf-8'))
+        os.chmod(f.name, 0o775)
+        return f.name
+
+    def test_isPythonHook(self):
+        with namedTemporaryDir() as dirName:
+            script = self._writeScript(
+                dirName, '#!%s\nimport hooking\n' % sys.executable)
+            self.assertTrue(hooks._isPythonHook(script))
+
+    def test_isPythonHookNoHooking(self):
+        with namedTemporaryDir() as dirName:
+            script = self._writeScript(
+                dirName, '#!%s\nimport os\n' % sys.executable)
+            self.assertFalse(hooks._isPythonHook(script))
+
+    def test_isPythonHookOtherInterpreter(self):
+        with namedTemporaryDir() as dirName:
+            script = self._writeScript(
+                dirName, '#!/bin/bash\n# import hooking\n')
+            self.assertFalse(hooks._isPythonHook(script))
+
+    def test_runHooksDirWorker(self):
+        code = """#!%s
+import os
+import hooking
+
+with open(os.environ['_hook_domxml'], 'a') as f:
+    f.write(os.environ['customProperty'])
+"""
+        config = make_config([('vars', 'hooks_worker', 'true')])
+        with namedTemporaryDir() as dirName:
+            self._writeScript(dirName, code % sys.executable)
+            with MonkeyPatchScope([(hooks, 'config', config)]):
+                result = hooks._runHooksDir(
+                    "oVirt", dirName, params={'customProperty': ' rocks!'})
+            self.assertEqual(result, "oVirt rocks!")
+
     def test_pause_flags(self):
         vm_id = '042f6258-3446-4437-8034-0c93e3bcda1b'
         with namedTemporaryDir() as tmpDir:
@@ -161,3 +203,12 @@ domXMLFile.close()
                     self.assertTrue(os.path.exists(flags_file))
                     hooks.remove_vm_launch_flags_file(vm_id)
                     self.assertFalse(os.path.exists(flags_file))
+
+
+class TestInventory(TestCaseBase):
+
+    def test_generation_not_watching(self):
+        with namedTemporaryDir() as dirName:
+            with MonkeyPatchScope([(hooks, 'pyinotify', None)]):
+                inventory = hooks._Inventory(dirName)
+                self.assertIsNone(inventory.generation())
@@ -0,0 +1,188 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import time
+
+import pytest
+
+from yajsonrpc import codec
+from yajsonrpc import JsonRpcResponse
+from yajsonrpc import _JsonRpcServeRequestContext
+
+from vdsm.common.compat import json
+
+OBJ = {
+    "jsonrpc": "2.0",
+    "id": "req-1",
+    "result": {
+        "vms": [{"vmId": str(i), "cpu": i * 0.5, "name": u"vm-\u05d0"}
+                for i in range(100)],
+        "path": "/rhev/data-center",
+        "big": 2**70,
+    },
+}
+
+
+@pytest.fixture(params=["json", "ujson"])
+def json_codec(request):
+    if request.param not in codec.available():
+        pytest.skip("%s codec is not available" % request.param)
+    return codec.get(request.param)
+
+
+def test_round_trip(json_codec):
+    text = json_codec.dumps(OBJ)
+    assert json_codec.loads(text) == OBJ
+    assert json_codec.loads(text.encode("utf-8")) == OBJ
+
+
+def test_encode_chunks(json_codec):
+    chunks = json_codec.encode_chunks(OBJ)
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    assert json_codec.loads(b"".join(chunks)) == OBJ
+    # Chunks are joined in the frame; the result must be the same as dumps.
+    assert b"".join(chunks) == json_codec.dumps(OBJ).encode("utf-8")
+
+
+def vm_stats(i):
+    return {
+        "vmId": "%08d-6a5a-4b6a-b3a1-5f7e0c8c2d4e" % i,
+        "status": "Up",
+        "elapsedTime": "86400",
+        "cpuUser": "1.25",
+        "cpuSys": "0.50",
+        "memUsage": "42",
+        "network": {
+            "vnet%d" % n: {
+                "name": "vnet%d" % n,
+                "rxErrors": "0",
+                "txErrors": "0",
+                "rx": "123456789",
+                "tx": "987654321",
+                "sampleTime": 4318.87,
+            } for n in range(2)
+        },
+        "disks": {
+            name: {
+                "readLatency": "0",
+                "writeLatency": "1234",
+                "readBytes": "1073741824",
+                "writtenBytes": "536870912",
+                "truesize": "10737418240",
+                "apparentsize": "10737418240",
+            } for name in ("vda", "vdb", "hdc")
+        },
+        "guestIPs": "192.168.122.%d" % (i % 256),
+        "hash": "-2697817656463928305",
+    }
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("vms", [300])
+def test_benchmark_encode_response(json_codec, vms):
+    obj = {"jsonrpc": "2.0", "id": "req-1",
+           "result": [vm_stats(i) for i in range(vms)]}
+    runs = 20
+
+    # Encoding before the codecs were added.
+    start = time.time()
+    for i in range(runs):
+        json.dumps(obj).encode("utf-8")
+    baseline = (time.time() - start) / runs
+
+    start = time.time()
+    for i in range(runs):
+        json_codec.encode_chunks(obj)
+    elapsed = (time.time() - start) / runs
+
+    print("%s: %d vms encoded in %.6f seconds (baseline %.6f seconds)"
+          % (json_codec.name, vms, elapsed, baseline))
+
+
+def test_default():
+    assert codec.get().name == "json"
+    assert codec.current().name == "json"
+
+
+def test_loads_invalid(json_codec):
+    with pytest.raises(ValueError):
+        json_codec.loads(b"{invalid")
+
+
+def test_unknown():
+    with pytest.raises(ValueError):
+        codec.get("no-such-codec")
+
+
+def test_select(monkeypatch):
+    monkeypatch.setattr(codec, "_current", codec.current())
+    codec.select("json")
+    assert codec.current().name == "json"
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, message, request_ids=()):
+        self.messages.append((message, request_ids))
+
+
+def test_send_reply_chunks():
+    client = FakeClient()
+    ctx = _JsonRpcServeRequestContext(client, None, None)
+    ctx.addResponse(JsonRpcResponse(result=[1, 2], reqId="req-1"))
+    ctx.sendReply()
+
+    [(message, request_ids)] = client.messages
+    assert request_ids == ["req-1"]
+    assert codec.current().loads(b"".join(message)) == {
+        "jsonrpc": "2.0", "id": "req-1", "result": [1, 2]}
+
+
+def test_send_reply_batch():
+    client = FakeClient()
+    ctx = _JsonRpcServeRequestContext(client, None, None)
+    ctx.addResponse(JsonRpcResponse(result=1, reqId="req-1"))
+    ctx.addResponse(JsonRpcResponse(result=2, reqId="req-2"))
+    ctx.sendReply()
+
+    [(message, request_ids)] = client.messages
+    assert request_ids == ["req-1", "req-2"]
+    assert codec.current().loads(b"".join(message)) == [
+        {"jsonrpc": "2.0", "id": "req-1", "result": 1},
+        {"jsonrpc": "2.0", "id": "req-2", "result": 2},
+    ]
+
+
+def test_send_reply_encoding_error():
+    client = FakeClient()
+    ctx = _JsonRpcServeRequestContext(client, None, None)
+    ctx.addResponse(JsonRpcResponse(result=object(), reqId="req-1"))
+    ctx.sendReply()
+
+    [(message, request_ids)] = client.messages
+    response = codec.current().loads(b"".join(message))
+    assert response["id"] == "req-1"
+    assert "error" in response
@@ -25,6 +25,7 @@ import pytest
 
 from network import nettestlib
 
+from vdsm.network.ipwrapper import linkSet
 from vdsm.network.link import stats as link_stats
 
 
@@ -68,3 +69,30 @@ def test_report(device_ctx, device_ctx_args):
             'duplex'
         }
         assert expected_stat_names == set(stats[dev])
+
+
+def test_report_counters():
+    with _bridge_device() as bridge:
+        stats = link_stats.report()
+        with open('/sys/class/net/%s/statistics/rx_errors' % bridge) as f:
+            assert stats[bridge]['rxErrors'] == int(f.read())
+
+
+def test_report_refreshes_changed_link():
+    with _bridge_device() as bridge:
+        link_stats.report()
+        properties = link_stats._links[bridge]
+
+        link_stats.report()
+        assert link_stats._links[bridge] is properties
+
+        linkSet(bridge, ['down'])
+        try:
+            stats = link_stats.report()
+            assert stats[bridge]['state'] == 'down'
+            assert link_stats._links[bridge] is not properties
+        finally:
+            linkSet(bridge, ['up'])
+
+    link_stats.report()
+    assert bridge not in link_stats._links
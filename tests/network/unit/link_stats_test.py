@@ -0,0 +1,96 @@
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+from __future__ import division
+
+import pytest
+
+from network.compat import mock
+
+from vdsm.network.link import stats as link_stats
+
+UP = 69699
+DOWN = 4098
+
+
+def _link(name, index, flags=UP, **kwargs):
+    info = {'name': name, 'index': index, 'flags': flags,
+            'state': 'up' if flags == UP else 'down'}
+    info.update(kwargs)
+    return info
+
+
+LINKS = [
+    _link('eth0', 1, master='bond0', master_index=3),
+    _link('eth1', 2, master='bond0', master_index=3),
+    _link('bond0', 3, type='bond'),
+    _link('bond0.100', 4, type='vlan', device='bond0', device_index=3),
+    _link('eth2', 5),
+]
+
+
+@pytest.fixture
+def links():
+    refreshed = []
+
+    def properties(info):
+        refreshed.append(info['name'])
+        return link_stats._LinkProperties(
+            link_stats._signature(info), 1000, 'full')
+
+    with mock.patch.object(link_stats, '_links', {}), \
+            mock.patch.object(link_stats, '_properties', properties):
+        link_stats._update_properties(_links_dict(LINKS))
+        del refreshed[:]
+        yield refreshed
+
+
+def test_unchanged(links):
+    link_stats._update_properties(_links_dict(LINKS))
+    assert links == []
+
+
+def test_changed_link(links):
+    changed = LINKS[:]
+    changed[4] = _link('eth2', 5, flags=DOWN)
+    link_stats._update_properties(_links_dict(changed))
+    assert links == ['eth2']
+
+
+def test_changed_slave(links):
+    changed = LINKS[:]
+    changed[0] = _link('eth0', 1, flags=DOWN, master='bond0', master_index=3)
+    link_stats._update_properties(_links_dict(changed))
+    assert sorted(links) == ['bond0', 'bond0.100', 'eth0']
+
+
+def test_removed_link(links):
+    link_stats._update_properties(_links_dict(LINKS[:4]))
+    assert links == []
+    assert 'eth2' not in link_stats._links
+
+
+def test_readded_link(links):
+    changed = LINKS[:4] + [_link('eth2', 6)]
+    link_stats._update_properties(_links_dict(changed))
+    assert links == ['eth2']
+
+
+def _links_dict(links):
+    return {info['name']: info for info in links}
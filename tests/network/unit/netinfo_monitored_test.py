@@ -0,0 +1,175 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import threading
+
+import pytest
+from six.moves import queue
+
+from network.compat import mock
+
+from vdsm.network.netinfo import monitored
+
+TIMEOUT = 2
+
+
+class FakeMonitor(object):
+
+    instances = queue.Queue()
+
+    def __init__(self, groups=()):
+        self.groups = groups
+        self._events = queue.Queue()
+        self._stopped = threading.Event()
+        self.consumed = threading.Event()
+        self.instances.put(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if not self.is_stopped():
+            self.stop()
+
+    def __iter__(self):
+        for event in iter(self._events.get, None):
+            yield event
+            self.consumed.set()
+
+    def send(self, event):
+        self.consumed.clear()
+        self._events.put(event)
+        assert self.consumed.wait(TIMEOUT)
+
+    def stop(self):
+        self._stopped.set()
+        self._events.put(None)
+
+    def is_stopped(self):
+        return self._stopped.is_set()
+
+
+class Builder(object):
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {'value': self.value}
+
+
+@pytest.fixture
+def cache():
+    with mock.patch.object(monitored.monitor, 'Monitor', FakeMonitor):
+        c = monitored.MonitoredCache(max_age=60)
+        c.start()
+        mon = FakeMonitor.instances.get(timeout=TIMEOUT)
+        # Wait until the monitor is iterated.
+        mon.send({'event': 'new_link'})
+        try:
+            yield c, mon
+        finally:
+            c.stop()
+            c.wait()
+
+
+def test_cached(cache):
+    c, _ = cache
+    build = Builder(1)
+    assert c.get('caps', build) == {'value': 1}
+    assert c.get('caps', build) == {'value': 1}
+    assert build.calls == 1
+
+
+def test_returns_copy(cache):
+    c, _ = cache
+    build = Builder(1)
+    c.get('caps', build)['value'] = 2
+    assert c.get('caps', build) == {'value': 1}
+
+
+def test_event_invalidates(cache):
+    c, mon = cache
+    build = Builder(1)
+    c.get('caps', build)
+    mon.send({'event': 'new_addr', 'label': 'eth0'})
+    build.value = 2
+    assert c.get('caps', build) == {'value': 2}
+    assert build.calls == 2
+
+
+def test_invalidate(cache):
+    c, _ = cache
+    build = Builder(1)
+    c.get('caps', build)
+    c.invalidate()
+    c.get('caps', build)
+    assert build.calls == 2
+
+
+def test_generation(cache):
+    c, _ = cache
+    build = Builder(1)
+    gen = c.generation('caps', build)
+    assert c.generation('caps', build) == gen
+
+    # Rebuilt with the same value.
+    c.invalidate()
+    assert c.generation('caps', build) == gen
+    assert build.calls == 2
+
+    c.invalidate()
+    build.value = 2
+    assert c.generation('caps', build) != gen
+
+
+def test_generation_other_instance():
+    build = Builder(1)
+    gen1 = monitored.MonitoredCache(max_age=60).generation('caps', build)
+    gen2 = monitored.MonitoredCache(max_age=60).generation('caps', build)
+    assert gen1 != gen2
+
+
+def test_not_started():
+    c = monitored.MonitoredCache(max_age=60)
+    build = Builder(1)
+    c.get('caps', build)
+    c.get('caps', build)
+    assert build.calls == 2
+
+
+def test_max_age():
+    with mock.patch.object(monitored.monitor, 'Monitor', FakeMonitor):
+        c = monitored.MonitoredCache(max_age=0)
+        c.start()
+        FakeMonitor.instances.get(timeout=TIMEOUT)
+        try:
+            build = Builder(1)
+            c.get('caps', build)
+            c.get('caps', build)
+            assert build.calls == 2
+        finally:
+            c.stop()
+            c.wait()
@@ -0,0 +1,168 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+from vdsm.common import exception
+from vdsm.common.time import monotonic_time
+
+from yajsonrpc import JsonRpcRequest
+from yajsonrpc import JsonRpcResponse
+from yajsonrpc import JsonRpcServer
+from yajsonrpc import _JsonRpcServeRequestContext
+from yajsonrpc import rpcstats
+
+REQUEST = '{"jsonrpc":"2.0","method":"Host.ping2","params":{},"id":"1"}'
+
+
+def test_empty():
+    stats = rpcstats.RpcStats()
+    assert stats.info() == {}
+    assert stats.metrics("rpc") == {}
+
+
+def test_served():
+    stats = rpcstats.RpcStats()
+    stats.request_served("Host.ping2", 0.5, 0.25, False)
+    stats.request_served("Host.ping2", None, 0.75, True)
+    info = stats.info()["Host.ping2"]
+    assert info["calls"] == 2
+    assert info["errors"] == 1
+    assert info["rejected"] == 0
+    assert info["queue_time"]["count"] == 1
+    assert info["queue_time"]["max"] == 0.5
+    assert info["run_time"]["count"] == 2
+    assert info["run_time"]["sum"] == 1.0
+    assert info["run_time"]["p50"] == 0.25
+    assert info["response_size"] == {"count": 0}
+
+
+def test_rejected():
+    stats = rpcstats.RpcStats()
+    stats.request_rejected("Host.ping2")
+    info = stats.info()["Host.ping2"]
+    assert info["rejected"] == 1
+    assert info["calls"] == 0
+    assert info["run_time"] == {"count": 0}
+
+
+def test_max_methods():
+    stats = rpcstats.RpcStats(max_methods=2)
+    for method in ("a", "b", "c", "d", "a"):
+        stats.request_served(method, 0.1, 0.1, False)
+    info = stats.info()
+    assert sorted(info) == ["a", "b", rpcstats.OTHER]
+    assert info["a"]["calls"] == 2
+    assert info[rpcstats.OTHER]["calls"] == 2
+
+
+def test_metrics():
+    stats = rpcstats.RpcStats()
+    stats.request_served("Host.ping2", 0.5, 0.25, False)
+    stats.response_sent("Host.ping2", 100)
+    data = stats.metrics("rpc")
+    assert data["rpc.Host.ping2.calls"] == 1
+    assert data["rpc.Host.ping2.run_time.max"] == 0.25
+    assert data["rpc.Host.ping2.response_size.sum"] == 100
+
+
+def test_server_served():
+    server = JsonRpcServer(FakeBridge(), 0, FakeCif())
+    ctx = FakeContext()
+    server._serveRequest(ctx, JsonRpcRequest.decode(REQUEST),
+                         monotonic_time() - 1)
+    assert ctx.response.result is True
+    info = server.stats.info()["Host.ping2"]
+    assert info["calls"] == 1
+    assert info["errors"] == 0
+    assert info["queue_time"]["min"] >= 1
+
+
+def test_server_failed():
+    server = JsonRpcServer(FakeBridge(error=RuntimeError()), 0, FakeCif())
+    ctx = FakeContext()
+    server._serveRequest(ctx, JsonRpcRequest.decode(REQUEST))
+    assert ctx.response.error is not None
+    info = server.stats.info()["Host.ping2"]
+    assert info["errors"] == 1
+    assert info["queue_time"] == {"count": 0}
+
+
+def test_server_rejected():
+    def thread_factory(callable):
+        raise exception.ResourceExhausted("Too many tasks",
+                                          resource="test", current_tasks=0)
+
+    server = JsonRpcServer(None, 0, None, threadFactory=thread_factory)
+    server._runRequest(FakeContext(), JsonRpcRequest.decode(REQUEST))
+    assert server.stats.info()["Host.ping2"]["rejected"] == 1
+
+
+def test_response_size():
+    stats = rpcstats.RpcStats()
+    client = FakeClient()
+    ctx = _JsonRpcServeRequestContext(client, None, None, stats)
+    ctx.setRequests([JsonRpcRequest.decode(REQUEST)])
+    ctx.requestDone(JsonRpcResponse(result="x" * 1000, reqId="1"))
+    [(message, _)] = client.messages
+    size = stats.info()["Host.ping2"]["response_size"]
+    assert size["count"] == 1
+    assert size["sum"] == len(b"".join(message))
+
+
+class FakeBridge(object):
+
+    def __init__(self, error=None):
+        self._error = error
+
+    def dispatch(self, method):
+        def verb():
+            if self._error:
+                raise self._error
+        return verb
+
+    def register_server_address(self, address):
+        pass
+
+    def unregister_server_address(self):
+        pass
+
+
+class FakeCif(object):
+    ready = True
+
+
+class FakeContext(object):
+
+    context = None
+    server_address = None
+
+    def requestDone(self, response):
+        self.response = response
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, message, request_ids=()):
+        self.messages.append((message, request_ids))
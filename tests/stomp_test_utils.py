@@ -84,6 +84,9 @@ class FakeAsyncDispatcher(object):
     def send(self, data):
         return len(data)
 
+    def send_buffers(self, buffers):
+        return sum(len(buf) for buf in buffers)
+
     def setHeartBeat(self, outgoing, incoming=0):
         pass
 
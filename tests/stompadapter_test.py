@@ -31,7 +31,9 @@ from yajsonrpc.stomp import \
     Headers, \
     SUBSCRIPTION_ID_REQUEST
 from yajsonrpc.stomp import AsyncDispatcher
+from yajsonrpc.stomp import Parser
 from yajsonrpc.stompserver import StompAdapterImpl
+from yajsonrpc.stompserver import StompServer
 from stomp_test_utils import (
     FakeAsyncClient,
     FakeAsyncDispatcher,
@@ -461,3 +463,84 @@ class ServerTimeoutTests(TestCaseBase):
 
         self.assertEqual(len(adapter._sub_ids), 0)
         self.assertEqual(len(destinations), 0)
+
+
+class ServerSendTests(TestCaseBase):
+
+    def _subscribe(self, destinations, destination, sub_id):
+        client = FakeAsyncClient()
+        subscription = FakeSubscription(destination, sub_id)
+        subscription.set_client(client)
+        destinations[destination].append(subscription)
+        return client
+
+    def _frames(self, client):
+        parser = Parser()
+        while not client.empty():
+            parser.parse(client.pop_message().encode())
+        frames = []
+        while parser.pending:
+            frames.append(parser.popFrame())
+        return frames
+
+    def test_send_response(self):
+        destinations = defaultdict(list)
+        client1 = self._subscribe(destinations, 'jms.topic.replies', 'sub1')
+        client2 = self._subscribe(destinations, 'jms.topic.replies', 'sub2')
+        other = self._subscribe(
+            destinations, 'jms.topic.vdsm_responses', 'sub3')
+
+        server = StompServer(Reactor(), destinations)
+        server._req_dest['req1'] = 'jms.topic.replies'
+        body = b'{"jsonrpc": "2.0", "id": "req1", "result": true}'
+        server.send(body, request_ids=['req1'])
+
+        self.assertEqual(server._req_dest, {})
+        self.assertTrue(other.empty())
+
+        for client, sub_id in ((client1, 'sub1'), (client2, 'sub2')):
+            frames = self._frames(client)
+            self.assertEqual(len(frames), 1)
+            self.assertEqual(frames[0].command, Command.MESSAGE)
+            self.assertEqual(frames[0].headers, {
+                Headers.DESTINATION: 'jms.topic.replies',
+                Headers.CONTENT_TYPE: 'application/json',
+                Headers.CONTENT_LENGTH: str(len(body)),
+                Headers.SUBSCRIPTION: sub_id,
+            })
+            self.assertEqual(frames[0].body, body)
+
+    def test_send_batch_response(self):
+        destinations = defaultdict(list)
+        client = self._subscribe(destinations, 'jms.topic.replies', 'sub1')
+
+        server = StompServer(Reactor(), destinations)
+        server._req_dest['req1'] = 'jms.topic.replies'
+        server._req_dest['req2'] = 'jms.topic.replies'
+        server.send(b'[]', request_ids=['req1', 'req2'])
+
+        self.assertEqual(server._req_dest, {})
+        self.assertEqual(len(self._frames(client)), 1)
+
+    def test_send_event(self):
+        destinations = defaultdict(list)
+        client = self._subscribe(destinations, 'jms.queue.events', 'sub1')
+
+        server = StompServer(Reactor(), destinations)
+        server.send(u'{"jsonrpc": "2.0", "method": "event"}',
+                    'jms.queue.events')
+
+        frames = self._frames(client)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frames[0].body,
+                         b'{"jsonrpc": "2.0", "method": "event"}')
+
+    def test_send_closed_client(self):
+        destinations = defaultdict(list)
+        client = self._subscribe(destinations, 'jms.queue.events', 'sub1')
+        destinations['jms.queue.events'][0].client.close()
+
+        server = StompServer(Reactor(), destinations)
+        server.send(b'{}', 'jms.queue.events')
+
+        self.assertTrue(client.empty())
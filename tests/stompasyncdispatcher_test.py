@@ -28,15 +28,39 @@ from stomp_test_utils import (
     FakeFrameHandler,
     FakeTimeGen
 )
+from yajsonrpc import stomp
 from yajsonrpc.stomp import (
     AsyncDispatcher,
     Command,
+    EncodedFrame,
     Frame,
     Headers,
     DEFAULT_INTERVAL
 )
 
 
+class WritingDispatcher(object):
+    """
+    Records the buffers sent, sending at most max_send bytes in every
+    call.
+    """
+
+    def __init__(self, max_send=None):
+        self.max_send = max_send
+        self.calls = []
+
+    def send_buffers(self, buffers):
+        data = b"".join(buffers)
+        if self.max_send is not None:
+            data = data[:self.max_send]
+        self.calls.append((list(buffers), data))
+        return len(data)
+
+    @property
+    def data(self):
+        return b"".join(data for _, data in self.calls)
+
+
 class AsyncDispatcherTest(TestCaseBase):
 
     def test_handle_connect(self):
@@ -137,6 +161,66 @@ class AsyncDispatcherTest(TestCaseBase):
         dispatcher.handle_write(FakeAsyncDispatcher(''))
         self.assertFalse(frame_handler.has_outgoing_messages)
 
+    def test_handle_write_coalesce(self):
+        frame_handler = FakeFrameHandler()
+        frames = [EncodedFrame(Command.MESSAGE, [b"head%d" % i, b"body%d" % i])
+                  for i in range(3)]
+        for frame in frames:
+            frame_handler.queue_frame(frame)
+
+        dispatcher = AsyncDispatcher(FakeConnection(), frame_handler)
+        writer = WritingDispatcher()
+        dispatcher.handle_write(writer)
+
+        # All frames sent in one call, without joining the buffers.
+        self.assertEqual(len(writer.calls), 1)
+        self.assertEqual(writer.calls[0][0], [b"head0", b"body0",
+                                              b"head1", b"body1",
+                                              b"head2", b"body2"])
+        self.assertFalse(frame_handler.has_outgoing_messages)
+        self.assertFalse(dispatcher.writable(None))
+
+    def test_handle_write_partial(self):
+        frame_handler = FakeFrameHandler()
+        frames = [EncodedFrame(Command.MESSAGE, [b"head%d" % i, b"body%d" % i])
+                  for i in range(3)]
+        for frame in frames:
+            frame_handler.queue_frame(frame)
+
+        dispatcher = AsyncDispatcher(FakeConnection(), frame_handler)
+        writer = WritingDispatcher(max_send=7)
+        while dispatcher.writable(None):
+            dispatcher.handle_write(writer)
+
+        self.assertEqual(writer.data, b"".join(f.encode() for f in frames))
+        self.assertEqual(len(writer.calls), 5)
+
+    def test_handle_write_large_frame(self):
+        frame_handler = FakeFrameHandler()
+        body = b"x" * stomp.WRITE_SIZE
+        frame_handler.queue_frame(EncodedFrame(Command.MESSAGE, [b"small"]))
+        frame_handler.queue_frame(EncodedFrame(Command.MESSAGE, [body]))
+
+        dispatcher = AsyncDispatcher(FakeConnection(), frame_handler)
+        writer = WritingDispatcher()
+        dispatcher.handle_write(writer)
+
+        # The large buffer is sent alone.
+        self.assertEqual([buffers for buffers, _ in writer.calls],
+                         [[b"small"], [body]])
+
+    def test_handle_write_resend(self):
+        frame_handler = FakeFrameHandler()
+        resent = []
+        frame_handler.queue_resend = resent.append
+        frame = EncodedFrame(Command.SEND, [b"data"])
+        frame_handler.queue_frame(frame)
+
+        dispatcher = AsyncDispatcher(FakeConnection(), frame_handler)
+        dispatcher.handle_write(WritingDispatcher(max_send=0))
+
+        self.assertEqual(resent, [frame])
+
     def test_handle_close(self):
         connection = FakeConnection()
         dispatcher = AsyncDispatcher(connection, FakeFrameHandler())
@@ -0,0 +1,125 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import pytest
+
+from yajsonrpc import stomp
+
+BODY = b'{"jsonrpc": "2.0"}'
+
+FRAME = (
+    b"SEND\n"
+    b"destination:jms.topic.vdsm_requests\n"
+    b"content-length:18\n"
+    b"\n" + BODY + b"\0"
+)
+
+
+def parse_chunks(data, size):
+    parser = stomp.Parser()
+    for i in range(0, len(data), size):
+        parser.parse(data[i:i + size])
+    frames = []
+    while parser.pending:
+        frames.append(parser.popFrame())
+    return parser, frames
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 4096])
+def test_content_length(size):
+    parser, frames = parse_chunks(FRAME, size)
+    assert len(frames) == 1
+    frame = frames[0]
+    assert frame.command == stomp.Command.SEND
+    assert frame.headers == {
+        "destination": "jms.topic.vdsm_requests",
+        "content-length": "18",
+    }
+    assert frame.body == BODY
+    assert parser._buffer == bytearray()
+
+
+@pytest.mark.parametrize("size", [1, 3, 4096])
+def test_no_content_length(size):
+    data = b"MESSAGE\r\nsubscription:sub-id\r\n\r\nbody\0"
+    parser, frames = parse_chunks(data, size)
+    assert len(frames) == 1
+    assert frames[0].command == stomp.Command.MESSAGE
+    assert frames[0].headers == {"subscription": "sub-id"}
+    assert frames[0].body == b"body"
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_multiple_frames_and_heartbeats(size):
+    data = b"\n" + FRAME + b"\n\n" + FRAME + b"\n"
+    parser, frames = parse_chunks(data, size)
+    assert len(frames) == 2
+    assert [f.body for f in frames] == [BODY, BODY]
+
+
+def test_partial_frame():
+    parser = stomp.Parser()
+    parser.parse(FRAME + FRAME[:-5])
+    assert parser.pending == 1
+    parser.parse(FRAME[-5:])
+    assert parser.pending == 2
+
+
+def test_escaped_header():
+    parser = stomp.Parser()
+    parser.parse(b"SEND\nkey:a\\cb\\nc\n\n\0")
+    assert parser.popFrame().headers["key"] == "a:b\nc"
+
+
+def test_missing_frame_end():
+    parser = stomp.Parser()
+    with pytest.raises(RuntimeError):
+        parser.parse(b"SEND\ncontent-length:2\n\nabc\0")
+
+
+def test_compact():
+    parser = stomp.Parser()
+    parser.parse(FRAME + FRAME[:10])
+    # The parsed data was removed, leaving the incomplete header.
+    assert parser._buffer == bytearray(FRAME[5:10])
+    parser.parse(FRAME[10:])
+    assert parser.pending == 2
+    assert parser._buffer == bytearray()
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("size_mb", [1, 4, 16])
+def test_benchmark_large_frame(size_mb):
+    body = b"x" * (size_mb * 1024**2)
+    data = (b"MESSAGE\ncontent-length:%d\n\n" % len(body)) + body + b"\0"
+    chunk = 4096
+    start = time.time()
+    parser, frames = parse_chunks(data, chunk)
+    elapsed = time.time() - start
+    assert frames[0].body == body
+    reads = len(data) // chunk + 1
+    print("%d MiB frame in %d reads in %.6f seconds (%.6f seconds per read)"
+          % (size_mb, reads, elapsed, elapsed / reads))
@@ -580,6 +580,50 @@ class TestBufferedReader:
         assert complete_calls[0] == 1
 
 
+class TestLineReader:
+
+    def setup_method(self, m):
+        self.loop = asyncevent.EventLoop()
+        self.lines = []
+
+    def teardown_method(self, m):
+        self.loop.close()
+
+    @pytest.mark.parametrize("data, lines", [
+        (b"", []),
+        (b"line\n", [b"line"]),
+        (b"1\n2\n\n3\n", [b"1", b"2", b"", b"3"]),
+        (b"complete\npartial", [b"complete"]),
+        (b"x" * 10000 + b"\n", [b"x" * 10000]),
+    ])
+    def test_read(self, data, lines):
+        r, w = os.pipe()
+        reader = self.loop.create_dispatcher(
+            asyncevent.LineReader, r, self.lines.append, self.loop.stop,
+            bufsize=64)
+        with closing(reader):
+            os.close(r)  # Dupped by LineReader
+            Sender(self.loop, w, data, 100)
+            self.loop.run_forever()
+            assert self.lines == lines
+
+    def test_close_does_not_call_closed(self):
+        closed_calls = [0]
+
+        def closed():
+            closed_calls[0] += 1
+
+        r, w = os.pipe()
+        reader = self.loop.create_dispatcher(
+            asyncevent.LineReader, r, self.lines.append, closed)
+        os.close(r)
+        os.close(w)
+        reader.close()
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+        assert closed_calls[0] == 0
+
+
 class Sender(object):
 
     def __init__(self, loop, fd, data, bufsize):
@@ -353,6 +353,103 @@ class TestDirectioCheckerTimings(VdsmTestCase):
             self.assertRaises(exception.MiscFileReadException, res.delay)
 
 
+class TestHelperChecker(VdsmTestCase):
+
+    def setUp(self):
+        self.loop = asyncevent.EventLoop()
+        self.pool = check.HelperPool(self.loop, max_idle=2)
+        self.results = []
+        self.checks = 1
+
+    def tearDown(self):
+        self.pool.close()
+        self.loop.close()
+
+    def complete(self, result):
+        self.results.append(result)
+        if len(self.results) == self.checks:
+            self.loop.stop()
+
+    def test_path_missing(self):
+        checker = check.HelperChecker(self.loop, "/no/such/path",
+                                      self.complete, self.pool)
+        checker.start()
+        self.loop.run_forever()
+        with self.assertRaises(exception.MiscFileReadException) as ctx:
+            self.results[0].delay()
+        self.assertIn("/no/such/path", str(ctx.exception))
+
+    def test_path_ok(self):
+        with temporaryPath(data=b"blah") as path:
+            checker = check.HelperChecker(self.loop, path, self.complete,
+                                          self.pool)
+            checker.start()
+            self.loop.run_forever()
+            delay = self.results[0].delay()
+            self.assertEqual(type(delay), float)
+
+    def test_helper_reused(self):
+        self.checks = 5
+        pids = set()
+
+        def complete(result):
+            pids.update(h._proc.pid for h in self.pool._idle)
+            self.complete(result)
+
+        with temporaryPath(data=b"blah") as path:
+            checker = check.HelperChecker(self.loop, path, complete,
+                                          self.pool, interval=0.05)
+            checker.start()
+            self.loop.run_forever()
+        self.assertEqual(len(self.results), 5)
+        self.assertEqual(len(pids), 1)
+
+    def test_helper_terminated(self):
+        self.checks = 2
+        helpers = []
+
+        def complete(result):
+            helpers.extend(h._proc.pid for h in self.pool._idle)
+            if len(self.results) == 0:
+                # Terminate the idle helper before the next check.
+                self.pool._idle[0]._proc.kill()
+            self.complete(result)
+
+        with temporaryPath(data=b"blah") as path:
+            checker = check.HelperChecker(self.loop, path, complete,
+                                          self.pool, interval=0.2)
+            checker.start()
+            self.loop.run_forever()
+        for result in self.results:
+            self.assertEqual(type(result.delay()), float)
+        self.assertNotEqual(helpers[0], helpers[1])
+
+    def test_blocked_path(self):
+        # Opening a fifo blocks until the fifo is opened for writing,
+        # simulating unresponsive storage. Checking other paths must not be
+        # blocked.
+        self.checks = 3
+        with temporaryPath() as path, temporaryPath() as blocked:
+            os.unlink(blocked)
+            os.mkfifo(blocked)
+            checker = check.HelperChecker(self.loop, blocked, self.complete,
+                                          self.pool, interval=0.2)
+            checker.start()
+            checker = check.HelperChecker(self.loop, path, self.complete,
+                                          self.pool, interval=0.2)
+            checker.start()
+            self.loop.run_forever()
+            # Unblock the helper.
+            with open(blocked, "w"):
+                pass
+
+        results = {r.path: r for r in self.results}
+        with self.assertRaises(exception.MiscFileReadException) as ctx:
+            results[blocked].delay()
+        self.assertIn("Read timeout", str(ctx.exception))
+        self.assertEqual(type(results[path].delay()), float)
+
+
 @expandPermutations
 class TestCheckResult(VdsmTestCase):
 
@@ -406,6 +503,20 @@ class TestCheckResult(VdsmTestCase):
         self.assertRaises(exception.MiscFileReadException, result.delay)
 
 
+class TestHelperCheckResult(VdsmTestCase):
+
+    def test_success(self):
+        result = check.HelperCheckResult("/path", 0, None, 0, 0, 0.002)
+        self.assertEqual(result.delay(), 0.002)
+
+    def test_error(self):
+        result = check.HelperCheckResult("/path", 2, "REASON", 0, 0, None)
+        with self.assertRaises(exception.MiscFileReadException) as ctx:
+            result.delay()
+        self.assertIn("/path", str(ctx.exception))
+        self.assertIn("REASON", str(ctx.exception))
+
+
 class TestCheckService(VdsmTestCase):
 
     def setUp(self):
@@ -458,6 +569,39 @@ class TestCheckService(VdsmTestCase):
             self.assertFalse(self.service.is_checking("/path"))
 
 
+class TestCheckServiceHelper(VdsmTestCase):
+
+    def setUp(self):
+        self.service = check.CheckService(backend=check.HELPER)
+        self.service.start()
+        self.result = None
+        self.completed = threading.Event()
+
+    def tearDown(self):
+        self.service.stop()
+
+    def complete(self, result):
+        self.result = result
+        self.completed.set()
+
+    def test_start_checking(self):
+        with temporaryPath(data=b"blah") as path:
+            self.service.start_checking(path, self.complete)
+            self.assertTrue(self.completed.wait(5.0))
+            self.assertEqual(type(self.result.delay()), float)
+
+    def test_stop_checking_and_wait(self):
+        with temporaryPath(data=b"blah") as path:
+            self.service.start_checking(path, self.complete)
+            self.assertTrue(self.service.stop_checking(path, timeout=5.0))
+            self.assertFalse(self.service.is_checking(path))
+
+
+def test_invalid_backend():
+    with pytest.raises(ValueError):
+        check.CheckService(backend="no-such-backend")
+
+
 @contextmanager
 def fake_dd(delay):
     """
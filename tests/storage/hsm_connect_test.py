@@ -22,10 +22,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import threading
+
 import pytest
 
 from storage.storagetestlib import FakeStorageDomainCache
+from testlib import make_config
 
+from vdsm.common import concurrent
 from vdsm.storage import hsm
 from vdsm.storage import sd
 from vdsm.storage import storageServer
@@ -35,16 +39,21 @@ from vdsm.storage import task
 class FakeConnectHSM(hsm.HSM):
     def __init__(self):
         self.prefetched_domains = {}
-        pass
+        self.prefetched_connections = []
 
     def _connectStorageOverIser(self, conDef, conObj, conTypeId):
         pass
 
     def _prefetchDomains(self, domType, conObj):
+        self.prefetched_connections.append(conObj)
         return self.prefetched_domains
 
 
 class FakeConnection(object):
+    # Used to block "waiting-" and "hanging-" connections.
+    barrier = None
+    event = None
+
     def __init__(self, conInfo):
         self.conInfo = conInfo
         self.connected = False
@@ -56,6 +65,13 @@ class FakeConnection(object):
     def connect(self):
         if self.id.startswith("failing-"):
             raise Exception("Connection failed")
+        if self.id.startswith("waiting-"):
+            self.barrier.wait(timeout=5)
+        if self.id.startswith("hanging-"):
+            if not self.event.wait(5):
+                raise Exception("Connection timed out")
+        if self.id.startswith("releasing-"):
+            self.event.set()
         self.connected = True
 
     def disconnect(self):
@@ -84,6 +100,8 @@ def fake_hsm(monkeypatch):
     monkeypatch.setattr(hsm.vars, 'task', task.Task("fake-task-id"))
     monkeypatch.setattr(storageServer, 'ConnectionFactory',
                         FakeConnectionFactory())
+    monkeypatch.setattr(hsm, 'config', make_config(
+        [('irs', 'connection_timeout', '1')]))
     return FakeConnectHSM()
 
 
@@ -180,3 +198,50 @@ def test_cache_update(fake_hsm):
     sc = storageServer.ConnectionFactory.connections
     assert sc['1'].connected
     assert hsm.sdCache.knownSDs['sd-uuid-1'] == nfs_find_method
+
+
+def test_concurrent_connections(fake_hsm, monkeypatch):
+    # Every connection waits until all the connections are connecting.
+    monkeypatch.setattr(FakeConnection, "barrier", concurrent.Barrier(4))
+    connections = [{'id': 'waiting-%d' % i, 'connection': '/my_sd%d' % i}
+                   for i in range(4)]
+    result = fake_hsm.connectStorageServer(
+        sd.NFS_DOMAIN, 'SPUID', connections, None)
+    assert result == {
+        'statuslist': [{'status': 0, 'id': con['id']} for con in connections]
+    }
+
+
+def test_connection_timeout_releases_worker(fake_hsm, monkeypatch):
+    # With a single worker, the releasing connection can start only after
+    # the hanging connection released its worker. The hanging connection
+    # completes when the releasing connection is started, and must not be
+    # reported as failed while it is running.
+    monkeypatch.setattr(hsm, 'config', make_config(
+        [('irs', 'connection_timeout', '1'),
+         ('irs', 'connection_workers', '1')]))
+    monkeypatch.setattr(FakeConnection, "event", threading.Event())
+    connections = [
+        {'id': 'hanging-1', 'connection': '/my_sd'},
+        {'id': 'releasing-1', 'connection': '/my_sd2'},
+    ]
+    result = fake_hsm.connectStorageServer(
+        sd.NFS_DOMAIN, 'SPUID', connections, None)
+    assert result == {
+        'statuslist': [
+            {'status': 0, 'id': 'hanging-1'},
+            {'status': 0, 'id': 'releasing-1'},
+        ]
+    }
+    assert len(fake_hsm.prefetched_connections) == 2
+
+
+@pytest.mark.parametrize("conn_type,prefetch_calls", [
+    (sd.NFS_DOMAIN, 3),
+    (sd.ISCSI_DOMAIN, 1),
+])
+def test_prefetch(fake_hsm, conn_type, prefetch_calls):
+    connections = [{'id': str(i), 'connection': 'test%d' % i, 'port': '3260'}
+                   for i in range(3)]
+    fake_hsm.connectStorageServer(conn_type, 'SPUID', connections, None)
+    assert len(fake_hsm.prefetched_connections) == prefetch_calls
@@ -209,3 +209,31 @@ class TestVerifyUntrustedVolume(object):
             make_file_volume(env.sd_manifest, self.SIZE, img_id, vol_id,
                              vol_format=vol_fmt)
             yield env.sd_manifest.produceVolume(img_id, vol_id)
+
+
+class FakeMailbox(object):
+
+    def stats(self):
+        return {"extend_latency": {"count": 1}}
+
+
+class FakeConnectedPool(object):
+
+    def __init__(self, mailer):
+        self.hsmMailer = mailer
+
+    def is_connected(self):
+        return True
+
+
+def test_mailbox_stats_disconnected():
+    assert hsm.HSM.mailbox_stats() == {}
+
+
+@pytest.mark.parametrize("mailer,stats", [
+    (None, {}),
+    (FakeMailbox(), {"extend_latency": {"count": 1}}),
+])
+def test_mailbox_stats(monkeypatch, mailer, stats):
+    monkeypatch.setattr(hsm.HSM, "_pool", FakeConnectedPool(mailer))
+    assert hsm.HSM.mailbox_stats() == stats
@@ -36,6 +36,7 @@ from vdsm.storage import constants as sc
 from vdsm.storage import exception as se
 from vdsm.storage import lvm
 from vdsm.storage import misc
+from vdsm.storage import udev
 
 from . marks import requires_root, xfail_python3
 
@@ -494,6 +495,289 @@ def test_change_read_only_mode(fake_devices, fake_runner, workers):
     assert elapsed > fake_runner.delay * 2
 
 
+def lvs_output(vg_name, *lv_names):
+    return [
+        "  lv-uuid-{lv}|{lv}|{vg}|-wi-------|134217728|0|/dev/mapper/a(0)|"
+        .format(vg=vg_name, lv=lv_name)
+        for lv_name in lv_names
+    ]
+
+
+def test_incremental_reload_stale_lvs(fake_devices, fake_runner):
+    lc = lvm.LVMCache(incremental=True)
+
+    # First access loads all the LVs in the VG.
+    fake_runner.out = lvs_output("vg", "lv1", "lv2", "lv3")
+    lvs = lc.getLv("vg")
+    assert sorted(lv.name for lv in lvs) == ["lv1", "lv2", "lv3"]
+    assert fake_runner.calls[-1][0][-1] == "vg"
+
+    # Nothing is stale, so the cache is used.
+    del fake_runner.calls[:]
+    lc.getLv("vg")
+    lc.getLv("vg", "lv2")
+    assert fake_runner.calls == []
+
+    # Only the stale LV is reloaded.
+    lc._invalidatelvs("vg", "lv2")
+    fake_runner.out = lvs_output("vg", "lv2")
+    lvs = lc.getLv("vg")
+    assert sorted(lv.name for lv in lvs) == ["lv1", "lv2", "lv3"]
+    assert len(fake_runner.calls) == 1
+    assert fake_runner.calls[0][0][-1] == "vg/lv2"
+
+
+def test_incremental_reload_invalidated_vg(fake_devices, fake_runner):
+    lc = lvm.LVMCache(incremental=True)
+    fake_runner.out = lvs_output("vg", "lv1", "lv2")
+    lc.getLv("vg")
+
+    # Invalidating all the LVs in the VG reloads the entire VG, detecting
+    # LVs created on another host.
+    lc._invalidatelvs("vg")
+    del fake_runner.calls[:]
+    fake_runner.out = lvs_output("vg", "lv1", "lv2", "lv3")
+    lvs = lc.getLv("vg")
+    assert sorted(lv.name for lv in lvs) == ["lv1", "lv2", "lv3"]
+    assert len(fake_runner.calls) == 1
+    assert fake_runner.calls[0][0][-1] == "vg"
+
+
+def test_incremental_reload_removed_lv(fake_devices, fake_runner):
+    lc = lvm.LVMCache(incremental=True)
+    fake_runner.out = lvs_output("vg", "lv1", "lv2")
+    lc.getLv("vg")
+
+    # lv2 was removed on another host; reloading it fails, so the entire VG
+    # is reloaded.
+    lc._invalidatelvs("vg", "lv2")
+    del fake_runner.calls[:]
+    fake_runner.retries = 1
+    fake_runner.out = lvs_output("vg", "lv1")
+    lvs = lc.getLv("vg")
+    assert [lv.name for lv in lvs] == ["lv1"]
+    assert [cmd[-1] for cmd, _ in fake_runner.calls] == ["vg/lv2", "vg"]
+
+
+def test_vg_seqno(fake_devices, fake_runner):
+    lc = lvm.LVMCache()
+    vg1 = lc.vg_seqno("vg1")
+    vg2 = lc.vg_seqno("vg2")
+
+    # Invalidating a VG changes only its sequence number.
+    lc._invalidatevgs("vg1")
+    assert lc.vg_seqno("vg1") > vg1
+    assert lc.vg_seqno("vg2") == vg2
+
+    # Invalidating LVs changes the sequence number of their VG.
+    vg1 = lc.vg_seqno("vg1")
+    lc._invalidatelvs("vg2", "lv1")
+    assert lc.vg_seqno("vg1") == vg1
+    assert lc.vg_seqno("vg2") > vg2
+
+    # Reloading does not change the sequence number.
+    vg2 = lc.vg_seqno("vg2")
+    fake_runner.out = lvs_output("vg2", "lv1")
+    lc.getLv("vg2", "lv1")
+    assert lc.vg_seqno("vg2") == vg2
+
+    # Reloading LVs modified, added or removed by another host changes the
+    # sequence number.
+    lc._invalidatelvs("vg2")
+    lc.getLv("vg2")
+    vg2 = lc.vg_seqno("vg2")
+    fake_runner.out = lvs_output("vg2", "lv1", "lv2")
+    lc._reloadlvs("vg2")
+    assert lc.vg_seqno("vg2") > vg2
+
+    vg2 = lc.vg_seqno("vg2")
+    fake_runner.out = lvs_output("vg2", "lv2")
+    lc._reloadlvs("vg2")
+    assert lc.vg_seqno("vg2") > vg2
+
+    # Reloading unchanged LVs does not change the sequence number.
+    vg2 = lc.vg_seqno("vg2")
+    lc._reloadlvs("vg2")
+    assert lc.vg_seqno("vg2") == vg2
+
+    # Flushing the cache changes all sequence numbers, including unknown VGs.
+    vg3 = lc.vg_seqno("vg3")
+    lc.flush()
+    assert lc.vg_seqno("vg1") > vg1
+    assert lc.vg_seqno("vg2") > vg2
+    assert lc.vg_seqno("vg3") > vg3
+
+
+@pytest.mark.parametrize("event_type", [udev.LV_CHANGED, udev.LV_REMOVED])
+def test_cache_monitor(fake_devices, fake_runner, event_type):
+    lc = lvm.LVMCache(incremental=True)
+    fake_runner.out = lvs_output("vg", "lv1", "lv2")
+    lc.getLv("vg")
+    seqno = lc.vg_seqno("vg")
+
+    monitor = lvm.CacheMonitor(lc)
+    monitor.handle(udev.LVMEvent(event_type, "vg", "lv1", 42))
+
+    assert isinstance(lc._lvs[("vg", "lv1")], lvm.Stub)
+    assert not isinstance(lc._lvs[("vg", "lv2")], lvm.Stub)
+    assert lc.vg_seqno("vg") > seqno
+
+
+def test_cache_monitor_ignore_multipath_events(fake_devices, fake_runner):
+    lc = lvm.LVMCache(incremental=True)
+    fake_runner.out = lvs_output("vg", "lv1")
+    lc.getLv("vg")
+    seqno = lc.vg_seqno("vg")
+
+    monitor = lvm.CacheMonitor(lc)
+    monitor.handle(udev.MultipathEvent(udev.PATH_FAILED, "uuid", "sda", 1, 1))
+
+    assert not isinstance(lc._lvs[("vg", "lv1")], lvm.Stub)
+    assert lc.vg_seqno("vg") == seqno
+
+
+class FailingLVsRunner(FakeRunner):
+    """
+    Fail commands changing any of the failing LVs.
+    """
+
+    def __init__(self, failing=()):
+        super(FailingLVsRunner, self).__init__()
+        self.failing = failing
+
+    def __call__(self, cmd, **kwargs):
+        self.calls.append((cmd, kwargs))
+        if any(lv in cmd for lv in self.failing):
+            return 5, [], [b"fake error"]
+        return 0, [], []
+
+
+@pytest.fixture
+def batch_env(monkeypatch, fake_devices):
+    runner = FailingLVsRunner()
+    monkeypatch.setattr(misc, "execCmd", runner)
+    monkeypatch.setattr(lvm.LVMCache, "RETRY_DELAY", 0)
+    monkeypatch.setattr(lvm, "_lvminfo", lvm.LVMCache())
+    active = set()
+    monkeypatch.setattr(
+        lvm, "_isLVActive", lambda vg, lv: "%s/%s" % (vg, lv) in active)
+    runner.active = active
+    return runner
+
+
+def lvchange_args(cmd):
+    # Drop "lvm lvchange --config CONFIG".
+    return cmd[4:]
+
+
+def test_batch_activate(batch_env):
+    batch_env.active.add("vg/lv1")
+    batch = lvm.LVBatch("vg")
+    batch.activate(["lv1", "lv2", "lv3"])
+    assert batch.activating == ("lv2", "lv3")
+    assert batch.commit() == {}
+
+    cmds = [lvchange_args(cmd) for cmd, _ in batch_env.calls]
+    assert cmds == [
+        ["--refresh", "vg/lv1"],
+        ["--autobackup", "n", "--available", "y", "vg/lv2", "vg/lv3"],
+    ]
+
+
+def test_batch_activate_no_refresh(batch_env):
+    batch_env.active.add("vg/lv1")
+    batch = lvm.LVBatch("vg")
+    batch.activate(["lv1", "lv2"], refresh=False)
+    batch.commit()
+
+    cmds = [lvchange_args(cmd) for cmd, _ in batch_env.calls]
+    assert cmds == [
+        ["--autobackup", "n", "--available", "y", "vg/lv2"],
+    ]
+
+
+def test_batch_deactivate(batch_env):
+    batch_env.active.update(("vg/lv1", "vg/lv2"))
+    batch = lvm.LVBatch("vg")
+    batch.deactivate(["lv1", "lv2", "lv3"])
+    batch.commit()
+
+    cmds = [lvchange_args(cmd) for cmd, _ in batch_env.calls]
+    assert cmds == [
+        ["--autobackup", "n", "--available", "n", "vg/lv1", "vg/lv2"],
+    ]
+
+
+def test_batch_change_tags(batch_env):
+    batch = lvm.LVBatch("vg")
+    batch.change_tags(["lv1", "lv2"], delTags=["old"], addTags=["new"])
+    batch.change_tags("lv3", delTags=["old"], addTags=["new"])
+    batch.change_tags("lv1", addTags=["other"])
+    batch.commit()
+
+    cmds = [lvchange_args(cmd) for cmd, _ in batch_env.calls]
+    assert cmds == [
+        ["--autobackup", "n", "--deltag", "old", "--addtag", "new",
+         "vg/lv1", "vg/lv2", "vg/lv3"],
+        ["--autobackup", "n", "--addtag", "other", "vg/lv1"],
+    ]
+
+
+def test_batch_change_tags_conflict(batch_env):
+    batch = lvm.LVBatch("vg")
+    with pytest.raises(se.LogicalVolumeReplaceTagError):
+        batch.change_tags("lv1", delTags=["tag"], addTags=["tag"])
+
+
+def test_batch_failure_retry_every_lv(batch_env):
+    batch_env.failing = ["vg/lv2"]
+    batch = lvm.LVBatch("vg")
+    batch.change_tags(["lv1", "lv2", "lv3"], addTags=["tag"])
+    batch.activate(["lv1", "lv2", "lv3"])
+    errors = batch.commit()
+
+    assert list(errors) == ["lv2"]
+    assert isinstance(errors["lv2"], se.LogicalVolumeReplaceTagError)
+
+    # The failed batch command is retried for every lv, and activation is
+    # skipped for the lv which failed.
+    cmds = [lvchange_args(cmd)[-3:] for cmd, _ in batch_env.calls]
+    assert cmds == [
+        ["vg/lv1", "vg/lv2", "vg/lv3"],
+        ["--addtag", "tag", "vg/lv1"],
+        ["--addtag", "tag", "vg/lv2"],
+        ["--addtag", "tag", "vg/lv3"],
+        ["y", "vg/lv1", "vg/lv3"],
+    ]
+
+
+def test_batch_raise_error(batch_env):
+    batch_env.failing = ["vg/lv1"]
+    batch = lvm.LVBatch("vg")
+    batch.activate(["lv1"])
+    with pytest.raises(se.CannotActivateLogicalVolumes):
+        batch.commit(raise_error=True)
+
+    # A single lv is not retried.
+    assert len(batch_env.calls) == 1
+
+
+def test_batch_commit_clears_changes(batch_env):
+    batch = lvm.LVBatch("vg")
+    batch.activate(["lv1"])
+    batch.commit()
+    del batch_env.calls[:]
+
+    batch.commit()
+    assert batch_env.calls == []
+
+
+def test_activate_lvs(batch_env):
+    batch_env.active.add("vg/lv1")
+    assert lvm.activateLVs("vg", ["lv1", "lv2"]) == ["lv2"]
+    assert len(batch_env.calls) == 2
+
+
 @requires_root
 @xfail_python3
 @pytest.mark.root
@@ -0,0 +1,257 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301  USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import os
+import sys
+
+import pytest
+
+from vdsm.common import concurrent
+from vdsm.storage import lvm
+from vdsm.storage import lvmshell
+from vdsm.storage import misc
+
+FAKE_LVM_SHELL = os.path.join(os.path.dirname(__file__), "fake-lvm-shell")
+
+SEPARATOR = ("--separator", "|")
+
+
+def fake_session(timeout=lvmshell.DEFAULT_TIMEOUT):
+    return lvmshell.Session(
+        cmd=(sys.executable, FAKE_LVM_SHELL), sudo=False, timeout=timeout)
+
+
+@pytest.fixture
+def session():
+    s = fake_session(timeout=2)
+    s.start()
+    try:
+        yield s
+    finally:
+        s.close()
+
+
+def test_session_report(session):
+    rc, out, err = session.run(("lvm", "lvs") + SEPARATOR)
+    assert rc == 0
+    assert out == [b"  uuid-1|lv-1|vg", b"  uuid-2|lv-2|vg"]
+    assert err == []
+
+
+def test_session_report_format(session):
+    # The report format and the command log are requested, keeping the
+    # caller config.
+    rc, out, err = session.run(
+        ("lvm", "echo", "--config", 'devices { filter=["r|.*|"] }')
+        + SEPARATOR)
+    assert rc == 0
+    assert [line.strip() for line in out] == [
+        b"--reportformat",
+        b"json",
+        b"--config",
+        b'devices { filter=["r|.*|"] }' + lvmshell.LOG_CONFIG.encode("ascii"),
+        b"--separator",
+        b"|",
+    ]
+
+
+def test_session_no_report(session):
+    rc, out, err = session.run(("lvm", "lvchange", "vg/lv-1"))
+    assert rc == 0
+    assert out == [b"  Logical volume vg/lv-1 changed."]
+    assert err == []
+
+
+def test_session_failure(session):
+    rc, out, err = session.run(("lvm", "fail") + SEPARATOR)
+    assert rc == 5
+    assert out == []
+    assert err == [b'  Volume group "vg" not found']
+
+    # The session can be used after a failed command.
+    rc, out, err = session.run(("lvm", "lvs") + SEPARATOR)
+    assert rc == 0
+
+
+def test_session_crash(session):
+    with pytest.raises(lvmshell.Error):
+        session.run(("lvm", "crash"))
+    assert not session.alive
+
+
+def test_session_timeout():
+    session = fake_session(timeout=0.5)
+    session.start()
+    with pytest.raises(lvmshell.Timeout):
+        session.run(("lvm", "hang"))
+    assert not session.alive
+
+
+def test_session_start_error():
+    session = lvmshell.Session(
+        cmd=("/no/such/executable", "shell"), sudo=False)
+    with pytest.raises(lvmshell.Error):
+        session.start()
+    assert not session.alive
+
+
+@pytest.mark.parametrize("arg,expected", [
+    ("lvs", "lvs"),
+    ("vg/lv", "vg/lv"),
+    ("a b", "'a b'"),
+    ('filter=["r|.*|"]', '\'filter=["r|.*|"]\''),
+    ("it's", '"it\'s"'),
+    ("", "''"),
+])
+def test_quote(arg, expected):
+    assert lvmshell._quote(arg) == expected
+
+
+def test_quote_error():
+    with pytest.raises(lvmshell.Error):
+        lvmshell._quote("'\"")
+
+
+def test_pool_reuse_sessions():
+    started = []
+
+    def session(timeout):
+        s = fake_session(timeout=timeout)
+        started.append(s)
+        return s
+
+    pool = lvmshell.Pool(2, session=session)
+    try:
+        for i in range(5):
+            rc, out, err = pool.run(("lvm", "lvs") + SEPARATOR)
+            assert rc == 0
+        assert len(started) == 1
+    finally:
+        pool.close()
+    assert not started[0].alive
+
+
+def test_pool_concurrency():
+    started = []
+
+    def session(timeout):
+        s = fake_session(timeout=timeout)
+        started.append(s)
+        return s
+
+    pool = lvmshell.Pool(2, session=session)
+    results = []
+
+    def run():
+        for i in range(10):
+            results.append(pool.run(("lvm", "lvs") + SEPARATOR))
+
+    threads = [concurrent.thread(run) for i in range(4)]
+    try:
+        for t in threads:
+            t.start()
+    finally:
+        for t in threads:
+            t.join()
+        pool.close()
+
+    assert len(results) == 40
+    assert all(rc == 0 for rc, out, err in results)
+    assert len(started) <= 2
+
+
+def test_pool_replace_failed_session():
+    pool = lvmshell.Pool(1, session=lambda timeout: fake_session(timeout))
+    try:
+        with pytest.raises(lvmshell.Error):
+            pool.run(("lvm", "crash"))
+        rc, out, err = pool.run(("lvm", "lvs") + SEPARATOR)
+        assert rc == 0
+        assert pool.enabled
+    finally:
+        pool.close()
+
+
+def test_pool_disabled_on_start_error():
+    pool = lvmshell.Pool(1, session=lambda timeout: lvmshell.Session(
+        cmd=("/no/such/executable", "shell"), sudo=False))
+    with pytest.raises(lvmshell.NotSent):
+        pool.run(("lvm", "lvs"))
+    assert not pool.enabled
+
+
+class FailingPool(object):
+
+    enabled = True
+
+    def __init__(self, error):
+        self.error = error
+
+    def run(self, cmd):
+        raise self.error
+
+
+@pytest.fixture
+def exec_calls(monkeypatch):
+    calls = []
+
+    def fake_exec(cmd, sudo=False):
+        calls.append(cmd)
+        return 0, [], []
+
+    monkeypatch.setattr(misc, "execCmd", fake_exec)
+    monkeypatch.setattr(lvm.multipath, "getMPDevNamesIter", lambda: ())
+    return calls
+
+
+@pytest.mark.parametrize("error", [
+    lvmshell.Error("fake error"),
+    lvmshell.Timeout("fake timeout"),
+    lvmshell.NotSent("fake error"),
+])
+def test_cache_read_only_fallback_to_new_process(exec_calls, error):
+    lc = lvm.LVMCache(shell_pool=FailingPool(error))
+    rc, out, err = lc.cmd(["lvs"])
+    assert rc == 0
+    assert len(exec_calls) == 1
+
+
+def test_cache_not_sent_fallback_to_new_process(exec_calls):
+    lc = lvm.LVMCache(shell_pool=FailingPool(lvmshell.NotSent("fake error")))
+    rc, out, err = lc.cmd(["lvchange", "-an", "vg/lv"])
+    assert rc == 0
+    assert len(exec_calls) == 1
+
+
+@pytest.mark.parametrize("error", [
+    lvmshell.Error("fake error"),
+    lvmshell.Timeout("fake timeout"),
+])
+def test_cache_no_fallback_after_sending(exec_calls, error):
+    # The command may have run, running it again may fail or modify the
+    # metadata twice.
+    lc = lvm.LVMCache(shell_pool=FailingPool(error))
+    with pytest.raises(type(error)):
+        lc.cmd(["lvchange", "-an", "vg/lv"])
+    assert exec_calls == []
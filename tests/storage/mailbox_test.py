@@ -26,9 +26,11 @@ import contextlib
 import io
 import threading
 import struct
+import time
 
 import pytest
 
+from testlib import make_config
 from testlib import mock
 
 import vdsm.storage.mailbox as sm
@@ -45,8 +47,12 @@ SPUUID = '5d928855-b09b-47a7-b920-bd2d2eb5808c'
 MboxFiles = collections.namedtuple("MboxFiles", "inbox, outbox")
 
 
-@pytest.fixture()
-def mboxfiles(tmpdir):
+@pytest.fixture(params=["dd", "direct"])
+def mboxfiles(tmpdir, monkeypatch, request):
+    # Mailboxes are files in the tests; use direct I/O in the current process
+    # as done for block devices.
+    direct = request.param == "direct"
+    monkeypatch.setattr(sm, "_is_block_device", lambda path: direct)
     data = sm.EMPTYMAILBOX * MAX_HOSTS
     inbox = tmpdir.join('inbox')
     outbox = tmpdir.join('outbox')
@@ -94,6 +100,60 @@ def make_spm_mailbox(mboxfiles):
             raise RuntimeError('Timemout waiting for spm mailbox')
 
 
+@pytest.mark.parametrize("backend", [sm.DDMailbox, sm.DirectMailbox])
+def test_mailbox_read_write(tmpdir, backend):
+    path = str(tmpdir.join("mailbox"))
+    with io.open(path, "wb") as f:
+        f.write(sm.EMPTYMAILBOX * 4)
+
+    mbox = backend(path)
+    try:
+        mbox.write(sm.MAILBOX_SIZE, b"a" * sm.MAILBOX_SIZE)
+        mbox.write(3 * sm.MAILBOX_SIZE, b"b" * sm.MAILBOX_SIZE)
+        assert mbox.read(sm.MAILBOX_SIZE, sm.MAILBOX_SIZE) == (
+            b"a" * sm.MAILBOX_SIZE)
+        assert mbox.read(0, sm.MAILBOX_SIZE * 4) == (
+            sm.EMPTYMAILBOX + b"a" * sm.MAILBOX_SIZE +
+            sm.EMPTYMAILBOX + b"b" * sm.MAILBOX_SIZE)
+    finally:
+        mbox.close()
+
+
+def test_direct_mailbox_short_read(tmpdir):
+    path = str(tmpdir.join("mailbox"))
+    with io.open(path, "wb") as f:
+        f.write(sm.EMPTYMAILBOX)
+
+    mbox = sm.DirectMailbox(path)
+    try:
+        assert mbox.read(0, sm.MAILBOX_SIZE * 2) == sm.EMPTYMAILBOX
+    finally:
+        mbox.close()
+
+
+def test_direct_mailbox_closed(tmpdir):
+    path = str(tmpdir.join("mailbox"))
+    with io.open(path, "wb") as f:
+        f.write(sm.EMPTYMAILBOX)
+
+    mbox = sm.DirectMailbox(path)
+    mbox.close()
+    with pytest.raises(ValueError):
+        mbox.write(0, sm.EMPTYMAILBOX)
+
+
+def test_open_mailbox(tmpdir):
+    path = str(tmpdir.join("mailbox"))
+    with io.open(path, "wb") as f:
+        f.write(sm.EMPTYMAILBOX)
+
+    mbox = sm.open_mailbox(path)
+    try:
+        assert isinstance(mbox, sm.DDMailbox)
+    finally:
+        mbox.close()
+
+
 class TestSPMMailMonitor:
 
     def test_thread_leak(self, mboxfiles):
@@ -210,6 +270,116 @@ class TestCommunicate:
             0x1000 * MAX_HOSTS - 0x40 - msg_offset)
 
 
+class TestAdaptivePolling:
+
+    @pytest.fixture
+    def adaptive(self, monkeypatch):
+        config = make_config([
+            ("irs", "mailbox_adaptive_polling", "true"),
+            ("irs", "mailbox_min_interval", "0.05"),
+        ])
+        monkeypatch.setattr(sm, "config", config)
+
+    def test_local_spm_round_trip(self, mboxfiles, adaptive):
+        # Using the production monitor interval; without waking up the local
+        # monitors, the request could not complete in less than interval.
+        interval = 2
+        host_id = 7
+        hsm_mb = sm.HSM_Mailbox(
+            hostID=host_id,
+            poolID=SPUUID,
+            inbox=mboxfiles.outbox,
+            outbox=mboxfiles.inbox,
+            monitorInterval=interval)
+        spm_mm = sm.SPM_MailMonitor(
+            SPUUID,
+            MAX_HOSTS,
+            inbox=mboxfiles.inbox,
+            outbox=mboxfiles.outbox,
+            monitorInterval=interval)
+
+        def spm_callback(msg_id, data):
+            spm_mm.sendReply(msg_id, sm.SPM_Extend_Message(VOL_DATA, 100))
+
+        spm_mm.registerMessageType(b"xtnd", spm_callback)
+        spm_mm.start()
+        hsm_mb.set_local_spm(spm_mm)
+        spm_mm.set_local_hsm(host_id, hsm_mb)
+        try:
+            VOL_DATA = dict(
+                poolID=SPUUID,
+                domainID='8adbc85e-e554-4ae0-b318-8a5465fe5fe1',
+                volumeID='d772f1c6-3ebb-43c3-a42e-73fcd8255a5f')
+            hsm_mb.sendExtendMsg(VOL_DATA, 100)
+
+            deadline = time.time() + MAILER_TIMEOUT
+            while hsm_mb.extend_latency.snapshot()["count"] == 0:
+                assert time.time() < deadline, "No reply on time"
+                time.sleep(0.05)
+        finally:
+            hsm_mb.stop()
+            spm_mm.stop()
+            assert hsm_mb.wait(timeout=MAILER_TIMEOUT)
+            assert spm_mm.wait(timeout=MAILER_TIMEOUT)
+
+        stats = hsm_mb.stats()["extend_latency"]
+        assert stats["count"] == 1
+        assert stats["max"] < interval / 2
+        assert stats["p50"] is not None
+
+    def test_local_spm_disabled(self, mboxfiles):
+        with make_hsm_mailbox(mboxfiles, 7) as hsm_mb:
+            with make_spm_mailbox(mboxfiles) as spm_mm:
+                hsm_mb.set_local_spm(spm_mm)
+                spm_mm.set_local_hsm(7, hsm_mb)
+                assert hsm_mb._mailman._local_spm is None
+                assert spm_mm._local_hsm is None
+
+
+class TestPoller:
+
+    def test_fixed(self):
+        poller = sm.Poller(0.1)
+        assert not poller.adaptive
+        poller.activity()
+        assert poller.interval == 0.1
+        assert not poller.wait()
+        assert poller.interval == 0.1
+
+    def test_backoff(self):
+        poller = sm.Poller(0.04, min_interval=0.01)
+        assert poller.interval == 0.04
+        poller.activity()
+        intervals = []
+        for i in range(4):
+            intervals.append(poller.interval)
+            poller.wait()
+        assert intervals == [0.01, 0.02, 0.04, 0.04]
+
+    def test_min_interval_clamped(self):
+        poller = sm.Poller(0.1, min_interval=1)
+        poller.activity()
+        assert poller.interval == 0.1
+
+    def test_wakeup(self):
+        poller = sm.Poller(MAILER_TIMEOUT)
+        poller.wakeup()
+        start = time.time()
+        assert poller.wait()
+        assert time.time() - start < MAILER_TIMEOUT
+        # The wakeup is consumed.
+        assert not poller.wait(0.01)
+
+    def test_wakeup_after_timeout(self):
+        poller = sm.Poller(MAILER_TIMEOUT)
+        assert not poller.wait(0.01)
+        # Woken up while checking the mailbox after the timeout.
+        poller.wakeup()
+        start = time.time()
+        assert poller.wait()
+        assert time.time() - start < MAILER_TIMEOUT
+
+
 class TestExtendMessage:
 
     VOL_DATA = dict(
@@ -277,6 +447,149 @@ class TestValidation:
         assert not sm.SPM_MailMonitor.validateMailbox(mailbox, 7)
 
 
+class FakeThreadPool(object):
+
+    def __init__(self):
+        self.tasks = []
+
+    def queueTask(self, id, func, args):
+        self.tasks.append(args)
+        return True
+
+    def joinAll(self, waitForTasks=True):
+        pass
+
+
+def make_mailbox(messages):
+    """
+    Return host mailbox with messages {slot: message} and valid checksum.
+    """
+    mailbox = bytearray(sm.EMPTYMAILBOX)
+    for slot, msg in messages.items():
+        start = slot * sm.MESSAGE_SIZE
+        mailbox[start:start + sm.MESSAGE_SIZE] = msg
+    data = bytes(mailbox[:-sm.CHECKSUM_BYTES])
+    csum = struct.pack('<l', sm.checksum(data, sm.CHECKSUM_BYTES))
+    return data + csum
+
+
+def make_message(n):
+    msg = b"1xtnd" + b"%059d" % n
+    assert len(msg) == sm.MESSAGE_SIZE
+    return msg
+
+
+@contextlib.contextmanager
+def make_spm_monitor(mboxfiles, hosts=MAX_HOSTS):
+    # The monitor thread is not started, so requests are handled only by the
+    # test.
+    mailer = sm.SPM_MailMonitor(
+        SPUUID, hosts,
+        inbox=mboxfiles.inbox,
+        outbox=mboxfiles.outbox,
+        monitorInterval=MONITOR_INTERVAL)
+    mailer.tp.joinAll(waitForTasks=False)
+    mailer.tp = FakeThreadPool()
+    mailer.registerMessageType(b"xtnd", "callback")
+    yield mailer
+
+
+class TestHandleRequests:
+
+    def test_new_request(self, mboxfiles):
+        with make_spm_monitor(mboxfiles) as mailer:
+            msg = make_message(1)
+            mail = (sm.EMPTYMAILBOX * 3 + make_mailbox({5: msg}) +
+                    sm.EMPTYMAILBOX * (MAX_HOSTS - 4))
+            assert not mailer._handleRequests(mail)
+            msg_id = 3 * sm.SLOTS_PER_MAILBOX + 5
+            assert mailer.tp.tasks == [("callback", msg_id, msg)]
+
+            # Unchanged mail is not handled again.
+            mailer._handleRequests(mail)
+            assert len(mailer.tp.tasks) == 1
+
+    def test_changed_request(self, mboxfiles):
+        with make_spm_monitor(mboxfiles) as mailer:
+            mail = make_mailbox({0: make_message(1), 1: make_message(2)})
+            mailer._handleRequests(mail + sm.EMPTYMAILBOX * (MAX_HOSTS - 1))
+            del mailer.tp.tasks[:]
+
+            mail = make_mailbox({0: make_message(1), 1: make_message(3)})
+            mailer._handleRequests(mail + sm.EMPTYMAILBOX * (MAX_HOSTS - 1))
+            assert mailer.tp.tasks == [("callback", 1, make_message(3))]
+
+    def test_invalid_checksum(self, mboxfiles):
+        with make_spm_monitor(mboxfiles) as mailer:
+            mail = bytearray(make_mailbox({0: make_message(1)}))
+            mail[-1:] = b"x"
+            mailer._handleRequests(
+                bytes(mail) + sm.EMPTYMAILBOX * (MAX_HOSTS - 1))
+            assert mailer.tp.tasks == []
+            # Invalid mailbox is cleared in the incoming mail.
+            assert mailer._incomingMail[:sm.MAILBOX_SIZE] == sm.EMPTYMAILBOX
+
+    def test_clean_message(self, mboxfiles):
+        with make_spm_monitor(mboxfiles) as mailer:
+            mail = make_mailbox({2: sm.CLEAN_MESSAGE})
+            assert mailer._handleRequests(
+                sm.EMPTYMAILBOX + mail + sm.EMPTYMAILBOX * (MAX_HOSTS - 2))
+            start = (sm.SLOTS_PER_MAILBOX + 2) * sm.MESSAGE_SIZE
+            outgoing = mailer._outgoingMail
+            assert outgoing[start:start + sm.MESSAGE_SIZE] == sm.CLEAN_MESSAGE
+            assert outgoing[:start] == b"\0" * start
+
+    def test_resend_after_write_error(self, mboxfiles, monkeypatch):
+        with make_spm_monitor(mboxfiles) as mailer:
+            mail = make_mailbox({2: sm.CLEAN_MESSAGE})
+            with io.open(mboxfiles.inbox, "wb") as f:
+                f.write(sm.EMPTYMAILBOX + mail +
+                        sm.EMPTYMAILBOX * (MAX_HOSTS - 2))
+
+            def fail(offset, data):
+                raise OSError("fake error")
+
+            with monkeypatch.context() as m:
+                m.setattr(mailer._outFile, "write", fail)
+                mailer._checkForMail()
+
+            # The incoming mail did not change, but the outgoing mail is
+            # sent again.
+            mailer._checkForMail()
+            _, outbox = read_mbox(mboxfiles)
+            start = (sm.SLOTS_PER_MAILBOX + 2) * sm.MESSAGE_SIZE
+            assert outbox[start:start + sm.MESSAGE_SIZE] == sm.CLEAN_MESSAGE
+
+    @pytest.mark.slow
+    def test_time_handle_requests(self, mboxfiles):
+        hosts = 250
+        with make_spm_monitor(mboxfiles, hosts=hosts) as mailer:
+            # Every host has pending requests in all slots.
+            mailboxes = [
+                make_mailbox({i: make_message(host * 100 + i)
+                              for i in range(sm.MESSAGES_PER_MAILBOX)})
+                for host in range(hosts)]
+            mailer._handleRequests(b"".join(mailboxes))
+            assert len(mailer.tp.tasks) == hosts * sm.MESSAGES_PER_MAILBOX
+
+            # On every check one host sends a new request.
+            count = 100
+            mails = []
+            for n in range(count):
+                host = n % hosts
+                changed = list(mailboxes)
+                changed[host] = make_mailbox({0: make_message(10**6 + n)})
+                mails.append(b"".join(changed))
+
+            start = time.time()
+            for mail in mails:
+                mailer._handleRequests(mail)
+            elapsed = time.time() - start
+
+            print("%d checks in %.6f seconds (%.6f seconds per check)"
+                  % (count, elapsed, elapsed / count))
+
+
 class TestChecksum:
 
     def test_consistency(self):
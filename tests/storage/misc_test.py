@@ -41,6 +41,7 @@ from testlib import VdsmTestCase
 from testlib import namedTemporaryDir
 from testlib import permutations, expandPermutations
 from testlib import TEMPDIR
+from testlib import make_config
 
 from vdsm.common import cmdutils
 from vdsm.common import commands
@@ -571,6 +572,45 @@ class TestReadBlock(VdsmTestCase):
         os.unlink(path)
 
 
+@pytest.fixture(params=["true", "false"], ids=["in_process", "dd"])
+def readblock_config(request, monkeypatch):
+    cfg = make_config([("irs", "readblock_in_process", request.param)])
+    monkeypatch.setattr(misc, "config", cfg)
+
+
+@pytest.fixture
+def block_file():
+    data = os.urandom(2 * misc.MEGA + 4096)
+    fd, path = tempfile.mkstemp(dir=TEMPDIR)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    yield path, data
+    os.unlink(path)
+
+
+@pytest.mark.parametrize("offset,size", [
+    (0, 512),
+    (4096, 8192),
+    # Multiple reads.
+    (512, misc.MEGA + 1024),
+])
+def test_readblock(readblock_config, block_file, offset, size):
+    path, data = block_file
+    assert misc.readblock(path, offset, size) == data[offset:offset + size]
+
+
+def test_readblock_incomplete(readblock_config, block_file):
+    path, data = block_file
+    offset = len(data) - 4096
+    with pytest.raises(misc.se.MiscBlockReadIncomplete):
+        misc.readblock(path, offset, 8192)
+
+
+def test_readblock_missing(readblock_config):
+    with pytest.raises(misc.se.MiscBlockReadException):
+        misc.readblock("/no/such/device", 0, 512)
+
+
 class TestCleanUpDir(VdsmTestCase):
 
     def testFullDir(self):
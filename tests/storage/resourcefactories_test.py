@@ -0,0 +1,174 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301  USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import threading
+
+import pytest
+
+from vdsm.common import concurrent
+from vdsm.storage import resourceFactories as rf
+
+
+class FakeLVM(object):
+
+    def __init__(self):
+        self.active = set()
+        self.calls = []
+        # Deactivating lvs in these vgs blocks until the event is set.
+        self.blocked = {}
+
+    def activateLVs(self, vg, lvs, refresh=True):
+        self.calls.append(("activate", vg, list(lvs), refresh))
+        activated = [lv for lv in lvs if (vg, lv) not in self.active]
+        self.active.update((vg, lv) for lv in activated)
+        return activated
+
+    def deactivateLVs(self, vg, lvs):
+        self.calls.append(("deactivate", vg, list(lvs)))
+        if vg in self.blocked:
+            started, event = self.blocked[vg]
+            started.set()
+            event.wait(5)
+        self.active.difference_update((vg, lv) for lv in lvs)
+
+
+@pytest.fixture
+def fake_lvm(monkeypatch):
+    lvm = FakeLVM()
+    monkeypatch.setattr(rf, "lvm", lvm)
+    monkeypatch.setattr(rf, "_pending", set())
+    monkeypatch.setattr(rf, "_deactivating", {})
+    return lvm
+
+
+def test_close_deactivates(fake_lvm):
+    res = rf.LvmActivation("vg", "lv1", None)
+    res.close()
+    assert fake_lvm.calls == [
+        ("activate", "vg", ["lv1"], False),
+        ("deactivate", "vg", ["lv1"]),
+    ]
+
+
+def test_deferred_deactivation(fake_lvm):
+    resources = [rf.LvmActivation("vg", lv, None) for lv in ("lv1", "lv2")]
+    del fake_lvm.calls[:]
+
+    with rf.deferred_deactivation("vg"):
+        for res in resources:
+            res.close()
+        assert fake_lvm.calls == []
+
+    assert fake_lvm.calls == [("deactivate", "vg", ["lv1", "lv2"])]
+
+
+def test_deferred_deactivation_nested(fake_lvm):
+    resources = [rf.LvmActivation("vg", lv, None) for lv in ("lv1", "lv2")]
+    del fake_lvm.calls[:]
+
+    with rf.deferred_deactivation("vg"):
+        resources[0].close()
+        with rf.deferred_deactivation("vg"):
+            resources[1].close()
+        assert fake_lvm.calls == []
+
+    assert fake_lvm.calls == [("deactivate", "vg", ["lv1", "lv2"])]
+
+
+def test_deferred_deactivation_other_vg(fake_lvm):
+    res = rf.LvmActivation("other", "lv1", None)
+    del fake_lvm.calls[:]
+
+    with rf.deferred_deactivation("vg"):
+        res.close()
+        assert fake_lvm.calls == [("deactivate", "other", ["lv1"])]
+
+
+def test_deferred_deactivation_cancelled(fake_lvm):
+    res = rf.LvmActivation("vg", "lv1", None)
+
+    with rf.deferred_deactivation("vg"):
+        res.close()
+        # Another user acquired the resource before the deactivation.
+        rf.LvmActivation("vg", "lv1", None)
+        del fake_lvm.calls[:]
+
+    assert fake_lvm.calls == []
+    assert ("vg", "lv1") in fake_lvm.active
+
+
+def test_activate_lvs_deactivate_unused(fake_lvm):
+    fake_lvm.active.add(("vg", "lv1"))
+    activated = rf.activate_lvs("vg", ["lv1", "lv2", "lv3"])
+    assert activated == ["lv2", "lv3"]
+    assert fake_lvm.calls == [
+        ("activate", "vg", ["lv1", "lv2", "lv3"], True),
+    ]
+
+    # lv2 resource was created, lv3 was not.
+    rf.LvmActivation("vg", "lv2", None)
+    del fake_lvm.calls[:]
+
+    rf.deactivate_unused("vg", activated)
+    assert fake_lvm.calls == [("deactivate", "vg", ["lv3"])]
+
+
+@pytest.fixture
+def blocked_deactivation(fake_lvm):
+    """
+    Start deactivating unused "lv1" in vg "blocked", blocking until the
+    returned event is set.
+    """
+    started = threading.Event()
+    event = threading.Event()
+    fake_lvm.blocked["blocked"] = (started, event)
+    rf.activate_lvs("blocked", ["lv1"])
+    t = concurrent.thread(rf.deactivate_unused, args=("blocked", ["lv1"]))
+    t.start()
+    try:
+        assert started.wait(5)
+        yield event
+    finally:
+        event.set()
+        t.join()
+
+
+def test_blocked_vg_does_not_block_other_vgs(fake_lvm, blocked_deactivation):
+    activated = rf.activate_lvs("vg", ["lv1"])
+    assert activated == ["lv1"]
+    rf.deactivate_unused("vg", activated)
+    assert ("vg", "lv1") not in fake_lvm.active
+
+
+def test_activation_waits_for_deactivation(fake_lvm, blocked_deactivation):
+    t = concurrent.thread(rf.LvmActivation, args=("blocked", "lv1", None))
+    t.start()
+    try:
+        # The lv must be activated after the deactivation completed.
+        t.join(0.2)
+        assert t.is_alive()
+    finally:
+        blocked_deactivation.set()
+        t.join()
+    assert ("blocked", "lv1") in fake_lvm.active
@@ -25,13 +25,15 @@ import uuid
 
 import pytest
 
+from vdsm.storage import blockSD
 from vdsm.storage import constants as sc
 from vdsm.storage import exception as se
 from vdsm.storage import clusterlock
 from vdsm.storage import sd
 
-from testlib import recorded
+from testlib import make_config
 from testlib import make_uuid
+from testlib import recorded
 
 from storage.storagetestlib import (
     fake_block_env,
@@ -206,6 +208,255 @@ class TestBlockDomainMetadataSlot:
                 assert not acquired
 
 
+@xfail_python3
+class TestBlockVolumeIndex:
+
+    def make_chain(self, env, img_id, length):
+        vol_ids = [make_uuid() for _ in range(length)]
+        parent = sc.BLANK_UUID
+        for i, vol_id in enumerate(vol_ids):
+            vol_type = sc.LEAF_VOL if i == length - 1 else sc.INTERNAL_VOL
+            env.make_volume(VOLSIZE, img_id, vol_id, parent_vol_id=parent,
+                            vol_type=vol_type)
+            parent = vol_id
+        return vol_ids
+
+    @pytest.mark.parametrize("sd_version", [3, 4, 5])
+    def test_chain(self, sd_version):
+        with fake_block_env(sd_version=sd_version) as env:
+            img_id = make_uuid()
+            vol_ids = self.make_chain(env, img_id, 3)
+            index = env.sd_manifest.volume_index()
+            assert index.chain(img_id) == vol_ids
+            assert index.chain(img_id, vol_ids[-1]) == vol_ids
+            assert index.chain(img_id, vol_ids[1]) == vol_ids[:2]
+            assert index.children(vol_ids[0]) == (vol_ids[1],)
+
+    def test_entries(self):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            vol_id, = self.make_chain(env, img_id, 1)
+            entry = env.sd_manifest.volume_index().get(vol_id)
+            assert entry.image == img_id
+            assert entry.parent == sc.BLANK_UUID
+            assert entry.metadata.image == img_id
+            assert entry.metadata.voltype == sc.type2name(sc.LEAF_VOL)
+            assert entry.error is None
+
+    def test_slots(self):
+        with fake_block_env(sd_version=5) as env:
+            self.make_chain(env, make_uuid(), 2)
+            self.make_chain(env, make_uuid(), 2)
+            index = env.sd_manifest.volume_index()
+            assert index.slots() == env.sd_manifest.occupied_metadata_slots()
+
+    def test_single_read(self, monkeypatch):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            self.make_chain(env, img_id, 3)
+            reads = []
+            readblock = blockSD.misc.readblock
+
+            def counting_readblock(*args):
+                reads.append(args)
+                return readblock(*args)
+
+            monkeypatch.setattr(blockSD.misc, "readblock", counting_readblock)
+            env.sd_manifest.volume_index().chain(img_id)
+            env.sd_manifest.volume_index().chain(img_id)
+            assert len(reads) == 1
+
+    def test_invalidated_by_metadata_write(self):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            vol_id, = self.make_chain(env, img_id, 1)
+            env.sd_manifest.volume_index()
+
+            vol = env.sd_manifest.produceVolume(img_id, vol_id)
+            md = vol.getMetadata()
+            md.description = "new description"
+            vol.setMetadata(md)
+
+            entry = env.sd_manifest.volume_index().get(vol_id)
+            assert entry.metadata.description == "new description"
+
+    def test_invalidated_by_lv_change(self):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            env.sd_manifest.volume_index()
+            vol_ids = self.make_chain(env, img_id, 1)
+            assert env.sd_manifest.volume_index().chain(img_id) == vol_ids
+
+    def test_reused_without_getting_lvs(self, monkeypatch):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            self.make_chain(env, img_id, 1)
+            index = env.sd_manifest.volume_index()
+
+            def fail(*args):
+                raise RuntimeError("getLV called")
+
+            monkeypatch.setattr(env.lvm, "getLV", fail)
+            assert env.sd_manifest.volume_index() is index
+
+    def test_bulk_read_error(self, monkeypatch):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            vol_ids = self.make_chain(env, img_id, 3)
+            readblock = blockSD.misc.readblock
+
+            def failing_readblock(path, offset, size):
+                if size > sc.METADATA_SIZE:
+                    raise OSError("fake error")
+                return readblock(path, offset, size)
+
+            monkeypatch.setattr(blockSD.misc, "readblock", failing_readblock)
+            index = env.sd_manifest.volume_index()
+            assert index.chain(img_id) == vol_ids
+
+    def test_slot_read_error(self, monkeypatch):
+        with fake_block_env(sd_version=5) as env:
+            img1 = make_uuid()
+            vol1, = self.make_chain(env, img1, 1)
+            img2 = make_uuid()
+            vol2, = self.make_chain(env, img2, 1)
+            bad_slot = env.sd_manifest.produceVolume(img2, vol2).getMetaSlot()
+            bad_offset = env.sd_manifest.metadata_offset(bad_slot)
+            readblock = blockSD.misc.readblock
+
+            def failing_readblock(path, offset, size):
+                if offset <= bad_offset < offset + size:
+                    raise OSError("fake error")
+                return readblock(path, offset, size)
+
+            monkeypatch.setattr(blockSD.misc, "readblock", failing_readblock)
+            index = env.sd_manifest.volume_index()
+            assert index.chain(img1) == [vol1]
+            assert index.get(vol2).error == "fake error"
+            with pytest.raises(se.VolumeMetadataReadError):
+                index.chain(img2)
+
+    def test_image_index_reads_image_volumes(self, monkeypatch):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            vol_ids = self.make_chain(env, img_id, 2)
+            for _ in range(3):
+                self.make_chain(env, make_uuid(), 2)
+            reads = []
+            readblock = blockSD.misc.readblock
+
+            def counting_readblock(*args):
+                reads.append(args)
+                return readblock(*args)
+
+            monkeypatch.setattr(blockSD.misc, "readblock", counting_readblock)
+            index = env.sd_manifest.image_volume_index(img_id)
+            assert index.chain(img_id) == vol_ids
+            assert len(reads) == 2
+
+    def test_image_index_includes_template(self):
+        with fake_block_env(sd_version=5) as env:
+            tmpl_img = make_uuid()
+            tmpl_vol = make_uuid()
+            env.make_volume(VOLSIZE, tmpl_img, tmpl_vol,
+                            vol_type=sc.SHARED_VOL)
+            img_id = make_uuid()
+            vol_id = make_uuid()
+            env.make_volume(VOLSIZE, img_id, vol_id, parent_vol_id=tmpl_vol)
+            index = env.sd_manifest.image_volume_index(img_id)
+            assert index.chain(img_id) == [vol_id]
+            assert index.get(tmpl_vol).image == tmpl_img
+
+    def test_image_index_uses_volume_index(self):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            self.make_chain(env, img_id, 1)
+            index = env.sd_manifest.volume_index()
+            assert env.sd_manifest.image_volume_index(img_id) is index
+
+    def test_max_age(self, monkeypatch):
+        monkeypatch.setattr(blockSD, "config", make_config(
+            [("irs", "volume_index_max_age", "0")]))
+        with fake_block_env(sd_version=5) as env:
+            self.make_chain(env, make_uuid(), 1)
+            index = env.sd_manifest.volume_index()
+            assert env.sd_manifest.volume_index() is not index
+
+    def test_cleared_metadata(self):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            vol_id, = self.make_chain(env, img_id, 1)
+            vol = env.sd_manifest.produceVolume(img_id, vol_id)
+            env.sd_manifest.clear_metadata_block(vol.getMetaSlot())
+
+            index = env.sd_manifest.volume_index()
+            entry = index.get(vol_id)
+            assert entry.metadata is None
+            assert entry.error is not None
+            with pytest.raises(se.VolumeMetadataReadError):
+                index.chain(img_id)
+
+    def test_missing_image(self):
+        with fake_block_env(sd_version=5) as env:
+            with pytest.raises(se.ImageDoesNotExistInSD):
+                env.sd_manifest.volume_index().chain(make_uuid())
+
+    def test_no_leaf(self):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            env.make_volume(VOLSIZE, img_id, make_uuid(),
+                            vol_type=sc.INTERNAL_VOL)
+            with pytest.raises(se.ImageIsNotLegalChain):
+                env.sd_manifest.volume_index().chain(img_id)
+
+    def make_leases(self, env, fake_sanlock, img_id, vol_ids):
+        fake_sanlock.write_lockspace(
+            env.sd_manifest.sdUUID, env.sd_manifest.getIdsFilePath())
+        for vol_id in vol_ids:
+            vol = env.sd_manifest.produceVolume(img_id, vol_id)
+            env.sd_manifest.create_volume_lease(vol.getMetaSlot(), vol_id)
+
+    def test_dump(self, fake_sanlock):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            vol_ids = self.make_chain(env, img_id, 2)
+            self.make_leases(env, fake_sanlock, img_id, vol_ids)
+            volumes = env.sd_manifest.dump()["volumes"]
+            assert sorted(volumes) == sorted(vol_ids)
+            base = volumes[vol_ids[0]]
+            assert base["image"] == img_id
+            assert base["parent"] == sc.BLANK_UUID
+            assert base["voltype"] == sc.type2name(sc.INTERNAL_VOL)
+            assert base["status"] == "OK"
+            assert base["lease"]["owners"] == []
+            top = volumes[vol_ids[1]]
+            assert top["parent"] == vol_ids[0]
+            assert top["voltype"] == sc.type2name(sc.LEAF_VOL)
+
+    def test_dump_matches_get_info(self, fake_sanlock):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            vol_ids = self.make_chain(env, img_id, 1)
+            self.make_leases(env, fake_sanlock, img_id, vol_ids)
+            vol = env.sd_manifest.produceVolume(img_id, vol_ids[0])
+            info = vol.getInfo()
+            dumped = env.sd_manifest.dump()["volumes"][vol_ids[0]]
+            for key in ("uuid", "image", "parent", "format", "voltype",
+                        "capacity", "legality", "generation", "status",
+                        "lease"):
+                assert dumped[key] == info[key]
+
+    def test_dump_cleared_metadata(self, fake_sanlock):
+        with fake_block_env(sd_version=5) as env:
+            img_id = make_uuid()
+            vol_id, = self.make_chain(env, img_id, 1)
+            vol = env.sd_manifest.produceVolume(img_id, vol_id)
+            env.sd_manifest.clear_metadata_block(vol.getMetaSlot())
+            info = env.sd_manifest.dump()["volumes"][vol_id]
+            assert info["image"] == img_id
+            assert info["status"] == "INVALID"
+
+
 class StorageDomainManifest(sd.StorageDomainManifest):
     def __init__(self):
         pass
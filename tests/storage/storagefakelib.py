@@ -172,6 +172,7 @@ class FakeLVM(object):
         self._create_lv_file(vgName, lvName, activate, size)
 
     def activateLVs(self, vgName, lvNames, refresh=True):
+        activated = []
         for lv in lvNames:
             try:
                 lv_md = self.lvmd[(vgName, lv)]
@@ -183,6 +184,9 @@ class FakeLVM(object):
                           self.lvPath(vgName, lv))
                 lv_md['active'] = True
                 lv_md['attr']['state'] = 'a'
+                activated.append(lv)
+
+        return activated
 
     def deactivateLVs(self, vgName, lvNames):
         active_lvs = [lv for lv in lvNames
@@ -284,6 +288,12 @@ class FakeLVM(object):
         else:
             return self._getLV(vgName, lvName)
 
+    def vg_seqno(self, vgName):
+        # Callers only compare sequence numbers, so return a value changing
+        # when any LV in the VG changes.
+        return repr(sorted((lv, md) for (vg, lv), md in self.lvmd.items()
+                           if vg == vgName))
+
     def extendLV(self, vgName, lvName, size_mb):
         try:
             lv = self.lvmd[(vgName, lvName)]
@@ -51,6 +51,7 @@ from vdsm.storage import hsm
 from vdsm.storage import nbd
 from vdsm.storage import outOfProcess as oop
 from vdsm.storage import qemuimg
+from vdsm.storage import resourceFactories
 from vdsm.storage import sd
 from vdsm.storage import volume
 
@@ -146,6 +147,7 @@ def fake_block_env(obj=None, sd_version=3, data_center=None):
         with MonkeyPatchScope([
             (blockSD, 'lvm', lvm),
             (blockVolume, 'lvm', lvm),
+            (resourceFactories, 'lvm', lvm),
             (blockVolume, 'sdCache', fake_sdc),
             (sc, 'REPO_DATA_CENTER', tmpdir),
             (sc, "REPO_MOUNT_DIR", os.path.join(tmpdir, sc.DOMAIN_MNT_POINT,
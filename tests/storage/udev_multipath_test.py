@@ -284,6 +284,48 @@ def test_hotunplug_monitor():
             valid_paths=None,
             dm_seqnum=None)
     ),
+    (
+        # Logical volume was activated
+        FakeDevice(
+            ACTION="add",
+            DM_UUID="LVM-fake-vg-uuid-fake-lv-uuid",
+            DM_VG_NAME="vg-name",
+            DM_LV_NAME="lv-name",
+            SEQNUM="12"),
+        udev.LVMEvent(
+            type=udev.LV_CHANGED,
+            vg_name="vg-name",
+            lv_name="lv-name",
+            seqnum=12)
+    ),
+    (
+        # Logical volume was refreshed or resized
+        FakeDevice(
+            ACTION="change",
+            DM_UUID="LVM-fake-vg-uuid-fake-lv-uuid",
+            DM_VG_NAME="vg-name",
+            DM_LV_NAME="lv-name",
+            SEQNUM="13"),
+        udev.LVMEvent(
+            type=udev.LV_CHANGED,
+            vg_name="vg-name",
+            lv_name="lv-name",
+            seqnum=13)
+    ),
+    (
+        # Logical volume was deactivated
+        FakeDevice(
+            ACTION="remove",
+            DM_UUID="LVM-fake-vg-uuid-fake-lv-uuid",
+            DM_VG_NAME="vg-name",
+            DM_LV_NAME="lv-name",
+            SEQNUM="14"),
+        udev.LVMEvent(
+            type=udev.LV_REMOVED,
+            vg_name="vg-name",
+            lv_name="lv-name",
+            seqnum=14)
+    ),
 ])
 def test_report_events(monkeypatch, device, expected):
     # Avoid accessing non-existing devices
@@ -307,7 +349,15 @@ def test_report_events(monkeypatch, device, expected):
                DM_NR_VALID_PATHS="4"),
     # the "action" is not supported
     FakeDevice(ACTION="update",
-               DM_UUID="mpath-fake-uuid-3")
+               DM_UUID="mpath-fake-uuid-3"),
+    # LVM device without vg and lv names
+    FakeDevice(ACTION="change",
+               DM_UUID="LVM-fake-vg-uuid-fake-lv-uuid"),
+    # LVM device "action" is not supported
+    FakeDevice(ACTION="move",
+               DM_UUID="LVM-fake-vg-uuid-fake-lv-uuid",
+               DM_VG_NAME="vg-name",
+               DM_LV_NAME="lv-name")
 ])
 def test_filter_event(device):
     listener = udev.MultipathListener()
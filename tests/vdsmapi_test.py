@@ -23,16 +23,20 @@ from __future__ import division
 
 import json
 import logging
+import time
+import uuid
 import yaml
 
 from io import StringIO
 from textwrap import dedent
 
 from nose.plugins.attrib import attr
+import pytest
 from vdsm.api import vdsmapi
 from vdsm.api.schema_inconsistency_formatter \
     import SchemaInconsistencyFormatter
 from vdsm.common.compat import pickle
+from yajsonrpc import rpcstats
 from yajsonrpc.exception import JsonRpcErrorBase
 
 from testlib import mock
@@ -52,6 +56,328 @@ _schema = vdsmapi.Schema.vdsm_api(strict_mode=True,
                                   with_gluster=_glusterEnabled)
 
 
+VM_STATS = [{'vcpuCount': '1',
+             'displayInfo': [{'tlsPort': u'5900',
+                              'ipAddress': '0',
+                              'type': u'spice',
+                              'port': '-1'}],
+             'hash': '-3472228600028768455',
+             'acpiEnable': u'true',
+             'displayIp': '0',
+             'guestFQDN': '',
+             'vmId': u'f1eb5cc5-d793-46c6-b1e3-719345bfec0c',
+             'pid': '32632',
+             'cpuUsage': '2660000000',
+             'timeOffset': u'0',
+             'session': 'Unknown',
+             'displaySecurePort': u'5900',
+             'displayPort': '-1',
+             'memUsage': '0',
+             'guestIPs': '',
+             'pauseCode': 'NOERR',
+             'vcpuQuota': '-1',
+             'username': 'Unknown',
+             'kvmEnable': u'true',
+             'network': {u'vnet0': {'macAddr': u'00:1a:4a:16:01:51',
+                                    'rxDropped': '1572',
+                                    'tx': '0',
+                                    'rxErrors': '0',
+                                    'txDropped': '0',
+                                    'rx': '90',
+                                    'txErrors': '0',
+                                    'state': 'unknown',
+                                    'sampleTime': 4319358.22,
+                                    'speed': '1000',
+                                    'name': u'vnet0'}},
+             'displayType': 'qxl',
+             'cpuUser': '0.57',
+             'vmJobs': {},
+             'disks': {
+                 u'vdq': {'readLatency': '0',
+                          'writtenBytes': '0',
+                          'writeOps': '0',
+                          'apparentsize': '1073741824',
+                          'readOps': '0',
+                          'writeLatency': '0',
+                          'imageID': u'95c06337-8c23-4dfb-b0bf-a5f30bc9d33',
+                          'readBytes': '0',
+                          'flushLatency': '0',
+                          'readRate': '0.0',
+                          'truesize': '0',
+                          'writeRate': '0.0'},
+                 u'vdp': {'readLatency': '0',
+                          'writtenBytes': '0',
+                          'writeOps': '0',
+                          'apparentsize': '1073741824',
+                          'readOps': '0',
+                          'writeLatency': '0',
+                          'imageID': u'702df0bd-fff6-41eb-817b-103b23e5bd9',
+                          'readBytes': '0',
+                          'flushLatency': '0',
+                          'readRate': '0.0',
+                          'truesize': '0',
+                          'writeRate': '0.0'}},
+             'monitorResponse': '0',
+             'elapsedTime': '2560',
+             'vmType': u'kvm',
+             'cpuSys': '0.20',
+             'status': 'Up',
+             'guestCPUCount': -1,
+             'appsList': (),
+             'clientIp': '',
+             'statusTime': '4319358220',
+             'vmName': u'vm1',
+             'vcpuPeriod': 100000},
+            {'vcpuCount': '1',
+             'displayInfo': [{'tlsPort': u'5901',
+                              'ipAddress': '0',
+                              'type': u'spice',
+                              'port': '-1'}],
+             'hash': '8478318448907411309',
+             'acpiEnable': u'true',
+             'displayIp': '0',
+             'guestFQDN': '',
+             'vmId': u'7d3efc8f-405e-40cc-b512-1f8de3d6d587',
+             'pid': '32734',
+             'cpuUsage': '1220000000',
+             'timeOffset': u'0',
+             'session': 'Unknown',
+             'displaySecurePort': u'5901',
+             'displayPort': '-1',
+             'memUsage': '0',
+             'guestIPs': '',
+             'pauseCode': 'NOERR',
+             'vcpuQuota': '-1',
+             'username': 'Unknown',
+             'kvmEnable': u'true',
+             'network': {u'vnet1': {'macAddr': u'00:1a:4a:16:01:52',
+                                    'rxDropped': '0',
+                                    'tx': '7478',
+                                    'rxErrors': '0',
+                                    'txDropped': '0',
+                                    'rx': '331023',
+                                    'txErrors': '0',
+                                    'state': 'unknown',
+                                    'sampleTime': 4319358.22,
+                                    'speed': '1000',
+                                    'name': u'vnet1'}},
+             'displayType': 'qxl',
+             'cpuUser': '0.34',
+             'vmJobs': {},
+             'disks': {
+                 u'vda': {'readLatency': '0',
+                          'writtenBytes': '219136',
+                          'writeOps': '81',
+                          'apparentsize': '2621440',
+                          'readOps': '791',
+                          'writeLatency': '0',
+                          'imageID': u'e2461e60-ee91-4500-bebf-f50f2a2f644',
+                          'readBytes': '15910400',
+                          'flushLatency': '0',
+                          'readRate': '0.0',
+                          'truesize': '2564096',
+                          'writeRate': '0.0'},
+                 u'hdc': {'readLatency': '0',
+                          'writtenBytes': '0',
+                          'writeOps': '0',
+                          'apparentsize': '0',
+                          'readOps': '1',
+                          'writeLatency': '0',
+                          'readBytes': '30',
+                          'flushLatency': '0',
+                          'readRate': '0.0',
+                          'truesize': '0',
+                          'writeRate': '0.0'}},
+             'monitorResponse': '0',
+             'elapsedTime': '2541',
+             'vmType': u'kvm',
+             'cpuSys': '0.07',
+             'status': 'Up',
+             'guestCPUCount': -1,
+             'appsList': (),
+             'clientIp': '',
+             'statusTime': '4319358220',
+             'vmName': u'vm2',
+             'vcpuPeriod': 100000}]
+
+CAPS = {'HBAInventory': {'iSCSI': [{'InitiatorName': 'iqn.1994-05.co'}],
+                         'FC': []},
+        'packages2': {'kernel': {'release': '201.fc23.x86_64',
+                                 'version': '4.5.5'},
+                      'glusterfs-rdma': {'release': '1.fc23',
+                                         'version': '3.7.11'},
+                      'glusterfs-fuse': {'release': '1.fc23',
+                                         'version': '3.7.11'},
+                      'spice-server': {'release': '1.fc23',
+                                       'version': '0.12.6'},
+                      'librbd1': {'release': '2.fc23',
+                                  'version': '0.94.7'},
+                      'vdsm': {'release': '73.git2105bb3.fc23',
+                               'version': '4.18.999'},
+                      'qemu-kvm': {'release': '10.fc23',
+                                   'version': '2.4.1'},
+                      'glusterfs': {'release': '1.fc23',
+                                    'version': '3.7.11'},
+                      'libvirt': {'release': '1.fc23',
+                                  'version': '1.2.18.3'},
+                      'qemu-img': {'release': '10.fc23',
+                                   'version': '2.4.1'},
+                      'mom': {'release': '1.fc23',
+                              'version': '0.5.4'},
+                      'glusterfs-geo-replication': {'release': '1.fc23',
+                                                    'version': '3.7.1'},
+                      'glusterfs-server': {'release': '1.fc23',
+                                           'version': '3.7.11'},
+                      'glusterfs-cli': {'release': '1.fc23',
+                                        'version': '3.7.11'}},
+        'numaNodeDistance': {'0': [10]},
+        'cpuModel': 'Intel(R) Core(TM) i7-3770 CPU @ 3.40GHz',
+        'liveMerge': 'true',
+        'hooks': {'before_nic_hotplug':
+                  {'50_vmfex': {'md5': 'e05994261acaea7dcf4b88ea'}},
+                  'before_device_migrate_destination':
+                  {'50_vmfex': {'md5': 'e05994261acaea7dcf4b88ea'}},
+                  'before_device_create':
+                  {'50_vmfex': {'md5': 'e05994261acaea7dcf4b88ea'}},
+                  'my_custom_hook':
+                  {'my_name.py': {'md5': 'e05994261acaea7dcf4b88ea'}}},
+        'supportsIPv6': True,
+        'vmTypes': ['kvm'],
+        'selinux': {'mode': '1'},
+        'liveSnapshot': 'true',
+        'kdumpStatus': 0,
+        'networks': {'ovirtmgmt':
+                     {'addr': '192.168.1.102',
+                      'bridged': True,
+                      'dhcpv4': True,
+                      'dhcpv6': False,
+                      'gateway': '192.168.1.1',
+                      'iface': 'ovirtmgmt',
+                      'ipv4addrs': ['192.168.1.102/24'],
+                      'ipv4defaultroute': True,
+                      'ipv6addrs': ['2a02:a31a:e13f:7640:baca:3aff/64'],
+                      'ipv6autoconf': True,
+                      'ipv6gateway': 'fe80::f6f2:6dff:fe9c:3967',
+                      'mtu': '1500',
+                      'netmask': '255.255.255.0',
+                      'ports': ['eno1'],
+                      'stp': 'off',
+                      'switch': 'legacy'}},
+        'kernelArgs': 'BOOT_IMAGE=/vmlinuz-4.5.5-201.fc23.x86_64 ro',
+        'bridges': {'ovirtmgmt':
+                      {'ipv6autoconf': True,
+                       'addr': '192.168.1.106',
+                       'ipv6addrs': [],
+                       'mtu': '1500',
+                       'dhcpv4': True,
+                       'netmask': '255.255.255.0',
+                       'dhcpv6': False,
+                       'stp': 'off',
+                       'ipv4addrs': ['192.168.1.106/24'],
+                       'ipv6gateway': '::',
+                       'gateway': '192.168.1.1',
+                       'opts':
+                          {'multicast_last_member_count': '2',
+                           'vlan_protocol': '0x8100',
+                           'hash_elasticity': '4',
+                           'multicast_query_response_interval': '1000',
+                           'group_fwd_mask': '0x0',
+                           'multicast_snooping': '1',
+                           'multicast_startup_query_interval': '3125',
+                           'hello_timer': '0',
+                           'multicast_querier_interval': '25500',
+                           'max_age': '2000',
+                           'hash_max': '512',
+                           'stp_state': '0',
+                           'topology_change_detected': '0',
+                           'priority': '32768',
+                           'multicast_membership_interval': '26000',
+                           'root_path_cost': '0',
+                           'root_port': '0',
+                           'multicast_querier': '0',
+                           'multicast_startup_query_count': '2',
+                           'nf_call_iptables': '0',
+                           'hello_time': '200',
+                           'topology_change': '0',
+                           'bridge_id': '8000.b8ca3aa977e2',
+                           'topology_change_timer': '0',
+                           'ageing_time': '30000',
+                           'nf_call_ip6tables': '0',
+                           'gc_timer': '2191',
+                           'root_id': '8000.b8ca3aa977e2',
+                           'nf_call_arptables': '0',
+                           'group_addr': '1:80:c2:0:0:0',
+                           'multicast_last_member_interval': '100',
+                           'default_pvid': '1',
+                           'multicast_query_interval': '12500',
+                           'multicast_query_use_ifaddr': '0',
+                           'tcn_timer': '0',
+                           'multicast_router': '1',
+                           'vlan_filtering': '0',
+                           'forward_delay': '0'},
+                       'ports': ['eno1']}},
+        'uuid': '4C4C4544-0046-4E10-8032-B2C04F385A31',
+        'onlineCpus': '0,1,2,3,4,5,6,7',
+        'nics': {'eno1': {'ipv6autoconf': False,
+                          'addr': '',
+                          'speed': 1000,
+                          'ipv6addrs': [],
+                          'mtu': '1500',
+                          'dhcpv4': False,
+                          'netmask': '',
+                          'dhcpv6': False,
+                          'ipv4addrs': [],
+                          'hwaddr': 'b8:ca:3a:a9:77:e2',
+                          'ipv6gateway': '::',
+                          'gateway': ''}},
+        'software_revision': '73',
+        'hostdevPassthrough': 'false',
+        'clusterLevels': ['3.5', '3.6', '4.0'],
+        'cpuFlags': 'fpu,vme,de,pse,tsc,msr,pae,mce,cx8,apic,sep',
+        'ISCSIInitiatorName': 'iqn.1994-05.com.redhat:7d366003913',
+        'netConfigDirty': 'False',
+        'supportedENGINEs': ['3.5', '3.6', '4.0'],
+        'autoNumaBalancing': 0,
+        'additionalFeatures': ['GLUSTER_SNAPSHOT', 'GLUSTER_GEO_RE'],
+        'reservedMem': '321',
+        'bondings': {'bond0': {'ipv6autoconf': True,
+                               'addr': '',
+                               'ipv6addrs': [],
+                               'switch': 'legacy',
+                               'active_slave': '',
+                               'mtu': '1500',
+                               'dhcpv4': False,
+                               'netmask': '',
+                               'dhcpv6': False,
+                               'ipv4addrs': [],
+                               'hwaddr': '3a:02:ff:17:ac:74',
+                               'slaves': [],
+                               'ipv6gateway': '::',
+                               'gateway': '',
+                               'opts': {'mode': '0'}}},
+        'software_version': '4.18',
+        'memSize': '15934',
+        'cpuSpeed': '1600.125',
+        'numaNodes': {'0': {'totalMemory': '15934',
+                            'cpus': [0, 1, 2, 3, 4, 5, 6, 7]}},
+        'cpuSockets': '1',
+        'nameservers': [],
+        'vlans': {},
+        'lastClientIface': 'ovirtmgmt',
+        'cpuCores': '4',
+        'kvmEnabled': 'true',
+        'guestOverhead': '65',
+        'version_name': 'Snow Man',
+        'cpuThreads': '8',
+        'emulatedMachines': ['pc-q35-2.0', 'pc-q35-2.1'],
+        'rngSources': ['hwrng', 'random'],
+        'operatingSystem': {'release': '1',
+                            'version': '23',
+                            'name': 'Fedora',
+                            'pretty_name': 'Fedora 24 (Workstation)'},
+        'vncEncrypted': 'false'}
+
+
 class FakeSchema(object):
 
     METHOD_NAME = "Namespace.Method"
@@ -145,6 +471,29 @@ class DataVerificationTests(TestCaseBase):
 
         self.assertIn('StorageDomainType', str(e.exception))
 
+    def test_vm_stats_changes_ret(self):
+        ret = {u"token": u"e3d1c1e1-6b8f-4a3a-8f5e-6f1d8a1f0a4c:42",
+               u"full": False,
+               u"changed": [
+                   {u"vmId": u"f6de012c-be35-47cb-94fb-f01074a5f9ef",
+                    u"stats": {u"cpuUser": u"1.47",
+                               u"network": {u"vnet0": {u"rx": u"0"}}},
+                    u"removed": [u"migrationProgress"]},
+               ],
+               u"removed": [u"773adfc7-10d4-4e60-b700-3272ee1871f9"]}
+
+        _schema.verify_retval(
+            vdsmapi.MethodRep('Host', 'getAllVmStatsChanges'), ret)
+
+    def test_rpc_stats_ret(self):
+        stats = rpcstats.RpcStats()
+        stats.request_served("Host.getStats", 0.001, 0.025, False)
+        stats.response_sent("Host.getStats", 2048)
+        stats.request_rejected("Host.getAllVmStats")
+
+        _schema.verify_retval(
+            vdsmapi.MethodRep('Host', 'getRpcStats'), stats.info())
+
     def test_list_ret(self):
         ret = [{u"status": 0, u"id": u"f6de012c-be35-47cb-94fb-f01074a5f9ef"}]
 
@@ -292,151 +641,17 @@ class DataVerificationTests(TestCaseBase):
         _schema.verify_retval(vdsmapi.MethodRep('Host', 'getStats'), ret)
 
     def test_allvmstats(self):
-        ret = [{'vcpuCount': '1',
-                'displayInfo': [{'tlsPort': u'5900',
-                                 'ipAddress': '0',
-                                 'type': u'spice',
-                                 'port': '-1'}],
-                'hash': '-3472228600028768455',
-                'acpiEnable': u'true',
-                'displayIp': '0',
-                'guestFQDN': '',
-                'vmId': u'f1eb5cc5-d793-46c6-b1e3-719345bfec0c',
-                'pid': '32632',
-                'cpuUsage': '2660000000',
-                'timeOffset': u'0',
-                'session': 'Unknown',
-                'displaySecurePort': u'5900',
-                'displayPort': '-1',
-                'memUsage': '0',
-                'guestIPs': '',
-                'pauseCode': 'NOERR',
-                'vcpuQuota': '-1',
-                'username': 'Unknown',
-                'kvmEnable': u'true',
-                'network': {u'vnet0': {'macAddr': u'00:1a:4a:16:01:51',
-                                       'rxDropped': '1572',
-                                       'tx': '0',
-                                       'rxErrors': '0',
-                                       'txDropped': '0',
-                                       'rx': '90',
-                                       'txErrors': '0',
-                                       'state': 'unknown',
-                                       'sampleTime': 4319358.22,
-                                       'speed': '1000',
-                                       'name': u'vnet0'}},
-                'displayType': 'qxl',
-                'cpuUser': '0.57',
-                'vmJobs': {},
-                'disks': {
-                    u'vdq': {'readLatency': '0',
-                             'writtenBytes': '0',
-                             'writeOps': '0',
-                             'apparentsize': '1073741824',
-                             'readOps': '0',
-                             'writeLatency': '0',
-                             'imageID': u'95c06337-8c23-4dfb-b0bf-a5f30bc9d33',
-                             'readBytes': '0',
-                             'flushLatency': '0',
-                             'readRate': '0.0',
-                             'truesize': '0',
-                             'writeRate': '0.0'},
-                    u'vdp': {'readLatency': '0',
-                             'writtenBytes': '0',
-                             'writeOps': '0',
-                             'apparentsize': '1073741824',
-                             'readOps': '0',
-                             'writeLatency': '0',
-                             'imageID': u'702df0bd-fff6-41eb-817b-103b23e5bd9',
-                             'readBytes': '0',
-                             'flushLatency': '0',
-                             'readRate': '0.0',
-                             'truesize': '0',
-                             'writeRate': '0.0'}},
-                'monitorResponse': '0',
-                'elapsedTime': '2560',
-                'vmType': u'kvm',
-                'cpuSys': '0.20',
-                'status': 'Up',
-                'guestCPUCount': -1,
-                'appsList': (),
-                'clientIp': '',
-                'statusTime': '4319358220',
-                'vmName': u'vm1',
-                'vcpuPeriod': 100000},
-               {'vcpuCount': '1',
-                'displayInfo': [{'tlsPort': u'5901',
-                                 'ipAddress': '0',
-                                 'type': u'spice',
-                                 'port': '-1'}],
-                'hash': '8478318448907411309',
-                'acpiEnable': u'true',
-                'displayIp': '0',
-                'guestFQDN': '',
-                'vmId': u'7d3efc8f-405e-40cc-b512-1f8de3d6d587',
-                'pid': '32734',
-                'cpuUsage': '1220000000',
-                'timeOffset': u'0',
-                'session': 'Unknown',
-                'displaySecurePort': u'5901',
-                'displayPort': '-1',
-                'memUsage': '0',
-                'guestIPs': '',
-                'pauseCode': 'NOERR',
-                'vcpuQuota': '-1',
-                'username': 'Unknown',
-                'kvmEnable': u'true',
-                'network': {u'vnet1': {'macAddr': u'00:1a:4a:16:01:52',
-                                       'rxDropped': '0',
-                                       'tx': '7478',
-                                       'rxErrors': '0',
-                                       'txDropped': '0',
-                                       'rx': '331023',
-                                       'txErrors': '0',
-                                       'state': 'unknown',
-                                       'sampleTime': 4319358.22,
-                                       'speed': '1000',
-                                       'name': u'vnet1'}},
-                'displayType': 'qxl',
-                'cpuUser': '0.34',
-                'vmJobs': {},
-                'disks': {
-                    u'vda': {'readLatency': '0',
-                             'writtenBytes': '219136',
-                             'writeOps': '81',
-                             'apparentsize': '2621440',
-                             'readOps': '791',
-                             'writeLatency': '0',
-                             'imageID': u'e2461e60-ee91-4500-bebf-f50f2a2f644',
-                             'readBytes': '15910400',
-                             'flushLatency': '0',
-                             'readRate': '0.0',
-                             'truesize': '2564096',
-                             'writeRate': '0.0'},
-                    u'hdc': {'readLatency': '0',
-                             'writtenBytes': '0',
-                             'writeOps': '0',
-                             'apparentsize': '0',
-                             'readOps': '1',
-                             'writeLatency': '0',
-                             'readBytes': '30',
-                             'flushLatency': '0',
-                             'readRate': '0.0',
-                             'truesize': '0',
-                             'writeRate': '0.0'}},
-                'monitorResponse': '0',
-                'elapsedTime': '2541',
-                'vmType': u'kvm',
-                'cpuSys': '0.07',
-                'status': 'Up',
-                'guestCPUCount': -1,
-                'appsList': (),
-                'clientIp': '',
-                'statusTime': '4319358220',
-                'vmName': u'vm2',
-                'vcpuPeriod': 100000}]
-
-        _schema.verify_retval(vdsmapi.MethodRep('Host', 'getAllVmStats'), ret)
+        _schema.verify_retval(
+            vdsmapi.MethodRep('Host', 'getAllVmStats'), VM_STATS)
+
+    def test_allvmstats_timeout(self):
+        ret = VM_STATS + [
+            {u"vmId": u"d4f4e5c1-7c8e-4d4c-a84b-3e1d1f3c3b0a",
+             u"status": u"Up",
+             u"statsTimeout": True},
+        ]
+        _schema.verify_retval(
+            vdsmapi.MethodRep('Host', 'getAllVmStats'), ret)
 
     def test_missing_method(self):
         with self.assertRaises(vdsmapi.MethodNotFound):
@@ -474,185 +689,8 @@ class DataVerificationTests(TestCaseBase):
         _events_schema.verify_event_params(sub_id, params)
 
     def test_get_caps(self):
-        ret = {'HBAInventory': {'iSCSI': [{'InitiatorName': 'iqn.1994-05.co'}],
-                                'FC': []},
-               'packages2': {'kernel': {'release': '201.fc23.x86_64',
-                                        'version': '4.5.5'},
-                             'glusterfs-rdma': {'release': '1.fc23',
-                                                'version': '3.7.11'},
-                             'glusterfs-fuse': {'release': '1.fc23',
-                                                'version': '3.7.11'},
-                             'spice-server': {'release': '1.fc23',
-                                              'version': '0.12.6'},
-                             'librbd1': {'release': '2.fc23',
-                                         'version': '0.94.7'},
-                             'vdsm': {'release': '73.git2105bb3.fc23',
-                                      'version': '4.18.999'},
-                             'qemu-kvm': {'release': '10.fc23',
-                                          'version': '2.4.1'},
-                             'glusterfs': {'release': '1.fc23',
-                                           'version': '3.7.11'},
-                             'libvirt': {'release': '1.fc23',
-                                         'version': '1.2.18.3'},
-                             'qemu-img': {'release': '10.fc23',
-                                          'version': '2.4.1'},
-                             'mom': {'release': '1.fc23',
-                                     'version': '0.5.4'},
-                             'glusterfs-geo-replication': {'release': '1.fc23',
-                                                           'version': '3.7.1'},
-                             'glusterfs-server': {'release': '1.fc23',
-                                                  'version': '3.7.11'},
-                             'glusterfs-cli': {'release': '1.fc23',
-                                               'version': '3.7.11'}},
-               'numaNodeDistance': {'0': [10]},
-               'cpuModel': 'Intel(R) Core(TM) i7-3770 CPU @ 3.40GHz',
-               'liveMerge': 'true',
-               'hooks': {'before_nic_hotplug':
-                         {'50_vmfex': {'md5': 'e05994261acaea7dcf4b88ea'}},
-                         'before_device_migrate_destination':
-                         {'50_vmfex': {'md5': 'e05994261acaea7dcf4b88ea'}},
-                         'before_device_create':
-                         {'50_vmfex': {'md5': 'e05994261acaea7dcf4b88ea'}},
-                         'my_custom_hook':
-                         {'my_name.py': {'md5': 'e05994261acaea7dcf4b88ea'}}},
-               'supportsIPv6': True,
-               'vmTypes': ['kvm'],
-               'selinux': {'mode': '1'},
-               'liveSnapshot': 'true',
-               'kdumpStatus': 0,
-               'networks': {'ovirtmgmt':
-                            {'addr': '192.168.1.102',
-                             'bridged': True,
-                             'dhcpv4': True,
-                             'dhcpv6': False,
-                             'gateway': '192.168.1.1',
-                             'iface': 'ovirtmgmt',
-                             'ipv4addrs': ['192.168.1.102/24'],
-                             'ipv4defaultroute': True,
-                             'ipv6addrs': ['2a02:a31a:e13f:7640:baca:3aff/64'],
-                             'ipv6autoconf': True,
-                             'ipv6gateway': 'fe80::f6f2:6dff:fe9c:3967',
-                             'mtu': '1500',
-                             'netmask': '255.255.255.0',
-                             'ports': ['eno1'],
-                             'stp': 'off',
-                             'switch': 'legacy'}},
-               'kernelArgs': 'BOOT_IMAGE=/vmlinuz-4.5.5-201.fc23.x86_64 ro',
-               'bridges': {'ovirtmgmt':
-                             {'ipv6autoconf': True,
-                              'addr': '192.168.1.106',
-                              'ipv6addrs': [],
-                              'mtu': '1500',
-                              'dhcpv4': True,
-                              'netmask': '255.255.255.0',
-                              'dhcpv6': False,
-                              'stp': 'off',
-                              'ipv4addrs': ['192.168.1.106/24'],
-                              'ipv6gateway': '::',
-                              'gateway': '192.168.1.1',
-                              'opts':
-                                 {'multicast_last_member_count': '2',
-                                  'vlan_protocol': '0x8100',
-                                  'hash_elasticity': '4',
-                                  'multicast_query_response_interval': '1000',
-                                  'group_fwd_mask': '0x0',
-                                  'multicast_snooping': '1',
-                                  'multicast_startup_query_interval': '3125',
-                                  'hello_timer': '0',
-                                  'multicast_querier_interval': '25500',
-                                  'max_age': '2000',
-                                  'hash_max': '512',
-                                  'stp_state': '0',
-                                  'topology_change_detected': '0',
-                                  'priority': '32768',
-                                  'multicast_membership_interval': '26000',
-                                  'root_path_cost': '0',
-                                  'root_port': '0',
-                                  'multicast_querier': '0',
-                                  'multicast_startup_query_count': '2',
-                                  'nf_call_iptables': '0',
-                                  'hello_time': '200',
-                                  'topology_change': '0',
-                                  'bridge_id': '8000.b8ca3aa977e2',
-                                  'topology_change_timer': '0',
-                                  'ageing_time': '30000',
-                                  'nf_call_ip6tables': '0',
-                                  'gc_timer': '2191',
-                                  'root_id': '8000.b8ca3aa977e2',
-                                  'nf_call_arptables': '0',
-                                  'group_addr': '1:80:c2:0:0:0',
-                                  'multicast_last_member_interval': '100',
-                                  'default_pvid': '1',
-                                  'multicast_query_interval': '12500',
-                                  'multicast_query_use_ifaddr': '0',
-                                  'tcn_timer': '0',
-                                  'multicast_router': '1',
-                                  'vlan_filtering': '0',
-                                  'forward_delay': '0'},
-                              'ports': ['eno1']}},
-               'uuid': '4C4C4544-0046-4E10-8032-B2C04F385A31',
-               'onlineCpus': '0,1,2,3,4,5,6,7',
-               'nics': {'eno1': {'ipv6autoconf': False,
-                                 'addr': '',
-                                 'speed': 1000,
-                                 'ipv6addrs': [],
-                                 'mtu': '1500',
-                                 'dhcpv4': False,
-                                 'netmask': '',
-                                 'dhcpv6': False,
-                                 'ipv4addrs': [],
-                                 'hwaddr': 'b8:ca:3a:a9:77:e2',
-                                 'ipv6gateway': '::',
-                                 'gateway': ''}},
-               'software_revision': '73',
-               'hostdevPassthrough': 'false',
-               'clusterLevels': ['3.5', '3.6', '4.0'],
-               'cpuFlags': 'fpu,vme,de,pse,tsc,msr,pae,mce,cx8,apic,sep',
-               'ISCSIInitiatorName': 'iqn.1994-05.com.redhat:7d366003913',
-               'netConfigDirty': 'False',
-               'supportedENGINEs': ['3.5', '3.6', '4.0'],
-               'autoNumaBalancing': 0,
-               'additionalFeatures': ['GLUSTER_SNAPSHOT', 'GLUSTER_GEO_RE'],
-               'reservedMem': '321',
-               'bondings': {'bond0': {'ipv6autoconf': True,
-                                      'addr': '',
-                                      'ipv6addrs': [],
-                                      'switch': 'legacy',
-                                      'active_slave': '',
-                                      'mtu': '1500',
-                                      'dhcpv4': False,
-                                      'netmask': '',
-                                      'dhcpv6': False,
-                                      'ipv4addrs': [],
-                                      'hwaddr': '3a:02:ff:17:ac:74',
-                                      'slaves': [],
-                                      'ipv6gateway': '::',
-                                      'gateway': '',
-                                      'opts': {'mode': '0'}}},
-               'software_version': '4.18',
-               'memSize': '15934',
-               'cpuSpeed': '1600.125',
-               'numaNodes': {'0': {'totalMemory': '15934',
-                                   'cpus': [0, 1, 2, 3, 4, 5, 6, 7]}},
-               'cpuSockets': '1',
-               'nameservers': [],
-               'vlans': {},
-               'lastClientIface': 'ovirtmgmt',
-               'cpuCores': '4',
-               'kvmEnabled': 'true',
-               'guestOverhead': '65',
-               'version_name': 'Snow Man',
-               'cpuThreads': '8',
-               'emulatedMachines': ['pc-q35-2.0', 'pc-q35-2.1'],
-               'rngSources': ['hwrng', 'random'],
-               'operatingSystem': {'release': '1',
-                                   'version': '23',
-                                   'name': 'Fedora',
-                                   'pretty_name': 'Fedora 24 (Workstation)'},
-               'vncEncrypted': 'false'}
-
         _schema.verify_retval(
-            vdsmapi.MethodRep('Host', 'getCapabilities'), ret)
+            vdsmapi.MethodRep('Host', 'getCapabilities'), CAPS)
 
     def test_create_complex_params(self):
         complex_type = {'lease': {'sd_id': 'UUID', 'lease_id': 'UUID'}}
@@ -1065,3 +1103,34 @@ class SchemaInconsistencyFormatterTest(TestCaseBase):
         self.assertIn(u'call_arg_keys":[', log_entries)
         self.assertIn(u'\t"a",', log_entries)
         self.assertIn(u'\t"b"', log_entries)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("vms", [1, 100, 1000])
+def test_benchmark_allvmstats(vms):
+    ret = [dict(VM_STATS[0], vmId=str(uuid.uuid4())) for i in range(vms)]
+    rep = vdsmapi.MethodRep('Host', 'getAllVmStats')
+    count = 10
+    elapsed = benchmark_retval(rep, ret, count)
+    print("%d vms verified in %.6f seconds (%.6f seconds per vm)"
+          % (vms, elapsed / count, elapsed / count / vms))
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("nics", [1, 100, 1000])
+def test_benchmark_caps(nics):
+    nic = CAPS['nics']['eno1']
+    ret = dict(CAPS, nics={'eno%d' % i: nic for i in range(nics)})
+    rep = vdsmapi.MethodRep('Host', 'getCapabilities')
+    count = 10
+    elapsed = benchmark_retval(rep, ret, count)
+    print("capabilities with %d nics verified in %.6f seconds"
+          % (nics, elapsed / count))
+
+
+def benchmark_retval(rep, ret, count):
+    _schema.verify_retval(rep, ret)
+    start = time.time()
+    for i in range(count):
+        _schema.verify_retval(rep, ret)
+    return time.time() - start
@@ -22,6 +22,7 @@ from __future__ import division
 
 from testlib import VdsmTestCase as TestCaseBase
 from vdsm.tool.dump_volume_chains import (_build_volume_chain, _BLANK_UUID,
+                                          _volumes_by_image,
                                           OrphanVolumes, ChainLoopError,
                                           NoBaseVolume, DuplicateParentError)
 
@@ -57,3 +58,31 @@ class GetVolumeChainTests(TestCaseBase):
         with self.assertRaises(DuplicateParentError):
             _build_volume_chain(
                 [(_BLANK_UUID, 'a'), ('a', 'b'), ('a', 'c')])
+
+
+class VolumesByImageTests(TestCaseBase):
+    def test_empty(self):
+        self.assertEqual(_volumes_by_image({}), {})
+
+    def test_images(self):
+        volumes = {
+            'a': {'image': 'img1', 'parent': _BLANK_UUID},
+            'b': {'image': 'img1', 'parent': 'a'},
+            'c': {'image': 'img2', 'parent': _BLANK_UUID},
+        }
+        self.assertEqual(_volumes_by_image(volumes), {
+            'img1': {'a': volumes['a'], 'b': volumes['b']},
+            'img2': {'c': volumes['c']},
+        })
+
+    def test_template(self):
+        volumes = {
+            'tmpl': {'image': 'tmpl-img', 'parent': _BLANK_UUID},
+            'a': {'image': 'img1', 'parent': 'tmpl'},
+            'b': {'image': 'img2', 'parent': 'tmpl'},
+        }
+        self.assertEqual(_volumes_by_image(volumes), {
+            'tmpl-img': {'tmpl': volumes['tmpl']},
+            'img1': {'tmpl': volumes['tmpl'], 'a': volumes['a']},
+            'img2': {'tmpl': volumes['tmpl'], 'b': volumes['b']},
+        })
@@ -0,0 +1,145 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import pytest
+
+from vdsm.virt import bulkstats
+
+STATS = {
+    'state.state': 1,
+    'cpu.time': 13755069120,
+    'cpu.user': 3370000000,
+    'cpu.system': 6320000000,
+    'balloon.current': 4194304,
+    'vcpu.current': 2,
+    'net.count': 1,
+    'net.0.name': 'vnet0',
+    'net.0.rx.bytes': 1024,
+    'net.0.rx.errs': 0,
+    'net.0.rx.drop': 0,
+    'net.0.tx.bytes': 2 ** 64 - 1,
+    'net.0.tx.errs': 0,
+    'net.0.tx.drop': 0,
+    'block.count': 2,
+    'block.0.name': 'hdc',
+    'block.0.rd.reqs': 0,
+    'block.0.rd.bytes': 0,
+    'block.1.name': 'vda',
+    'block.1.path': '/path/to/vda',
+    'block.1.rd.reqs': 1,
+    'block.1.rd.bytes': 512,
+    'block.1.rd.times': 58991,
+}
+
+
+def test_scalars():
+    sample = bulkstats.compact(STATS)
+    assert sample['cpu.time'] == 13755069120
+    assert sample.get('vcpu.current') == 2
+    assert 'balloon.current' in sample
+
+
+def test_missing_scalar():
+    sample = bulkstats.compact(STATS)
+    assert 'balloon.available' not in sample
+    assert sample.get('balloon.available', 0) == 0
+    with pytest.raises(KeyError) as e:
+        sample['balloon.available']
+    assert 'balloon.available' in str(e.value)
+
+
+def test_unknown_scalar():
+    sample = bulkstats.compact(STATS)
+    assert 'state.state' not in sample
+    with pytest.raises(KeyError):
+        sample['state.state']
+
+
+def test_slots():
+    sample = bulkstats.compact(STATS)
+    assert sample.layout.slots == {
+        'block': {'hdc': 0, 'vda': 1},
+        'net': {'vnet0': 0},
+    }
+
+
+def test_rows():
+    sample = bulkstats.compact(STATS)
+    assert len(sample.block) == 2
+    assert len(sample.net) == 1
+    assert value(sample, 'block', 1, 'rd.bytes') == 512
+    assert value(sample, 'net', 0, 'tx.bytes') == 2 ** 64 - 1
+
+
+def test_missing_value():
+    sample = bulkstats.compact(STATS)
+    assert value(sample, 'block', 0, 'rd.times') is None
+
+
+def test_layout_reused():
+    first = bulkstats.compact(STATS)
+    stats = dict(STATS, **{'block.1.rd.bytes': 1024})
+    last = bulkstats.compact(stats, first.layout)
+    assert last.layout is first.layout
+    assert value(last, 'block', 1, 'rd.bytes') == 1024
+
+
+@pytest.mark.parametrize("changes", [
+    # Disk hotplugged.
+    {'block.count': 3, 'block.2.name': 'sda'},
+    # Disks reordered.
+    {'block.0.name': 'vda', 'block.1.name': 'hdc'},
+    # Nic unplugged.
+    {'net.count': 0},
+])
+def test_layout_changed(changes):
+    first = bulkstats.compact(STATS)
+    stats = dict(STATS, **changes)
+    last = bulkstats.compact(stats, first.layout)
+    assert last.layout is not first.layout
+    assert last.layout.matches(stats)
+
+
+def test_missing_name():
+    # Seen using SR-IOV: count is an upper bound.
+    stats = {'net.count': 2, 'net.1.name': 'vnet1', 'net.1.rx.bytes': 1}
+    sample = bulkstats.compact(stats)
+    assert sample.layout.slots['net'] == {'vnet1': 1}
+    assert sample.net[0] == (None,) * len(bulkstats.NET)
+    assert value(sample, 'net', 1, 'rx.bytes') == 1
+
+
+def test_as_sample():
+    sample = bulkstats.compact(STATS)
+    assert bulkstats.as_sample(sample) is sample
+    assert bulkstats.as_sample(None) is None
+    assert bulkstats.as_sample(STATS).cpu == sample.cpu
+
+
+def test_delta():
+    assert bulkstats.delta((1, None, 3), (4, 5, None)) == [3, None, None]
+
+
+def value(sample, group, slot, field):
+    row = getattr(sample, group)[slot]
+    return row[bulkstats.field_index(group, field)]
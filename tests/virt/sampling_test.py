@@ -106,7 +106,7 @@ class StatsCacheTests(TestCaseBase):
             ({'a': 'bar'}, 2)
         ))
         res = self.cache.get('a')
-        self.assertEqual(res,
+        self.assertEqual(self._values(res),
                          ('foo',
                           'bar',
                           FakeClock.STEP,
@@ -164,7 +164,7 @@ class StatsCacheTests(TestCaseBase):
             ({'a': 'baz'}, 3)
         ))
         res = self.cache.get('a')
-        self.assertEqual(res,
+        self.assertEqual(self._values(res),
                          ('bar',
                           'baz',
                           FakeClock.STEP,
@@ -177,7 +177,7 @@ class StatsCacheTests(TestCaseBase):
             ({'a': 'baz'}, 3)
         ))
         res = self.cache.get('a')
-        self.assertEqual(res,
+        self.assertEqual(self._values(res),
                          ('foo',
                           'baz',
                           FakeClock.STEP,
@@ -193,7 +193,7 @@ class StatsCacheTests(TestCaseBase):
             ({'a': 'baz', 'b': 'baz'}, 3),
         ))
         self.fake_monotonic_time.freeze(value=4)
-        self.assertEqual(self.cache.get('a'),
+        self.assertEqual(self._values(self.cache.get('a')),
                          ('bar', 'baz', 1, 1))
         res = self.cache.get('b')
         self.assertTrue(res.is_empty())
@@ -222,9 +222,27 @@ class StatsCacheTests(TestCaseBase):
         self.assertTrue(res.is_empty())
         self.assertEqual(res.stats_age, 100)
 
+    def test_layout_reused(self):
+        self._feed_cache((
+            ({'a': 'foo'}, 1),
+            ({'a': 'bar'}, 2)
+        ))
+        res = self.cache.get('a')
+        self.assertIs(res.first_value.layout, res.last_value.layout)
+
     def _feed_cache(self, samples):
-        for sample in samples:
-            self.cache.put(*sample)
+        # Use the sample value as the value of a single stat.
+        for bulk_stats, monotonic_ts in samples:
+            self.cache.put(
+                {vm_id: {'cpu.time': value}
+                 for vm_id, value in bulk_stats.items()},
+                monotonic_ts)
+
+    def _values(self, res):
+        return (res.first_value['cpu.time'],
+                res.last_value['cpu.time'],
+                res.interval,
+                res.stats_age)
 
 
 class NumaNodeMemorySampleTests(TestCaseBase):
@@ -0,0 +1,284 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import copy
+
+import pytest
+
+from vdsm.virt import statstracker
+
+VM1 = {
+    'vmId': 'vm1',
+    'status': 'Up',
+    'cpuUser': '1.00',
+    'network': {'vnet0': {'rx': '0', 'tx': '0'}},
+}
+
+VM2 = {
+    'vmId': 'vm2',
+    'status': 'Up',
+    'cpuUser': '2.00',
+}
+
+
+@pytest.fixture
+def tracker():
+    return statstracker.VmStatsTracker()
+
+
+def test_full(tracker):
+    res = tracker.changes([VM1, VM2])
+    assert res['full']
+    assert res['removed'] == []
+    assert by_id(res['changed']) == {
+        'vm1': {'vmId': 'vm1', 'stats': VM1, 'removed': []},
+        'vm2': {'vmId': 'vm2', 'stats': VM2, 'removed': []},
+    }
+
+
+def test_no_changes(tracker):
+    token = tracker.changes([VM1, VM2])['token']
+    res = tracker.changes([VM1, VM2], token)
+    assert not res['full']
+    assert res['changed'] == []
+    assert res['removed'] == []
+    assert res['token'] == token
+
+
+def test_changed_fields(tracker):
+    token = tracker.changes([VM1, VM2])['token']
+    vm1 = dict(VM1, cpuUser='3.00')
+    res = tracker.changes([vm1, VM2], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1', 'stats': {'cpuUser': '3.00'}, 'removed': []},
+    ]
+    assert res['token'] != token
+
+
+def test_changed_in_place(tracker):
+    # The owner of the stats may modify nested values in place.
+    vm1 = copy.deepcopy(VM1)
+    token = tracker.changes([vm1])['token']
+    vm1['network']['vnet0']['rx'] = '1024'
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1',
+         'stats': {'network': {'vnet0': {'rx': '1024'}}},
+         'removed': []},
+    ]
+
+
+def test_volatile_fields(tracker):
+    vm1 = dict(VM1, statusTime='1000', elapsedTime='10')
+    token = tracker.changes([vm1])['token']
+
+    # Changes in volatile fields only are not reported.
+    vm1 = dict(vm1, statusTime='2000', elapsedTime='20')
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == []
+    assert res['token'] == token
+
+    # But they are reported with other changes.
+    vm1 = dict(vm1, statusTime='3000', cpuUser='3.00')
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1',
+         'stats': {'cpuUser': '3.00', 'statusTime': '3000',
+                   'elapsedTime': '20'},
+         'removed': []},
+    ]
+
+
+def test_volatile_device_fields(tracker):
+    vm1 = copy.deepcopy(VM1)
+    vm1['network']['vnet0']['sampleTime'] = 1.0
+    vm1['network']['vnet1'] = {'rx': '0', 'tx': '0', 'sampleTime': 1.0}
+    token = tracker.changes([vm1])['token']
+
+    vm1['network']['vnet0']['sampleTime'] = 2.0
+    vm1['network']['vnet1']['sampleTime'] = 2.0
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == []
+
+    # The sample time is reported with the changed device.
+    vm1['network']['vnet0']['sampleTime'] = 3.0
+    vm1['network']['vnet0']['rx'] = '1024'
+    vm1['network']['vnet1']['sampleTime'] = 3.0
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1',
+         'stats': {'network': {'vnet0': {'rx': '1024', 'sampleTime': 3.0}}},
+         'removed': []},
+    ]
+
+
+def test_added_device(tracker):
+    token = tracker.changes([VM1])['token']
+    vm1 = copy.deepcopy(VM1)
+    vm1['network']['vnet1'] = {'rx': '0', 'tx': '0'}
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1',
+         'stats': {'network': {'vnet1': {'rx': '0', 'tx': '0'}}},
+         'removed': []},
+    ]
+
+
+def test_removed_device(tracker):
+    vm1 = copy.deepcopy(VM1)
+    vm1['network']['vnet1'] = {'rx': '0', 'tx': '0'}
+    token = tracker.changes([vm1])['token']
+    res = tracker.changes([VM1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1', 'stats': {}, 'removed': ['network/vnet1']},
+    ]
+
+    # Added again, replacing the previous device.
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1',
+         'stats': {'network': {'vnet1': {'rx': '0', 'tx': '0'}}},
+         'removed': ['network/vnet1']},
+    ]
+
+
+def test_changed_device_fields(tracker):
+    token = tracker.changes([VM1])['token']
+    vm1 = copy.deepcopy(VM1)
+    vm1['network']['vnet0'] = {'rx': '0'}
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1',
+         'stats': {'network': {'vnet0': {'rx': '0'}}},
+         'removed': ['network/vnet0']},
+    ]
+
+
+def test_removed_devices_field(tracker):
+    token = tracker.changes([VM1])['token']
+    vm1 = dict(VM1)
+    del vm1['network']
+    res = tracker.changes([vm1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1', 'stats': {}, 'removed': ['network']},
+    ]
+
+    # Reported again with no devices.
+    token = res['token']
+    res = tracker.changes([dict(vm1, network={})], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1', 'stats': {'network': {}}, 'removed': []},
+    ]
+
+
+def test_removed_field(tracker):
+    vm1 = dict(VM1, migrationProgress=50)
+    token = tracker.changes([vm1])['token']
+    res = tracker.changes([VM1], token)
+    assert res['changed'] == [
+        {'vmId': 'vm1', 'stats': {}, 'removed': ['migrationProgress']},
+    ]
+
+    # Reported again.
+    res = tracker.changes([vm1], res['token'])
+    assert res['changed'] == [
+        {'vmId': 'vm1', 'stats': {'migrationProgress': 50}, 'removed': []},
+    ]
+
+
+def test_added_vm(tracker):
+    token = tracker.changes([VM1])['token']
+    res = tracker.changes([VM1, VM2], token)
+    assert res['changed'] == [
+        {'vmId': 'vm2', 'stats': VM2, 'removed': []},
+    ]
+
+
+def test_removed_vm(tracker):
+    token = tracker.changes([VM1, VM2])['token']
+    res = tracker.changes([VM1], token)
+    assert res['changed'] == []
+    assert res['removed'] == ['vm2']
+
+    # Reported once.
+    res = tracker.changes([VM1], res['token'])
+    assert res['removed'] == []
+
+
+def test_readded_vm(tracker):
+    token = tracker.changes([VM1, VM2])['token']
+    tracker.changes([VM1])
+    res = tracker.changes([VM1, VM2], token)
+    assert res['removed'] == ['vm2']
+    assert res['changed'] == [
+        {'vmId': 'vm2', 'stats': VM2, 'removed': []},
+    ]
+
+
+def test_multiple_clients(tracker):
+    token1 = tracker.changes([VM1])['token']
+    vm1 = dict(VM1, cpuUser='3.00')
+    token2 = tracker.changes([vm1])['token']
+    res1 = tracker.changes([vm1, VM2], token1)
+    res2 = tracker.changes([vm1, VM2], token2)
+    assert by_id(res1['changed']) == {
+        'vm1': {'vmId': 'vm1', 'stats': {'cpuUser': '3.00'}, 'removed': []},
+        'vm2': {'vmId': 'vm2', 'stats': VM2, 'removed': []},
+    }
+    assert res2['changed'] == [
+        {'vmId': 'vm2', 'stats': VM2, 'removed': []},
+    ]
+
+
+@pytest.mark.parametrize("token", [
+    "invalid",
+    "other-instance:1",
+    # From the future.
+    None,
+])
+def test_unknown_token(tracker, token):
+    valid = tracker.changes([VM1])['token']
+    if token is None:
+        token = valid.rsplit(':', 1)[0] + ':42'
+    res = tracker.changes([VM1, VM2], token)
+    assert res['full']
+    assert len(res['changed']) == 2
+
+
+def test_expired_removals():
+    tracker = statstracker.VmStatsTracker(max_removed=1)
+    token = tracker.changes([VM1, VM2])['token']
+    tracker.changes([VM1])
+    recent = tracker.changes([])['token']
+
+    # The removal of vm2 was forgotten.
+    res = tracker.changes([], token)
+    assert res['full']
+    assert res['changed'] == []
+
+    res = tracker.changes([], recent)
+    assert not res['full']
+
+
+def by_id(changed):
+    return {change['vmId']: change for change in changed}
@@ -999,7 +999,8 @@ class TestVmStats(TestCaseBase):
                 testvm, fake.Nic(
                     name='vnettest', model='virtio', mac_addr=MAC
                 ),
-                start_sample={'net.0.rx.bytes': 2 ** 64 - 15 * GBPS,
+                start_sample={'net.count': 1,
+                              'net.0.rx.bytes': 2 ** 64 - 15 * GBPS,
                               'net.0.rx.pkts': 1,
                               'net.0.rx.errs': 2,
                               'net.0.rx.drop': 3,
@@ -1008,7 +1009,8 @@ class TestVmStats(TestCaseBase):
                               'net.0.tx.errs': 5,
                               'net.0.tx.drop': 6},
                 start_index=0,
-                end_sample={'net.0.rx.bytes': 0,
+                end_sample={'net.count': 1,
+                            'net.0.rx.bytes': 0,
                             'net.0.rx.pkts': 7,
                             'net.0.rx.errs': 8,
                             'net.0.rx.drop': 9,
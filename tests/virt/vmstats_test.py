@@ -27,6 +27,7 @@ import uuid
 
 import six
 
+from vdsm.virt import bulkstats
 from vdsm.virt import vmstats
 
 from fakelib import FakeLogger
@@ -257,22 +258,20 @@ class VmStatsTestCase(TestCaseBase):
 @expandPermutations
 class UtilsFunctionsTests(VmStatsTestCase):
 
-    # we should not test private functions, but this one is
-    # the cornerstone of bulk stats translation, so we make
-    # one exception for the sake of the practicality.
+    # the layout is the cornerstone of bulk stats translation.
 
     @permutations([['block', 'hdc'], ['net', 'vnet0']])
     def test_find_existing(self, group, name):
-        indexes = vmstats._find_bulk_stats_reverse_map(
-            self.bulk_stats, group)
+        indexes = bulkstats.Layout.from_stats(
+            self.bulk_stats).slots[group]
         self.assertNameIsAt(
             self.bulk_stats, group, indexes[name], name)
 
     @permutations([['block'], ['net']])
     def test_find_bogus(self, group):
         name = 'inexistent'
-        indexes = vmstats._find_bulk_stats_reverse_map(
-            self.bulk_stats, group)
+        indexes = bulkstats.Layout.from_stats(
+            self.bulk_stats).slots[group]
         self.assertNotIn(name, indexes)
 
     @permutations([['block', 'hdc'], ['net', 'vnet0']])
@@ -280,8 +279,8 @@ class UtilsFunctionsTests(VmStatsTestCase):
         all_indexes = []
 
         for bulk_stats in self.samples:
-            indexes = vmstats._find_bulk_stats_reverse_map(
-                bulk_stats, group)
+            indexes = bulkstats.Layout.from_stats(
+                bulk_stats).slots[group]
 
             self.assertNameIsAt(bulk_stats, group, indexes[name], name)
             all_indexes.append(indexes)
@@ -293,8 +292,8 @@ class UtilsFunctionsTests(VmStatsTestCase):
         # seen using SR-IOV
 
         bulk_stats = next(six.itervalues(_FAKE_BULK_STATS_SRIOV))
-        indexes = vmstats._find_bulk_stats_reverse_map(
-            bulk_stats[0], 'net')
+        indexes = bulkstats.Layout.from_stats(
+            bulk_stats[0]).slots['net']
         self.assertTrue(indexes)
 
     def test_log_inexistent_key(self):
@@ -0,0 +1,147 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import threading
+
+import pytest
+
+from vdsm import schedule
+from vdsm.virt import vmstatspool
+
+TIMEOUT = 0.5
+
+
+@pytest.fixture
+def scheduler():
+    s = schedule.Scheduler()
+    s.start()
+    yield s
+    s.stop()
+
+
+@pytest.fixture
+def pool(scheduler):
+    p = vmstatspool.VmStatsPool(scheduler, workers=2, timeout=TIMEOUT)
+    p.start()
+    yield p
+    p.stop()
+
+
+def test_produce(pool):
+    vms = [FakeVM('vm%d' % i) for i in range(5)]
+    assert pool.produce(vms) == [vm.stats() for vm in vms]
+
+
+def test_produce_empty(pool):
+    assert pool.produce([]) == []
+
+
+def test_blocked_vm(pool):
+    blocked = FakeVM('blocked')
+    blocked.block()
+    vms = [FakeVM('vm1'), blocked, FakeVM('vm2')]
+    try:
+        res = pool.produce(vms)
+        assert res == [
+            vms[0].stats(),
+            {'vmId': 'blocked', 'status': 'Up', 'statsTimeout': True},
+            vms[2].stats(),
+        ]
+
+        # Not dispatched again while blocked.
+        res = pool.produce(vms)
+        assert res[1]['statsTimeout']
+        assert blocked.calls == 1
+    finally:
+        blocked.unblock()
+
+
+def test_blocked_vm_does_not_delay_other_vms(pool):
+    blocked = FakeVM('blocked')
+    blocked.block()
+    vms = [blocked] + [FakeVM('vm%d' % i) for i in range(5)]
+    try:
+        res = pool.produce(vms)
+        assert res[0]['statsTimeout']
+        assert res[1:] == [vm.stats() for vm in vms[1:]]
+    finally:
+        blocked.unblock()
+
+
+def test_unblocked_vm(pool):
+    vm = FakeVM('vm')
+    vm.block()
+    assert pool.produce([vm])[0]['statsTimeout']
+    vm.unblock()
+    vm.done.wait(TIMEOUT)
+    # Dispatched again once unblocked.
+    assert pool.produce([vm]) == [vm.stats()]
+
+
+def test_error(pool):
+    vm = FakeVM('vm', error=RuntimeError("no stats"))
+    with pytest.raises(RuntimeError):
+        pool.produce([FakeVM('vm1'), vm])
+
+    # The failed VM is not considered blocked.
+    vm.error = None
+    assert pool.produce([vm]) == [vm.stats()]
+
+
+def test_not_running(scheduler):
+    # Stats are produced in the calling thread.
+    pool = vmstatspool.VmStatsPool(scheduler, workers=1, timeout=TIMEOUT)
+    vms = [FakeVM('vm1'), FakeVM('vm2')]
+    assert pool.produce(vms) == [vm.stats() for vm in vms]
+
+
+class FakeVM(object):
+
+    def __init__(self, vm_id, error=None):
+        self.id = vm_id
+        self.lastStatus = 'Up'
+        self.error = error
+        self.calls = 0
+        self.done = threading.Event()
+        self._ready = threading.Event()
+        self._ready.set()
+
+    def block(self):
+        self._ready.clear()
+        self.done.clear()
+
+    def unblock(self):
+        self._ready.set()
+
+    def stats(self):
+        return {'vmId': self.id, 'status': self.lastStatus}
+
+    def getStats(self):
+        self.calls += 1
+        try:
+            self._ready.wait()
+            if self.error:
+                raise self.error
+            return self.stats()
+        finally:
+            self.done.set()